@@ -1,7 +1,12 @@
 from fastapi import FastAPI 
 from fastapi.middleware.cors import CORSMiddleware
 
-from src.api import immuneapp, immuneappneo, transphla, lineardesign
+from src.api import immuneapp, immuneappneo, transphla, lineardesign, estimate
+from src.utils.hits import HitsMiddleware
+from src.utils.metrics import metrics_endpoint, MetricsMiddleware
+from src.utils.profiling import ProfilingMiddleware
+from src.utils.resource_usage import ResourceUsageMiddleware
+from src.utils.tracing import TracingMiddleware
 
 app = FastAPI()
 
@@ -15,7 +20,18 @@ app.add_middleware(
     allow_credentials=True,  # 支持cookie跨域
     allow_methods=["*"],  # 允许的请求方法
     allow_headers=["*"],  # 允许的请求头
+    expose_headers=["X-Resource-Usage", "X-Request-Id", "X-Profile-Url", "X-Profile-Status"],  # 允许前端读取资源统计、请求 ID 和剖析报告地址
 )
+# 未要求返回 hits 时从响应 JSON 中去掉 hits 字段
+app.add_middleware(HitsMiddleware)
+# 按请求汇总工具进程的 CPU 时间、峰值内存和 I/O
+app.add_middleware(ResourceUsageMiddleware)
+# 请求头 X-Profile 开启时用 cProfile + tracemalloc 剖析本次请求
+app.add_middleware(ProfilingMiddleware)
+# 生成请求 ID 并记录各阶段耗时，按需在响应中返回 timings
+app.add_middleware(TracingMiddleware)
+# 记录接口耗时和错误数，/metrics 以 Prometheus 文本格式输出
+app.add_middleware(MetricsMiddleware)
 
 @app.get("/")
 def read_root():
@@ -25,3 +41,5 @@ app.post("/ImmuneApp",tags=["ImmuneApp_presentation"],summary="ImmuneAppTool")(i
 app.post("/ImmuneApp_Neo",tags=["ImmuneApp_immunogenicity"],summary="ImmuneAppNeoTool")(immuneappneo)
 app.post("/TransPHLA_AOMP",tags=["TransPHLA_AOMP"],summary="TransPHLATool")(transphla)
 app.post("/LinearDesign",tags=["LinearDesign"],summary="LinearDesignTool")(lineardesign)
+app.post("/estimate",tags=["Estimate"],summary="EstimateToolCost")(estimate)
+app.get("/metrics",tags=["Metrics"],summary="Metrics")(metrics_endpoint)
@@ -19,7 +19,12 @@ current_file = Path(__file__).resolve()
 project_root = current_file.parents[4]
 sys.path.append(str(project_root))
 from src.tools.ImmuneApp.parse_immuneapp_results import parse_immuneapp_results, parse_immuneapp_annotation_results
+from src.utils.hits import top_hits, with_hits
+from src.utils.summarize import read_table
 from src.utils.log import logger
+from src.utils.supervisor import run_supervised
+from src.utils.tracing import traced
+from src.utils.minio_utils import upload_artifacts_to_minio, InstrumentedMinio
 from config import CONFIG_YAML
 
 # ImmuneApp 配置
@@ -39,7 +44,7 @@ MINIO_SECURE = MINIO_CONFIG.get("secure", False)
 MINIO_BUCKET = CONFIG_YAML["MINIO"]["immuneapp_bucket"]
 DOWNLOAD_PREFIX = CONFIG_YAML["TOOL"]["COMMON"]["output_download_url_prefix"]
 
-minio_client = Minio(
+minio_client = InstrumentedMinio(
     MINIO_ENDPOINT,
     access_key=MINIO_ACCESS_KEY,
     secret_key=MINIO_SECRET_KEY,
@@ -115,6 +120,7 @@ def check_minio_connection():
         return False
 
 
+@traced()
 async def run_ImmuneApp(minio_input_path: str,
                         alleles: str,
                         use_binding_score: bool = True,
@@ -175,14 +181,9 @@ async def run_ImmuneApp(minio_input_path: str,
     command += ["-o", str(output_subdir)]
 
     try:
-        process = await asyncio.create_subprocess_exec(
-            *map(str, command),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            cwd=os.path.dirname(immuneapp_script)
-        )
+        process = await run_supervised("immuneapp", command, cwd=os.path.dirname(immuneapp_script))
 
-        stdout, stderr = await process.communicate()
+        stdout, stderr = process.stdout, process.stderr
         stdout_text = stdout.decode()
         stderr_text = stderr.decode()
         # print(f"stdout:{stdout_text}")
@@ -195,35 +196,37 @@ async def run_ImmuneApp(minio_input_path: str,
                 output=f"stdout: {stdout.decode()}\nstderr: {stderr.decode()}"
             )
         logger.info(f"ImmuneApp 执行成功，输出目录: {output_subdir}")
-        # 上传输出文件到 MinIO
-        uploaded_paths = {}
-        if not minio_client.bucket_exists(MINIO_BUCKET):
-            minio_client.make_bucket(MINIO_BUCKET)
-            logger.info(f"创建 MinIO 存储桶: {MINIO_BUCKET}")
-        try:
-            for file in output_subdir.iterdir():
-                if file.is_file():
-                    object_name = f"{result_uuid}_{file.name}"
-                    minio_client.fput_object(
-                        MINIO_BUCKET,
-                        object_name,
-                        str(file)
-                    )
-                    logger.info(f"文件 {file.name} 已上传到 MinIO，路径: minio://{MINIO_BUCKET}/{object_name}")
-                    file_path = f"minio://{MINIO_BUCKET}/{object_name}"
-                    uploaded_paths[file.name] = file_path
-        except Exception as upload_error:
+        # 并发上传输出文件到 MinIO
+        uploaded_paths, failures = await upload_artifacts_to_minio(
+            {file.name: file for file in output_subdir.iterdir() if file.is_file()},
+            MINIO_BUCKET,
+            object_prefix=f"{result_uuid}_"
+        )
+        if failures:
+            upload_error = next(iter(failures.values()))
             logger.error(f"文件上传到 MinIO 失败: {upload_error}")
             return json.dumps({
                 "type": "text",
                 "content": f"文件上传到 MinIO 失败: {upload_error}"
             }, ensure_ascii=False)
         #print(f"uploaded_paths: {uploaded_paths}")
+        # 直接解析本地结果文件，避免从 MinIO 重新下载；结果表只读取一次，摘要和 hits 共用
+        predictions_path = output_subdir / "ImmuneApp_presentation_predictions.tsv"
+        predictions_df = read_table(predictions_path, sep='\t')
         immuneapp_content = parse_immuneapp_results(
-            uploaded_paths.get("ImmuneApp_presentation_predictions.tsv")
+            predictions_path if predictions_df is None else predictions_df
         )
+        # hits 按呈递百分位排名 El_rank 升序，附 Binder 列的分类计数
+        hits = None
+        if predictions_df is not None:
+            counts = predictions_df["Binder"].value_counts() if "Binder" in predictions_df.columns else None
+            hits = top_hits(
+                predictions_df, "El_rank", ascending=True,
+                columns=["Allele", "Peptide", "Sample", "El_rank", "El_score", "Aff_score", "Aff_nM", "Binder"],
+                counts=None if counts is None else counts.to_dict()
+            )
         immuneapp_annotation_content = parse_immuneapp_annotation_results(
-            uploaded_paths.get("sample_annotation_results.txt")
+            output_subdir / "sample_annotation_results.txt"
         )
         try:
             # 删除输入文件
@@ -239,11 +242,11 @@ async def run_ImmuneApp(minio_input_path: str,
                 logger.info(f"已删除输出目录: {output_subdir}")
         except Exception as cleanup_error:
             logger.error(f"清理临时文件失败: {cleanup_error}")
-        return json.dumps({
+        return json.dumps(with_hits({
                 "type": "link",
                 "url":uploaded_paths,
                 "content": f"ImmuneApp工具执行完成，结果文件已生成。\n\n[预测结果]\n{immuneapp_content}\n\n[注释统计结果]\n{immuneapp_annotation_content}",
-            }, ensure_ascii=False)
+            }, hits), ensure_ascii=False)
     except Exception as e:
         logger.error(f"ImmuneApp工具执行失败: {e}")
         return json.dumps({
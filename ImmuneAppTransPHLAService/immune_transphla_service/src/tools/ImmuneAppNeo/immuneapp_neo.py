@@ -15,7 +15,12 @@ current_file = Path(__file__).resolve()
 project_root = current_file.parents[5]
 sys.path.append(str(project_root))
 from src.tools.ImmuneAppNeo.parse_immuneapp_neo_results import parse_immuneapp_neo_results
+from src.utils.hits import top_hits, with_hits
+from src.utils.summarize import read_table
 from src.utils.log import logger
+from src.utils.supervisor import run_supervised
+from src.utils.tracing import traced
+from src.utils.minio_utils import upload_artifacts_to_minio, InstrumentedMinio
 from config import CONFIG_YAML
 
 load_dotenv()
@@ -24,6 +29,7 @@ immuneapp_neo_script = CONFIG_YAML["TOOL"]["IMMUNEAPP_NEO"]["script_path"]
 immuneapp_python = CONFIG_YAML["TOOL"]["IMMUNEAPP_NEO"]["python_bin"]
 input_tmp_dir = CONFIG_YAML["TOOL"]["IMMUNEAPP_NEO"]["input_tmp_dir"]
 output_tmp_dir = CONFIG_YAML["TOOL"]["IMMUNEAPP_NEO"]["output_tmp_dir"]
+result_file_name = CONFIG_YAML["TOOL"]["IMMUNEAPP_NEO"].get("result_file", "ImmuneApp_immunogenicity_predictions.tsv")
 os.makedirs(input_tmp_dir, exist_ok=True)
 os.makedirs(output_tmp_dir, exist_ok=True)
 
@@ -35,7 +41,7 @@ MINIO_SECRET_KEY = os.getenv("SECRET_KEY")
 MINIO_SECURE = MINIO_CONFIG.get("secure", False)
 MINIO_BUCKET = CONFIG_YAML["MINIO"]["immuneapp_neo_bucket"]
 
-minio_client = Minio(
+minio_client = InstrumentedMinio(
     MINIO_ENDPOINT,
     access_key=MINIO_ACCESS_KEY,
     secret_key=MINIO_SECRET_KEY,
@@ -63,6 +69,7 @@ def download_file_from_minio(minio_path: str, local_dir: str):
     return str(local_path)
 
 
+@traced()
 async def run_ImmuneApp_Neo(input_file: str, alleles: str):
     """
     执行 ImmuneApp-Neo 命令以预测 neoepitope 的免疫原性，仅支持 peplist 文件输入。
@@ -94,14 +101,9 @@ async def run_ImmuneApp_Neo(input_file: str, alleles: str):
     command += ["-o", str(output_dir)]
 
     try:
-        process = await asyncio.create_subprocess_exec(
-            *command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            cwd=os.path.dirname(immuneapp_neo_script)
-        )
+        process = await run_supervised("immuneappneo", command, cwd=os.path.dirname(immuneapp_neo_script))
 
-        stdout, stderr = await process.communicate()
+        stdout, stderr = process.stdout, process.stderr
         stdout_text = stdout.decode()
         stderr_text = stderr.decode()
         # print(f"stdout: {stdout_text}")
@@ -115,29 +117,29 @@ async def run_ImmuneApp_Neo(input_file: str, alleles: str):
             )
         logger.info(f"ImmuneApp-Neo 执行成功，输出目录: {output_dir}")
 
-        # 上传输出文件到 MinIO
-        if not minio_client.bucket_exists(MINIO_BUCKET):
-            minio_client.make_bucket(MINIO_BUCKET)
-            logger.info(f"创建 MinIO 存储桶: {MINIO_BUCKET}")
-        try:
-            for file in output_dir.iterdir():
-                if file.is_file():
-                    object_name = f"{result_uuid}_{file.name}"
-                    minio_client.fput_object(
-                        MINIO_BUCKET,
-                        object_name,
-                        str(file)
-                    )
-                    logger.info(f"文件 {file.name} 已上传到 MinIO，路径: minio://{MINIO_BUCKET}/{object_name}")
-                    file_path = f"minio://{MINIO_BUCKET}/{object_name}"
-        except Exception as upload_error:
+        # 并发上传输出文件到 MinIO，其他文件上传失败不影响结果文件
+        output_files = [file for file in output_dir.iterdir() if file.is_file()]
+        uploaded_paths, failures = await upload_artifacts_to_minio(
+            {file.name: file for file in output_files},
+            MINIO_BUCKET,
+            object_prefix=f"{result_uuid}_"
+        )
+        result_file = output_dir / result_file_name
+        if result_file.name in failures:
+            upload_error = failures[result_file.name]
             logger.error(f"文件上传到 MinIO 失败: {upload_error}")
             return json.dumps({
                 "type": "text",
                 "content": f"文件上传到 MinIO 失败: {upload_error}"
             }, ensure_ascii=False)
-        # 解析结果文件
-        immuneapp_content = parse_immuneapp_neo_results(file_path)
+        file_path = uploaded_paths.get(result_file.name)
+        # 直接解析本地结果文件，避免从 MinIO 重新下载；结果表只读取一次，摘要和 hits 共用
+        result_df = read_table(result_file, sep='\t')
+        immuneapp_content = parse_immuneapp_neo_results(result_file if result_df is None else result_df)
+        hits = top_hits(
+            result_df, "Immunogenicity_score", ascending=False,
+            columns=["Allele", "Peptide", "Sample", "Immunogenicity_score"]
+        )
         # 删除输入和输出的临时文件
         try:
             # 删除输入文件
@@ -154,11 +156,11 @@ async def run_ImmuneApp_Neo(input_file: str, alleles: str):
         except Exception as cleanup_error:
             logger.error(f"清理临时文件失败: {cleanup_error}")
             
-        return json.dumps({
+        return json.dumps(with_hits({
             "type": "link",
             "url": file_path,
             "content": immuneapp_content
-        }, ensure_ascii=False)
+        }, hits), ensure_ascii=False)
 
     except Exception as e:
         logger.error(f"ImmuneApp_Neo执行失败: {e}")
@@ -12,6 +12,8 @@ current_file = Path(__file__).resolve()
 project_root = current_file.parents[5]
 sys.path.append(str(project_root))
 from src.utils.log import logger
+from src.utils.supervisor import run_supervised
+from src.utils.tracing import traced
 from config import CONFIG_YAML
 from src.utils.minio_utils import upload_file_to_minio,download_from_minio_uri
 
@@ -27,6 +29,7 @@ linear_design_dir = Path(linear_design_script).parents[0]
 
 
 
+@traced()
 async def run_lineardesign(minio_input_fasta: str, lambda_val: float = 1.0) -> str:
     try:
         
@@ -44,15 +47,10 @@ async def run_lineardesign(minio_input_fasta: str, lambda_val: float = 1.0) -> s
         ]
         #查看命令
         # print(f"Running command: {' '.join(command)}")
-        process = await asyncio.create_subprocess_exec(
-            *command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            cwd=linear_design_dir  
-        )
+        process = await run_supervised("lineardesign", command, cwd=linear_design_dir)
 
         # 等待执行结束，收集输出
-        stdout, stderr = await process.communicate()
+        stdout, stderr = process.stdout, process.stderr
         # print(f"STDOUT: {stdout.decode()}")
         # print(f"STDERR: {stderr.decode()}")
         # exit()
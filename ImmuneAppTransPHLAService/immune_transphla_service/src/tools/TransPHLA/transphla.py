@@ -14,7 +14,12 @@ from urllib.parse import urlparse
 current_file = Path(__file__).resolve()
 project_root = current_file.parents[5]
 sys.path.append(str(project_root))
+from src.utils.hits import top_hits, with_hits
+from src.utils.summarize import read_table
 from src.utils.log import logger
+from src.utils.supervisor import run_supervised
+from src.utils.tracing import traced
+from src.utils.minio_utils import upload_artifacts_to_minio, InstrumentedMinio
 from config import CONFIG_YAML
 from src.tools.TransPHLA.parse_transphla_results import parse_transphla_results
 
@@ -25,6 +30,7 @@ transphla_script = CONFIG_YAML["TOOL"]["TRANSPHLA"]["script_path"]
 transphla_python = CONFIG_YAML["TOOL"]["TRANSPHLA"]["python_bin"]
 input_tmp_dir = CONFIG_YAML["TOOL"]["TRANSPHLA"]["input_tmp_dir"]
 output_tmp_dir = CONFIG_YAML["TOOL"]["TRANSPHLA"]["output_tmp_dir"]
+result_file_name = CONFIG_YAML["TOOL"]["TRANSPHLA"].get("result_file", "predict_results.csv")
 os.makedirs(input_tmp_dir, exist_ok=True)
 os.makedirs(output_tmp_dir, exist_ok=True)
 
@@ -36,7 +42,7 @@ MINIO_SECRET_KEY = os.getenv("SECRET_KEY")
 MINIO_SECURE = MINIO_CONFIG.get("secure", False)
 MINIO_BUCKET = MINIO_CONFIG["transphla_bucket"]
 
-minio_client = Minio(
+minio_client = InstrumentedMinio(
     MINIO_ENDPOINT,
     access_key=MINIO_ACCESS_KEY,
     secret_key=MINIO_SECRET_KEY,
@@ -55,6 +61,7 @@ def download_file_from_minio(minio_path: str, local_dir: str):
     return str(local_file_path)
 
 
+@traced()
 async def run_TransPHLA(peptide_minio_path: str,
                         hla_minio_path: str,
                         threshold: float = 0.5,
@@ -84,14 +91,9 @@ async def run_TransPHLA(peptide_minio_path: str,
             "--output_mutation", "True"
         ]
 
-        process = await asyncio.create_subprocess_exec(
-            *map(str, command),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            cwd=os.path.dirname(transphla_script),
-        )
+        process = await run_supervised("transphla", command, cwd=os.path.dirname(transphla_script))
 
-        stdout, stderr = await process.communicate()
+        stdout, stderr = process.stdout, process.stderr
         # print(f"TransPHLA输出: {stdout.decode()}"
         #       f"TransPHLA错误: {stderr.decode()}")
         # exit()
@@ -100,33 +102,29 @@ async def run_TransPHLA(peptide_minio_path: str,
         
         logger.info(f"TransPHLA运行成功，结果在: {output_dir}")
 
-        # 上传结果目录下所有文件回 MinIO
-        
-        if not minio_client.bucket_exists(MINIO_BUCKET):
-            minio_client.make_bucket(MINIO_BUCKET)
-            logger.info(f"创建 MinIO 存储桶: {MINIO_BUCKET}")
-        
-        for file in output_dir.glob("*"):
-            if file.is_dir():
-                logger.info(f"Skipping directory: {file}")
-                continue
-
-            if not file.exists():
-                logger.warning(f"File not found: {file}")
-                continue
-            try:
-                logger.info(f"Uploading {file} to MinIO...")
-                object_path = f"{result_uuid}_transphla_{file.name}"
-                minio_client.fput_object(
-                    bucket_name=MINIO_BUCKET,
-                    object_name=object_path,
-                    file_path=str(file)
-                )
-        
-            except Exception as e:
-                logger.error(f"Failed to upload {file}: {e}")
-        file_path = f"minio://{MINIO_BUCKET}/{object_path}"
-        parse_content = parse_transphla_results(file_path)
+        # 并发上传结果目录下所有文件回 MinIO（子目录跳过），单个文件上传失败只记录日志
+        output_files = [file for file in output_dir.glob("*") if file.is_file()]
+        uploaded_paths, failures = await upload_artifacts_to_minio(
+            {file.name: file for file in output_files},
+            MINIO_BUCKET,
+            object_prefix=f"{result_uuid}_transphla_"
+        )
+        for name, upload_error in failures.items():
+            logger.error(f"Failed to upload {name}: {upload_error}")
+        result_file = output_dir / result_file_name
+        if result_file.name in failures:
+            raise failures[result_file.name]
+        file_path = uploaded_paths.get(result_file.name)
+        # 直接解析本地结果文件，避免从 MinIO 重新下载；结果表只读取一次，摘要和 hits 共用
+        result_df = read_table(result_file)
+        parse_content = parse_transphla_results(result_file if result_df is None else result_df)
+        hits = None
+        if result_df is not None and "y_pred" in result_df.columns:
+            hits = top_hits(
+                result_df, "y_prob", ascending=False,
+                columns=["HLA", "peptide", "y_pred", "y_prob"],
+                counts={"binders": (result_df["y_pred"] == 1).sum()}
+            )
         
         #清理输入文件和输出目录
         try:
@@ -150,11 +148,11 @@ async def run_TransPHLA(peptide_minio_path: str,
         except Exception as cleanup_err:
             logger.warning(f"清理临时文件失败: {cleanup_err}")
         
-        return json.dumps({
+        return json.dumps(with_hits({
             "type": "link",
             "url": file_path,
             "content": parse_content
-        }, ensure_ascii=False)
+        }, hits), ensure_ascii=False)
     
     except Exception as e:
         logger.error(f"TransPHLA运行失败: {e}")
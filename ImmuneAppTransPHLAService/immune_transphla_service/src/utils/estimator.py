@@ -0,0 +1,314 @@
+"""
+工具运行开销估算
+
+根据输入文件统计量（记录数、残基总数、字节数）和请求参数（等位基因数、肽长数）计算本次请求的
+工作量，再用该工具历史运行记录（run_history.py）拟合 工作量 -> CPU 时间 / 耗时 / 峰值内存 的线性模型，
+得到本次请求的开销估算。估算结果用于：
+1. /estimate 接口，供调用方在提交前规划任务；
+2. num_workers 为 auto 时自动选择并行度；
+3. 准入控制估算峰值内存（admission.py）。
+
+各工具的工作量定义见配置 ESTIMATOR.tools：
+    input: 输入文件参数名；alleles: 等位基因参数名（逗号分隔字符串、列表或文件路径）；
+    lengths: 肽长参数名（"-1" 表示 8/9/10/11）；cpu_seconds_per_unit: 无历史记录时每单位工作量的 CPU 时间；
+    startup_seconds: 单个工具进程的启动开销（加载模型/等位基因数据等），用于限制分片数
+"""
+import math
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import NamedTuple, Optional
+from urllib.parse import urlparse
+
+from src.utils.log import logger, run_in_executor
+from src.utils.metrics import TOOL_ERRORS, record_cache_lookup
+from src.utils.minio_utils import compression_of, decompressing_stream, minio_client, strip_compression_suffix
+from src.utils.run_history import recent_runs, record_run
+from src.utils.single_flight import input_content_hash
+from src.utils.supervisor import active_processes, available_cpus, collect_process_results
+from config import CONFIG_YAML
+
+ESTIMATOR_CONFIG = CONFIG_YAML.get("ESTIMATOR", {})
+MIN_HISTORY_RUNS = ESTIMATOR_CONFIG.get("min_history_runs", 3)
+HISTORY_WINDOW = ESTIMATOR_CONFIG.get("history_window", 200)
+TARGET_SHARD_SECONDS = ESTIMATOR_CONFIG.get("target_shard_seconds", 60)
+MAX_WORKERS = ESTIMATOR_CONFIG.get("max_workers", 0)
+MAX_STARTUP_OVERHEAD = ESTIMATOR_CONFIG.get("max_startup_overhead", 0.1)
+RESERVED_CORES = ESTIMATOR_CONFIG.get("reserved_cores", 1)
+TOOL_SPECS = ESTIMATOR_CONFIG.get("tools", {})
+
+# 默认肽长 8/9/10/11
+_DEFAULT_LENGTH_COUNT = 4
+_TABLE_SUFFIXES = (".csv", ".tsv", ".txt")
+_STATS_CACHE_SIZE = 512
+_stats_cache = OrderedDict()
+
+
+class InputStats(NamedTuple):
+    bytes: int
+    records: int
+    residues: int
+
+
+class Estimate(NamedTuple):
+    work_units: float
+    history_runs: int
+    cpu_seconds: Optional[float]
+    wall_seconds: Optional[float]
+    peak_rss_kb: Optional[int]
+
+
+@contextmanager
+def _open_input(path: str):
+    """读取输入文件，.gz / .zst 输入边读边解压，按解压后的内容统计"""
+    if path.startswith("minio://"):
+        parsed = urlparse(path)
+        with minio_client.open_object(parsed.netloc, parsed.path.lstrip("/")) as stream:
+            yield stream
+        return
+    with open(path, "rb") as f:
+        yield decompressing_stream(f, compression_of(path))
+
+
+def _scan_input(path: str) -> InputStats:
+    """流式扫描输入文件：FASTA 统计序列条数和残基数，表格统计数据行数"""
+    total_bytes = records = residues = 0
+    fasta = False
+    with _open_input(path) as stream:
+        pending = b""
+        for chunk in iter(lambda: stream.read(1024 * 1024), b""):
+            total_bytes += len(chunk)
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                line = line.strip()
+                if not line:
+                    continue
+                if line.startswith(b">"):
+                    fasta = True
+                    records += 1
+                elif fasta:
+                    residues += len(line)
+                else:
+                    records += 1
+        pending = pending.strip()
+        if pending:
+            if pending.startswith(b">"):
+                records += 1
+            elif fasta:
+                residues += len(pending)
+            else:
+                records += 1
+    if not fasta and records and strip_compression_suffix(path).lower().endswith(_TABLE_SUFFIXES):
+        # 表格文件去掉表头
+        records -= 1
+    return InputStats(total_bytes, records, residues)
+
+
+def input_stats(path: str, local_path: Optional[str] = None) -> InputStats:
+    """
+    输入文件统计量，按内容标识缓存（MinIO ETag / 本地 sha256）；
+    local_path 为工具已下载到本地的同一输入文件，指定时扫描本地文件，不再从 MinIO 读取
+    """
+    key = input_content_hash(path) or path
+    stats = _stats_cache.get(key)
+    record_cache_lookup("input_stats", stats is not None)
+    if stats is None:
+        stats = _scan_input(local_path or path)
+        _stats_cache[key] = stats
+        if len(_stats_cache) > _STATS_CACHE_SIZE:
+            _stats_cache.popitem(last=False)
+    else:
+        _stats_cache.move_to_end(key)
+    return stats
+
+
+def _count_items(value) -> int:
+    """逗号分隔字符串、列表或文件（按记录数）中的条目数"""
+    if value is None:
+        return 1
+    if isinstance(value, (list, tuple)):
+        return max(len(value), 1)
+    value = str(value).strip()
+    if value.startswith("minio://") or value.startswith("/"):
+        return max(input_stats(value).records, 1)
+    return max(len([item for item in value.split(",") if item.strip()]), 1)
+
+
+def _count_lengths(value) -> int:
+    if value is None or str(value).strip() == "-1":
+        return _DEFAULT_LENGTH_COUNT
+    if isinstance(value, (list, tuple)):
+        return max(len(value), 1)
+    return max(len([item for item in str(value).split(",") if item.strip()]), 1)
+
+
+def _work_units(tool: str, request, input_path: Optional[str] = None) -> float:
+    """按工具配置计算请求的工作量：输入规模 × 等位基因数 × 肽长数"""
+    spec = TOOL_SPECS.get(tool, {})
+    input_field = spec.get("input")
+    if not input_field:
+        return 0.0
+    stats = input_stats(getattr(request, input_field), local_path=input_path)
+    # FASTA 按残基数，表格按行数，都无法统计时按字节数
+    units = stats.residues or stats.records or stats.bytes
+    if spec.get("alleles"):
+        units *= _count_items(getattr(request, spec["alleles"], None))
+    if spec.get("lengths"):
+        units *= _count_lengths(getattr(request, spec["lengths"], None))
+    return float(units)
+
+
+async def estimate_work_units(tool: str, request, input_path: Optional[str] = None) -> float:
+    """
+    计算请求的工作量，输入文件无法读取时返回 0（交给工具本身报错）；
+    input_path 为工具已下载到本地的输入文件（见 input_stats）
+    """
+    try:
+        return await run_in_executor(None, _work_units, tool, request, input_path)
+    except Exception as e:
+        logger.warning(f"{tool} 工作量统计失败，按 0 处理: {e}")
+        return 0.0
+
+
+def fit_linear(xs, ys):
+    """最小二乘拟合 y = a + b·x，斜率不小于 0；返回 (a, b)"""
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    slope = 0.0
+    if var_x > 0:
+        slope = max(sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x, 0.0)
+    return mean_y - slope * mean_x, slope
+
+
+def _predict(xs, ys, work_units: float) -> float:
+    intercept, slope = fit_linear(xs, ys)
+    # 预测值不低于历史中位数，避免小输入时被低估
+    median = sorted(ys)[len(ys) // 2]
+    return max(intercept + slope * work_units, median)
+
+
+def estimate_for_units(tool: str, work_units: float) -> Estimate:
+    """根据工作量和历史运行记录估算 CPU 时间、耗时和峰值内存"""
+    runs = recent_runs(tool, limit=HISTORY_WINDOW)
+    if len(runs) < MIN_HISTORY_RUNS:
+        per_unit = TOOL_SPECS.get(tool, {}).get("cpu_seconds_per_unit")
+        cpu_seconds = per_unit * work_units if per_unit is not None else None
+        return Estimate(work_units, len(runs), cpu_seconds, cpu_seconds, None)
+    xs = [run.work_units for run in runs]
+    return Estimate(
+        work_units,
+        len(runs),
+        _predict(xs, [run.cpu_seconds for run in runs], work_units),
+        _predict(xs, [run.wall_seconds for run in runs], work_units),
+        int(_predict(xs, [run.max_rss_kb for run in runs], work_units))
+    )
+
+
+async def estimate(tool: str, request, input_path: Optional[str] = None) -> Estimate:
+    work_units = await estimate_work_units(tool, request, input_path)
+    return estimate_for_units(tool, work_units)
+
+
+def free_cpus() -> int:
+    """可分配给新任务的 CPU 数：可用 CPU 扣除为事件循环保留的核和正在运行的工具进程"""
+    return max(available_cpus() - RESERVED_CORES - active_processes(), 1)
+
+
+def workers_for_estimate(tool: str, result: Estimate) -> int:
+    """
+    按预估 CPU 时间选择并行度：
+    1. 每个分片约运行 target_shard_seconds 秒；
+    2. 所有分片的进程启动开销之和不超过总 CPU 时间的 max_startup_overhead；
+    3. 不超过当前空闲 CPU 数和 max_workers
+    """
+    if not result.cpu_seconds:
+        return 1
+    workers = int(math.ceil(result.cpu_seconds / TARGET_SHARD_SECONDS))
+    startup_seconds = TOOL_SPECS.get(tool, {}).get("startup_seconds", 0)
+    if startup_seconds > 0:
+        workers = min(workers, int(result.cpu_seconds * MAX_STARTUP_OVERHEAD / startup_seconds))
+    limit = free_cpus()
+    if MAX_WORKERS:
+        limit = min(limit, MAX_WORKERS)
+    return max(min(workers, limit), 1)
+
+
+async def resolve_num_workers(tool: str, request, input_path: Optional[str] = None) -> int:
+    """
+    解析请求的 num_workers：auto（或未指定）时按开销估算和当前负载自动选择，
+    显式指定时不超过可用 CPU 数。
+
+    由工具在下载输入之后调用（经过结果缓存和调度排队之后），input_path 为下载到本地的输入文件：
+    工作量按本地文件统计并缓存，run_measured 记录运行历史时直接命中缓存，不再从 MinIO 读取输入
+    """
+    value = getattr(request, "num_workers", None)
+    if value is None or str(value).strip().lower() == "auto":
+        result = await estimate(tool, request, input_path)
+        workers = workers_for_estimate(tool, result)
+        cpu = "未知" if result.cpu_seconds is None else f"{result.cpu_seconds:.0f}s"
+        logger.info(
+            f"{tool} num_workers=auto，工作量 {result.work_units:.0f}，预估 CPU {cpu}，"
+            f"空闲 CPU {free_cpus()}，选择 {workers} 个并行任务"
+        )
+        return workers
+    if input_path is not None:
+        await estimate_work_units(tool, request, input_path)
+    workers = max(int(value), 1)
+    limit = available_cpus()
+    if workers > limit:
+        logger.warning(f"{tool} num_workers={workers} 超过可用 CPU 数，调整为 {limit}")
+        workers = limit
+    return workers
+
+
+async def estimate_summary(tool: str, request) -> dict:
+    """/estimate 接口返回的估算结果"""
+    stats = None
+    spec = TOOL_SPECS.get(tool, {})
+    if spec.get("input"):
+        stats = await run_in_executor(None, input_stats, getattr(request, spec["input"]))
+    result = await estimate(tool, request)
+    return {
+        "tool": tool,
+        "input": stats._asdict() if stats else None,
+        "work_units": result.work_units,
+        "history_runs": result.history_runs,
+        "cpu_seconds": round(result.cpu_seconds, 1) if result.cpu_seconds is not None else None,
+        "wall_seconds": round(result.wall_seconds, 1) if result.wall_seconds is not None else None,
+        "peak_rss_mb": round(result.peak_rss_kb / 1024) if result.peak_rss_kb is not None else None,
+        "recommended_num_workers": workers_for_estimate(tool, result),
+    }
+
+
+async def run_measured(tool: str, request, coro, work_units: Optional[float] = None):
+    """
+    运行工具协程，并把本次运行的工作量与资源占用写入运行历史
+
+    Args:
+        tool: 工具名称
+        request: pydantic 请求模型，用于计算工作量
+        coro: 工具调用协程
+        work_units: (可选)已计算好的工作量；未指定时在工具结束后计算，
+            此时工具已按下载的输入统计过（resolve_num_workers），不会再次读取输入
+    """
+    started = time.monotonic()
+    with collect_process_results() as results:
+        try:
+            result = await coro
+        except Exception as e:
+            TOOL_ERRORS.inc(tool=tool, error=type(e).__name__)
+            raise
+    wall_seconds = time.monotonic() - started
+    if results and not any(r.killed for r in results):
+        if work_units is None:
+            work_units = await estimate_work_units(tool, request)
+        record_run(
+            tool,
+            work_units,
+            max(r.max_rss_kb for r in results),
+            sum(r.cpu_seconds for r in results),
+            wall_seconds
+        )
+    return result
@@ -1,10 +1,21 @@
+import asyncio
+import gzip
+import io
 import os
+import shutil
+import tarfile
+import time
 import uuid
 import sys
 import tempfile
 
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from io import BytesIO
 from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+import pandas as pd
 from minio import Minio
 from minio.error import S3Error
 from urllib.parse import urlparse
@@ -15,7 +26,8 @@ current_file = Path(__file__).resolve()
 project_root = current_file.parents[5]
 sys.path.append(str(project_root))
 from config import CONFIG_YAML
-from src.utils.log import logger
+from src.utils.log import logger, run_in_executor
+from src.utils.metrics import MINIO_BYTES, MINIO_DURATION, stage_timer
 
 
 MINIO_CONFIG = CONFIG_YAML["MINIO"]
@@ -25,19 +37,166 @@ MINIO_SECRET_KEY = os.getenv("SECRET_KEY")
 MINIO_BUCKET = MINIO_CONFIG["molly_bucket"]
 MINIO_SECURE = MINIO_CONFIG.get("secure", False)
 
+# 传输压缩：上传文本结果时压缩并设置 Content-Encoding，对象名不变，minio/urllib3 客户端和浏览器下载时透明解压；
+# 下载 .gz / .zst 输入时边下载边解压
+COMPRESS_UPLOADS = MINIO_CONFIG.get("compress_uploads", False)
+COMPRESS_ENCODING = MINIO_CONFIG.get("compress_encoding", "gzip")
+COMPRESS_LEVEL = MINIO_CONFIG.get("compress_level", 6)
+COMPRESS_MIN_SIZE = MINIO_CONFIG.get("compress_min_size", 64 * 1024)
+COMPRESS_SUFFIXES = tuple(MINIO_CONFIG.get(
+    "compress_suffixes", [".csv", ".tsv", ".txt", ".fasta", ".fa", ".fsa", ".vcf", ".json", ".md", ".pdb"]
+))
+
+# 压缩格式的扩展名和文件头
+_COMPRESSED_SUFFIXES = {".gz": "gzip", ".zst": "zstd"}
+_MAGIC = {"gzip": b"\x1f\x8b", "zstd": b"\x28\xb5\x2f\xfd"}
+_COPY_CHUNK = 1024 * 1024
+
+
+def compression_of(name: str) -> Optional[str]:
+    """按扩展名判断压缩格式（gzip / zstd），未压缩返回 None"""
+    return _COMPRESSED_SUFFIXES.get(Path(name).suffix.lower())
+
+
+def strip_compression_suffix(name: str) -> str:
+    """去掉 .gz / .zst 扩展名（如 sample.fasta.gz -> sample.fasta），用于按原扩展名判断文件类型"""
+    if compression_of(name) is None:
+        return name
+    return name[:-len(Path(name).suffix)]
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("读写 zstd 压缩文件需要安装 zstandard") from None
+    return zstandard
+
+
+def decompressing_stream(stream, encoding: Optional[str]):
+    """
+    包装为边读边解压的流。先按文件头确认确实是压缩数据：对象带 Content-Encoding 时
+    HTTP 客户端已经解压过，此时原样返回
+    """
+    if encoding is None:
+        return stream
+    if not hasattr(stream, "peek"):
+        stream = io.BufferedReader(stream, _COPY_CHUNK)
+    if not stream.peek(len(_MAGIC[encoding])).startswith(_MAGIC[encoding]):
+        return stream
+    if encoding == "gzip":
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    return _zstd().ZstdDecompressor().stream_reader(stream, read_across_frames=True)
+
+
+def _compressible(object_name: str, size: int) -> bool:
+    return size >= COMPRESS_MIN_SIZE and Path(object_name).suffix.lower() in COMPRESS_SUFFIXES
+
+
+def _compress_file(path: Path) -> Path:
+    """流式压缩到同目录下的临时文件"""
+    target = path.with_name(f"{path.name}.{uuid.uuid4().hex}.part")
+    with open(path, "rb") as source, open(target, "wb") as output:
+        if COMPRESS_ENCODING == "zstd":
+            compressor = _zstd().ZstdCompressor(level=COMPRESS_LEVEL)
+            with compressor.stream_writer(output, closefd=False) as writer:
+                shutil.copyfileobj(source, writer, _COPY_CHUNK)
+        else:
+            with gzip.GzipFile(fileobj=output, mode="wb", compresslevel=COMPRESS_LEVEL) as writer:
+                shutil.copyfileobj(source, writer, _COPY_CHUNK)
+    return target
+
+
+def _compress_bytes(data: bytes) -> bytes:
+    if COMPRESS_ENCODING == "zstd":
+        return _zstd().ZstdCompressor(level=COMPRESS_LEVEL).compress(data)
+    return gzip.compress(data, COMPRESS_LEVEL)
+
+
+class InstrumentedMinio(Minio):
+    """
+    记录对象读写的耗时和字节数（/metrics）。fget_object / fput_object 内部分别调用
+    get_object / put_object，这里只覆盖这两个方法；get 的耗时为收到响应头的时间，
+    字节数为传输的字节数（压缩对象为压缩后的大小）。
+    open_object / read_object 读取对象时按扩展名边下载边解压 .gz / .zst
+    """
+
+    def get_object(self, bucket_name, object_name, *args, **kwargs):
+        started = time.monotonic()
+        response = super().get_object(bucket_name, object_name, *args, **kwargs)
+        MINIO_DURATION.observe(time.monotonic() - started, operation="get")
+        MINIO_BYTES.inc(int(response.headers.get("content-length") or 0), operation="get")
+        return response
+
+    def put_object(self, bucket_name, object_name, data, length, *args, **kwargs):
+        started = time.monotonic()
+        result = super().put_object(bucket_name, object_name, data, length, *args, **kwargs)
+        MINIO_DURATION.observe(time.monotonic() - started, operation="put")
+        MINIO_BYTES.inc(max(length, 0), operation="put")
+        return result
+
+    @contextmanager
+    def open_object(self, bucket_name, object_name):
+        """
+        以流的方式读取对象，.gz / .zst 对象边下载边解压
+
+        用法:
+            with minio_client.open_object(bucket_name, object_name) as stream:
+                for chunk in iter(lambda: stream.read(1024 * 1024), b""):
+                    ...
+        """
+        response = self.get_object(bucket_name, object_name)
+        try:
+            yield decompressing_stream(response, compression_of(object_name))
+        finally:
+            response.close()
+            response.release_conn()
+
+    def read_object(self, bucket_name, object_name) -> bytes:
+        """读取对象的全部内容，.gz / .zst 对象返回解压后的内容"""
+        with self.open_object(bucket_name, object_name) as stream:
+            return stream.read()
+
 
 # # 初始化 MinIO 客户端
-minio_client = Minio(
+minio_client = InstrumentedMinio(
     MINIO_ENDPOINT,
     access_key=MINIO_ACCESS_KEY,
     secret_key=MINIO_SECRET_KEY,
     secure=MINIO_SECURE
 )
 
+
+def _fput_object(bucket_name: str, object_name: str, local_path: Path, compress: Optional[bool] = None, **kwargs) -> None:
+    """
+    上传本地文件。compress（默认配置 compress_uploads）为 True 时，超过 compress_min_size 的文本文件
+    （compress_suffixes）先流式压缩，再带 Content-Encoding 上传，对象名不变
+    """
+    if compress is None:
+        compress = COMPRESS_UPLOADS
+    size = local_path.stat().st_size
+    if not (compress and _compressible(object_name, size)):
+        minio_client.fput_object(bucket_name, object_name, str(local_path), **kwargs)
+        return
+    compressed = _compress_file(local_path)
+    try:
+        minio_client.fput_object(
+            bucket_name,
+            object_name,
+            str(compressed),
+            metadata={"Content-Encoding": COMPRESS_ENCODING},
+            **kwargs
+        )
+        logger.info(f"压缩上传 {object_name}: {size} -> {compressed.stat().st_size} 字节（{COMPRESS_ENCODING}）")
+    finally:
+        compressed.unlink()
+
+
 def upload_file_to_minio(
     local_file_path: str,
     bucket_name: str,
     minio_object_name: str = None,
+    compress: Optional[bool] = None,
 ) -> str:
     """
     上传本地文件到MinIO存储
@@ -47,6 +206,7 @@ def upload_file_to_minio(
         local_file_path: 本地文件路径
         bucket_name: MinIO桶名称
         minio_object_name: 在MinIO中存储的文件名(可选)，如果不指定则使用随机UUID+原文件名
+        compress: (可选)是否压缩上传文本文件（带 Content-Encoding，下载时透明解压），默认读取配置 compress_uploads
         
     Returns:
         str: MinIO访问地址 (格式: minio://bucket/object_name)
@@ -72,11 +232,8 @@ def upload_file_to_minio(
             minio_client.make_bucket(bucket_name)
         
         # 上传文件
-        minio_client.fput_object(
-            bucket_name,
-            minio_object_name,
-            str(local_path)
-        )
+        with stage_timer("upload"):
+            _fput_object(bucket_name, minio_object_name, local_path, compress)
         logger.info(f"MinIO path: minio://{bucket_name}/{minio_object_name}")
         # 返回MinIO地址
         return f"minio://{bucket_name}/{minio_object_name}"
@@ -87,6 +244,162 @@ def upload_file_to_minio(
     except Exception as e:
         logger.error(f"An unexpected error occurred: {e}")
         raise
+
+
+UPLOAD_MAX_WORKERS = MINIO_CONFIG.get("upload_max_workers", 8)
+BUNDLE_SMALL_FILES = MINIO_CONFIG.get("bundle_small_files", False)
+BUNDLE_MAX_FILE_SIZE = MINIO_CONFIG.get("bundle_max_file_size", 256 * 1024)
+BUNDLE_MIN_FILES = MINIO_CONFIG.get("bundle_min_files", 8)
+
+# 多文件结果上传使用的有界线程池，限制同时进行的上传数量
+_upload_executor = ThreadPoolExecutor(
+    max_workers=UPLOAD_MAX_WORKERS,
+    thread_name_prefix="minio-upload"
+)
+
+
+def _artifact_size(source: Union[str, Path, bytes]) -> int:
+    if isinstance(source, (bytes, bytearray)):
+        return len(source)
+    return Path(source).stat().st_size
+
+
+def _put_artifact(
+    bucket_name: str,
+    object_name: str,
+    source: Union[str, Path, bytes],
+    content_type: str,
+) -> str:
+    """上传单个文件或字节内容，返回 minio:// 地址；文本内容按配置压缩上传"""
+    if isinstance(source, (bytes, bytearray)):
+        metadata = None
+        if COMPRESS_UPLOADS and _compressible(object_name, len(source)):
+            source = _compress_bytes(source)
+            metadata = {"Content-Encoding": COMPRESS_ENCODING}
+        minio_client.put_object(
+            bucket_name,
+            object_name,
+            BytesIO(source),
+            len(source),
+            content_type=content_type,
+            metadata=metadata
+        )
+    else:
+        _fput_object(bucket_name, object_name, Path(source), content_type=content_type)
+    logger.info(f"MinIO path: minio://{bucket_name}/{object_name}")
+    return f"minio://{bucket_name}/{object_name}"
+
+
+def _bundle_artifacts(artifacts: Dict[str, Union[str, Path, bytes]]) -> bytes:
+    """将多个小文件打包为一个 tar.gz 字节流"""
+    buffer = BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        for name, source in artifacts.items():
+            if isinstance(source, (bytes, bytearray)):
+                info = tarfile.TarInfo(name=name)
+                info.size = len(source)
+                info.mtime = int(time.time())
+                tar.addfile(info, BytesIO(source))
+            else:
+                tar.add(str(source), arcname=name)
+    return buffer.getvalue()
+
+
+def _fallback_url(prefix: str, object_name: str, source: Union[str, Path, bytes]) -> str:
+    """上传失败时的下载地址：本地文件由下载服务按文件名提供，字节内容沿用对象名"""
+    if isinstance(source, bytes):
+        return f"{prefix}{object_name}"
+    return f"{prefix}{Path(source).name}"
+
+
+async def upload_artifacts_to_minio(
+    artifacts: Dict[str, Union[str, Path, bytes]],
+    bucket_name: str,
+    object_prefix: str = "",
+    bundle: Optional[bool] = None,
+    bundle_name: str = "artifacts.tar.gz",
+    fallback_url_prefix: Optional[str] = None,
+    content_type: str = "application/octet-stream",
+) -> Tuple[Dict[str, str], Dict[str, Exception]]:
+    """
+    并发上传一个工具产生的多个结果文件到MinIO，单个文件上传失败不影响其余文件
+
+    Args:
+        artifacts: {文件名: 本地文件路径或字节内容}，对象名为 object_prefix + 文件名
+        bucket_name: MinIO桶名称
+        object_prefix: 对象名前缀，一般为本次任务的uuid
+        bundle: 是否将小文件打包为一个 tar.gz 对象上传，默认读取配置 bundle_small_files
+        bundle_name: 打包对象的文件名
+        fallback_url_prefix: (可选)单个文件上传失败时使用的下载地址前缀，本地文件按其文件名拼接，
+                             字节内容按对象名拼接；不指定则失败的文件不出现在返回的地址中
+        content_type: 上传对象的 Content-Type
+
+    Returns:
+        Tuple[Dict[str, str], Dict[str, Exception]]:
+            {文件名: MinIO地址}，与逐个上传时的映射一致，被打包的文件地址为 minio://bucket/<打包对象>#<文件名>；
+            以及 {文件名: 异常}，记录上传失败的文件
+    """
+    if not artifacts:
+        return {}, {}
+    if bundle is None:
+        bundle = BUNDLE_SMALL_FILES
+
+    run = lambda func, *args: run_in_executor(_upload_executor, func, *args)
+
+    # 确保桶存在
+    if not await run(minio_client.bucket_exists, bucket_name):
+        await run(minio_client.make_bucket, bucket_name)
+
+    singles = dict(artifacts)
+    bundled = {}
+    if bundle:
+        bundled = {
+            name: source for name, source in artifacts.items()
+            if _artifact_size(source) <= BUNDLE_MAX_FILE_SIZE
+        }
+        if len(bundled) >= BUNDLE_MIN_FILES:
+            for name in bundled:
+                singles.pop(name)
+        else:
+            bundled = {}
+
+    names = list(singles)
+    tasks = [
+        run(_put_artifact, bucket_name, f"{object_prefix}{name}", singles[name], content_type)
+        for name in names
+    ]
+    if bundled:
+        archive_object = f"{object_prefix}{bundle_name}"
+        archive = await run(_bundle_artifacts, bundled)
+        tasks.append(run(_put_artifact, bucket_name, archive_object, archive, "application/gzip"))
+    with stage_timer("upload"):
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    uploaded_urls = {}
+    failures = {}
+    for name, result in zip(names, results):
+        if isinstance(result, Exception):
+            logger.error(f"文件 {name} 上传到MinIO失败: {result}")
+            failures[name] = result
+            if fallback_url_prefix is None:
+                continue
+            result = _fallback_url(fallback_url_prefix, f"{object_prefix}{name}", singles[name])
+        uploaded_urls[name] = result
+
+    if bundled:
+        archive_result = results[-1]
+        if isinstance(archive_result, Exception):
+            logger.error(f"打包文件 {archive_object} 上传到MinIO失败: {archive_result}")
+        for name, source in bundled.items():
+            if not isinstance(archive_result, Exception):
+                uploaded_urls[name] = f"{archive_result}#{name}"
+                continue
+            # 打包对象只在内存中，兜底地址按各文件自身拼接
+            failures[name] = archive_result
+            if fallback_url_prefix is not None:
+                uploaded_urls[name] = _fallback_url(fallback_url_prefix, f"{object_prefix}{name}", source)
+
+    return uploaded_urls, failures
         
 
 
@@ -103,6 +416,7 @@ def download_from_minio_uri(uri: str, local_path: str = None) -> str:
         local_path: (可选)本地保存路径（可以是目录或完整路径）
                    - 如果是目录：自动使用原文件名（前面加UUID）
                    - 如果未指定：使用临时目录+UUID_原文件名
+                   .gz / .zst 对象边下载边解压，本地文件名去掉压缩扩展名
     
     Returns:
         str: 下载文件的完整本地路径（包含文件名）
@@ -122,7 +436,7 @@ def download_from_minio_uri(uri: str, local_path: str = None) -> str:
     original_filename = os.path.basename(object_name)
     
     # 生成带UUID的新文件名
-    filename_with_uuid = f"{uuid.uuid4()}_{original_filename}"
+    filename_with_uuid = f"{uuid.uuid4()}_{strip_compression_suffix(original_filename)}"
 
     # 处理本地路径
     if local_path is None:
@@ -133,19 +447,44 @@ def download_from_minio_uri(uri: str, local_path: str = None) -> str:
         local_path = os.path.join(local_path, filename_with_uuid)
     else:
         # 如果提供的是完整路径，直接使用（但不加UUID，因为用户可能想要自定义文件名）
-        pass  # 保持原样
+        local_path = strip_compression_suffix(local_path)  # 只去掉压缩扩展名
     
     # 确保目录存在
     os.makedirs(os.path.dirname(local_path), exist_ok=True)
     
     # 执行下载
-    minio_client.fget_object(
-        bucket_name=bucket_name,
-        object_name=object_name,
-        file_path=local_path
-    )
+    with stage_timer("download"):
+        if compression_of(object_name) is None:
+            minio_client.fget_object(
+                bucket_name=bucket_name,
+                object_name=object_name,
+                file_path=local_path
+            )
+        else:
+            # 压缩对象边下载边解压，本地只保存解压后的文件
+            with minio_client.open_object(bucket_name, object_name) as stream, open(local_path, "wb") as f:
+                shutil.copyfileobj(stream, f, _COPY_CHUNK)
     
     # 返回绝对路径
     return os.path.abspath(local_path)
 
+
+def load_result_dataframe(result: Union[str, Path, pd.DataFrame], download_dir: str = None, **read_kwargs) -> pd.DataFrame:
+    """
+    读取工具结果表格，优先使用内存中的 DataFrame 或本地文件，MinIO 路径仅作为兜底。
+    从 MinIO 下载到 download_dir 的临时文件读完即删除（读取失败也删除）；本地结果文件由调用方清理。
+    """
+    if isinstance(result, pd.DataFrame):
+        return result
+    result = str(result)
+    if not result.startswith("minio://"):
+        return pd.read_csv(result, **read_kwargs)
+    temp_file_path = download_from_minio_uri(result, download_dir)
+    try:
+        return pd.read_csv(temp_file_path, **read_kwargs)
+    finally:
+        if os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+            logger.info(f"Temporary file {temp_file_path} deleted.")
+
 # download_from_minio_uri("minio://molly/29959599-2e39-4a66-a22d-ccfb86dedd21_hlas.fasta","/mnt/workspace/dev/ltc/mRNAPredictionAgent/src/utils")
@@ -10,8 +10,15 @@ from src.api import (
     bigMHC,
     prime,
     rnaPlot,
-    rnaFold
+    rnaFold,
+    estimate
 )
+from src.utils.hits import HitsMiddleware
+from src.utils.metrics import metrics_endpoint, MetricsMiddleware
+from src.utils.profiling import ProfilingMiddleware
+from src.utils.resource_usage import ResourceUsageMiddleware
+from src.utils.tracing import TracingMiddleware
+from src.utils.scheduler import QueueHeadersMiddleware
 
 app = FastAPI()
 
@@ -25,7 +32,20 @@ app.add_middleware(
     allow_credentials=True,  # 支持cookie跨域
     allow_methods=["*"],  # 允许的请求方法
     allow_headers=["*"],  # 允许的请求头
+    expose_headers=["X-Queue-Position", "X-Queue-Wait-Seconds", "X-Queue-Class", "X-Resource-Usage", "X-Request-Id", "X-Profile-Url", "X-Profile-Status"],  # 允许前端读取排队信息、资源统计、请求 ID 和剖析报告地址
 )
+# 未要求返回 hits 时从响应 JSON 中去掉 hits 字段
+app.add_middleware(HitsMiddleware)
+# 在响应头中返回排队位置和等待时间
+app.add_middleware(QueueHeadersMiddleware)
+# 按请求汇总工具进程的 CPU 时间、峰值内存和 I/O
+app.add_middleware(ResourceUsageMiddleware)
+# 请求头 X-Profile 开启时用 cProfile + tracemalloc 剖析本次请求
+app.add_middleware(ProfilingMiddleware)
+# 生成请求 ID 并记录各阶段耗时，按需在响应中返回 timings
+app.add_middleware(TracingMiddleware)
+# 记录接口耗时和错误数，/metrics 以 Prometheus 文本格式输出
+app.add_middleware(MetricsMiddleware)
 
 @app.get("/")
 def read_root():
@@ -40,3 +60,5 @@ app.post("/bigmhc",tags=["BigMHCTool"],summary="BigMHCTool")(bigMHC)
 app.post("/prime",tags=["PrimeTool"],summary="PrimeTool")(prime)
 app.post("/rnaplot",tags=["RNAPlotTool"],summary="RNAPlotTool")(rnaPlot)
 app.post("/rnafold",tags=["RNAFoldTool"],summary="RNAFoldTool")(rnaFold)
+app.post("/estimate",tags=["Estimate"],summary="EstimateToolCost")(estimate)
+app.get("/metrics",tags=["Metrics"],summary="Metrics")(metrics_endpoint)
@@ -2,7 +2,6 @@ import asyncio
 import json
 import os
 import uuid
-import traceback
 import datetime
 from datetime import datetime
 from zoneinfo import ZoneInfo
@@ -11,14 +10,23 @@ from dotenv import load_dotenv
 from minio import Minio
 from minio.error import S3Error
 from pathlib import Path
+from typing import Optional
 
 from config import CONFIG_YAML
 from src.tools.NetCTLPan.filter_netctlpan import filter_netctlpan_output
 from src.tools.NetCTLPan.netctlpan_to_excel import save_excel
-from src.utils.log import logger
-from src.utils.parallel_utils import split_fasta, run_commands_async, merge_excels
+from src.utils.log import logger, log_payload
+from src.utils.net_parsers import NETCTLPAN, ParsedOutput, StreamParser, parse_netctlpan, rank_rows
+from src.utils.supervisor import run_supervised
+from src.utils.tracing import traced
+from src.utils.parallel_utils import (
+    split_fasta, run_commands_async, merge_excels, merge_sorted_excels, SortedMerge, ShardManifest, cleanup_stale_jobs, WorkerPool, allocate_workers,
+    workers_for_input
+)
 from src.utils.minio_utils import download_from_minio_uri, upload_file_to_minio
+from src.utils.result_writer import result_filename
 from src.utils.utils import deduplicate_fasta_by_sequence
+from src.utils.hits import TOP_K as HITS_TOP_K, top_hits, with_hits
 
 load_dotenv()
 # MinIO 配置:
@@ -35,9 +43,56 @@ INPUT_TMP_DIR = CONFIG_YAML["TOOL"]["NETCTLPAN"]["input_tmp_netctlpan_dir"]
 DOWNLOADER_PREFIX = CONFIG_YAML["TOOL"]["COMMON"]["output_download_url_prefix"]
 OUTPUT_TMP_DIR = CONFIG_YAML["TOOL"]["NETCTLPAN"]["output_tmp_netctlpan_dir"]
 
+# 排序输出（ranked / top_k）、每个等位基因前 K 行和 hits 共用的评分列，越高越好
+RANK_COLUMN = "Comb"
+
+
+def netctlpan_hits(merged: SortedMerge):
+    """按 Comb 综合评分降序的 top hits，按原顺序合并的结果附 CTL 表位（<-E）计数；排序合并（top_k 时写满即停止）不附计数"""
+    counts = {"epitopes": merged.counts.get("<-E", 0)} if merged.counts is not None else None
+    return top_hits(merged.head, RANK_COLUMN, ascending=False, counts=counts, total=merged.rows)
+
+
+def merge_results(
+    excel_files, output_excel: str, ranked: bool, top_k: Optional[int], top_k_per_allele: Optional[int],
+    output_format: Optional[str] = "xlsx",
+):
+    """
+    合并分片结果。ranked 或 top_k 时各分片已按 Comb 降序排列，k 路归并流式写出全局有序的结果
+    （top_k 时写满即停止）；否则按原顺序逐行拼接。每个等位基因最多保留 Comb 最高的 top_k_per_allele 行，
+    均返回 SortedMerge。
+    output_format 只用于最终结果，各肽长的中间合并结果保持 xlsx
+    """
+    if ranked or top_k:
+        return merge_sorted_excels(
+            excel_files, output_excel, RANK_COLUMN, ascending=False, limit=top_k,
+            group_limit=("Allele", top_k_per_allele) if top_k_per_allele else None, head_rows=HITS_TOP_K,
+            output_format=output_format,
+        )
+    return merge_excels(
+        excel_files, output_excel, RANK_COLUMN, ascending=False,
+        group_limit=("Allele", top_k_per_allele) if top_k_per_allele else None, head_rows=HITS_TOP_K,
+        count_column="Epitope", output_format=output_format,
+    )
+
+
+def result_summary(binders_only: bool, top_k_per_allele: Optional[int], ranked: bool, top_k: Optional[int]) -> str:
+    """结果说明，注明只保留表位、排序输出时的过滤条件"""
+    content = "NetCTLpan多肽长并行处理完成，结果已合并。"
+    if binders_only:
+        content += "结果仅包含标记为表位（<-E）的肽段及统计行。"
+    if top_k_per_allele:
+        content += f"每个等位基因最多保留 Comb 最高的 {top_k_per_allele} 行。"
+    if top_k:
+        content += f"结果按 Comb 降序排列，只保留前 {top_k} 行。"
+    elif ranked:
+        content += "结果按 Comb 降序排列。"
+    return content
+
 
 
 # 单FASTA并行NetCTLpan
+@traced()
 async def run_netctlpan_single(
     input_fasta: str,
     mhc_allele: str = "HLA-A02:01",
@@ -48,12 +103,20 @@ async def run_netctlpan_single(
     output_threshold: float = -99.9,
     sort_by: int = -1,
     netctlpan_dir: str = NETCTLPAN_DIR,
-    output_dir: str = OUTPUT_TMP_DIR
+    output_dir: str = OUTPUT_TMP_DIR,
+    binders_only: bool = False,
+    top_k_per_allele: Optional[int] = None,
+    ranked: bool = False,
+    top_k: Optional[int] = None,
 ) -> str:
     """
     单个FASTA文件运行NetCTLpan，返回Excel路径。
     该函数用于并行主流程的子任务，也可单独调用。
     :param input_fasta: 单个FASTA文件路径
+    :param binders_only: 只保留表位（<-E）行和统计行，边读取输出边解析，不在内存中保存完整输出
+    :param top_k_per_allele: (可选)每个等位基因只保留 Comb 最高的前 K 行
+    :param ranked: 数据行按 Comb 降序排列、统计行放在最后，供合并时 k 路归并
+    :param top_k: (可选)只需要全局前 K 行，分片内也只保留前 K 行（隐含 ranked）
     :return: 生成的Excel文件路径
     """
     random_id = uuid.uuid4().hex
@@ -79,14 +142,30 @@ async def run_netctlpan_single(
     if peptide_length != -1:
         cmd.extend(["-l", str(peptide_length)])
     # 启动外部命令，异步等待完成
-    proc = await asyncio.create_subprocess_exec(
-        *cmd,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-        cwd=f"{netctlpan_dir}"
+    parser = None
+    if binders_only or top_k_per_allele:
+        parser = StreamParser(NETCTLPAN, binders_only=binders_only, top_k=top_k_per_allele)
+    proc = await run_supervised(
+        "netctlpan", cmd, cwd=f"{netctlpan_dir}", stdout_sink=parser.feed if parser else None
     )
-    stdout, stderr = await proc.communicate()
-    output_content = stdout.decode()
+    stdout, stderr = proc.stdout, proc.stderr
+    if proc.killed:
+        raise RuntimeError(f"NetCTLPan 执行被终止: {proc.exit_reason}")
+    if parser is not None:
+        output_content = parser.close()
+        logger.info(
+            f"netCTLpan 流式解析: 共 {parser.total_rows} 行，符合条件 {parser.matched_rows} 行，"
+            f"保留 {len(output_content.rows) - len(output_content.summary_rows)} 行"
+        )
+    else:
+        output_content = stdout.decode()
+    if ranked or top_k:
+        # 分片结果按 Comb 降序排列供 k 路归并；按等位基因限制行数时归并会跳过部分行，分片内不截断
+        if not isinstance(output_content, ParsedOutput):
+            output_content = parse_netctlpan(output_content)
+        output_content = rank_rows(
+            output_content, RANK_COLUMN, ascending=False, limit=None if top_k_per_allele else top_k
+        )
     # print(output_content)
     # 保存命令输出为Excel
     save_excel(output_content, str(output_dir), output_filename)
@@ -94,6 +173,7 @@ async def run_netctlpan_single(
     return str(output_path)
 
 # 并行主流程
+@traced()
 async def run_netctlpan_parallel(
     input_fasta: str,
     mhc_allele: str = "HLA-A02:01",
@@ -107,12 +187,23 @@ async def run_netctlpan_parallel(
     netctlpan_dir: str = NETCTLPAN_DIR,
     output_dir: str = OUTPUT_TMP_DIR,
     sub_fastas: list = None,  # 新增参数
+    manifest: ShardManifest = None,
+    pool: WorkerPool = None,
+    binders_only: bool = False,
+    top_k_per_allele: Optional[int] = None,
+    ranked: bool = False,
+    top_k: Optional[int] = None,
 ) -> str:
     """
     拆分FASTA并并发运行NetCTLpan，合并Excel，返回合并后Excel的本地路径。
     :param input_fasta: 原始FASTA文件路径或minio://路径
     :param num_workers: 并行任务数
     :param sub_fastas: 已切割好的分片文件列表（如有则直接用）
+    :param manifest: (可选)分片任务清单，用于分片重试后的断点续跑
+    :param binders_only: 只保留表位行（见 run_netctlpan_single）
+    :param top_k_per_allele: (可选)每个等位基因只保留 Comb 最高的前 K 行
+    :param ranked: 按 Comb 降序 k 路归并各分片结果（见 merge_results）
+    :param top_k: (可选)只输出全局 Comb 最高的前 K 行
     :return: 合并后Excel的本地路径
     """
     try:
@@ -120,32 +211,42 @@ async def run_netctlpan_parallel(
         if input_fasta.startswith("minio://"):
             input_fasta = download_from_minio_uri(input_fasta, INPUT_TMP_DIR)
         # 2. 拆分FASTA为num_workers个子文件（如果没传sub_fastas）
+        shard_group = f"len{peptide_length}"
+        if sub_fastas is None and manifest is not None:
+            # 续跑时复用上次切分好的分片，保证分片键一致
+            sub_fastas = manifest.get_splits(shard_group)
         if sub_fastas is None:
-            split_dir = Path(output_dir) / f"split_{uuid.uuid4().hex}"
+            split_root = manifest.job_dir if manifest is not None else Path(output_dir)
+            split_dir = split_root / f"split_{uuid.uuid4().hex}"
             split_dir.mkdir(parents=True, exist_ok=True)
             sub_fastas = split_fasta(input_fasta, num_workers, str(split_dir))
+            if manifest is not None:
+                manifest.set_splits(shard_group, sub_fastas)
+        log_payload(f"{shard_group} 分片文件", sub_fastas)
         for f in sub_fastas:
-            print("  -", f, "exists:", Path(f).exists(), "type:", type(f))
             if not isinstance(f, str) or not Path(f).exists():
                 raise FileNotFoundError(f"分片文件不存在或不是字符串: {f}")
         # 3. 并发调度每个子文件的NetCTLpan运行
         async def run_one(sub_fasta, *_):
             return await run_netctlpan_single(
                 sub_fasta, mhc_allele, peptide_length, weight_of_tap, weight_of_clevage,
-                epi_threshold, output_threshold, sort_by, netctlpan_dir, output_dir
+                epi_threshold, output_threshold, sort_by, netctlpan_dir, output_dir,
+                binders_only, top_k_per_allele, ranked, top_k
             )
-        excel_files = await run_commands_async(run_one, sub_fastas, num_workers=num_workers)
+        excel_files = await run_commands_async(
+            run_one, sub_fastas, num_workers=num_workers, manifest=manifest, shard_group=shard_group, pool=pool
+        )
         # 4. 合并所有Excel为一个总表
         merged_excel = Path(output_dir) / f"merged_{uuid.uuid4().hex}_NetCTLpan_results.xlsx"
-        merge_excels(excel_files, str(merged_excel))
+        merge_results(excel_files, str(merged_excel), ranked, top_k, top_k_per_allele)
         # 5. 直接返回本地合并Excel路径，不再上传MinIO
         return str(merged_excel)
     except Exception as e:
-        print(f"[ERROR] run_netctlpan_parallel 执行异常: {e}")
-        traceback.print_exc()
+        logger.exception(f"run_netctlpan_parallel 执行异常: {e}")
         raise
 
 # 新增：多肽长并行NetCTLpan
+@traced()
 async def run_netctlpan_multi_length(
     input_fasta: str,
     mhc_allele: str = "HLA-A02:01",
@@ -161,7 +262,12 @@ async def run_netctlpan_multi_length(
     peptide_duplication_mode: int=0,
     netctlpan_dir: str = NETCTLPAN_DIR,
     output_dir: str = OUTPUT_TMP_DIR,
-
+    job_id: str = None,
+    binders_only: bool = False,
+    top_k_per_allele: Optional[int] = None,
+    ranked: bool = False,
+    top_k: Optional[int] = None,
+    output_format: Optional[str] = None,
 ) -> str:
     """
     支持多肽长并行预测，peptide_length为-1时预测8/9/10/11，为'9,11'时预测9和11，为单个数字时只预测该长度。
@@ -169,11 +275,56 @@ async def run_netctlpan_multi_length(
     其它情况只下载/切割一次fasta，所有肽长共用分片，合并所有Excel输出，上传minio并清理中间文件。
     
     并行度分配逻辑：
-    - 当只有一个肽长时，使用全部num_workers
-    - 当有n个肽长时，每个肽长分配num_workers//n个并行度
-    - 如果有余数，将余数分配给前几个肽长
-    - 如果总肽长数大于总并发数，则每个肽长至少分配1个并行度
+    - 所有肽长共用 num_workers 个并发槽，同时运行的工具进程数不超过 num_workers，
+      某个肽长先跑完后空出的槽由其余肽长继续使用
+    - mode==1 时按各肽长分组文件大小分配分片数（每个肽长至少 1 个分片）
+
+    分片结果记录在 job_id 对应的任务清单中，失败的分片自动重试；
+    仍然失败时保留工作目录，使用同一个 job_id 重新提交即可只重跑未完成的分片。
+
+    binders_only 为 True 时只保留表位（<-E）行和统计行，top_k_per_allele 限制每个等位基因保留的行数，
+    内存占用和结果文件大小与表位数量成正比。
+    ranked 为 True 时结果按 Comb 降序排列：各分片先排好序，合并时 k 路归并流式写出；
+    top_k 指定时只输出全局前 K 行，归并写满即停止。
+    output_format 为最终结果文件的格式（xlsx / csv.gz / parquet，默认 OUTPUT.default_format），
+    xlsx 中统计行单独放在 Summary 工作表，超过单表行数上限时数据行自动拆分到多个工作表。
+    num_workers 也可以是 async 函数 f(本地输入路径)，在输入下载后按本地文件确定并行度（见 workers_for_input）。
     """
+    job_id = job_id or uuid.uuid4().hex
+    try:
+        return await _run_netctlpan_multi_length(
+            job_id, input_fasta, mhc_allele, peptide_length, weight_of_tap, weight_of_clevage,
+            epi_threshold, output_threshold, sort_by, num_workers, mode, hla_mode,
+            peptide_duplication_mode, netctlpan_dir, output_dir, binders_only, top_k_per_allele,
+            ranked, top_k, output_format
+        )
+    except Exception as e:
+        logger.exception(f"run_netctlpan_multi_length 执行异常: {e}")
+        raise RuntimeError(f"{e}（已完成的分片已保存，使用 job_id={job_id} 重新提交可续跑）") from e
+
+
+async def _run_netctlpan_multi_length(
+    job_id: str,
+    input_fasta: str,
+    mhc_allele: str,
+    peptide_length,
+    weight_of_tap: float,
+    weight_of_clevage: float,
+    epi_threshold: float,
+    output_threshold: float,
+    sort_by: int,
+    num_workers,
+    mode: int,
+    hla_mode: int,
+    peptide_duplication_mode: int,
+    netctlpan_dir: str,
+    output_dir: str,
+    binders_only: bool,
+    top_k_per_allele: Optional[int],
+    ranked: bool,
+    top_k: Optional[int],
+    output_format: Optional[str],
+) -> str:
     input_dir = Path(INPUT_TMP_DIR)
     output_dir =Path(OUTPUT_TMP_DIR)
 
@@ -198,80 +349,101 @@ async def run_netctlpan_multi_length(
         except Exception:
             raise ValueError(f"peptide_length参数类型不支持: {peptide_length}")
         
-    # 2. 动态分配并行度
-    num_lengths = len(lengths)
-    if num_lengths == 1:
-        # 只有一个肽长时，使用全部并行度
-        workers_per_length = [num_workers]
-    elif num_lengths >= num_workers:
-        # 肽长数大于等于总并发数时，每个肽长分配1个并行度
-        # 这样可能会超过总并发数，但确保每个肽长都被处理
-        workers_per_length = [1] * num_lengths
-    else:
-        # 肽长数小于总并发数时，平均分配
-        base_workers = num_workers // num_lengths
-        remainder = num_workers % num_lengths
-        workers_per_length = [base_workers] * num_lengths
-        # 将余数分配给前几个肽长
-        for i in range(remainder):
-            workers_per_length[i] += 1
-    
-    print(f"肽长列表: {lengths}")
-    print(f"总并发数: {num_workers}")
-    print(f"各肽长分配的并行度: {workers_per_length}")
+    logger.info(f"肽长列表: {lengths}")
+
+    # 分片任务清单，记录已完成的分片用于失败后续跑
+    cleanup_stale_jobs("netctlpan")
+    manifest = ShardManifest("netctlpan", job_id, {
+        "input_fasta": input_fasta,
+        "mhc_allele": mhc_allele,
+        "lengths": lengths,
+        "weight_of_tap": weight_of_tap,
+        "weight_of_clevage": weight_of_clevage,
+        "epi_threshold": epi_threshold,
+        "output_threshold": output_threshold,
+        "sort_by": sort_by,
+        "mode": mode,
+        "peptide_duplication_mode": peptide_duplication_mode,
+        "binders_only": binders_only,
+        "top_k_per_allele": top_k_per_allele,
+        "ranked": ranked,
+        "top_k": top_k,
+    })
+    resumed_input = manifest.get_input("input_fasta")
+    if resumed_input is not None:
+        # 续跑时直接使用上次下载（并已去重）的输入文件
+        input_fasta = resumed_input
+    elif isinstance(input_fasta, str) and input_fasta.startswith("minio://"):
+        input_fasta = download_from_minio_uri(input_fasta, str(manifest.job_dir))
 
-    if isinstance(input_fasta, str) and input_fasta.startswith("minio://"):
-        input_fasta = download_from_minio_uri(input_fasta, INPUT_TMP_DIR)    
+    # 所有肽长共用 num_workers 个并发槽，某个肽长的分片先跑完后，空出的槽由其余肽长继续使用
+    num_workers = await workers_for_input(num_workers, input_fasta)
+    pool = WorkerPool(num_workers)
+    logger.info(f"总并发数: {num_workers}")
 
 
     # 新增：如果peptide_duplication_mode==1，对FASTA文件内容去重
-    if peptide_duplication_mode == 1:
+    if peptide_duplication_mode == 1 and resumed_input is None:
 
         # 读取、去重、写回
         with open(input_fasta, 'r', encoding='utf-8') as f:
             fasta_content = f.read()
         deduped, total_before, total_after = deduplicate_fasta_by_sequence(fasta_content)
-        print(f"去重前肽段总数: {total_before}")
-        print(f"去重后肽段总数: {total_after}")
+        logger.info(f"去重前肽段总数: {total_before}")
+        logger.info(f"去重后肽段总数: {total_after}")
         with open(input_fasta, 'w', encoding='utf-8') as f:
             f.write(deduped)
+    if resumed_input is None and Path(input_fasta).parent == manifest.job_dir:
+        manifest.set_input("input_fasta", input_fasta)
 
     # 2. mode==1且肽长只包含8/9/10/11时，按肽长分组
     if mode == 1 and all(l in [8,9,10,11] for l in lengths):
             
-        split_dir = Path(output_dir) / f"split_{uuid.uuid4().hex}"
-        split_dir.mkdir(parents=True, exist_ok=True)
-        sub_fastas = split_fasta_by_length(input_fasta, lengths, str(split_dir))
+        split_dir = manifest.job_dir / "split_by_length"
+        sub_fastas = manifest.get_splits("by_length")
+        if sub_fastas is None:
+            split_dir.mkdir(parents=True, exist_ok=True)
+            sub_fastas = split_fasta_by_length(input_fasta, lengths, str(split_dir))
+            manifest.set_splits("by_length", sub_fastas)
         # 过滤掉空文件和对应的length
         non_empty_fastas = []
         non_empty_lengths = []
-        non_empty_workers = []
         for i, f in enumerate(sub_fastas):
             try:
                 if Path(f).stat().st_size > 0:
                     non_empty_fastas.append(f)
                     non_empty_lengths.append(lengths[i])
-                    non_empty_workers.append(workers_per_length[i])
             except Exception as e:
-                print(f"[WARN] 检查分组FASTA文件大小失败: {f}, {e}")
+                logger.warning(f"检查分组FASTA文件大小失败: {f}, {e}")
         
+        # 按各肽长分组文件大小分配分片数，总分片数为 num_workers
+        shards_per_length = allocate_workers(
+            num_workers, [Path(f).stat().st_size for f in non_empty_fastas]
+        )
+        logger.info(f"各肽长分配的分片数: {shards_per_length}")
         tasks = [
             run_netctlpan_parallel(
                 non_empty_fastas[i], mhc_allele, non_empty_lengths[i], weight_of_tap, weight_of_clevage,
-                epi_threshold, output_threshold, sort_by, non_empty_workers[i], netctlpan_dir, output_dir
-                # 分组模式下不传sub_fastas参数，使用动态分配的并行度
+                epi_threshold, output_threshold, sort_by, shards_per_length[i], netctlpan_dir, output_dir,
+                # 分组模式下不传sub_fastas参数，按分配的分片数切分，并发受共享的 pool 限制
+                manifest=manifest, pool=pool, binders_only=binders_only, top_k_per_allele=top_k_per_allele,
+                ranked=ranked, top_k=top_k
             )
             for i in range(len(non_empty_fastas))
         ]
 
-        excel_files = await asyncio.gather(*tasks)
+        # 等待所有肽长跑完（已完成的分片都会写入清单），再统一报告失败
+        excel_files = await asyncio.gather(*tasks, return_exceptions=True)
+        for res in excel_files:
+            if isinstance(res, Exception):
+                raise res
         # 5. 合并所有excel
-        merged_excel = Path(output_dir) / f"merged_multi_{uuid.uuid4().hex}_NetCTLpan_results.xlsx"
-        merge_excels(excel_files, str(merged_excel))
+        merged_excel = Path(output_dir) / result_filename(f"merged_multi_{uuid.uuid4().hex}_NetCTLpan_results", output_format)
+        merged = merge_results(excel_files, str(merged_excel), ranked, top_k, top_k_per_allele, output_format)
         # 6. 上传合并后的Excel到MinIO
         beijing_time = datetime.now(ZoneInfo("Asia/Shanghai"))
         time_str = beijing_time.strftime('%Y-%m-%d_%H-%M-%S')
-        tool_output_filename = f"{uuid.uuid4().hex}_NetCTLpan_results_{time_str}.xlsx"
+        tool_output_filename = result_filename(f"{uuid.uuid4().hex}_NetCTLpan_results_{time_str}", output_format)
         minio_excel_path = upload_file_to_minio(str(merged_excel), MINIO_BUCKET, tool_output_filename)
         # 7. 删除所有中间excel和分组fasta和合并excel
         for f in excel_files:
@@ -279,57 +451,63 @@ async def run_netctlpan_multi_length(
                 if Path(f).exists():
                     Path(f).unlink()
             except Exception as e:
-                print(f"[WARN] 删除中间Excel失败: {f}, {e}")
-                traceback.print_exc()
+                logger.warning(f"删除中间Excel失败: {f}, {e}")
         for f in sub_fastas:
             try:
                 if Path(f).exists():
                     Path(f).unlink()
             except Exception as e:
-                print(f"[WARN] 删除分组FASTA失败: {f}, {e}")
-                traceback.print_exc()
+                logger.warning(f"删除分组FASTA失败: {f}, {e}")
         try:
             if merged_excel.exists():
                 merged_excel.unlink()
         except Exception as e:
-            print(f"[WARN] 删除合并Excel失败: {merged_excel}, {e}")
-            traceback.print_exc()
+            logger.warning(f"删除合并Excel失败: {merged_excel}, {e}")
         try:
             if split_dir.exists():
                 split_dir.rmdir()
         except Exception as e:
-            print(f"[WARN] 删除分组目录失败: {split_dir}, {e}")
-            traceback.print_exc()
+            logger.warning(f"删除分组目录失败: {split_dir}, {e}")
              
-        return json.dumps({"type": "link", "url": minio_excel_path, "content": "NetCTLpan多肽长并行处理完成，结果已合并。"}, ensure_ascii=False)
+        manifest.cleanup()
+        return json.dumps(with_hits(
+            {"type": "link", "url": minio_excel_path, "content": result_summary(binders_only, top_k_per_allele, ranked, top_k)},
+            netctlpan_hits(merged)
+        ), ensure_ascii=False)
     else:
         
-        # 2. 切割一次fasta
-        split_dir = Path(output_dir) / f"split_{uuid.uuid4().hex}"
-        split_dir.mkdir(parents=True, exist_ok=True)
-        sub_fastas = split_fasta(input_fasta, num_workers, str(split_dir))
+        # 2. 切割一次fasta（续跑时复用已切好的分片）
+        split_dir = manifest.job_dir / "split_all"
+        sub_fastas = manifest.get_splits("all")
+        if sub_fastas is None:
+            split_dir.mkdir(parents=True, exist_ok=True)
+            sub_fastas = split_fasta(input_fasta, num_workers, str(split_dir))
+            manifest.set_splits("all", sub_fastas)
         # 4. 针对每个肽长并发run_netctlpan_parallel，传入同一批分片
         try:
             tasks = [
                 run_netctlpan_parallel(
                     input_fasta, mhc_allele, l, weight_of_tap, weight_of_clevage,
-                    epi_threshold, output_threshold, sort_by, workers_per_length[i], netctlpan_dir, output_dir,
-                    sub_fastas=sub_fastas
+                    epi_threshold, output_threshold, sort_by, num_workers, netctlpan_dir, output_dir,
+                    sub_fastas=sub_fastas, manifest=manifest, pool=pool,
+                    binders_only=binders_only, top_k_per_allele=top_k_per_allele, ranked=ranked, top_k=top_k
                 )
                 for i, l in enumerate(lengths)
             ]
-            excel_files = await asyncio.gather(*tasks)
+            excel_files = await asyncio.gather(*tasks, return_exceptions=True)
+            for res in excel_files:
+                if isinstance(res, Exception):
+                    raise res
             # 5. 合并所有excel
-            merged_excel = Path(output_dir) / f"merged_multi_{uuid.uuid4().hex}_NetCTLpan_results.xlsx"
-            merge_excels(excel_files, str(merged_excel))
+            merged_excel = Path(output_dir) / result_filename(f"merged_multi_{uuid.uuid4().hex}_NetCTLpan_results", output_format)
+            merged = merge_results(excel_files, str(merged_excel), ranked, top_k, top_k_per_allele, output_format)
             # 6. 上传合并后的Excel到MinIO
             beijing_time = datetime.now(ZoneInfo("Asia/Shanghai"))
             time_str = beijing_time.strftime('%Y-%m-%d_%H-%M-%S')
-            tool_output_filename = f"{uuid.uuid4().hex}_NetCTLpan_results_{time_str}.xlsx"
+            tool_output_filename = result_filename(f"{uuid.uuid4().hex}_NetCTLpan_results_{time_str}", output_format)
             minio_excel_path = upload_file_to_minio(str(merged_excel), MINIO_BUCKET, tool_output_filename)
         except Exception as e:
-            print(f"[ERROR] run_netctlpan_multi_length 分片并发/合并/上传异常: {e}")
-            traceback.print_exc()
+            logger.exception(f"run_netctlpan_multi_length 分片并发/合并/上传异常: {e}")
             raise
         # 7. 删除所有中间excel和分片fasta和合并excel
         for f in excel_files:
@@ -337,29 +515,29 @@ async def run_netctlpan_multi_length(
                 if Path(f).exists():
                     Path(f).unlink()
             except Exception as e:
-                print(f"[WARN] 删除中间Excel失败: {f}, {e}")
-                traceback.print_exc()
+                logger.warning(f"删除中间Excel失败: {f}, {e}")
         for f in sub_fastas:
             try:
                 if Path(f).exists():
                     Path(f).unlink()
             except Exception as e:
-                print(f"[WARN] 删除分片FASTA失败: {f}, {e}")
-                traceback.print_exc()
+                logger.warning(f"删除分片FASTA失败: {f}, {e}")
         try:
             if merged_excel.exists():
                 merged_excel.unlink()
         except Exception as e:
-            print(f"[WARN] 删除合并Excel失败: {merged_excel}, {e}")
-            traceback.print_exc()
+            logger.warning(f"删除合并Excel失败: {merged_excel}, {e}")
         try:
             if split_dir.exists():
                 split_dir.rmdir()
         except Exception as e:
-            print(f"[WARN] 删除分片目录失败: {split_dir}, {e}")
-            traceback.print_exc()
+            logger.warning(f"删除分片目录失败: {split_dir}, {e}")
  
-        return json.dumps({"type": "link", "url": minio_excel_path, "content": "NetCTLpan多肽长并行处理完成，结果已合并。"}, ensure_ascii=False)
+        manifest.cleanup()
+        return json.dumps(with_hits(
+            {"type": "link", "url": minio_excel_path, "content": result_summary(binders_only, top_k_per_allele, ranked, top_k)},
+            netctlpan_hits(merged)
+        ), ensure_ascii=False)
 
 
 
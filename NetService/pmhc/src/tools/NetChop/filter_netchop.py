@@ -1,3 +1,7 @@
+from src.utils.metrics import stage_timer
+
+
+@stage_timer("parse")
 def filter_netchop_output(output_lines: list) -> str:
     """
     过滤 netchop 的输出，提取关键信息并生成 Markdown 表格
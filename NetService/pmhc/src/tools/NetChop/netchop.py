@@ -3,7 +3,6 @@ import json
 import os
 import sys
 import uuid
-import traceback
 import datetime
 from datetime import datetime
 from zoneinfo import ZoneInfo
@@ -15,9 +14,13 @@ from typing import List
 from config import CONFIG_YAML
 from src.tools.NetChop.filter_netchop import filter_netchop_output
 from src.tools.NetChop.netchop_to_excel import save_excel
+from src.utils.hits import TOP_K as HITS_TOP_K, top_hits, with_hits
 from src.utils.log import logger
-from src.utils.parallel_utils import split_fasta, run_commands_async, merge_excels
+from src.utils.supervisor import run_supervised
+from src.utils.tracing import traced
+from src.utils.parallel_utils import split_fasta, run_commands_async, merge_excels, workers_for_input, SortedMerge
 from src.utils.minio_utils import download_from_minio_uri, upload_file_to_minio
+from src.utils.result_writer import result_filename
 from src.utils.utils import deduplicate_fasta_by_sequence
 
 load_dotenv()
@@ -32,6 +35,12 @@ DOWNLOADER_PREFIX = CONFIG_YAML["TOOL"]["COMMON"]["output_download_url_prefix"]
 OUTPUT_TMP_DIR = CONFIG_YAML["TOOL"]["NETCHOP"]["output_tmp_netchop_dir"]
 
 
+def netchop_hits(merged: SortedMerge):
+    """按切割评分降序的 top hits，附切割位点（C 列为 S）计数"""
+    counts = {"cleavage_sites": merged.counts.get("S", 0)} if merged.counts is not None else None
+    return top_hits(merged.head, "score", ascending=False, counts=counts, total=merged.rows)
+
+
 
 #获取滑窗肽段文件
 def sliding_window_from_file(input_file: str, window_sizes: List[int], output_file: str) -> None:
@@ -87,6 +96,7 @@ def sliding_window_from_file(input_file: str, window_sizes: List[int], output_fi
 
 
 # 新增：单文件处理逻辑（原run_netchop主体，便于并行调用）
+@traced()
 async def run_netchop_single(
     input_fasta: str,
     cleavage_site_threshold: float = 0.5,
@@ -126,13 +136,10 @@ async def run_netchop_single(
     cmd = [arg for arg in cmd if arg]
 
     # 启动外部命令，异步等待完成
-    proc = await asyncio.create_subprocess_exec(
-        *cmd,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-        cwd=f"{netchop_dir}"
-    )
-    stdout, stderr = await proc.communicate()
+    proc = await run_supervised("netchop", cmd, cwd=f"{netchop_dir}")
+    stdout, stderr = proc.stdout, proc.stderr
+    if proc.killed:
+        raise RuntimeError(f"NetChop 执行被终止: {proc.exit_reason}")
     output_content = stdout.decode()
     
     # 保存命令输出为Excel
@@ -141,6 +148,7 @@ async def run_netchop_single(
     return str(output_path)
 
 # 新增：并行处理逻辑
+@traced()
 async def run_netchop_parallel(
     input_fasta: str,
     cleavage_site_threshold: float = 0.5,
@@ -150,18 +158,25 @@ async def run_netchop_parallel(
     num_workers: int = 1,
     window_sizes: List[int] =[8,9,10,11],
     netchop_dir: str = NETCHOP_DIR,
-    output_dir: str = OUTPUT_TMP_DIR
+    output_dir: str = OUTPUT_TMP_DIR,
+    output_format: str = None
 ) -> str:
+    """
+    并行运行 NetChop，合并各分片结果后上传。
+    :param output_format: 合并结果的文件格式 xlsx / csv.gz / parquet，默认 OUTPUT.default_format
+    :param num_workers: 并行任务数，也可以是 async 函数 f(本地输入路径)，在输入下载后按本地文件确定（见 workers_for_input）
+    """
     # 1. 拆分FASTA
     if isinstance(input_fasta, str) and input_fasta.startswith("minio://"):
         input_fasta = download_from_minio_uri(input_fasta, INPUT_TMP_DIR)
+    num_workers = await workers_for_input(num_workers, input_fasta)
 
     # 读取、去重、写回
     with open(input_fasta, 'r', encoding='utf-8') as f:
         fasta_content = f.read()
     deduped, total_before, total_after = deduplicate_fasta_by_sequence(fasta_content)
-    print(f"输入文件去重前肽段总数: {total_before}")
-    print(f"输入文件去重后肽段总数: {total_after}")
+    logger.info(f"输入文件去重前肽段总数: {total_before}")
+    logger.info(f"输入文件去重后肽段总数: {total_after}")
     with open(input_fasta, 'w', encoding='utf-8') as f:
         f.write(deduped)        
 
@@ -171,8 +186,8 @@ async def run_netchop_parallel(
     with open(input_fasta, 'r', encoding='utf-8') as f:
         fasta_content = f.read()
     deduped, total_before, total_after = deduplicate_fasta_by_sequence(fasta_content)
-    print(f"滑窗得到去重前肽段总数: {total_before}")
-    print(f"滑窗得到去重后肽段总数: {total_after}")
+    logger.info(f"滑窗得到去重前肽段总数: {total_before}")
+    logger.info(f"滑窗得到去重后肽段总数: {total_after}")
     with open(input_fasta, 'w', encoding='utf-8') as f:
         f.write(deduped)
 
@@ -186,12 +201,15 @@ async def run_netchop_parallel(
         )
     excel_files = await run_commands_async(run_one, sub_fastas, num_workers=num_workers)
     # 3. 合并Excel
-    merged_excel = Path(output_dir) / f"merged_{uuid.uuid4().hex}_NetChop_results.xlsx"
-    merge_excels(excel_files, str(merged_excel))
+    merged_excel = Path(output_dir) / result_filename(f"merged_{uuid.uuid4().hex}_NetChop_results", output_format)
+    merged = merge_excels(
+        excel_files, str(merged_excel), "score", ascending=False, head_rows=HITS_TOP_K, count_column="C",
+        output_format=output_format,
+    )
     # 4. 先上传合并后的Excel到MinIO
     beijing_time = datetime.now(ZoneInfo("Asia/Shanghai"))
     time_str = beijing_time.strftime('%Y-%m-%d_%H-%M-%S')
-    tool_output_filename = f"{uuid.uuid4().hex}_NetChop_results_{time_str}.xlsx"
+    tool_output_filename = result_filename(f"{uuid.uuid4().hex}_NetChop_results_{time_str}", output_format)
     minio_excel_path = upload_file_to_minio(str(merged_excel), MINIO_BUCKET, tool_output_filename)
     # 5. 清理中间excel、分片fasta和分片目录
     for f in excel_files:
@@ -199,29 +217,28 @@ async def run_netchop_parallel(
             if Path(f).exists():
                 Path(f).unlink()
         except Exception as e:
-            print(f"[WARN] 删除中间Excel失败: {f}, {e}")
-            traceback.print_exc()
+            logger.warning(f"删除中间Excel失败: {f}, {e}")
     for f in sub_fastas:
         try:
             if Path(f).exists():
                 Path(f).unlink()
         except Exception as e:
-            print(f"[WARN] 删除分片FASTA失败: {f}, {e}")
-            traceback.print_exc()
+            logger.warning(f"删除分片FASTA失败: {f}, {e}")
     try:
         if merged_excel.exists():
             merged_excel.unlink()
     except Exception as e:
-        print(f"[WARN] 删除合并Excel失败: {merged_excel}, {e}")
-        traceback.print_exc()
+        logger.warning(f"删除合并Excel失败: {merged_excel}, {e}")
     try:
         if split_dir.exists():
             split_dir.rmdir()
     except Exception as e:
-        print(f"[WARN] 删除分片目录失败: {split_dir}, {e}")
-        traceback.print_exc()
+        logger.warning(f"删除分片目录失败: {split_dir}, {e}")
 
-    return json.dumps({"type": "link", "url": minio_excel_path, "content": "NetChop并行处理完成，结果已合并。"}, ensure_ascii=False)
+    return json.dumps(with_hits(
+        {"type": "link", "url": minio_excel_path, "content": "NetChop并行处理完成，结果已合并。"},
+        netchop_hits(merged)
+    ), ensure_ascii=False)
 
 
 # def NetChop(input_filename: str, cleavage_site_threshold: float = 0.5, model: int = 0, format: int = 0, strict: int = 0) -> str:
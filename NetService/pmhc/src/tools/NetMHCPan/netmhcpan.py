@@ -1,598 +1,724 @@
-import asyncio
-import json
-import os
-import sys
-import uuid
-import datetime
-
-from dotenv import load_dotenv
-from minio import Minio
-from minio.error import S3Error 
-from pathlib import Path
-
-from src.tools.NetMHCPan.filter_netmhcpan import filter_netmhcpan_excel
-from src.tools.NetMHCPan.netmhcpan_to_excel import save_excel
-from src.utils.parallel_utils import split_fasta, run_commands_async, merge_excels
-from src.utils.minio_utils import download_from_minio_uri, upload_file_to_minio
-import traceback
-from typing import List
-from datetime import datetime
-from zoneinfo import ZoneInfo
-
-load_dotenv()
-current_file = Path(__file__).resolve()
-project_root = current_file.parents[3] 
-                                        
-# 将项目根目录添加到 sys.path
-sys.path.append(str(project_root))
-from config import CONFIG_YAML
-
-# MinIO 配置:
-MINIO_CONFIG = CONFIG_YAML["MINIO"]
-MINIO_ENDPOINT = MINIO_CONFIG["endpoint"]
-MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY")
-MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY")
-MINIO_BUCKET = MINIO_CONFIG["netmhcpan_bucket"]
-MINIO_SECURE = MINIO_CONFIG.get("secure", False)
-
-# netMHCpan 配置 
-NETMHCPAN_DIR = CONFIG_YAML["TOOL"]["NETMHCPAN"]["netmhcpan_dir"]
-INPUT_TMP_DIR = CONFIG_YAML["TOOL"]["NETMHCPAN"]["input_tmp_netmhcpan_dir"]
-DOWNLOADER_PREFIX = CONFIG_YAML["TOOL"]["COMMON"]["output_download_url_prefix"]
-OUTPUT_TMP_DIR = CONFIG_YAML["TOOL"]["NETMHCPAN"]["output_tmp_netmhcpan_dir"]
-
-# # 初始化 MinIO 客户端
-# minio_client = Minio(
-#     MINIO_ENDPOINT,
-#     access_key=MINIO_ACCESS_KEY,
-#     secret_key=MINIO_SECRET_KEY,
-#     secure=MINIO_SECURE
-# )
-# #检查minio是否可用
-# def check_minio_connection(bucket_name=MINIO_BUCKET):
-#     try:
-#         minio_client.list_buckets()
-#         if not minio_client.bucket_exists(bucket_name):
-#             minio_client.make_bucket(bucket_name)
-#         return True
-#     except S3Error as e:
-#         print(f"MinIO连接或bucket操作失败: {e}")
-#         return False
-
-
-# async def run_netmhcpan(
-#     input_filename: str,  # MinIO 文件路径，格式为 "bucket-name/file-path"
-#     mhc_allele: str = "HLA-A02:01",  # HLA 等位基因（MHC 分子类型）
-#     peptide_length: str = "-1",  # 肽段长度，范围8-11，-1表示使用默认值
-#     high_threshold_of_bp: float = 0.5,  # 高结合力肽段的阈值
-#     low_threshold_of_bp: float = 2.0,  # 低结合力肽段的阈值
-#     rank_cutoff: float = -99.9,  # 输出结果的%Rank截断值
-#     netmhcpan_dir: str = NETMHCPAN_DIR
-#     ) -> str:
-
-#     """
-#     异步运行 netMHCpan 并将处理后的结果上传到 MinIO
-#     :param input_filename: MinIO 文件路径，格式为 "bucket-name/file-path"
-#     :param mhc_allele: HLA 等位基因（MHC 分子类型），默认值HLA-A02:01
-#     :param peptide_length: 肽段长度，范围8-11，-1表示使用默认值，默认值-1
-#     :param high_threshold_of_bp: 高结合力肽段的阈值，默认值0.5
-#     :param low_threshold_of_bp: 低结合力肽段的阈值，默认值2.0
-#     :param rank_cutoff: 输出结果的%Rank截断值，默认值-99.9
-#     :param netmhcpan_dir: netMHCpan 安装目录
-#     :return: JSON 字符串，包含 MinIO 文件路径（或下载链接）
-#     """
-
-#     minio_available = check_minio_connection()
-#     #提取桶名和文件
-#     try:
-#         # 去掉 minio:// 前缀
-#         path_without_prefix = input_filename[len("minio://"):]
-        
-#         # 找到第一个斜杠的位置，用于分割 bucket_name 和 object_name
-#         first_slash_index = path_without_prefix.find("/")
-        
-#         if first_slash_index == -1:
-#             raise ValueError("Invalid file path format: missing bucket name or object name")
-        
-#         # 提取 bucket_name 和 object_name
-#         bucket_name = path_without_prefix[:first_slash_index]
-#         object_name = path_without_prefix[first_slash_index + 1:]
-        
-#         # 打印提取结果（可选）
-#         # logger.info(f"Extracted bucket_name: {bucket_name}, object_name: {object_name}")
-        
-#     except Exception as e:
-#         # logger.error(f"Failed to parse file_path: {file_path}, error: {str(e)}")
-#         raise str(status_code=400, detail=f"Failed to parse file path: {str(e)}")     
-
-#     try:
-#         response = minio_client.get_object(bucket_name, object_name)
-#         file_content = response.read().decode("utf-8")
-#     except S3Error as e:
-#         return json.dumps({
-#             "type": "text",
-#             "content": f"无法从 MinIO 读取文件: {str(e)}"
-#         }, ensure_ascii=False)    
-
-#     # 生成随机ID和文件路径
-#     random_id = uuid.uuid4().hex
-#     #base_path = Path(__file__).resolve().parents[3]  # 根据文件位置调整层级
-#     input_dir = Path(INPUT_TMP_DIR)
-#     output_dir =Path(OUTPUT_TMP_DIR)
-    
-
-#     # 创建目录
-#     input_dir.mkdir(parents=True, exist_ok=True)
-#     output_dir.mkdir(parents=True, exist_ok=True)
-
-#     # 写入输入文件
-#     input_path = input_dir / f"{random_id}.fsa"
-#     with open(input_path, "w") as f:
-#         f.write(file_content)
-
-#     # 构建输出文件名和临时路径
-#     output_filename = f"{random_id}_NetMHCpan_results.xlsx"
-#     output_path = output_dir / output_filename
-
-#     # 构建命令
-#     cmd = [
-#         f"{netmhcpan_dir}/netMHCpan",
-#         "-BA",
-#         "-a", mhc_allele,  # HLA 等位基因
-#         "-rth", str(high_threshold_of_bp),  # 高结合力肽段阈值
-#         "-rlt", str(low_threshold_of_bp),  # 低结合力肽段阈值
-#         "-t", str(rank_cutoff),  # 输出结果%Rank截断值
-#         str(input_path)  # 输入文件路径
-#     ]
-    
-#     # 只有当peptide_length不为-1时才添加-l参数
-#     if peptide_length != -1:
-#         cmd.insert(-1, "-l")  # 在输入文件路径前插入-l
-#         cmd.insert(-1, str(peptide_length))  # 在-l后插入peptide_length值
-
-#     # 过滤掉空字符串
-#     cmd = [arg for arg in cmd if arg]
-#     # 启动异步进程
-#     proc = await asyncio.create_subprocess_exec(
-#         *cmd,
-#         stdout=asyncio.subprocess.PIPE,
-#         stderr=asyncio.subprocess.PIPE,
-#         cwd=f"{netmhcpan_dir}"
-#     )
-
-#     # 处理输出
-#     stdout, stderr = await proc.communicate()
-#     output = stdout.decode()
-#     # stdout_text = stdout.decode()
-#     # stderr_text = stderr.decode()
-#     # print(f"stdout:{stdout_text}")
-#     # print(f"stderr:{stderr_text}")
-#     # exit()
-#     print("11111111111111111111111111111111111111")
-#     print("11111111111111111111111111111111111111")
-#     print("11111111111111111111111111111111111111")        
-#     print(output)
-#     save_excel(output,output_dir,output_filename)
-
-#     # # 直接将所有内容写入文件
-#     # with open(output_path, "w") as f:
-#     #     f.write("\n".join(output.splitlines()))
-       
-#     # 调用过滤函数
-#     # filtered_content = filter_netmhcpan_excel(output_path)
-    
-#     # 错误处理
-#     if proc.returncode != 0:
-#         error_msg = stderr.decode()
-#         input_path.unlink(missing_ok=True)
-#         output_path.unlink(missing_ok=True)
-#         result = {
-#             "type": "text",
-#             "content": "您的输入信息可能有误，请核对正确再试。"
-#         }
-#     else:
-#         try:
-#             if minio_available:
-#                 minio_client.fput_object(
-#                     MINIO_BUCKET,
-#                     output_filename,
-#                     str(output_path)
-#                 )
-#                 file_path = f"minio://{MINIO_BUCKET}/{output_filename}"
-#             else:
-#                 # 如果 MinIO 不可用，返回下载链接
-#                 file_path = f"{DOWNLOADER_PREFIX}{output_filename}"
-#         except S3Error as e:
-#             file_path = f"{DOWNLOADER_PREFIX}{output_filename}"
-#         finally:
-#             # 如果 MinIO 成功上传，清理临时文件；否则保留
-#             if minio_available:
-#                 input_path.unlink(missing_ok=True)
-#                 output_path.unlink(missing_ok=True)
-#             else:
-#                 input_path.unlink(missing_ok=True)  # 只删除输入文件，保留输出文件
-
-#         # 返回结果
-#         # result = {
-#         #     "type": "link",
-#         #     "url": file_path,
-#         #     "content": filtered_content  # 替换为生成的 Markdown 内容
-#         # }
-#         result = {
-#             "type": "link",
-#             "url": file_path,
-#             "content": "NetMHCPan处理完成"  
-#         }
-        
-
-#     return json.dumps(result, ensure_ascii=False)
-
-
-# 单FASTA并行NetMHCPan
-async def run_netmhcpan_single(
-    input_fasta: str,
-    mhc_allele: str = "HLA-A02:01",
-    peptide_length: int = -1,
-    high_threshold_of_bp: float = 0.5,
-    low_threshold_of_bp: float = 2.0,
-    rank_cutoff: float = -99.9,
-    netmhcpan_dir: str = NETMHCPAN_DIR,
-    output_dir: str = OUTPUT_TMP_DIR
-) -> str:
-    try:
-        random_id = uuid.uuid4().hex
-        input_path = Path(INPUT_TMP_DIR) / f"{random_id}.fsa"
-        # 拷贝输入内容到临时文件
-        with open(str(input_path), "w") as f:
-            with open(input_fasta, "r") as fin:
-                f.write(fin.read())
-        output_filename = f"{random_id}_NetMHCpan_results.xlsx"
-        output_path = Path(output_dir) / output_filename
-        # 构建命令行参数
-        cmd = [
-            f"{netmhcpan_dir}/netMHCpan",
-            "-BA",
-            "-a", mhc_allele,
-            "-rth", str(high_threshold_of_bp),
-            "-rlt", str(low_threshold_of_bp),
-            "-t", str(rank_cutoff),
-            str(input_path)
-        ]
-        if peptide_length != -1:
-            cmd.insert(-1, "-l")
-            cmd.insert(-1, str(peptide_length))
-        cmd = [arg for arg in cmd if arg]
-        proc = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            cwd=f"{netmhcpan_dir}"
-        )
-        stdout, stderr = await proc.communicate()
-        output_content = stdout.decode()
-        save_excel(output_content, str(output_dir), output_filename)
-        # input_path.unlink(missing_ok=True)
-        return str(output_path)
-    except Exception as e:
-        print(f"[ERROR] run_netmhcpan_single 执行异常: {e}")
-        traceback.print_exc()
-        raise
-
-# 并行主流程
-async def run_netmhcpan_parallel(
-    input_fasta: str,
-    mhc_allele: str = "HLA-A02:01",
-    peptide_length: int = -1,
-    high_threshold_of_bp: float = 0.5,
-    low_threshold_of_bp: float = 2.0,
-    rank_cutoff: float = -99.9,
-    num_workers: int = 1,
-    netmhcpan_dir: str = NETMHCPAN_DIR,
-    output_dir: str = OUTPUT_TMP_DIR,
-    sub_fastas: list = None,
-) -> str:
-    try:
-        print(f"run_netmhcpan_parallel: 进入函数, input_fasta={input_fasta}, peptide_length={peptide_length}, sub_fastas={sub_fastas}")
-        if input_fasta.startswith("minio://"):
-            input_fasta = download_from_minio_uri(input_fasta, INPUT_TMP_DIR)
-        if sub_fastas is None:
-            split_dir = Path(output_dir) / f"split_{uuid.uuid4().hex}"
-            split_dir.mkdir(parents=True, exist_ok=True)
-            sub_fastas = split_fasta(input_fasta, num_workers, str(split_dir))
-        for f in sub_fastas:
-            if not isinstance(f, str) or not Path(f).exists():
-                raise FileNotFoundError(f"分片文件不存在或不是字符串: {f}")
-        async def run_one(sub_fasta, *_):
-            print(f"run_one: 处理分片 {sub_fasta}")
-            return await run_netmhcpan_single(
-                sub_fasta, mhc_allele, peptide_length, high_threshold_of_bp, low_threshold_of_bp,
-                rank_cutoff, netmhcpan_dir, output_dir
-            )
-        excel_files = await run_commands_async(run_one, sub_fastas, num_workers=num_workers)
-        merged_excel = Path(output_dir) / f"merged_{uuid.uuid4().hex}_NetMHCpan_results.xlsx"
-        merge_excels(excel_files, str(merged_excel))
-        return str(merged_excel)
-    except Exception as e:
-        print(f"[ERROR] run_netmhcpan_parallel 执行异常: {e}")
-        traceback.print_exc()
-        raise
-
-# 完全仿照netctlpan.py的多肽长并发逻辑
-async def run_netmhcpan_multi_length(
-    input_fasta: str,
-    mhc_allele: str = "HLA-A02:01",
-    peptide_length = -1,
-    high_threshold_of_bp: float = 0.5,
-    low_threshold_of_bp: float = 2.0,
-    rank_cutoff: float = -99.9,
-    num_workers: int = 1,
-    mode: int = 0,
-    netmhcpan_dir: str = NETMHCPAN_DIR,
-    output_dir: str = OUTPUT_TMP_DIR,
-) -> str:
-    """
-    支持多肽长并行预测，peptide_length为-1时预测8/9/10/11，为'9,11'时预测9和11，为单个数字时只预测该长度。
-    mode==1时，按肽长分组拆分fasta，每个肽长一个文件。
-    其它情况只下载/切割一次fasta，所有肽长共用分片，合并所有Excel输出，上传minio并清理中间文件。
-    
-    并行度分配逻辑：
-    - 当只有一个肽长时，使用全部num_workers
-    - 当有n个肽长时，每个肽长分配num_workers//n个并行度
-    - 如果有余数，将余数分配给前几个肽长
-    - 如果总肽长数大于总并发数，则每个肽长至少分配1个并行度
-    """
-    try:
-        input_dir = Path(INPUT_TMP_DIR)
-        output_dir =Path(OUTPUT_TMP_DIR)
-
-        # 创建目录
-        input_dir.mkdir(parents=True, exist_ok=True)
-        output_dir.mkdir(parents=True, exist_ok=True)
-        
-        import json
-        # 1. 解析 peptide_length，确保lengths始终为list
-        if peptide_length == "-1":
-            lengths = [8, 9, 10, 11]
-        elif isinstance(peptide_length, str):
-            lengths = [int(x) for x in peptide_length.split(",") if x.strip()]
-        elif isinstance(peptide_length, int):
-            lengths = [peptide_length]
-        else:
-            try:
-                lengths = [int(peptide_length)]
-            except Exception:
-                raise ValueError(f"peptide_length参数类型不支持: {peptide_length}")
-            
-        # 2. 动态分配并行度
-        num_lengths = len(lengths)
-        if num_lengths == 1:
-            # 只有一个肽长时，使用全部并行度
-            workers_per_length = [num_workers]
-        elif num_lengths >= num_workers:
-            # 肽长数大于等于总并发数时，每个肽长分配1个并行度
-            # 这样可能会超过总并发数，但确保每个肽长都被处理
-            workers_per_length = [1] * num_lengths
-        else:
-            # 肽长数小于总并发数时，平均分配
-            base_workers = num_workers // num_lengths
-            remainder = num_workers % num_lengths
-            workers_per_length = [base_workers] * num_lengths
-            # 将余数分配给前几个肽长
-            for i in range(remainder):
-                workers_per_length[i] += 1
-        
-        print(f"肽长列表: {lengths}")
-        print(f"总并发数: {num_workers}")
-        print(f"各肽长分配的并行度: {workers_per_length}")
-        
-        # 2. mode==1且肽长只包含8/9/10/11时，按肽长分组
-        if mode == 1 and all(l in [8,9,10,11] for l in lengths):
-            if isinstance(input_fasta, str) and input_fasta.startswith("minio://"):
-                input_fasta = download_from_minio_uri(input_fasta, INPUT_TMP_DIR)
-            split_dir = Path(output_dir) / f"split_{uuid.uuid4().hex}"
-            split_dir.mkdir(parents=True, exist_ok=True)
-            sub_fastas = split_fasta_by_length(input_fasta, lengths, str(split_dir))
-            # 过滤掉空文件和对应的length
-            non_empty_fastas = []
-            non_empty_lengths = []
-            non_empty_workers = []
-            for i, f in enumerate(sub_fastas):
-                try:
-                    if Path(f).stat().st_size > 0:
-                        non_empty_fastas.append(f)
-                        non_empty_lengths.append(lengths[i])
-                        non_empty_workers.append(workers_per_length[i])
-                except Exception as e:
-                    print(f"[WARN] 检查分组FASTA文件大小失败: {f}, {e}")
-                    traceback.print_exc()
-            tasks = [
-                run_netmhcpan_parallel(
-                    non_empty_fastas[i], mhc_allele, non_empty_lengths[i], high_threshold_of_bp, low_threshold_of_bp,
-                    rank_cutoff,  non_empty_workers[i], netmhcpan_dir, output_dir
-                    # 分组模式下不传sub_fastas参数，使用动态分配的并行度
-                )
-                for i in range(len(non_empty_fastas))
-            ]
-            print("tasks内容：", tasks)
-            print("tasks类型：", [type(t) for t in tasks])
-            try:
-                excel_files = await asyncio.gather(*tasks)
-                for i, res in enumerate(excel_files):
-                    if isinstance(res, Exception):
-                        print(f"[ERROR] 子任务{i} 执行异常: {res}")
-                        traceback.print_exception(type(res), res, res.__traceback__)
-                # 过滤掉异常和无效文件
-                valid_excels = [f for f in excel_files if isinstance(f, str) and Path(f).exists()]
-                if not valid_excels:
-                    print("[ERROR] 没有生成任何有效的Excel文件，无法合并！")
-                    raise RuntimeError("没有生成任何有效的Excel文件，无法合并！")
-            except Exception as e:
-                print(f"[ERROR] gather tasks 执行异常: {e}")
-                traceback.print_exc()
-                raise
-            # 5. 合并所有excel
-            merged_excel = Path(output_dir) / f"merged_multi_{uuid.uuid4().hex}_NetMHCPan_results.xlsx"
-            merge_excels(valid_excels, str(merged_excel))
-            # 6. 上传合并后的Excel到MinIO
-            beijing_time = datetime.now(ZoneInfo("Asia/Shanghai"))
-            time_str = beijing_time.strftime('%Y-%m-%d_%H-%M-%S')
-            tool_output_filename = f"{uuid.uuid4().hex}_NetMHCPan_results_{time_str}.xlsx"
-            minio_excel_path = upload_file_to_minio(str(merged_excel), MINIO_BUCKET, tool_output_filename)
-            # 7. 删除所有中间excel和分组fasta和合并excel
-            for f in excel_files:
-                try:
-                    if Path(f).exists():
-                        Path(f).unlink()
-                except Exception as e:
-                    print(f"[WARN] 删除中间Excel失败: {f}, {e}")
-                    traceback.print_exc()
-            for f in sub_fastas:
-                try:
-                    if Path(f).exists():
-                        Path(f).unlink()
-                except Exception as e:
-                    print(f"[WARN] 删除分组FASTA失败: {f}, {e}")
-                    traceback.print_exc()
-            try:
-                if merged_excel.exists():
-                    merged_excel.unlink()
-            except Exception as e:
-                print(f"[WARN] 删除合并Excel失败: {merged_excel}, {e}")
-                traceback.print_exc()
-            try:
-                if split_dir.exists():
-                    split_dir.rmdir()
-            except Exception as e:
-                print(f"[WARN] 删除分组目录失败: {split_dir}, {e}")
-                traceback.print_exc()
-
-            return json.dumps({"type": "link", "url": minio_excel_path, "content": "NetMHCPan多肽长并行处理完成，结果已合并。"}, ensure_ascii=False)
-        else:
-            # 3. 其它情况，原有分片并发逻辑
-            # 1. 下载minio文件到本地（如有需要）
-            if isinstance(input_fasta, str) and input_fasta.startswith("minio://"):
-                input_fasta = download_from_minio_uri(input_fasta, INPUT_TMP_DIR)
-            # 2. 切割一次fasta
-            split_dir = Path(output_dir) / f"split_{uuid.uuid4().hex}"
-            split_dir.mkdir(parents=True, exist_ok=True)
-            sub_fastas = split_fasta(input_fasta, num_workers, str(split_dir))
-            # 4. 针对每个肽长并发run_netmhcpan_parallel，传入同一批分片
-            try:
-                tasks = [
-                run_netmhcpan_parallel(
-                    non_empty_fastas[i], mhc_allele, non_empty_lengths[i], high_threshold_of_bp, low_threshold_of_bp,
-                    rank_cutoff,  non_empty_workers[i], netmhcpan_dir, output_dir,sub_fastas=sub_fastas
-                    )
-                    for i, l in enumerate(lengths)
-                ]
-                excel_files = await asyncio.gather(*tasks, return_exceptions=True)
-                for i, res in enumerate(excel_files):
-                    if isinstance(res, Exception):
-                        print(f"[ERROR] 子任务{i} 执行异常: {res}")
-                        traceback.print_exception(type(res), res, res.__traceback__)
-                # 过滤掉异常和无效文件
-                valid_excels = [f for f in excel_files if isinstance(f, str) and Path(f).exists()]
-                if not valid_excels:
-                    print("[ERROR] 没有生成任何有效的Excel文件，无法合并！")
-                    raise RuntimeError("没有生成任何有效的Excel文件，无法合并！")
-                # 5. 合并所有excel
-                merged_excel = Path(output_dir) / f"merged_multi_{uuid.uuid4().hex}_NetMHCPan_results.xlsx"
-                merge_excels(valid_excels, str(merged_excel))
-                # 6. 上传合并后的Excel到MinIO
-                beijing_time = datetime.now(ZoneInfo("Asia/Shanghai"))
-                time_str = beijing_time.strftime('%Y-%m-%d_%H-%M-%S')
-                tool_output_filename = f"{uuid.uuid4().hex}_NetMHCPan_results_{time_str}.xlsx"
-                minio_excel_path = upload_file_to_minio(str(merged_excel), MINIO_BUCKET, tool_output_filename)
-            except Exception as e:
-                print(f"[ERROR] run_netmhcpan_multi_length 分片并发/合并/上传异常: {e}")
-                traceback.print_exc()
-                raise
-            # 7. 删除所有中间excel和分片fasta和合并excel
-            for f in excel_files:
-                try:
-                    if Path(f).exists():
-                        Path(f).unlink()
-                except Exception as e:
-                    print(f"[WARN] 删除中间Excel失败: {f}, {e}")
-                    traceback.print_exc()
-            for f in sub_fastas:
-                try:
-                    if Path(f).exists():
-                        Path(f).unlink()
-                except Exception as e:
-                    print(f"[WARN] 删除分片FASTA失败: {f}, {e}")
-                    traceback.print_exc()
-            try:
-                if merged_excel.exists():
-                    merged_excel.unlink()
-            except Exception as e:
-                print(f"[WARN] 删除合并Excel失败: {merged_excel}, {e}")
-                traceback.print_exc()
-            try:
-                if split_dir.exists():
-                    split_dir.rmdir()
-            except Exception as e:
-                print(f"[WARN] 删除分片目录失败: {split_dir}, {e}")
-                traceback.print_exc()
- 
-            return json.dumps({"type": "link", "url": minio_excel_path, "content": "NetMHCPan多肽长并行处理完成，结果已合并。"}, ensure_ascii=False)
-    except Exception as e:
-        print(f"[ERROR] run_netmhcpan_multi_length 执行异常: {e}")
-        traceback.print_exc()
-        raise
-
-# 新增：按肽长分组拆分fasta
-def split_fasta_by_length(input_fasta: str, lengths: list, output_dir: str) -> list:
-    """
-    按实际序列长度分组fasta，每个肽长一个文件，返回文件路径列表，顺序与lengths一致。
-    """
-    from pathlib import Path
-    out_map = {l: [] for l in lengths}
-    with open(input_fasta, 'r') as f:
-        lines = f.readlines()
-    current = []
-    for line in lines:
-        if line.startswith('>'):
-            if current:
-                seq = ''.join(current[1:]).replace('\n', '')
-                seq_len = len(seq)
-                if seq_len in out_map:
-                    out_map[seq_len].append(''.join(current))
-            current = [line]
-        else:
-            current.append(line)
-    if current:
-        seq = ''.join(current[1:]).replace('\n', '')
-        seq_len = len(seq)
-        if seq_len in out_map:
-            out_map[seq_len].append(''.join(current))
-    out_files = []
-    for l in lengths:
-        out_path = Path(output_dir) / f"split_len{l}.fasta"
-        with open(out_path, 'w') as f:
-            f.writelines(out_map[l])
-        out_files.append(str(out_path))
-    return out_files
-
-# # 新主入口，支持并发
-# async def NetMHCPan(
-#     input_filename: str,
-#     mhc_allele: str = "HLA-A02:01",
-#     peptide_length: str = "-1",
-#     high_threshold_of_bp: float = 0.5,
-#     low_threshold_of_bp: float = 2.0,
-#     rank_cutoff: float = -99.9,
-#     num_workers: int = 1
-# ) -> str:
-#     try:
-#         return await run_netmhcpan_multi_length(
-#             input_filename, mhc_allele, peptide_length, high_threshold_of_bp, low_threshold_of_bp, rank_cutoff, num_workers
-#         )
-#     except Exception as e:
-#         result = {
-#             "type": "text",
-#             "content": f"调用NetMHCPan工具失败: {e}"
-#         }
-#         return json.dumps(result, ensure_ascii=False)
-    
-    
+import asyncio
+import json
+import os
+import sys
+import uuid
+import datetime
+
+from dotenv import load_dotenv
+from minio import Minio
+from minio.error import S3Error 
+from pathlib import Path
+
+from src.tools.NetMHCPan.netmhcpan_to_excel import save_excel
+from src.utils.parallel_utils import (
+    split_fasta, run_commands_async, merge_excels, merge_sorted_excels, SortedMerge, ShardManifest, cleanup_stale_jobs, WorkerPool, allocate_workers,
+    workers_for_input
+)
+from src.utils.minio_utils import download_from_minio_uri, upload_file_to_minio
+from src.utils.result_writer import result_filename
+from typing import List, Optional
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+load_dotenv()
+current_file = Path(__file__).resolve()
+project_root = current_file.parents[3] 
+                                        
+# 将项目根目录添加到 sys.path
+sys.path.append(str(project_root))
+from config import CONFIG_YAML
+from src.utils.hits import TOP_K as HITS_TOP_K, top_hits, with_hits
+from src.utils.log import logger, log_payload
+from src.utils.net_parsers import NETMHCPAN, ParsedOutput, StreamParser, parse_netmhcpan, rank_rows
+from src.utils.supervisor import run_supervised
+from src.utils.tracing import traced
+
+# MinIO 配置:
+MINIO_CONFIG = CONFIG_YAML["MINIO"]
+MINIO_ENDPOINT = MINIO_CONFIG["endpoint"]
+MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY")
+MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY")
+MINIO_BUCKET = MINIO_CONFIG["netmhcpan_bucket"]
+MINIO_SECURE = MINIO_CONFIG.get("secure", False)
+
+# netMHCpan 配置 
+NETMHCPAN_DIR = CONFIG_YAML["TOOL"]["NETMHCPAN"]["netmhcpan_dir"]
+INPUT_TMP_DIR = CONFIG_YAML["TOOL"]["NETMHCPAN"]["input_tmp_netmhcpan_dir"]
+DOWNLOADER_PREFIX = CONFIG_YAML["TOOL"]["COMMON"]["output_download_url_prefix"]
+OUTPUT_TMP_DIR = CONFIG_YAML["TOOL"]["NETMHCPAN"]["output_tmp_netmhcpan_dir"]
+
+# 排序输出（ranked / top_k）、每个等位基因前 K 行和 hits 共用的评分列，越高越好
+RANK_COLUMN = "Score_EL"
+HIT_COLUMNS = ["Pos", "MHC", "Peptide", "Identity", "Score_EL", "%Rank_EL", "Score_BA", "%Rank_BA", "Aff(nM)", "BindLevel"]
+
+
+def netmhcpan_hits(merged: SortedMerge):
+    """按 Score_EL 降序的 top hits，按原顺序合并的结果附 SB/WB 计数；排序合并（top_k 时写满即停止）不附计数"""
+    counts = None
+    if merged.counts is not None:
+        counts = {"SB": merged.counts.get("<= SB", 0), "WB": merged.counts.get("<= WB", 0)}
+    return top_hits(merged.head, RANK_COLUMN, ascending=False, columns=HIT_COLUMNS, counts=counts, total=merged.rows)
+
+
+def merge_results(
+    excel_files, output_excel: str, ranked: bool, top_k: Optional[int], top_k_per_allele: Optional[int],
+    output_format: Optional[str] = "xlsx",
+):
+    """
+    合并分片结果。ranked 或 top_k 时各分片已按 Score_EL 降序排列，k 路归并流式写出全局有序的结果
+    （top_k 时写满即停止）；否则按原顺序逐行拼接。每个等位基因最多保留 Score_EL 最高的 top_k_per_allele 行，
+    均返回 SortedMerge。
+    output_format 只用于最终结果，各肽长的中间合并结果保持 xlsx
+    """
+    if ranked or top_k:
+        return merge_sorted_excels(
+            excel_files, output_excel, RANK_COLUMN, ascending=False, limit=top_k,
+            group_limit=("MHC", top_k_per_allele) if top_k_per_allele else None, head_rows=HITS_TOP_K,
+            output_format=output_format,
+        )
+    return merge_excels(
+        excel_files, output_excel, RANK_COLUMN, ascending=False,
+        group_limit=("MHC", top_k_per_allele) if top_k_per_allele else None, head_rows=HITS_TOP_K,
+        count_column="BindLevel", output_format=output_format,
+    )
+
+
+def result_summary(binders_only: bool, top_k_per_allele: Optional[int], ranked: bool, top_k: Optional[int]) -> str:
+    """结果说明，注明只保留结合肽、排序输出时的过滤条件"""
+    content = "NetMHCPan多肽长并行处理完成，结果已合并。"
+    if binders_only:
+        content += "结果仅包含 SB/WB 结合肽及每个蛋白的统计行。"
+    if top_k_per_allele:
+        content += f"每个等位基因最多保留 Score_EL 最高的 {top_k_per_allele} 行。"
+    if top_k:
+        content += f"结果按 Score_EL 降序排列，只保留前 {top_k} 行。"
+    elif ranked:
+        content += "结果按 Score_EL 降序排列。"
+    return content
+
+# # 初始化 MinIO 客户端
+# minio_client = Minio(
+#     MINIO_ENDPOINT,
+#     access_key=MINIO_ACCESS_KEY,
+#     secret_key=MINIO_SECRET_KEY,
+#     secure=MINIO_SECURE
+# )
+# #检查minio是否可用
+# def check_minio_connection(bucket_name=MINIO_BUCKET):
+#     try:
+#         minio_client.list_buckets()
+#         if not minio_client.bucket_exists(bucket_name):
+#             minio_client.make_bucket(bucket_name)
+#         return True
+#     except S3Error as e:
+#         print(f"MinIO连接或bucket操作失败: {e}")
+#         return False
+
+
+# async def run_netmhcpan(
+#     input_filename: str,  # MinIO 文件路径，格式为 "bucket-name/file-path"
+#     mhc_allele: str = "HLA-A02:01",  # HLA 等位基因（MHC 分子类型）
+#     peptide_length: str = "-1",  # 肽段长度，范围8-11，-1表示使用默认值
+#     high_threshold_of_bp: float = 0.5,  # 高结合力肽段的阈值
+#     low_threshold_of_bp: float = 2.0,  # 低结合力肽段的阈值
+#     rank_cutoff: float = -99.9,  # 输出结果的%Rank截断值
+#     netmhcpan_dir: str = NETMHCPAN_DIR
+#     ) -> str:
+
+#     """
+#     异步运行 netMHCpan 并将处理后的结果上传到 MinIO
+#     :param input_filename: MinIO 文件路径，格式为 "bucket-name/file-path"
+#     :param mhc_allele: HLA 等位基因（MHC 分子类型），默认值HLA-A02:01
+#     :param peptide_length: 肽段长度，范围8-11，-1表示使用默认值，默认值-1
+#     :param high_threshold_of_bp: 高结合力肽段的阈值，默认值0.5
+#     :param low_threshold_of_bp: 低结合力肽段的阈值，默认值2.0
+#     :param rank_cutoff: 输出结果的%Rank截断值，默认值-99.9
+#     :param netmhcpan_dir: netMHCpan 安装目录
+#     :return: JSON 字符串，包含 MinIO 文件路径（或下载链接）
+#     """
+
+#     minio_available = check_minio_connection()
+#     #提取桶名和文件
+#     try:
+#         # 去掉 minio:// 前缀
+#         path_without_prefix = input_filename[len("minio://"):]
+        
+#         # 找到第一个斜杠的位置，用于分割 bucket_name 和 object_name
+#         first_slash_index = path_without_prefix.find("/")
+        
+#         if first_slash_index == -1:
+#             raise ValueError("Invalid file path format: missing bucket name or object name")
+        
+#         # 提取 bucket_name 和 object_name
+#         bucket_name = path_without_prefix[:first_slash_index]
+#         object_name = path_without_prefix[first_slash_index + 1:]
+        
+#         # 打印提取结果（可选）
+#         # logger.info(f"Extracted bucket_name: {bucket_name}, object_name: {object_name}")
+        
+#     except Exception as e:
+#         # logger.error(f"Failed to parse file_path: {file_path}, error: {str(e)}")
+#         raise str(status_code=400, detail=f"Failed to parse file path: {str(e)}")     
+
+#     try:
+#         response = minio_client.get_object(bucket_name, object_name)
+#         file_content = response.read().decode("utf-8")
+#     except S3Error as e:
+#         return json.dumps({
+#             "type": "text",
+#             "content": f"无法从 MinIO 读取文件: {str(e)}"
+#         }, ensure_ascii=False)    
+
+#     # 生成随机ID和文件路径
+#     random_id = uuid.uuid4().hex
+#     #base_path = Path(__file__).resolve().parents[3]  # 根据文件位置调整层级
+#     input_dir = Path(INPUT_TMP_DIR)
+#     output_dir =Path(OUTPUT_TMP_DIR)
+    
+
+#     # 创建目录
+#     input_dir.mkdir(parents=True, exist_ok=True)
+#     output_dir.mkdir(parents=True, exist_ok=True)
+
+#     # 写入输入文件
+#     input_path = input_dir / f"{random_id}.fsa"
+#     with open(input_path, "w") as f:
+#         f.write(file_content)
+
+#     # 构建输出文件名和临时路径
+#     output_filename = f"{random_id}_NetMHCpan_results.xlsx"
+#     output_path = output_dir / output_filename
+
+#     # 构建命令
+#     cmd = [
+#         f"{netmhcpan_dir}/netMHCpan",
+#         "-BA",
+#         "-a", mhc_allele,  # HLA 等位基因
+#         "-rth", str(high_threshold_of_bp),  # 高结合力肽段阈值
+#         "-rlt", str(low_threshold_of_bp),  # 低结合力肽段阈值
+#         "-t", str(rank_cutoff),  # 输出结果%Rank截断值
+#         str(input_path)  # 输入文件路径
+#     ]
+    
+#     # 只有当peptide_length不为-1时才添加-l参数
+#     if peptide_length != -1:
+#         cmd.insert(-1, "-l")  # 在输入文件路径前插入-l
+#         cmd.insert(-1, str(peptide_length))  # 在-l后插入peptide_length值
+
+#     # 过滤掉空字符串
+#     cmd = [arg for arg in cmd if arg]
+#     # 启动异步进程
+#     proc = await asyncio.create_subprocess_exec(
+#         *cmd,
+#         stdout=asyncio.subprocess.PIPE,
+#         stderr=asyncio.subprocess.PIPE,
+#         cwd=f"{netmhcpan_dir}"
+#     )
+
+#     # 处理输出
+#     stdout, stderr = await proc.communicate()
+#     output = stdout.decode()
+#     # stdout_text = stdout.decode()
+#     # stderr_text = stderr.decode()
+#     # print(f"stdout:{stdout_text}")
+#     # print(f"stderr:{stderr_text}")
+#     # exit()
+#     print("11111111111111111111111111111111111111")
+#     print("11111111111111111111111111111111111111")
+#     print("11111111111111111111111111111111111111")        
+#     print(output)
+#     save_excel(output,output_dir,output_filename)
+
+#     # # 直接将所有内容写入文件
+#     # with open(output_path, "w") as f:
+#     #     f.write("\n".join(output.splitlines()))
+       
+#     # 调用过滤函数
+#     # filtered_content = filter_netmhcpan_excel(output_path)
+    
+#     # 错误处理
+#     if proc.returncode != 0:
+#         error_msg = stderr.decode()
+#         input_path.unlink(missing_ok=True)
+#         output_path.unlink(missing_ok=True)
+#         result = {
+#             "type": "text",
+#             "content": "您的输入信息可能有误，请核对正确再试。"
+#         }
+#     else:
+#         try:
+#             if minio_available:
+#                 minio_client.fput_object(
+#                     MINIO_BUCKET,
+#                     output_filename,
+#                     str(output_path)
+#                 )
+#                 file_path = f"minio://{MINIO_BUCKET}/{output_filename}"
+#             else:
+#                 # 如果 MinIO 不可用，返回下载链接
+#                 file_path = f"{DOWNLOADER_PREFIX}{output_filename}"
+#         except S3Error as e:
+#             file_path = f"{DOWNLOADER_PREFIX}{output_filename}"
+#         finally:
+#             # 如果 MinIO 成功上传，清理临时文件；否则保留
+#             if minio_available:
+#                 input_path.unlink(missing_ok=True)
+#                 output_path.unlink(missing_ok=True)
+#             else:
+#                 input_path.unlink(missing_ok=True)  # 只删除输入文件，保留输出文件
+
+#         # 返回结果
+#         # result = {
+#         #     "type": "link",
+#         #     "url": file_path,
+#         #     "content": filtered_content  # 替换为生成的 Markdown 内容
+#         # }
+#         result = {
+#             "type": "link",
+#             "url": file_path,
+#             "content": "NetMHCPan处理完成"  
+#         }
+        
+
+#     return json.dumps(result, ensure_ascii=False)
+
+
+# 单FASTA并行NetMHCPan
+@traced()
+async def run_netmhcpan_single(
+    input_fasta: str,
+    mhc_allele: str = "HLA-A02:01",
+    peptide_length: int = -1,
+    high_threshold_of_bp: float = 0.5,
+    low_threshold_of_bp: float = 2.0,
+    rank_cutoff: float = -99.9,
+    netmhcpan_dir: str = NETMHCPAN_DIR,
+    output_dir: str = OUTPUT_TMP_DIR,
+    binders_only: bool = False,
+    top_k_per_allele: Optional[int] = None,
+    ranked: bool = False,
+    top_k: Optional[int] = None,
+) -> str:
+    """
+    binders_only / top_k_per_allele 指定时边读取 netMHCpan 输出边解析，只保留 SB/WB 行
+    （及每个等位基因 Score_EL 最高的前 K 行）和每个蛋白的统计行，不在内存中保存完整输出。
+    ranked / top_k 指定时数据行按 Score_EL 降序排列、统计行放在最后，供合并时 k 路归并；
+    top_k 时分片内也只保留前 K 行
+    """
+    try:
+        random_id = uuid.uuid4().hex
+        input_path = Path(INPUT_TMP_DIR) / f"{random_id}.fsa"
+        # 拷贝输入内容到临时文件
+        with open(str(input_path), "w") as f:
+            with open(input_fasta, "r") as fin:
+                f.write(fin.read())
+        output_filename = f"{random_id}_NetMHCpan_results.xlsx"
+        output_path = Path(output_dir) / output_filename
+        # 构建命令行参数
+        cmd = [
+            f"{netmhcpan_dir}/netMHCpan",
+            "-BA",
+            "-a", mhc_allele,
+            "-rth", str(high_threshold_of_bp),
+            "-rlt", str(low_threshold_of_bp),
+            "-t", str(rank_cutoff),
+            str(input_path)
+        ]
+        if peptide_length != -1:
+            cmd.insert(-1, "-l")
+            cmd.insert(-1, str(peptide_length))
+        cmd = [arg for arg in cmd if arg]
+        parser = None
+        if binders_only or top_k_per_allele:
+            parser = StreamParser(NETMHCPAN, binders_only=binders_only, top_k=top_k_per_allele)
+        proc = await run_supervised(
+            "netmhcpan", cmd, cwd=f"{netmhcpan_dir}", stdout_sink=parser.feed if parser else None
+        )
+        stdout, stderr = proc.stdout, proc.stderr
+        if proc.killed:
+            raise RuntimeError(f"NetMHCPan 执行被终止: {proc.exit_reason}")
+        if parser is not None:
+            output_content = parser.close()
+            logger.info(
+                f"netMHCpan 流式解析: 共 {parser.total_rows} 行，符合条件 {parser.matched_rows} 行，"
+                f"保留 {len(output_content.rows) - len(output_content.summary_rows)} 行"
+            )
+        else:
+            output_content = stdout.decode()
+        if ranked or top_k:
+            # 分片结果按 Score_EL 降序排列供 k 路归并；按等位基因限制行数时归并会跳过部分行，分片内不截断
+            if not isinstance(output_content, ParsedOutput):
+                output_content = parse_netmhcpan(output_content)
+            output_content = rank_rows(
+                output_content, RANK_COLUMN, ascending=False, limit=None if top_k_per_allele else top_k
+            )
+        save_excel(output_content, str(output_dir), output_filename)
+        # input_path.unlink(missing_ok=True)
+        return str(output_path)
+    except Exception as e:
+        logger.exception(f"run_netmhcpan_single 执行异常: {e}")
+        raise
+
+# 并行主流程
+@traced()
+async def run_netmhcpan_parallel(
+    input_fasta: str,
+    mhc_allele: str = "HLA-A02:01",
+    peptide_length: int = -1,
+    high_threshold_of_bp: float = 0.5,
+    low_threshold_of_bp: float = 2.0,
+    rank_cutoff: float = -99.9,
+    num_workers: int = 1,
+    netmhcpan_dir: str = NETMHCPAN_DIR,
+    output_dir: str = OUTPUT_TMP_DIR,
+    sub_fastas: list = None,
+    manifest: ShardManifest = None,
+    pool: WorkerPool = None,
+    binders_only: bool = False,
+    top_k_per_allele: Optional[int] = None,
+    ranked: bool = False,
+    top_k: Optional[int] = None,
+) -> str:
+    try:
+        logger.debug(f"run_netmhcpan_parallel: input_fasta={input_fasta}, peptide_length={peptide_length}")
+        log_payload("run_netmhcpan_parallel 分片文件", sub_fastas)
+        if input_fasta.startswith("minio://"):
+            input_fasta = download_from_minio_uri(input_fasta, INPUT_TMP_DIR)
+        shard_group = f"len{peptide_length}"
+        if sub_fastas is None and manifest is not None:
+            # 续跑时复用上次切分好的分片，保证分片键一致
+            sub_fastas = manifest.get_splits(shard_group)
+        if sub_fastas is None:
+            split_root = manifest.job_dir if manifest is not None else Path(output_dir)
+            split_dir = split_root / f"split_{uuid.uuid4().hex}"
+            split_dir.mkdir(parents=True, exist_ok=True)
+            sub_fastas = split_fasta(input_fasta, num_workers, str(split_dir))
+            if manifest is not None:
+                manifest.set_splits(shard_group, sub_fastas)
+        for f in sub_fastas:
+            if not isinstance(f, str) or not Path(f).exists():
+                raise FileNotFoundError(f"分片文件不存在或不是字符串: {f}")
+        async def run_one(sub_fasta, *_):
+            logger.debug(f"run_one: 处理分片 {sub_fasta}")
+            return await run_netmhcpan_single(
+                sub_fasta, mhc_allele, peptide_length, high_threshold_of_bp, low_threshold_of_bp,
+                rank_cutoff, netmhcpan_dir, output_dir, binders_only, top_k_per_allele, ranked, top_k
+            )
+        excel_files = await run_commands_async(
+            run_one, sub_fastas, num_workers=num_workers, manifest=manifest, shard_group=shard_group, pool=pool
+        )
+        merged_excel = Path(output_dir) / f"merged_{uuid.uuid4().hex}_NetMHCpan_results.xlsx"
+        merge_results(excel_files, str(merged_excel), ranked, top_k, top_k_per_allele)
+        return str(merged_excel)
+    except Exception as e:
+        logger.exception(f"run_netmhcpan_parallel 执行异常: {e}")
+        raise
+
+# 完全仿照netctlpan.py的多肽长并发逻辑
+@traced()
+async def run_netmhcpan_multi_length(
+    input_fasta: str,
+    mhc_allele: str = "HLA-A02:01",
+    peptide_length = -1,
+    high_threshold_of_bp: float = 0.5,
+    low_threshold_of_bp: float = 2.0,
+    rank_cutoff: float = -99.9,
+    num_workers: int = 1,
+    mode: int = 0,
+    netmhcpan_dir: str = NETMHCPAN_DIR,
+    output_dir: str = OUTPUT_TMP_DIR,
+    job_id: str = None,
+    binders_only: bool = False,
+    top_k_per_allele: Optional[int] = None,
+    ranked: bool = False,
+    top_k: Optional[int] = None,
+    output_format: Optional[str] = None,
+) -> str:
+    """
+    支持多肽长并行预测，peptide_length为-1时预测8/9/10/11，为'9,11'时预测9和11，为单个数字时只预测该长度。
+    mode==1时，按肽长分组拆分fasta，每个肽长一个文件。
+    其它情况只下载/切割一次fasta，所有肽长共用分片，合并所有Excel输出，上传minio并清理中间文件。
+    
+    并行度分配逻辑：
+    - 所有肽长共用 num_workers 个并发槽，同时运行的工具进程数不超过 num_workers，
+      某个肽长先跑完后空出的槽由其余肽长继续使用
+    - mode==1 时按各肽长分组文件大小分配分片数（每个肽长至少 1 个分片）
+
+    分片结果记录在 job_id 对应的任务清单中，失败的分片自动重试；
+    仍然失败时保留工作目录，使用同一个 job_id 重新提交即可只重跑未完成的分片。
+
+    binders_only 为 True 时只保留 SB/WB 结合肽和每个蛋白的统计行，top_k_per_allele 限制每个等位基因保留的行数，
+    内存占用和结果文件大小与结合肽数量成正比。
+    ranked 为 True 时结果按 Score_EL 降序排列：各分片先排好序，合并时 k 路归并流式写出；
+    top_k 指定时只输出全局前 K 行，归并写满即停止。
+    output_format 为最终结果文件的格式（xlsx / csv.gz / parquet，默认 OUTPUT.default_format），
+    xlsx 中统计行单独放在 Summary 工作表，超过单表行数上限时数据行自动拆分到多个工作表。
+    num_workers 也可以是 async 函数 f(本地输入路径)，在输入下载后按本地文件确定并行度（见 workers_for_input）。
+    """
+    job_id = job_id or uuid.uuid4().hex
+    try:
+        input_dir = Path(INPUT_TMP_DIR)
+        output_dir =Path(OUTPUT_TMP_DIR)
+
+        # 创建目录
+        input_dir.mkdir(parents=True, exist_ok=True)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        
+        import json
+        # 1. 解析 peptide_length，确保lengths始终为list
+        if peptide_length == "-1":
+            lengths = [8, 9, 10, 11]
+        elif isinstance(peptide_length, str):
+            lengths = [int(x) for x in peptide_length.split(",") if x.strip()]
+        elif isinstance(peptide_length, int):
+            lengths = [peptide_length]
+        else:
+            try:
+                lengths = [int(peptide_length)]
+            except Exception:
+                raise ValueError(f"peptide_length参数类型不支持: {peptide_length}")
+            
+        logger.info(f"肽长列表: {lengths}")
+
+        # 分片任务清单，记录已完成的分片用于失败后续跑
+        cleanup_stale_jobs("netmhcpan")
+        manifest = ShardManifest("netmhcpan", job_id, {
+            "input_fasta": input_fasta,
+            "mhc_allele": mhc_allele,
+            "lengths": lengths,
+            "high_threshold_of_bp": high_threshold_of_bp,
+            "low_threshold_of_bp": low_threshold_of_bp,
+            "rank_cutoff": rank_cutoff,
+            "mode": mode,
+            "binders_only": binders_only,
+            "top_k_per_allele": top_k_per_allele,
+            "ranked": ranked,
+            "top_k": top_k,
+        })
+        if isinstance(input_fasta, str) and input_fasta.startswith("minio://"):
+            local_fasta = manifest.get_input("input_fasta")
+            if local_fasta is None:
+                local_fasta = download_from_minio_uri(input_fasta, str(manifest.job_dir))
+                manifest.set_input("input_fasta", local_fasta)
+            input_fasta = local_fasta
+
+        # 所有肽长共用 num_workers 个并发槽，某个肽长的分片先跑完后，空出的槽由其余肽长继续使用
+        num_workers = await workers_for_input(num_workers, input_fasta)
+        pool = WorkerPool(num_workers)
+        logger.info(f"总并发数: {num_workers}")
+
+        # 2. mode==1且肽长只包含8/9/10/11时，按肽长分组
+        if mode == 1 and all(l in [8,9,10,11] for l in lengths):
+            split_dir = manifest.job_dir / "split_by_length"
+            sub_fastas = manifest.get_splits("by_length")
+            if sub_fastas is None:
+                split_dir.mkdir(parents=True, exist_ok=True)
+                sub_fastas = split_fasta_by_length(input_fasta, lengths, str(split_dir))
+                manifest.set_splits("by_length", sub_fastas)
+            # 过滤掉空文件和对应的length
+            non_empty_fastas = []
+            non_empty_lengths = []
+            for i, f in enumerate(sub_fastas):
+                try:
+                    if Path(f).stat().st_size > 0:
+                        non_empty_fastas.append(f)
+                        non_empty_lengths.append(lengths[i])
+                except Exception as e:
+                    logger.warning(f"检查分组FASTA文件大小失败: {f}, {e}")
+            # 按各肽长分组文件大小分配分片数，总分片数为 num_workers
+            shards_per_length = allocate_workers(
+                num_workers, [Path(f).stat().st_size for f in non_empty_fastas]
+            )
+            logger.info(f"各肽长分配的分片数: {shards_per_length}")
+            tasks = [
+                run_netmhcpan_parallel(
+                    non_empty_fastas[i], mhc_allele, non_empty_lengths[i], high_threshold_of_bp, low_threshold_of_bp,
+                    rank_cutoff,  shards_per_length[i], netmhcpan_dir, output_dir,
+                    # 分组模式下不传sub_fastas参数，按分配的分片数切分，并发受共享的 pool 限制
+                    manifest=manifest, pool=pool, binders_only=binders_only, top_k_per_allele=top_k_per_allele,
+                    ranked=ranked, top_k=top_k
+                )
+                for i in range(len(non_empty_fastas))
+            ]
+            logger.debug(f"提交 {len(tasks)} 个肽长任务")
+            try:
+                # 等待所有肽长跑完（已完成的分片都会写入清单），再统一报告失败
+                excel_files = await asyncio.gather(*tasks, return_exceptions=True)
+                for i, res in enumerate(excel_files):
+                    if isinstance(res, Exception):
+                        logger.error(f"子任务{i} 执行异常: {res}", exc_info=res)
+                        raise res
+                valid_excels = [f for f in excel_files if isinstance(f, str) and Path(f).exists()]
+                if not valid_excels:
+                    logger.error("没有生成任何有效的Excel文件，无法合并！")
+                    raise RuntimeError("没有生成任何有效的Excel文件，无法合并！")
+            except Exception as e:
+                logger.exception(f"gather tasks 执行异常: {e}")
+                raise
+            # 5. 合并所有excel
+            merged_excel = Path(output_dir) / result_filename(f"merged_multi_{uuid.uuid4().hex}_NetMHCPan_results", output_format)
+            merged = merge_results(valid_excels, str(merged_excel), ranked, top_k, top_k_per_allele, output_format)
+            # 6. 上传合并后的Excel到MinIO
+            beijing_time = datetime.now(ZoneInfo("Asia/Shanghai"))
+            time_str = beijing_time.strftime('%Y-%m-%d_%H-%M-%S')
+            tool_output_filename = result_filename(f"{uuid.uuid4().hex}_NetMHCPan_results_{time_str}", output_format)
+            minio_excel_path = upload_file_to_minio(str(merged_excel), MINIO_BUCKET, tool_output_filename)
+            # 7. 删除所有中间excel和分组fasta和合并excel
+            for f in excel_files:
+                try:
+                    if Path(f).exists():
+                        Path(f).unlink()
+                except Exception as e:
+                    logger.warning(f"删除中间Excel失败: {f}, {e}")
+            for f in sub_fastas:
+                try:
+                    if Path(f).exists():
+                        Path(f).unlink()
+                except Exception as e:
+                    logger.warning(f"删除分组FASTA失败: {f}, {e}")
+            try:
+                if merged_excel.exists():
+                    merged_excel.unlink()
+            except Exception as e:
+                logger.warning(f"删除合并Excel失败: {merged_excel}, {e}")
+            try:
+                if split_dir.exists():
+                    split_dir.rmdir()
+            except Exception as e:
+                logger.warning(f"删除分组目录失败: {split_dir}, {e}")
+
+            manifest.cleanup()
+            return json.dumps(with_hits(
+                {"type": "link", "url": minio_excel_path, "content": result_summary(binders_only, top_k_per_allele, ranked, top_k)},
+                netmhcpan_hits(merged)
+            ), ensure_ascii=False)
+        else:
+            # 3. 其它情况，原有分片并发逻辑
+            # 2. 切割一次fasta（续跑时复用已切好的分片）
+            split_dir = manifest.job_dir / "split_all"
+            sub_fastas = manifest.get_splits("all")
+            if sub_fastas is None:
+                split_dir.mkdir(parents=True, exist_ok=True)
+                sub_fastas = split_fasta(input_fasta, num_workers, str(split_dir))
+                manifest.set_splits("all", sub_fastas)
+            # 4. 针对每个肽长并发run_netmhcpan_parallel，传入同一批分片
+            try:
+                tasks = [
+                run_netmhcpan_parallel(
+                    input_fasta, mhc_allele, l, high_threshold_of_bp, low_threshold_of_bp,
+                    rank_cutoff, num_workers, netmhcpan_dir, output_dir, sub_fastas=sub_fastas,
+                    manifest=manifest, pool=pool, binders_only=binders_only, top_k_per_allele=top_k_per_allele,
+                    ranked=ranked, top_k=top_k
+                    )
+                    for i, l in enumerate(lengths)
+                ]
+                # 等待所有肽长跑完（已完成的分片都会写入清单），任一失败则整体失败，不合并残缺结果
+                excel_files = await asyncio.gather(*tasks, return_exceptions=True)
+                for i, res in enumerate(excel_files):
+                    if isinstance(res, Exception):
+                        logger.error(f"子任务{i} 执行异常: {res}", exc_info=res)
+                        raise res
+                valid_excels = [f for f in excel_files if isinstance(f, str) and Path(f).exists()]
+                if not valid_excels:
+                    logger.error("没有生成任何有效的Excel文件，无法合并！")
+                    raise RuntimeError("没有生成任何有效的Excel文件，无法合并！")
+                # 5. 合并所有excel
+                merged_excel = Path(output_dir) / result_filename(f"merged_multi_{uuid.uuid4().hex}_NetMHCPan_results", output_format)
+                merged = merge_results(valid_excels, str(merged_excel), ranked, top_k, top_k_per_allele, output_format)
+                # 6. 上传合并后的Excel到MinIO
+                beijing_time = datetime.now(ZoneInfo("Asia/Shanghai"))
+                time_str = beijing_time.strftime('%Y-%m-%d_%H-%M-%S')
+                tool_output_filename = result_filename(f"{uuid.uuid4().hex}_NetMHCPan_results_{time_str}", output_format)
+                minio_excel_path = upload_file_to_minio(str(merged_excel), MINIO_BUCKET, tool_output_filename)
+            except Exception as e:
+                logger.exception(f"run_netmhcpan_multi_length 分片并发/合并/上传异常: {e}")
+                raise
+            # 7. 删除所有中间excel和分片fasta和合并excel
+            for f in excel_files:
+                try:
+                    if Path(f).exists():
+                        Path(f).unlink()
+                except Exception as e:
+                    logger.warning(f"删除中间Excel失败: {f}, {e}")
+            for f in sub_fastas:
+                try:
+                    if Path(f).exists():
+                        Path(f).unlink()
+                except Exception as e:
+                    logger.warning(f"删除分片FASTA失败: {f}, {e}")
+            try:
+                if merged_excel.exists():
+                    merged_excel.unlink()
+            except Exception as e:
+                logger.warning(f"删除合并Excel失败: {merged_excel}, {e}")
+            try:
+                if split_dir.exists():
+                    split_dir.rmdir()
+            except Exception as e:
+                logger.warning(f"删除分片目录失败: {split_dir}, {e}")
+ 
+            manifest.cleanup()
+            return json.dumps(with_hits(
+                {"type": "link", "url": minio_excel_path, "content": result_summary(binders_only, top_k_per_allele, ranked, top_k)},
+                netmhcpan_hits(merged)
+            ), ensure_ascii=False)
+    except Exception as e:
+        logger.exception(f"run_netmhcpan_multi_length 执行异常: {e}")
+        raise RuntimeError(f"{e}（已完成的分片已保存，使用 job_id={job_id} 重新提交可续跑）") from e
+
+# 新增：按肽长分组拆分fasta
+def split_fasta_by_length(input_fasta: str, lengths: list, output_dir: str) -> list:
+    """
+    按实际序列长度分组fasta，每个肽长一个文件，返回文件路径列表，顺序与lengths一致。
+    """
+    from pathlib import Path
+    out_map = {l: [] for l in lengths}
+    with open(input_fasta, 'r') as f:
+        lines = f.readlines()
+    current = []
+    for line in lines:
+        if line.startswith('>'):
+            if current:
+                seq = ''.join(current[1:]).replace('\n', '')
+                seq_len = len(seq)
+                if seq_len in out_map:
+                    out_map[seq_len].append(''.join(current))
+            current = [line]
+        else:
+            current.append(line)
+    if current:
+        seq = ''.join(current[1:]).replace('\n', '')
+        seq_len = len(seq)
+        if seq_len in out_map:
+            out_map[seq_len].append(''.join(current))
+    out_files = []
+    for l in lengths:
+        out_path = Path(output_dir) / f"split_len{l}.fasta"
+        with open(out_path, 'w') as f:
+            f.writelines(out_map[l])
+        out_files.append(str(out_path))
+    return out_files
+
+# # 新主入口，支持并发
+# async def NetMHCPan(
+#     input_filename: str,
+#     mhc_allele: str = "HLA-A02:01",
+#     peptide_length: str = "-1",
+#     high_threshold_of_bp: float = 0.5,
+#     low_threshold_of_bp: float = 2.0,
+#     rank_cutoff: float = -99.9,
+#     num_workers: int = 1
+# ) -> str:
+#     try:
+#         return await run_netmhcpan_multi_length(
+#             input_filename, mhc_allele, peptide_length, high_threshold_of_bp, low_threshold_of_bp, rank_cutoff, num_workers
+#         )
+#     except Exception as e:
+#         result = {
+#             "type": "text",
+#             "content": f"调用NetMHCPan工具失败: {e}"
+#         }
+#         return json.dumps(result, ensure_ascii=False)
+    
+    
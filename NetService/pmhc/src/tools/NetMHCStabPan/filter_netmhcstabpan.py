@@ -1,5 +1,7 @@
 import re
+from src.utils.metrics import stage_timer
 
+@stage_timer("parse")
 def filter_netmhcstabpan_output(output_lines: list) -> str:
     """
     过滤 netMHCstabpan 的输出，提取关键信息并生成 Markdown 表格。
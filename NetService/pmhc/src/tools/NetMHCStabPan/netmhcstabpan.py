@@ -12,6 +12,11 @@ from pathlib import Path
 from config import CONFIG_YAML
 from src.tools.NetMHCStabPan.filter_netmhcstabpan import filter_netmhcstabpan_output
 from src.tools.NetMHCStabPan.netmhcstabpan_to_excel import save_excel
+from src.utils.hits import top_hits, with_hits
+from src.utils.supervisor import run_supervised
+from src.utils.tracing import traced
+from src.utils.minio_utils import InstrumentedMinio
+from src.utils.result_writer import result_filename
 
 load_dotenv()
 # MinIO 配置:
@@ -29,7 +34,7 @@ DOWNLOADER_PREFIX = CONFIG_YAML["TOOL"]["COMMON"]["output_download_url_prefix"]
 OUTPUT_TMP_DIR = CONFIG_YAML["TOOL"]["NETMHCSTABPAN"]["output_tmp_netmhcstabpan_dir"]
 
 # 初始化 MinIO 客户端
-minio_client = Minio(
+minio_client = InstrumentedMinio(
     MINIO_ENDPOINT,
     access_key=MINIO_ACCESS_KEY,
     secret_key=MINIO_SECRET_KEY,
@@ -47,13 +52,15 @@ def check_minio_connection(bucket_name=MINIO_BUCKET):
         return False
 
 
+@traced()
 async def run_netmhcstabpan(
     input_file: str,  # MinIO 文件路径，格式为 "bucket-name/file-path"
     mhc_allele: str = "HLA-A02:01",  # MHC 等位基因类型
     high_threshold_of_bp: float = 0.5,  # 相对阈值上限
     low_threshold_of_bp: float = 2.0,  # 相对阈值下限
     peptide_length: str = "8,9,10,11",  # 肽段长度，逗号分隔
-    netmhcstabpan_dir: str = NETMHCSTABPAN_DIR
+    netmhcstabpan_dir: str = NETMHCSTABPAN_DIR,
+    output_format: str = None  # 结果文件格式 xlsx / csv.gz / parquet
     ) -> str:
 
     """
@@ -64,6 +71,7 @@ async def run_netmhcstabpan(
     :param low_threshold_of_bp: 相对阈值下限
     :param peptide_length: 肽段长度，逗号分隔（如 "8,9"）
     :param netmhcstabpan_dir: netMHCstabpan 安装目录
+    :param output_format: 结果文件格式 xlsx / csv.gz / parquet，默认 OUTPUT.default_format
     :return: JSON 字符串，包含 MinIO 文件路径（或下载链接）
     """
 
@@ -91,8 +99,7 @@ async def run_netmhcstabpan(
         raise str(status_code=400, detail=f"Failed to parse file path: {str(e)}")     
 
     try:
-        response = minio_client.get_object(bucket_name, object_name)
-        file_content = response.read().decode("utf-8")
+        file_content = minio_client.read_object(bucket_name, object_name).decode("utf-8")
     except S3Error as e:
         return json.dumps({
             "type": "text",
@@ -112,7 +119,7 @@ async def run_netmhcstabpan(
         f.write(file_content)
 
     # 构建输出文件名和临时路径
-    output_filename = f"{random_id}_NetMHCstabpan_results.xlsx"
+    output_filename = result_filename(f"{random_id}_NetMHCstabpan_results", output_format)
     output_path = output_dir / output_filename
 
     # 构建命令
@@ -126,12 +133,7 @@ async def run_netmhcstabpan(
     ]
     # 启动异步进程
     try:
-        proc = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            cwd=f"{netmhcstabpan_dir}"
-        )
+        proc = await run_supervised("netmhcstabpan", cmd, cwd=f"{netmhcstabpan_dir}")
     except FileNotFoundError as e:
         result = {
             "type": "text",
@@ -140,13 +142,15 @@ async def run_netmhcstabpan(
         return json.dumps(result, ensure_ascii=False)
     
     # 获取输出
-    stdout, stderr = await proc.communicate()
+    stdout, stderr = proc.stdout, proc.stderr
+    if proc.killed:
+        raise RuntimeError(f"NetMHCStabPan 执行被终止: {proc.exit_reason}")
     output_content = stdout.decode("utf-8", errors="replace")
     #stdout_text = stdout.decode()
     #stderr_text = stderr.decode()
     #print(f"stdout:{stdout_text}")
     #print(f"stderr:{stderr_text}")
-    save_excel(output_content, str(output_dir), output_filename)
+    result_df = save_excel(output_content, str(output_dir), output_filename, output_format)
 
     # with open(output_path, "w") as f:
     #     f.write("\n".join(output_content.splitlines()))
@@ -194,6 +198,10 @@ async def run_netmhcstabpan(
             "url": file_path,
             "content": filtered_content  # 替换为生成的Markdown内容
         }
+        # 按稳定性预测值 Pred 降序的 top hits，附 SB/WB 计数
+        levels = result_df["BindLevel"].value_counts()
+        counts = {"SB": levels.get("<= SB", 0), "WB": levels.get("<= WB", 0)}
+        with_hits(result, top_hits(result_df, "Pred", ascending=False, counts=counts))
 
     return json.dumps(result, ensure_ascii=False)
 
@@ -1,38 +1,33 @@
 import pandas as pd
+from typing import Union
+from src.utils.metrics import stage_timer
+from src.utils.summarize import markdown_table
 
-def filter_nettcr_output(output_path_xlsx: str) -> str:
+@stage_timer("parse")
+def filter_nettcr_output(output_path_xlsx: Union[str, pd.DataFrame]) -> str:
     """
     解析 Excel 文件并生成动态 Markdown 表格（兼容任意列名和数量）
     
     Args:
-        output_path_xlsx (str): Excel 文件路径
+        output_path_xlsx (str | DataFrame): Excel 文件路径，或已在内存中的结果 DataFrame
         
     Returns:
         str: 生成的 Markdown 表格字符串
     """
     try:
-        # 读取 Excel 文件
-        df = pd.read_excel(output_path_xlsx)
+        # 读取 Excel 文件（已有 DataFrame 时直接使用）
+        if isinstance(output_path_xlsx, pd.DataFrame):
+            df = output_path_xlsx
+        else:
+            df = pd.read_excel(output_path_xlsx)
         
         # 检查数据是否为空
         if df.empty:
             return "**警告**: Excel 文件中没有数据"
             
-        # 动态生成 Markdown 表头
-        headers = df.columns.tolist()
-        markdown_table = [
-            "| " + " | ".join(headers) + " |",
-            "| " + " | ".join(["---"] * len(headers)) + " |"
-        ]
-        
-        # 动态生成数据行
-        for _, row in df.iterrows():
-            markdown_table.append(
-                "| " + " | ".join(str(row[col]) for col in headers) + " |"
-            )
-        
-        # 返回完整的 Markdown 表格
-        return "\n".join(markdown_table)
+        # 动态生成 Markdown 表格（按列转换为字符串）
+        headers = [str(col) for col in df.columns]
+        return "\n".join(markdown_table(df, df.columns.tolist(), headers=headers))
         
     except FileNotFoundError:
         return f"**错误**: 文件未找到 - {output_path_xlsx}"
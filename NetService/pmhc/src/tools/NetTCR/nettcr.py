@@ -13,7 +13,13 @@ from pathlib import Path
 
 from config import CONFIG_YAML
 from src.tools.NetTCR.filter_nettcr import filter_nettcr_output
+from src.utils.hits import top_hits, with_hits
 from src.utils.log import logger
+from src.utils.minio_utils import InstrumentedMinio, strip_compression_suffix
+from src.utils.result_writer import result_filename, write_frame
+from src.utils.supervisor import run_supervised
+from src.utils.tracing import traced
+from src.utils.thread_budget import thread_lease
 
 load_dotenv()
 
@@ -32,7 +38,7 @@ DOWNLOADER_PREFIX = CONFIG_YAML["TOOL"]["COMMON"]["output_download_url_prefix"]
 OUTPUT_TMP_DIR = CONFIG_YAML["TOOL"]["NETTCR"]["output_tmp_nettcr_dir"]
 
 # 初始化 MinIO 客户端
-minio_client = Minio(
+minio_client = InstrumentedMinio(
     MINIO_ENDPOINT,
     access_key=MINIO_ACCESS_KEY,
     secret_key=MINIO_SECRET_KEY,
@@ -50,14 +56,17 @@ def check_minio_connection(bucket_name=MINIO_BUCKET):
         return False
 
 
+@traced()
 async def run_nettcr(
     input_file: str,  # MinIO 文件路径，格式为 "bucket-name/file-path"
-    nettcr_dir: str = NETTCR_DIR
+    nettcr_dir: str = NETTCR_DIR,
+    output_format: str = None  # 结果文件格式 xlsx / csv.gz / parquet
     ) -> str:
 
     """
     异步运行 nettcr 并将处理后的结果上传到 MinIO
     :param input_file: MinIO 文件路径，格式为 "bucket-name/file-path"
+    :param output_format: 结果文件格式 xlsx / csv.gz / parquet，默认 OUTPUT.default_format
     :return: JSON 字符串，包含 MinIO 文件路径（或下载链接）
     """
 
@@ -86,8 +95,7 @@ async def run_nettcr(
 
     # 2. 从 MinIO 下载文件（二进制模式）
     try:
-        response = minio_client.get_object(bucket_name, object_name)
-        file_content = response.read()  # 直接读取为 bytes，不解码
+        file_content = minio_client.read_object(bucket_name, object_name)  # 直接读取为 bytes，不解码（.gz / .zst 已解压）
     except S3Error as e:
         return json.dumps({
             "type": "text",
@@ -106,7 +114,7 @@ async def run_nettcr(
     output_dir.mkdir(parents=True, exist_ok=True)\
     
      # 获取文件扩展名
-    file_ext = Path(object_name).suffix.lower()    
+    file_ext = Path(strip_compression_suffix(object_name)).suffix.lower()    
 
     # 写入输入文件
     input_path = input_dir / f"{random_id}.csv"
@@ -147,7 +155,7 @@ async def run_nettcr(
         }, ensure_ascii=False)
 
     # 构建输出文件名和临时路径
-    output_filename = f"{random_id}_NetTCR_results.xlsx"
+    output_filename = result_filename(f"{random_id}_NetTCR_results", output_format)
     #工具输出文件路径
     output_tmp = f"{random_id}_output"
     output_tmp_path = output_dir / output_tmp
@@ -163,15 +171,11 @@ async def run_nettcr(
         "-a", "10",  # 添加 -a 参数
     ]
     # 启动异步进程
-    proc = await asyncio.create_subprocess_exec(
-        *cmd,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-        cwd=f"{nettcr_dir}"
-    )
+    with thread_lease("nettcr") as env:
+        proc = await run_supervised("nettcr", cmd, cwd=f"{nettcr_dir}", env=env)
 
     # 处理输出
-    stdout, stderr = await proc.communicate()
+    stdout, stderr = proc.stdout, proc.stderr
     output_content = stdout.decode()
     # print(output_content)
     
@@ -187,11 +191,11 @@ async def run_nettcr(
     else:
         # 检查 CSV 文件是否存在并转换
         csv_file = output_tmp_path / "nettcr_predictions.csv"
-        excel_file = output_tmp_path / "nettcr_predictions.xlsx"
+        excel_file = output_tmp_path / result_filename("nettcr_predictions", output_format)
         
         try:
             df = pd.read_csv(str(csv_file))
-            df.to_excel(str(excel_file), index=False, engine="openpyxl")
+            write_frame(df, excel_file, output_format)
         except FileNotFoundError:
             logger.error(f"警告: 未找到预测结果文件 {csv_file}")
             return json.dumps({
@@ -206,7 +210,7 @@ async def run_nettcr(
             }, ensure_ascii=False)  
 
         # 调用markdown过滤函数
-        filtered_content = filter_nettcr_output(str(excel_file))
+        filtered_content = filter_nettcr_output(df)
         try:
             if minio_available:
                 minio_client.fput_object(
@@ -234,6 +238,8 @@ async def run_nettcr(
             "url": file_path,
             "content": filtered_content  # 替换为生成的 Markdown 内容
         }
+        # 按 prediction 降序的 top hits
+        with_hits(result, top_hits(df, "prediction", ascending=False))
 
     return json.dumps(result, ensure_ascii=False)
 
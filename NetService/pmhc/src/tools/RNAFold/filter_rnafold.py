@@ -1,47 +1,17 @@
 import pandas as pd
+from typing import Union
 from src.utils.log import logger
+from src.utils.metrics import stage_timer
+from src.utils.summarize import escape_markdown
 
-def escape_markdown_special_chars(text: str) -> str:
-    # 定义需要转义的特殊字符及其转义形式
-    special_chars = {
-        '|': '\\|',
-        '\\': '\\\\',
-        '*': '\\*',
-        '_': '\\_',
-        '#': '\\#',
-        '+': '\\+',
-        '-': '\\-',
-        '=': '\\=',
-        '>': '\\>',
-        '<': '\\<',
-        '(': '\\(',
-        ')': '\\)',
-        '!': '\\!',
-        '[': '\\[',
-        ']': '\\]',
-        '{': '\\{',
-        '}': '\\}',
-        '"': '\\"',
-        "'": "\\'",
-        '`': '\\`',
-        '&': '\\&',
-        '%': '\\%',
-        '$': '\\$',
-        '^': '\\^',
-        '~': '\\~',
-    }
-    # 替换特殊字符
-    for char, escaped_char in special_chars.items():
-        text = text.replace(char, escaped_char)
-    return text
-
-def filter_rnafold_excel(excel_path: str) -> str:
+@stage_timer("parse")
+def filter_rnafold_excel(result: Union[str, pd.DataFrame]) -> str:
+    """result 为 save_excel 返回的 DataFrame，传入文件路径时读取 Excel"""
     try:
-        # 读取Excel文件
-        df = pd.read_excel(excel_path)
-        
-        # 处理特殊字符和换行符
-        df = df.map(lambda x: escape_markdown_special_chars(str(x)).replace('\n', ' '))
+        df = result if isinstance(result, pd.DataFrame) else pd.read_excel(result)
+
+        # 按列转义特殊字符，换行替换为空格
+        df = df.apply(escape_markdown)
 
         # 生成Markdown表格（对齐表头）
         markdown_table = df.to_markdown(index=False, tablefmt="github")
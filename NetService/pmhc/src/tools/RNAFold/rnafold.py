@@ -14,7 +14,10 @@ from config import CONFIG_YAML
 from src.tools.RNAFold.filter_rnafold import filter_rnafold_excel
 from src.tools.RNAFold.rnafold_to_excel import save_excel
 from src.tools.RNAPlot.rnaplot import RNAPlot
-from src.utils.log import logger
+from src.utils.log import logger, log_payload
+from src.utils.supervisor import run_supervised
+from src.utils.tracing import traced
+from src.utils.minio_utils import upload_artifacts_to_minio, InstrumentedMinio
 
 load_dotenv()
 
@@ -34,7 +37,7 @@ DOWNLOADER_PREFIX = CONFIG_YAML["TOOL"]["COMMON"]["output_download_url_prefix"]
 OUTPUT_TMP_DIR = CONFIG_YAML["TOOL"]["RNAFOLD"]["output_tmp_dir"]
 
 # 初始化 MinIO 客户端
-minio_client = Minio(
+minio_client = InstrumentedMinio(
     MINIO_ENDPOINT,
     access_key=MINIO_ACCESS_KEY,
     secret_key=MINIO_SECRET_KEY,
@@ -48,10 +51,11 @@ def check_minio_connection(bucket_name=MINIO_BUCKET):
             minio_client.make_bucket(bucket_name)
         return True
     except S3Error as e:
-        print(f"MinIO连接或bucket操作失败: {e}")
+        logger.error(f"MinIO连接或bucket操作失败: {e}")
         return False
 
 
+@traced()
 async def run_rnafold(
     input_file: str,  # MinIO 文件路径，格式为 "bucket-name/file-path"
     ) -> str:
@@ -89,8 +93,7 @@ async def run_rnafold(
         raise str(status_code=400, detail=f"Failed to parse file path: {str(e)}")     
 
     try:
-        response = minio_client.get_object(bucket_name, object_name)
-        file_content = response.read().decode("utf-8")
+        file_content = minio_client.read_object(bucket_name, object_name).decode("utf-8")
     except S3Error as e:
         error_msg = f"无法从MinIO读取文件: {str(e)}"
         logger.error(error_msg)        
@@ -137,15 +140,10 @@ async def run_rnafold(
     # ]
 
     # 启动异步进程
-    proc = await asyncio.create_subprocess_exec(
-        *cmd,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-        cwd="/opt/softwares/ViennaRNA"
-    )
+    proc = await run_supervised("rnafold", cmd, cwd="/opt/softwares/ViennaRNA")
 
     # 处理输出
-    stdout, stderr = await proc.communicate()
+    stdout, stderr = proc.stdout, proc.stderr
     output = stdout.decode()
     
     # 错误处理
@@ -161,8 +159,8 @@ async def run_rnafold(
         }
         return json.dumps(result, ensure_ascii=False)
     logger.info("RNAfold执行成功，正在保存结果...")
-    save_excel(output, output_dir, output_filename)
-    filtered_content = filter_rnafold_excel(output_path)    
+    result_df = save_excel(output, output_dir, output_filename)
+    filtered_content = filter_rnafold_excel(result_df)    
 
     # 解析RNAfold输出
     lines = output.split('\n')
@@ -210,46 +208,35 @@ async def run_rnafold(
             })
             
         except Exception as e:
-            print(f"解析记录时出错，跳过该记录。错误: {str(e)}")
-            print(f"问题记录内容: {record[:100]}...")
+            logger.warning(f"解析记录时出错，跳过该记录。错误: {str(e)}，记录内容: {record[:100]}...")
 
-    logger.info(f"results的结果：...................{results}")
+    log_payload("RNAfold 解析结果", results)
     # 上传JSON数据到MinIO
-    uploaded_urls = {}
-    
+    parts = {}
     for i, result in enumerate(results, 1):
         # 创建JSON内容
         json_content = {
             "structure": result['structure'],
             "sequence": result['sequence'] 
         }
-        
-        # 转换为JSON字符串
-        json_str = json.dumps(json_content, ensure_ascii=False)
-        
-        # 创建文件名
-        json_filename = f"{random_id}_part{i}.txt"
-        
-        try:
-            if minio_available:
-                # 直接上传字符串数据到MinIO
-                minio_client.put_object(
-                    MINIO_BUCKET,
-                    json_filename,
-                    BytesIO(json_str.encode('utf-8')),
-                    len(json_str.encode('utf-8')),
-                    content_type='application/json'
-                )
-                file_path = f"minio://{MINIO_BUCKET}/{json_filename}"
-                uploaded_urls[f"fasta_path{i}"] = file_path
-            else:
-                logger.warning("MinIO不可用，返回本地下载链接")
-                file_path = f"{DOWNLOADER_PREFIX}{json_filename}"
-                uploaded_urls[f"fasta_path{i}"] = file_path
-        except S3Error as e:
-            logger.error(f"MinIO上传失败: {e}")
-            file_path = f"{DOWNLOADER_PREFIX}{json_filename}"
-            uploaded_urls[f"fasta_path{i}"] = file_path
+        parts[f"part{i}.txt"] = json.dumps(json_content, ensure_ascii=False).encode('utf-8')
+
+    # 并发上传所有记录，单条上传失败时回退为下载链接
+    if minio_available:
+        part_urls, _ = await upload_artifacts_to_minio(
+            parts,
+            MINIO_BUCKET,
+            object_prefix=f"{random_id}_",
+            bundle_name="parts.tar.gz",
+            fallback_url_prefix=DOWNLOADER_PREFIX,
+            content_type='application/json'
+        )
+    else:
+        logger.warning("MinIO不可用，返回本地下载链接")
+        part_urls = {name: f"{DOWNLOADER_PREFIX}{random_id}_{name}" for name in parts}
+    uploaded_urls = {
+        f"fasta_path{i}": part_urls[f"part{i}.txt"] for i in range(1, len(parts) + 1)
+    }
     
     # 根据上传结果构建最终返回结构
     if len(uploaded_urls) == 1:
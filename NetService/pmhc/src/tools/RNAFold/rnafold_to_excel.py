@@ -1,8 +1,10 @@
 import os
 import pandas as pd
 from src.utils.log import logger
+from src.utils.metrics import stage_timer
 
-def save_excel(output: str, output_dir: str, output_filename: str) -> None:
+@stage_timer("excel")
+def save_excel(output: str, output_dir: str, output_filename: str) -> pd.DataFrame:
     """
     将特定格式的序列数据保存为Excel文件
     
@@ -12,7 +14,7 @@ def save_excel(output: str, output_dir: str, output_filename: str) -> None:
         output_filename: 保存的文件名（不需要.xlsx后缀）
     
     返回:
-        None
+        写入 Excel 的 DataFrame，供生成摘要使用
     """
     # 构建完整文件路径
     file_path = os.path.join(output_dir, output_filename)
@@ -74,6 +76,7 @@ def save_excel(output: str, output_dir: str, output_filename: str) -> None:
         
         # 保存到Excel
         df.to_excel(file_path, index=False)
+        return df
     
     except pd.errors.EmptyDataError:
         error_msg = "无有效数据可保存，DataFrame为空"
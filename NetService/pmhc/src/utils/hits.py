@@ -0,0 +1,89 @@
+"""
+结构化的 top hits
+
+工具在处理结果时（DataFrame 已在内存中）按该工具的主要评分取前 K 行，放在结果 JSON 的 hits 字段中，
+下游无需再下载表格或从 markdown content 中解析：
+    "hits": {
+        "score": "Score_EL", "order": "desc",
+        "total": 1234,               # 有有效评分的结果行数
+        "counts": {"SB": 3, "WB": 10},   # 可选，按类别的计数
+        "items": [{"Peptide": "...", "Score_EL": 0.98, ...}, ...]
+    }
+hits 随工具结果一起进入结果缓存。配置 include_in_response 为 false 或请求头 X-Include-Hits 为 0/false 时，
+HitsMiddleware 从响应中去掉该字段（只在这种情况下缓冲并改写响应体）。
+
+用法:
+    hits = top_hits(df, "y_prob", ascending=False, columns=["HLA", "peptide", "y_pred", "y_prob"])
+    result = with_hits({"type": "link", "url": url, "content": content}, hits)
+"""
+import json
+from typing import Dict, Optional, Sequence
+
+import pandas as pd
+
+from starlette.requests import Request
+
+from src.utils.summarize import top_k
+from src.utils.tracing import header_enabled, remove_body_field, rewriting_send
+from config import CONFIG_YAML
+
+HITS_CONFIG = CONFIG_YAML.get("HITS", {})
+HITS_ENABLED = HITS_CONFIG.get("enabled", True)
+INCLUDE_IN_RESPONSE = HITS_CONFIG.get("include_in_response", True)
+REQUEST_HEADER = HITS_CONFIG.get("request_header", "X-Include-Hits")
+TOP_K = HITS_CONFIG.get("top_k", 10)
+
+
+def top_hits(
+    df: pd.DataFrame,
+    score: str,
+    ascending: bool,
+    columns: Optional[Sequence[str]] = None,
+    counts: Optional[Dict[str, int]] = None,
+    k: Optional[int] = None,
+    total: Optional[int] = None,
+) -> Optional[dict]:
+    """
+    按 score 列取前 k 行（默认 HITS.top_k）作为 hits；score 无法转换为数值的行（如统计行）不计入。
+    columns 为 items 中保留的列（df 中不存在的列忽略），默认全部列。未启用或缺少 score 列时返回 None。
+    df 只是结果的前几行时（如排序合并的结果），total 传入结果的总行数
+    """
+    if not HITS_ENABLED or df is None or score not in df.columns:
+        return None
+    scores = pd.to_numeric(df[score], errors="coerce")
+    valid = scores.notna()
+    if columns is not None:
+        df = df[[column for column in columns if column in df.columns]]
+    df = df[valid].assign(**{score: scores[valid]})
+    shown = top_k(df, score, TOP_K if k is None else k, ascending=ascending)
+    hits = {
+        "score": score,
+        "order": "asc" if ascending else "desc",
+        "total": int(len(df) if total is None else total),
+    }
+    if counts is not None:
+        hits["counts"] = {str(key): int(value) for key, value in counts.items()}
+    # to_json 把 numpy 类型转为 JSON 数字，NaN 转为 null
+    hits["items"] = json.loads(shown.to_json(orient="records", force_ascii=False))
+    return hits
+
+
+def with_hits(result: dict, hits: Optional[dict]) -> dict:
+    """hits 不为空时加入工具结果"""
+    if hits is not None:
+        result["hits"] = hits
+    return result
+
+
+class HitsMiddleware:
+    """未要求返回 hits 时从响应 JSON 中去掉 hits 字段"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or header_enabled(Request(scope), REQUEST_HEADER, INCLUDE_IN_RESPONSE):
+            await self.app(scope, receive, send)
+            return
+        strip_hits = lambda body: remove_body_field(body, "hits")
+        await self.app(scope, receive, rewriting_send(send, lambda message: strip_hits))
@@ -0,0 +1,219 @@
+"""
+进程内指标（Prometheus 文本格式）
+
+不依赖 prometheus_client，计数器/直方图都是带锁的进程内字典，开销只有一次加锁和几次加法。
+/metrics 接口按 Prometheus 文本格式（0.0.4）输出：
+1. http_request_duration_seconds：接口端到端耗时（按工具、状态码）；
+2. tool_stage_duration_seconds：各阶段耗时（download / split / subprocess / parse / excel / upload）；
+3. tool_queue_wait_seconds：调度排队和内存准入排队的等待时间；
+4. tool_processes_running：正在运行的工具子进程数；
+5. minio_request_duration_seconds / minio_transfer_bytes_total：MinIO 请求耗时和传输字节数；
+6. cache_lookups_total：结果缓存、single-flight 合并、输入统计缓存的命中情况；
+7. tool_errors_total / tool_process_exits_total：错误计数和子进程退出原因。
+工具标签取自请求路径（如 /netmhcpan -> netmhcpan），由 MetricsMiddleware 写入上下文，
+请求内的 stage_timer 和 MinIO 操作自动带上该标签。
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Sequence, Tuple
+
+from starlette.responses import PlainTextResponse
+
+from src.utils.tracing import span
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+_current_tool = contextvars.ContextVar("metrics_tool", default="none")
+
+_registry = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, object] = {}
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [各桶计数（最后一个为 +Inf）, 总和]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        with self._lock:
+            items = sorted((key, (list(state[0]), state[1])) for key, state in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{float(bound)!r}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}"
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "接口端到端耗时", ("tool", "status")
+)
+STAGE_DURATION = Histogram(
+    "tool_stage_duration_seconds", "工具各阶段耗时", ("tool", "stage")
+)
+QUEUE_WAIT = Histogram(
+    "tool_queue_wait_seconds", "调度/准入排队等待时间", ("tool", "queue")
+)
+PROCESSES_RUNNING = Gauge(
+    "tool_processes_running", "正在运行的工具子进程数", ("tool",)
+)
+PROCESS_EXITS = Counter(
+    "tool_process_exits_total", "工具子进程退出次数（按退出原因）", ("tool", "exit_reason")
+)
+TOOL_ERRORS = Counter(
+    "tool_errors_total", "工具错误次数", ("tool", "error")
+)
+MINIO_DURATION = Histogram(
+    "minio_request_duration_seconds", "MinIO 请求耗时", ("operation",)
+)
+MINIO_BYTES = Counter(
+    "minio_transfer_bytes_total", "MinIO 传输字节数", ("operation",)
+)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total", "缓存查询次数（按命中结果）", ("cache", "result")
+)
+
+
+def current_tool() -> str:
+    """当前请求对应的工具名（由 MetricsMiddleware 写入）"""
+    return _current_tool.get()
+
+
+@contextmanager
+def stage_timer(stage: str, tool: str = None):
+    """
+    记录一个阶段的耗时（同时记录为请求追踪中的一个阶段），也可作为同步函数的装饰器
+
+    用法:
+        with stage_timer("excel"):
+            save_excel(...)
+    """
+    started = time.monotonic()
+    try:
+        with span(stage):
+            yield
+    finally:
+        STAGE_DURATION.observe(time.monotonic() - started, tool=tool or current_tool(), stage=stage)
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+async def metrics_endpoint():
+    """Prometheus 抓取接口"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+class MetricsMiddleware:
+    """记录接口端到端耗时（到响应体发送完毕），并把工具名写入上下文供请求内的阶段计时使用"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path")
+        if scope["type"] != "http" or path == "/metrics":
+            await self.app(scope, receive, send)
+            return
+        routes = {getattr(route, "path", None) for route in scope["app"].routes}
+        tool = (path.strip("/").lower() or "root") if path in routes else "other"
+        token = _current_tool.set(tool)
+        started = time.monotonic()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current_tool.reset(token)
+            REQUEST_DURATION.observe(time.monotonic() - started, tool=tool, status=status)
+            if status >= 400:
+                TOOL_ERRORS.inc(tool=tool, error=f"http_{status}")
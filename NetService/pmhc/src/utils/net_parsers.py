@@ -0,0 +1,404 @@
+"""
+Net* 工具标准输出解析
+
+NetChop / NetCTLpan / NetMHCpan / NetMHCstabpan 的结果都是按空白分隔的定宽表格，这里按行处理：
+1. 以数字开头的行视为数据行，先用 str.split 按列切分、按列下标直接转换类型（快速路径）；
+2. 列数或类型不符合时，再用该工具的单行正则匹配（兜底，处理列粘连等异常行），仍不匹配则跳过；
+3. 其余行只检查是否为统计行（如 "Number of cleavage sites ..."）。
+数值列转换为 int / float，解析结果直接用于写 Excel。
+
+StreamParser 在读取子进程输出时按块增量解析，可只保留结合肽/表位行（以及每个等位基因评分最高的前 K 行），
+内存占用与结合肽数量而不是肽段总数成正比。
+
+用法:
+    parsed = parse_netmhcpan(stdout_text)
+    df = pd.DataFrame(parsed.rows, columns=parsed.columns)
+
+    parser = StreamParser(NETMHCPAN, binders_only=True, top_k=100)
+    proc = await run_supervised("netmhcpan", cmd, stdout_sink=parser.feed)
+    parsed = parser.close()
+"""
+import gc
+import heapq
+import re
+from typing import Callable, Dict, List, NamedTuple, Optional, Pattern, Sequence
+
+_DIGITS = "0123456789"
+
+
+class ParsedOutput(NamedTuple):
+    columns: List[str]
+    # 数据行与统计行按输出顺序排列；统计行第一列为统计文本，其余列为空字符串
+    rows: List[list]
+    # 统计行在 rows 中的下标
+    summary_rows: List[int]
+
+
+class _ToolFormat(NamedTuple):
+    columns: List[str]
+    types: Sequence[Callable]
+    fast: Callable[[List[str]], Optional[list]]
+    fallback: Pattern
+    summary: Callable[[str], Optional[str]]
+    # 只保留第一条统计行并放到最后（NetMHCstabpan）
+    single_summary: bool = False
+    # 流式过滤：数据行是否为结合肽/表位，及按等位基因取前 K 行时使用的列下标（评分越高越好）
+    binder: Optional[Callable[[list], bool]] = None
+    allele_index: int = 0
+    score_index: int = 0
+
+
+def _convert(values: Sequence[str], types: Sequence[Callable]) -> Optional[list]:
+    """兜底路径：按列类型转换正则匹配出的字段"""
+    try:
+        return [convert(value) for convert, value in zip(types, values)]
+    except ValueError:
+        return None
+
+
+def _summary_after(marker: str, require: str = "") -> Callable[[str], Optional[str]]:
+    """统计行：从 marker（不区分大小写）开始到行尾，require 不为空时要求其出现在 marker 之后"""
+    marker = marker.lower()
+    require = require.lower()
+
+    def match(line: str) -> Optional[str]:
+        lower = line.lower()
+        start = lower.find(marker)
+        if start < 0 or len(line) <= start + len(marker):
+            return None
+        if require and lower.find(require, start + len(marker)) < 0:
+            return None
+        return line[start:].rstrip()
+    return match
+
+
+def _summary_regex(pattern: str) -> Callable[[str], Optional[str]]:
+    regex = re.compile(pattern)
+
+    def match(line: str) -> Optional[str]:
+        found = regex.search(line)
+        return found.group() if found else None
+    return match
+
+
+# ---------------- NetChop ----------------
+_NETCHOP_TYPES = (int, str, str, float, str)
+
+
+def _netchop_fast(parts: List[str]) -> Optional[list]:
+    if len(parts) != 5 or len(parts[1]) != 1 or parts[2] not in (".", "S"):
+        return None
+    try:
+        return [int(parts[0]), parts[1], parts[2], float(parts[3]), parts[4]]
+    except ValueError:
+        return None
+
+
+NETCHOP = _ToolFormat(
+    columns=["Pos", "AA", "C", "score", "Ident"],
+    types=_NETCHOP_TYPES,
+    fast=_netchop_fast,
+    fallback=re.compile(r"^(\d+)\s+([A-Z])\s+([.S])\s+([\d.]+)\s+(.+?)\s*$"),
+    summary=_summary_after("Number of cleavage sites"),
+)
+
+
+# ---------------- NetCTLpan ----------------
+_NETCTLPAN_TYPES = (int, str, str, str, float, float, float, float, float, str)
+
+
+def _netctlpan_fast(parts: List[str]) -> Optional[list]:
+    count = len(parts)
+    if count == 9:
+        epitope = ""
+    elif count == 10:
+        epitope = parts[9]
+    else:
+        return None
+    try:
+        return [
+            int(parts[0]), parts[1], parts[2], parts[3], float(parts[4]), float(parts[5]),
+            float(parts[6]), float(parts[7]), float(parts[8]), epitope
+        ]
+    except ValueError:
+        return None
+
+
+NETCTLPAN = _ToolFormat(
+    columns=["N", "Sequence Name", "Allele", "Peptide", "MHC", "TAP", "Cle", "Comb", "%Rank", "Epitope"],
+    types=_NETCTLPAN_TYPES,
+    fast=_netctlpan_fast,
+    fallback=re.compile(
+        r"^(\d+)\s+(\S+)\s+(\S+)\s+(\S+)\s+([-\d.]+)\s+([-\d.]+)\s+([-\d.]+)\s+([-\d.]+)\s+([-\d.]+)\s*(\S*)\s*$"
+    ),
+    summary=_summary_after("Number of MHC ligands", require="protein"),
+    # Comb 超过 -ethr 阈值的行带 <-E 标记
+    binder=lambda row: row[9] == "<-E",
+    allele_index=2,
+    score_index=7,
+)
+
+
+# ---------------- NetMHCpan ----------------
+_NETMHCPAN_TYPES = (
+    int, str, str, str, int, int, int, int, int, str, str, float, float, float, float, float, str
+)
+
+
+def _netmhcpan_fast(parts: List[str]) -> Optional[list]:
+    count = len(parts)
+    if count == 16:
+        bind_level = ""
+    elif count == 18 and parts[16] == "<=":
+        bind_level = "<= " + parts[17]
+    else:
+        return None
+    try:
+        return [
+            int(parts[0]), parts[1], parts[2], parts[3], int(parts[4]), int(parts[5]), int(parts[6]),
+            int(parts[7]), int(parts[8]), parts[9], parts[10], float(parts[11]), float(parts[12]),
+            float(parts[13]), float(parts[14]), float(parts[15]), bind_level
+        ]
+    except ValueError:
+        return None
+
+
+NETMHCPAN = _ToolFormat(
+    columns=["Pos", "MHC", "Peptide", "Core", "Of", "Gp", "Gl", "Ip", "Il", "Icore",
+             "Identity", "Score_EL", "%Rank_EL", "Score_BA", "%Rank_BA", "Aff(nM)", "BindLevel"],
+    types=_NETMHCPAN_TYPES,
+    fast=_netmhcpan_fast,
+    fallback=re.compile(
+        r"^(\d+)\s+(\S+)\s+([A-Z*-]+)\s+([A-Z*-]+)\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+)\s+([A-Z*-]+)\s+(\S+)"
+        r"\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)\s*(<=\s*[WS]B)?\s*$"
+    ),
+    summary=_summary_regex(
+        r"Protein .+?\. Allele .+?\. Number of high binders \d+\. Number of weak binders \d+\. Number of peptides \d+"
+    ),
+    # %Rank_EL 低于 -rth / -rlt 阈值的行带 <= SB / <= WB 标记
+    binder=lambda row: row[16] in ("<= SB", "<= WB"),
+    allele_index=1,
+    score_index=11,
+)
+
+
+# ---------------- NetMHCstabpan ----------------
+_NETMHCSTABPAN_TYPES = (int, str, str, str, float, float, float, str)
+
+
+def _netmhcstabpan_fast(parts: List[str]) -> Optional[list]:
+    count = len(parts)
+    if count == 7:
+        bind_level = ""
+    elif count == 9 and parts[7] == "<=":
+        bind_level = "<= " + parts[8]
+    else:
+        return None
+    try:
+        return [
+            int(parts[0]), parts[1], parts[2], parts[3], float(parts[4]), float(parts[5]),
+            float(parts[6]), bind_level
+        ]
+    except ValueError:
+        return None
+
+
+NETMHCSTABPAN = _ToolFormat(
+    columns=["Pos", "HLA", "peptide", "Identity", "Pred", "Thalf(h)", "%Rank_Stab", "BindLevel"],
+    types=_NETMHCSTABPAN_TYPES,
+    fast=_netmhcstabpan_fast,
+    fallback=re.compile(
+        r"^(\d+)\s+(\S+)\s+([A-Z]+)\s+(\S+)\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)\s*(<=\s*[WS]B)?\s*$"
+    ),
+    summary=_summary_regex(r".*Allele\s+\S+.*"),
+    single_summary=True,
+)
+
+
+def _fallback_row(tool: _ToolFormat, line: str) -> Optional[list]:
+    found = tool.fallback.match(line)
+    if not found:
+        return None
+    values = [value or "" for value in found.groups()]
+    if values[-1].startswith("<="):
+        values[-1] = "<= " + values[-1][2:].strip()
+    return _convert(values, tool.types)
+
+
+def parse_output(tool: _ToolFormat, output: str) -> ParsedOutput:
+    """按工具格式解析标准输出"""
+    rows = []
+    summary_rows = []
+    first_summary = None
+    padding = [""] * (len(tool.columns) - 1)
+    fast = tool.fast
+    append = rows.append
+    # 解析只创建不含循环引用的列表，暂停分代垃圾回收，避免百万行时反复触发回收扫描
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for line in output.splitlines():
+            parts = line.split()
+            if not parts:
+                continue
+            if parts[0][0] in _DIGITS:
+                row = fast(parts)
+                if row is None:
+                    row = _fallback_row(tool, line.strip())
+                if row is not None:
+                    append(row)
+                continue
+            summary = tool.summary(line.strip())
+            if summary is None:
+                continue
+            if tool.single_summary:
+                if first_summary is None:
+                    first_summary = summary
+                continue
+            summary_rows.append(len(rows))
+            append([summary] + padding)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    if first_summary is not None:
+        summary_rows.append(len(rows))
+        rows.append([first_summary] + padding)
+    return ParsedOutput(list(tool.columns), rows, summary_rows)
+
+
+def rank_rows(parsed: ParsedOutput, column: str, ascending: bool, limit: Optional[int] = None) -> ParsedOutput:
+    """
+    数据行按 column 列排序（并列时保持原顺序），统计行放在最后，用于分片结果的 k 路归并；
+    limit 不为空时只保留前 limit 个数据行
+    """
+    index = parsed.columns.index(column)
+    summary_rows = set(parsed.summary_rows)
+    data = [row for position, row in enumerate(parsed.rows) if position not in summary_rows]
+    summaries = [parsed.rows[position] for position in parsed.summary_rows]
+
+    def key(row):
+        return row[index]
+    if limit:
+        data = heapq.nsmallest(limit, data, key=key) if ascending else heapq.nlargest(limit, data, key=key)
+    else:
+        data.sort(key=key, reverse=not ascending)
+    return ParsedOutput(
+        list(parsed.columns), data + summaries, list(range(len(data), len(data) + len(summaries)))
+    )
+
+
+def parse_netchop(output: str) -> ParsedOutput:
+    return parse_output(NETCHOP, output)
+
+
+def parse_netctlpan(output: str) -> ParsedOutput:
+    return parse_output(NETCTLPAN, output)
+
+
+def parse_netmhcpan(output: str) -> ParsedOutput:
+    return parse_output(NETMHCPAN, output)
+
+
+def parse_netmhcstabpan(output: str) -> ParsedOutput:
+    return parse_output(NETMHCSTABPAN, output)
+
+
+class StreamParser:
+    """
+    增量解析工具标准输出，不保存完整输出。
+
+    binders_only 为 True 时只保留工具标记为结合肽/表位的数据行（见 _ToolFormat.binder）；
+    top_k 不为空时每个等位基因只保留评分最高的 top_k 行（小顶堆，评分相同时保留先出现的行）。
+    统计行全部保留，close() 返回与 parse_output 相同结构的 ParsedOutput，数据行与统计行保持原输出顺序。
+    """
+
+    def __init__(self, tool: _ToolFormat, binders_only: bool = False, top_k: Optional[int] = None):
+        if binders_only and tool.binder is None:
+            raise ValueError("该工具不支持只保留结合肽")
+        self.tool = tool
+        self.binders_only = binders_only
+        self.top_k = top_k if top_k and top_k > 0 else None
+        # 解析出的数据行数 / 通过过滤的数据行数（按等位基因取前 K 行之前）
+        self.total_rows = 0
+        self.matched_rows = 0
+        self._pending = b""
+        self._seq = 0
+        # (序号, 行)；按等位基因取前 K 行时数据行放在 _heaps 中
+        self._rows: List[tuple] = []
+        self._heaps: Dict[str, List[tuple]] = {}
+        self._summaries: List[tuple] = []
+        self._first_summary = None
+        self._padding = [""] * (len(tool.columns) - 1)
+
+    def feed(self, data: bytes) -> None:
+        """接收一块 stdout 数据，只处理其中完整的行，最后不完整的行留到下一块"""
+        data = self._pending + data
+        end = data.rfind(b"\n")
+        if end < 0:
+            self._pending = data
+            return
+        self._pending = data[end + 1:]
+        self._feed_text(data[:end].decode("utf-8", errors="replace"))
+
+    def _feed_text(self, text: str) -> None:
+        tool = self.tool
+        fast = tool.fast
+        for line in text.splitlines():
+            parts = line.split()
+            if not parts:
+                continue
+            if parts[0][0] in _DIGITS:
+                row = fast(parts)
+                if row is None:
+                    row = _fallback_row(tool, line.strip())
+                if row is not None:
+                    self._add_row(row)
+                continue
+            summary = tool.summary(line.strip())
+            if summary is None:
+                continue
+            if tool.single_summary:
+                if self._first_summary is None:
+                    self._first_summary = summary
+                continue
+            self._summaries.append((self._seq, [summary] + self._padding))
+            self._seq += 1
+
+    def _add_row(self, row: list) -> None:
+        self.total_rows += 1
+        if self.binders_only and not self.tool.binder(row):
+            return
+        self.matched_rows += 1
+        seq = self._seq
+        self._seq += 1
+        if self.top_k is None:
+            self._rows.append((seq, row))
+            return
+        heap = self._heaps.setdefault(row[self.tool.allele_index], [])
+        # 堆顶为评分最低（同分时最晚出现）的行，堆满后新行评分更高才替换
+        item = (row[self.tool.score_index], -seq, row)
+        if len(heap) < self.top_k:
+            heapq.heappush(heap, item)
+        elif item[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, item)
+
+    def close(self) -> ParsedOutput:
+        """处理剩余数据并按原输出顺序返回保留的数据行和统计行"""
+        if self._pending:
+            self._feed_text(self._pending.decode("utf-8", errors="replace"))
+            self._pending = b""
+        if self.top_k is None:
+            data_rows = self._rows
+        else:
+            data_rows = sorted((-negative_seq, row) for heap in self._heaps.values() for _, negative_seq, row in heap)
+        rows = []
+        summary_rows = []
+        summary_seqs = {seq for seq, _ in self._summaries}
+        for seq, row in heapq.merge(data_rows, self._summaries, key=lambda item: item[0]):
+            if seq in summary_seqs:
+                summary_rows.append(len(rows))
+            rows.append(row)
+        if self._first_summary is not None:
+            summary_rows.append(len(rows))
+            rows.append([self._first_summary] + self._padding)
+        return ParsedOutput(list(self.tool.columns), rows, summary_rows)
@@ -1,13 +1,43 @@
 import os
 import math
 import asyncio
+import heapq
+import json
+import re
+import shutil
+import time
 from pathlib import Path
 import pandas as pd
-from openpyxl import load_workbook
-from typing import List, Callable, Any
+from contextlib import contextmanager
+from typing import List, Callable, Any, Dict, NamedTuple, Optional, Tuple
+
+from config import CONFIG_YAML
+from src.utils.log import logger
+from src.utils.supervisor import pinned_cpus
+from src.utils.metrics import stage_timer
+from src.utils.result_writer import ResultReader, ResultWriter
+
+SHARD_CONFIG = CONFIG_YAML.get("SHARD", {})
+SHARD_JOBS_DIR = SHARD_CONFIG.get("jobs_dir", "/opt/tmp/jobs")
+SHARD_MAX_RETRIES = SHARD_CONFIG.get("max_retries", 2)
+SHARD_RETRY_BACKOFF_SECONDS = SHARD_CONFIG.get("retry_backoff_seconds", 5)
+SHARD_JOB_RETENTION_HOURS = SHARD_CONFIG.get("job_retention_hours", 24)
+SHARD_SPECULATIVE = SHARD_CONFIG.get("speculative", True)
+SHARD_SPECULATION_SLOWDOWN = SHARD_CONFIG.get("speculation_slowdown", 1.5)
+SHARD_SPECULATION_MIN_SECONDS = SHARD_CONFIG.get("speculation_min_seconds", 30)
+SHARD_SPECULATION_CHECK_INTERVAL = SHARD_CONFIG.get("speculation_check_interval", 5)
+
+# job_id 即工作目录名（uuid4().hex），与请求模型中的校验一致
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+AFFINITY_CONFIG = CONFIG_YAML.get("AFFINITY", {})
+AFFINITY_ENABLED = AFFINITY_CONFIG.get("enabled", True)
+AFFINITY_RESERVED_CORES = AFFINITY_CONFIG.get("reserved_cores", 1)
+AFFINITY_CORES_PER_WORKER = AFFINITY_CONFIG.get("cores_per_worker", 1)
 
 # 1. 拆分FASTA文件
 
+@stage_timer("split")
 def split_fasta(input_fasta: str, num_workers: int, output_dir: str) -> List[str]:
     """
     将一个FASTA文件均匀拆分为num_workers个子文件，返回子文件路径列表。
@@ -38,7 +68,7 @@ def split_fasta(input_fasta: str, num_workers: int, output_dir: str) -> List[str
     # 调整worker数量，避免过度拆分
     actual_workers = min(num_workers, len(records))
     if actual_workers < num_workers:
-        print(f"警告：肽段数量({len(records)})少于worker数量({num_workers})，调整为{actual_workers}个worker")
+        logger.warning(f"肽段数量({len(records)})少于worker数量({num_workers})，调整为{actual_workers}个worker")
     
     # 均匀分配到actual_workers个文件
     chunk_size = math.ceil(len(records) / actual_workers)
@@ -54,41 +84,559 @@ def split_fasta(input_fasta: str, num_workers: int, output_dir: str) -> List[str
         sub_files.append(str(sub_path))
     return sub_files
 
-# 2. 并发调度外部命令
+# 2. 分片任务清单（断点续跑）
+def resolve_job_dir(tool: str, job_id: str) -> Path:
+    """
+    任务工作目录 SHARD_JOBS_DIR/tool/job_id；job_id 来自请求，格式不对或解析后不在该工具目录下时拒绝，
+    避免写入或删除（cleanup）任意目录
+    """
+    if not isinstance(job_id, str) or not JOB_ID_PATTERN.fullmatch(job_id):
+        raise ValueError(f"无效的 job_id: {job_id!r}")
+    tool_dir = (Path(SHARD_JOBS_DIR) / tool).resolve()
+    path = (tool_dir / job_id).resolve()
+    if path.parent != tool_dir:
+        raise ValueError(f"无效的 job_id: {job_id!r}")
+    return path
+
+
+class ShardManifest:
+    """
+    分片任务清单，持久化在任务工作目录的 manifest.json 中。
+    记录任务参数、切分好的分片文件以及每个已完成分片的输出路径，
+    任务失败后使用同一个 job_id 重新提交时，已完成的分片直接复用，只重跑未完成的分片。
+    """
+
+    def __init__(self, tool: str, job_id: str, params: Dict[str, Any]):
+        self.job_id = job_id
+        self.job_dir = resolve_job_dir(tool, job_id)
+        self.job_dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.job_dir / "manifest.json"
+        params = json.loads(json.dumps(params, sort_keys=True, default=str))
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+            if self.data.get("params") != params:
+                raise ValueError(f"job_id {job_id} 已存在且参数不一致，无法续跑")
+            logger.info(f"续跑任务 {tool}/{job_id}，已完成分片数: {len(self.completed_keys())}")
+        else:
+            self.data = {"params": params, "inputs": {}, "splits": {}, "shards": {}}
+            self.save()
+
+    def save(self) -> None:
+        # 先写临时文件再原子替换，避免进程中断时留下半个清单
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get_input(self, name: str) -> Optional[str]:
+        path = self.data["inputs"].get(name)
+        return path if path and Path(path).exists() else None
+
+    def set_input(self, name: str, path: str) -> None:
+        self.data["inputs"][name] = str(path)
+        self.save()
+
+    def get_splits(self, group: str) -> Optional[List[str]]:
+        """返回之前记录的分片文件列表，文件缺失时返回 None（需要重新切分）"""
+        files = self.data["splits"].get(group)
+        if files is not None and all(Path(f).exists() for f in files):
+            return files
+        return None
+
+    def set_splits(self, group: str, files: List[str]) -> None:
+        self.data["splits"][group] = [str(f) for f in files]
+        self.save()
+
+    def completed_keys(self) -> List[str]:
+        return [k for k, v in self.data["shards"].items() if v.get("status") == "done"]
+
+    def get_output(self, key: str) -> Optional[str]:
+        shard = self.data["shards"].get(key)
+        if shard and shard.get("status") == "done" and Path(shard["output"]).exists():
+            return shard["output"]
+        return None
+
+    def mark_done(self, key: str, output: str, attempts: int) -> None:
+        self.data["shards"][key] = {"status": "done", "output": str(output), "attempts": attempts}
+        self.save()
+
+    def mark_failed(self, key: str, error: str, attempts: int) -> None:
+        self.data["shards"][key] = {"status": "failed", "error": error, "attempts": attempts}
+        self.save()
+
+    def cleanup(self) -> None:
+        """任务成功后删除整个工作目录"""
+        shutil.rmtree(self.job_dir, ignore_errors=True)
+
+
+def cleanup_stale_jobs(tool: str, retention_hours: float = SHARD_JOB_RETENTION_HOURS) -> None:
+    """删除超过保留时间仍未续跑的失败任务工作目录"""
+    tool_dir = Path(SHARD_JOBS_DIR) / tool
+    if not tool_dir.exists():
+        return
+    expire_before = time.time() - retention_hours * 3600
+    for job_dir in tool_dir.iterdir():
+        try:
+            if job_dir.is_dir() and job_dir.stat().st_mtime < expire_before:
+                shutil.rmtree(job_dir, ignore_errors=True)
+        except OSError:
+            continue
+
+
+# 3. 并发调度外部命令
+class WorkerPool:
+    """
+    并发槽，可由多次 run_commands_async 调用共享（如多个肽长的分片共用同一组并行度），
+    某一组分片先跑完后空出的槽自动被其它组使用
+    """
+
+    def __init__(self, size: int):
+        self.size = max(size, 1)
+        self.in_use = 0
+        self._semaphore = asyncio.Semaphore(self.size)
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        self.in_use += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.in_use -= 1
+        self._semaphore.release()
+
+
+class CpuAffinityPool:
+    """
+    分片进程的 CPU 分配：前 reserved_cores 个核留给事件循环和模型子进程，
+    其余核按 cores_per_worker 切成互不重叠的 CPU 集合，每个分片进程独占一组；
+    没有空闲的 CPU 集合时（如推测执行、多个请求同时运行）不绑定
+    """
+
+    def __init__(self, cpus: List[int], reserved_cores: int, cores_per_worker: int):
+        self.cores_per_worker = max(cores_per_worker, 1)
+        self._free = sorted(cpus)[reserved_cores:]
+
+    @contextmanager
+    def lease(self):
+        if len(self._free) < self.cores_per_worker:
+            yield None
+            return
+        # 取编号相邻的核，尽量共享缓存
+        cpus = self._free[:self.cores_per_worker]
+        del self._free[:self.cores_per_worker]
+        try:
+            yield set(cpus)
+        finally:
+            self._free = sorted(self._free + cpus)
+
+
+def _affinity_cpus() -> List[int]:
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return []
+
+
+_cpu_pool = CpuAffinityPool(_affinity_cpus(), AFFINITY_RESERVED_CORES, AFFINITY_CORES_PER_WORKER)
+
+
+async def _run_pinned(cmd_func: Callable[[str, Any], Any], fasta_file: str, *args, **kwargs) -> Any:
+    """为本次分片执行租用一组 CPU，执行期间启动的工具进程都绑定到这组 CPU"""
+    with _cpu_pool.lease() as cpus, pinned_cpus(cpus):
+        return await cmd_func(fasta_file, *args, **kwargs)
+
+
+async def workers_for_input(num_workers, input_path: str) -> int:
+    """
+    确定并行任务数：num_workers 为整数时原样返回；为 async 函数 f(input_path) 时（接口传入的
+    resolve_num_workers），在输入下载到本地之后按本地文件估算
+    """
+    if callable(num_workers):
+        return await num_workers(input_path)
+    return int(num_workers)
+
+
+def allocate_workers(total: int, weights: List[float]) -> List[int]:
+    """按权重（如各组输入大小）把 total 个分片数分配到各组，每组至少 1 个，余数按最大余数法分配"""
+    if not weights:
+        return []
+    total = max(total, len(weights))
+    weight_sum = sum(weights)
+    if weight_sum <= 0:
+        weights = [1] * len(weights)
+        weight_sum = len(weights)
+    spare = total - len(weights)
+    shares = [spare * w / weight_sum for w in weights]
+    allocation = [1 + int(share) for share in shares]
+    remainders = sorted(range(len(weights)), key=lambda i: shares[i] - int(shares[i]), reverse=True)
+    for i in remainders[:total - sum(allocation)]:
+        allocation[i] += 1
+    return allocation
+
+
+class _ShardState:
+    """单个分片的运行状态，用于估算吞吐和识别拖尾分片"""
+
+    def __init__(self, key: str, fasta_file: str):
+        self.key = key
+        self.fasta_file = fasta_file
+        self.size = max(os.path.getsize(fasta_file), 1)
+        self.started = None
+        self.finished = None
+        self.speculated = False
+        self.reused = False
+        self.factory = None
+        self.attempts = []
+        self.wakeup = asyncio.Event()
+
+    def speculate(self) -> None:
+        """启动一份重复执行，与原执行竞争，先完成者胜出"""
+        self.speculated = True
+        self.attempts.append(asyncio.ensure_future(self.factory()))
+        self.wakeup.set()
+
+
+async def _race_attempts(state: _ShardState) -> Any:
+    """等待分片的原执行及其重复执行中第一个成功完成的结果，并取消其余执行"""
+    state.attempts = [asyncio.ensure_future(state.factory())]
+    try:
+        while True:
+            state.wakeup.clear()
+            waiter = asyncio.ensure_future(state.wakeup.wait())
+            done, _ = await asyncio.wait(state.attempts + [waiter], return_when=asyncio.FIRST_COMPLETED)
+            waiter.cancel()
+            for task in done:
+                if task is waiter:
+                    continue
+                state.attempts.remove(task)
+                if task.exception() is None:
+                    return task.result()
+                if not state.attempts:
+                    raise task.exception()
+                logger.warning(f"分片 {state.key} 的一份执行失败，等待另一份执行: {task.exception()}")
+    finally:
+        # 取消落后的执行，由 run_supervised 终止对应的工具进程
+        for task in state.attempts:
+            task.cancel()
+        state.attempts = []
+
+
+async def _speculation_monitor(states: List[_ShardState], pool: WorkerPool) -> None:
+    """
+    队列中已无待启动分片且存在空闲并发槽时，按已完成分片的吞吐估算剩余分片的预期耗时，
+    为最落后的分片启动一份重复执行
+    """
+    while True:
+        await asyncio.sleep(SHARD_SPECULATION_CHECK_INTERVAL)
+        if any(state.started is None for state in states):
+            continue
+        running = [state for state in states if state.finished is None and state.attempts]
+        # 已占用的并发槽 + 本组已启动的重复执行
+        busy = pool.in_use + sum(len(state.attempts) - 1 for state in running)
+        if not running or busy >= pool.size:
+            continue
+        throughputs = sorted(
+            state.size / max(state.finished - state.started, 1e-6)
+            for state in states if state.finished is not None and not state.reused
+        )
+        if not throughputs:
+            continue
+        throughput = throughputs[len(throughputs) // 2]
+        now = time.monotonic()
+        stragglers = []
+        for state in running:
+            if state.speculated:
+                continue
+            elapsed = now - state.started
+            expected = state.size / throughput
+            if elapsed >= SHARD_SPECULATION_MIN_SECONDS and elapsed > SHARD_SPECULATION_SLOWDOWN * expected:
+                stragglers.append((elapsed - expected, state))
+        for _, state in sorted(stragglers, key=lambda item: item[0], reverse=True)[:pool.size - busy]:
+            logger.warning(
+                f"分片 {state.key} 已运行 {now - state.started:.1f}s，"
+                f"按吞吐估算应为 {state.size / throughput:.1f}s，启动重复执行"
+            )
+            state.speculate()
+
+
 async def run_commands_async(
     cmd_func: Callable[[str, Any], Any],
     fasta_files: List[str],
     *args,
     num_workers: int = 4,
+    manifest: Optional[ShardManifest] = None,
+    shard_group: str = "",
+    max_retries: Optional[int] = None,
+    speculative: Optional[bool] = None,
+    pool: Optional[WorkerPool] = None,
+    pin_cpus: Optional[bool] = None,
     **kwargs
 ) -> List[Any]:
     """
     并发调度cmd_func（如run_netctlpan），每个fasta文件一个任务。
+    失败的分片按指数退避自动重试 max_retries 次；传入 manifest 时已完成的分片直接复用，
+    新完成的分片写入清单，某个分片最终失败时其余分片仍会跑完并记录，便于按 job_id 续跑。
+    开启推测执行时，任务尾部有空闲并发槽时为明显落后的分片启动重复执行，先完成者胜出，
+    因此 cmd_func 的每次调用必须使用独立的临时文件。
     :param cmd_func: 需要并发执行的异步函数，参数第一个为fasta文件路径
     :param fasta_files: 拆分后的FASTA文件路径列表
-    :param num_workers: 最大并发数
+    :param num_workers: 最大并发数（传入 pool 时以 pool 为准）
+    :param manifest: (可选)分片任务清单
+    :param shard_group: 分片在清单中的分组名（如肽长），与分片文件名共同组成分片键
+    :param max_retries: 单个分片失败后的重试次数，默认读取配置 SHARD.max_retries
+    :param speculative: 是否对拖尾分片推测执行，默认读取配置 SHARD.speculative
+    :param pool: (可选)与其它调用共享的并发槽
+    :param pin_cpus: 是否为每个分片进程绑定独占的 CPU 集合，默认读取配置 AFFINITY.enabled
     :return: 每个任务的返回结果列表
     """
-    sem = asyncio.Semaphore(num_workers)  # 控制最大并发数
-    async def run_one(fasta_file):
-        async with sem:
-            return await cmd_func(fasta_file, *args, **kwargs)
-    tasks = [run_one(f) for f in fasta_files]
-    return await asyncio.gather(*tasks)
-
-# 3. 合并Excel
-
-def merge_excels(excel_files: List[str], output_excel: str):
-    """
-    合并多个Excel文件为一个，只保留第一个表的表头，其余所有内容原样追加。
-    :param excel_files: 需要合并的Excel文件路径列表
-    :param output_excel: 合并后输出的Excel文件路径
-    """
-    # 读取第一个表，保留表头
-    merged = pd.read_excel(excel_files[0], sheet_name=0, header=0)
-    for file in excel_files[1:]:
-        # 读取后续表，保留表头，保证列名和顺序一致
-        df = pd.read_excel(file, sheet_name=0, header=0)
-        df = df[merged.columns]  # 保证列顺序和列名一致
-        merged = pd.concat([merged, df], ignore_index=True)
-    merged.to_excel(output_excel, index=False, header=True) 
\ No newline at end of file
+    if max_retries is None:
+        max_retries = SHARD_MAX_RETRIES
+    if speculative is None:
+        speculative = SHARD_SPECULATIVE
+    if pool is None:
+        pool = WorkerPool(num_workers)  # 控制最大并发数
+    if pin_cpus is None:
+        pin_cpus = AFFINITY_ENABLED
+    states = [_ShardState(f"{shard_group}/{Path(f).name}", f) for f in fasta_files]
+
+    async def run_one(state):
+        key = state.key
+        if manifest is not None:
+            output = manifest.get_output(key)
+            if output is not None:
+                logger.info(f"分片 {key} 已完成，复用结果: {output}")
+                state.reused = True
+                state.started = state.finished = time.monotonic()
+                return output
+        if pin_cpus:
+            # 原执行和推测执行各自租用 CPU 集合
+            state.factory = lambda: _run_pinned(cmd_func, state.fasta_file, *args, **kwargs)
+        else:
+            state.factory = lambda: cmd_func(state.fasta_file, *args, **kwargs)
+        async with pool:
+            state.started = time.monotonic()
+            for attempt in range(1, max_retries + 2):
+                try:
+                    result = await _race_attempts(state)
+                except Exception as e:
+                    if attempt > max_retries:
+                        logger.error(f"分片 {key} 第 {attempt} 次执行失败，放弃重试: {e}")
+                        if manifest is not None:
+                            manifest.mark_failed(key, str(e), attempt)
+                        raise
+                    delay = SHARD_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1)
+                    logger.warning(f"分片 {key} 第 {attempt} 次执行失败，{delay}s 后重试: {e}")
+                    await asyncio.sleep(delay)
+                    # 重试的耗时不计入吞吐估算
+                    state.started = time.monotonic()
+                else:
+                    state.finished = time.monotonic()
+                    duration = state.finished - state.started
+                    logger.info(
+                        f"分片 {key} 完成，耗时 {duration:.1f}s，"
+                        f"吞吐 {state.size / max(duration, 1e-6) / 1024:.1f} KB/s"
+                    )
+                    if manifest is not None:
+                        manifest.mark_done(key, result, attempt)
+                    return result
+
+    tasks = [asyncio.ensure_future(run_one(state)) for state in states]
+    monitor = None
+    if speculative and pool.size > 1 and len(states) > 1:
+        monitor = asyncio.ensure_future(_speculation_monitor(states, pool))
+    try:
+        results = await asyncio.gather(*tasks, return_exceptions=manifest is not None)
+    except BaseException:
+        # 任一分片失败或请求被取消时，取消其余分片，由 run_supervised 终止对应的工具进程
+        for task in tasks:
+            task.cancel()
+        raise
+    finally:
+        if monitor is not None:
+            monitor.cancel()
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        raise errors[0]
+    return results
+
+# 4. 合并Excel
+
+class SortedMerge(NamedTuple):
+    # 按 key 列排在最前面的 head_rows 个数据行（用于计算 hits 等摘要）
+    head: pd.DataFrame
+    # 写出的数据行数（不含统计行）
+    rows: int
+    # count_column 列各取值的数据行数（merge_excels 指定 count_column 时）
+    counts: Optional[Dict[Any, int]] = None
+
+
+def _score(value) -> Optional[float]:
+    """数值评分，空单元格或无法转换为数值时返回 None"""
+    try:
+        score = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(score) else score
+
+
+class _TopRows:
+    """流式保留 score 最高（ascending 时最低）的前 k 个条目，并列时保留先出现（position 较小）的条目"""
+
+    def __init__(self, k: int, ascending: bool):
+        self.k = k
+        self._sign = -1 if ascending else 1
+        self._heap = []
+
+    def push(self, score: float, position: int, item=None) -> None:
+        entry = (self._sign * score, -position, item)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif self._heap and entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def positions(self) -> List[int]:
+        return [-position for _, position, _ in self._heap]
+
+    def items(self) -> List[Any]:
+        """按排序方向排列，并列时先出现的在前"""
+        return [item for _, _, item in sorted(self._heap, key=lambda entry: entry[:2], reverse=True)]
+
+
+def _aligned_rows(reader: ResultReader, columns: List[str]):
+    """按 columns 的列顺序逐行读出分片的数据行"""
+    if reader.columns == columns:
+        yield from reader.rows()
+        return
+    order = [reader.columns.index(column) for column in columns]
+    for row in reader.rows():
+        yield tuple(row[i] for i in order)
+
+
+@stage_timer("excel")
+def merge_excels(
+    excel_files: List[str],
+    output_excel: str,
+    key: Optional[str] = None,
+    ascending: bool = True,
+    group_limit: Optional[Tuple[str, int]] = None,
+    head_rows: int = 0,
+    count_column: Optional[str] = None,
+    output_format: Optional[str] = "xlsx",
+) -> SortedMerge:
+    """
+    合并多个分片结果（ResultWriter 写出的 xlsx）为一个，只保留第一个表的表头，各分片的数据行按原顺序逐行追加，统计行依次写入 Summary。
+    与 merge_sorted_excels 相同，openpyxl 只读/只写模式逐行读写，不把分片读入 DataFrame，内存占用与结果行数无关。
+    :param excel_files: 需要合并的Excel文件路径列表，各文件表头相同（列顺序可以不同）
+    :param output_excel: 合并后输出的文件路径
+    :param key: (可选)评分列，ascending 为排序方向，用于 group_limit 和 head_rows
+    :param group_limit: (可选)(列名, k)，该列每个取值只保留 key 排在前 k 的数据行（并列时保留先出现的行），
+                        该列或 key 为空的行全部保留；先读一遍各分片确定保留的行，内存占用只与该列取值数 × k 有关
+    :param head_rows: 返回结果中保留按 key 排在最前的几个数据行
+    :param count_column: (可选)返回结果中附带该列各取值的数据行数
+    :param output_format: 输出格式 xlsx / csv.gz / parquet，中间合并结果保持 xlsx
+    :return: SortedMerge
+    """
+    readers = [ResultReader(file) for file in excel_files]
+    try:
+        columns = readers[0].columns
+        key_index = columns.index(key) if key else None
+        group_index = columns.index(group_limit[0]) if group_limit else None
+        count_index = columns.index(count_column) if count_column in columns else None
+        summaries = [text for reader in readers for text in reader.summaries]
+
+        def ranked_rows():
+            """(行号, 评分, 行)，行号在所有分片中连续编号"""
+            position = 0
+            for reader in readers:
+                for row in _aligned_rows(reader, columns):
+                    yield position, _score(row[key_index]) if key_index is not None else None, row
+                    position += 1
+
+        kept = None
+        if group_limit:
+            # 第一遍：每个取值只记录排在前 k 的行号
+            groups: Dict[Any, _TopRows] = {}
+            for position, score, row in ranked_rows():
+                if score is not None and row[group_index] is not None:
+                    groups.setdefault(row[group_index], _TopRows(group_limit[1], ascending)).push(score, position)
+            kept = {position for top in groups.values() for position in top.positions()}
+
+        head = _TopRows(head_rows, ascending)
+        counts: Dict[Any, int] = {}
+        written = 0
+        with ResultWriter(output_excel, columns, output_format) as writer:
+            for position, score, row in ranked_rows():
+                if kept is not None and score is not None and row[group_index] is not None and position not in kept:
+                    continue
+                writer.append(row)
+                written += 1
+                if score is not None and head_rows:
+                    head.push(score, position, row)
+                if count_index is not None:
+                    counts[row[count_index]] = counts.get(row[count_index], 0) + 1
+            for text in summaries:
+                writer.add_summary(text)
+    finally:
+        for reader in readers:
+            reader.close()
+    logger.info(f"合并 {len(excel_files)} 个分片，写出 {written} 行，统计行 {len(summaries)} 行")
+    return SortedMerge(
+        pd.DataFrame(head.items(), columns=columns), written, counts if count_index is not None else None
+    )
+
+
+@stage_timer("excel")
+def merge_sorted_excels(
+    excel_files: List[str],
+    output_excel: str,
+    key: str,
+    ascending: bool = True,
+    limit: Optional[int] = None,
+    group_limit: Optional[Tuple[str, int]] = None,
+    head_rows: int = 0,
+    output_format: Optional[str] = "xlsx",
+) -> SortedMerge:
+    """
+    k 路归并已按 key 列排好序的分片结果（ResultWriter 写出的 xlsx），流式写出全局有序的结果，统计行依次写入 Summary。
+    openpyxl 只读/只写模式逐行读写，内存占用只与分片数和 head_rows 有关，与结果行数无关。
+    :param excel_files: 需要合并的Excel文件路径列表，各文件表头相同（列顺序可以不同）
+    :param output_excel: 合并后输出的文件路径
+    :param key: 排序列，ascending 为各分片的排序方向
+    :param limit: (可选)写满 limit 个数据行后停止归并（top-K 查询），统计行单独存放，无需读完剩余数据行
+    :param group_limit: (可选)(列名, k)，该列每个取值最多写出 k 个数据行，如每个等位基因只保留前 K 行
+    :param head_rows: 返回结果中保留的前几个数据行
+    :param output_format: 输出格式 xlsx / csv.gz / parquet，中间合并结果保持 xlsx
+    :return: SortedMerge
+    """
+    readers = [ResultReader(file) for file in excel_files]
+    try:
+        columns = readers[0].columns
+        key_index = columns.index(key)
+        group_index = columns.index(group_limit[0]) if group_limit else None
+        summaries = [text for reader in readers for text in reader.summaries]
+
+        sources = [_aligned_rows(reader, columns) for reader in readers]
+        head = []
+        written = 0
+        group_counts: Dict[Any, int] = {}
+        with ResultWriter(output_excel, columns, output_format) as writer:
+            for row in heapq.merge(*sources, key=lambda row: row[key_index], reverse=not ascending):
+                if group_limit:
+                    group = row[group_index]
+                    if group_counts.get(group, 0) >= group_limit[1]:
+                        continue
+                    group_counts[group] = group_counts.get(group, 0) + 1
+                writer.append(row)
+                if written < head_rows:
+                    head.append(row)
+                written += 1
+                if limit and written >= limit:
+                    break
+            for text in summaries:
+                writer.add_summary(text)
+    finally:
+        for reader in readers:
+            reader.close()
+    logger.info(f"排序合并 {len(excel_files)} 个分片，写出 {written} 行，统计行 {len(summaries)} 行")
+    return SortedMerge(pd.DataFrame(head, columns=columns), written)
@@ -0,0 +1,82 @@
+"""
+请求级资源统计
+
+run_supervised 启动的每个工具子进程都会通过 wait4 记录用户态/内核态 CPU 时间、峰值内存和块设备 I/O，
+这里在 HTTP 中间件中按请求汇总（响应开始发送时工具已经结束）：
+1. 每个启动过工具进程的请求输出一行结构化日志（resource_usage {...}，JSON），用于容量规划；
+2. 在响应头 X-Resource-Usage 中返回汇总结果；
+3. 配置 include_in_response 为 true 或请求头 X-Include-Resource-Usage 为 1/true 时，
+   同时写入响应 JSON 的 resource_usage 字段。
+"""
+import json
+import time
+from typing import List
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+
+from src.utils.log import logger
+from src.utils.supervisor import ProcessResult, collect_process_results
+from src.utils.tracing import add_body_field, rewriting_send
+from config import CONFIG_YAML
+
+RESOURCE_USAGE_CONFIG = CONFIG_YAML.get("RESOURCE_USAGE", {})
+INCLUDE_IN_RESPONSE = RESOURCE_USAGE_CONFIG.get("include_in_response", False)
+REQUEST_HEADER = RESOURCE_USAGE_CONFIG.get("request_header", "X-Include-Resource-Usage")
+LOG_PROCESSES = RESOURCE_USAGE_CONFIG.get("log_processes", True)
+
+RESPONSE_HEADER = "X-Resource-Usage"
+
+
+def summarize_usage(results: List[ProcessResult]) -> dict:
+    """汇总一次请求内所有工具进程的资源占用"""
+    return {
+        "processes": len(results),
+        "killed": sum(1 for r in results if r.killed),
+        "user_seconds": round(sum(r.user_seconds for r in results), 3),
+        "sys_seconds": round(sum(r.sys_seconds for r in results), 3),
+        "cpu_seconds": round(sum(r.cpu_seconds for r in results), 3),
+        "max_rss_kb": max((r.max_rss_kb for r in results), default=0),
+        "read_bytes": sum(r.read_bytes for r in results),
+        "write_bytes": sum(r.write_bytes for r in results),
+    }
+
+
+def _wants_usage(request) -> bool:
+    value = (request.headers.get(REQUEST_HEADER) or "").strip().lower()
+    if value:
+        return value in ("1", "true", "yes")
+    return INCLUDE_IN_RESPONSE
+
+
+class ResourceUsageMiddleware:
+    """汇总请求内工具进程的资源占用，写入结构化日志和响应"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        started = time.monotonic()
+
+        def on_start(message):
+            if not results:
+                return None
+            usage = summarize_usage(results)
+            usage["wall_seconds"] = round(time.monotonic() - started, 3)
+            record = {"method": request.method, "path": request.url.path, "status": message["status"]}
+            record.update(usage)
+            if LOG_PROCESSES:
+                record["process_usage"] = [r.usage() for r in results]
+            logger.info("resource_usage " + json.dumps(record, ensure_ascii=False))
+
+            MutableHeaders(scope=message)[RESPONSE_HEADER] = json.dumps(usage)
+            if _wants_usage(request):
+                return lambda body: add_body_field(body, "resource_usage", usage)
+            return None
+
+        with collect_process_results() as results:
+            await self.app(scope, receive, rewriting_send(send, on_start))
@@ -0,0 +1,244 @@
+"""
+结果文件的流式写出
+
+Net* 工具的结果表（分片结果、合并结果）统一由 ResultWriter 逐行写出，不再经过 DataFrame.to_excel 和逐行合并单元格：
+- xlsx：openpyxl 只写模式，内存占用与行数无关；数据行写入 Results 工作表，
+  超过 Excel 单表行数上限时自动续写到 Results_2、Results_3 ...；
+  统计行（如 "Protein ... Number of high binders ..."）单独写入 Summary 工作表
+- csv.gz：gzip 压缩的 CSV，统计行追加在数据行之后（只有第一列有值）
+- parquet：按批写出，统计行以 JSON 列表保存在文件元数据的 summary 键中（pyarrow.parquet.read_metadata(path).metadata）
+分片之间的中间结果始终为 xlsx，由 ResultReader 逐行读回；output_format 只作用于最终上传的结果文件。
+
+用法:
+    with ResultWriter(path, columns, output_format) as writer:
+        for row in rows:
+            writer.append(row)
+        writer.add_summary("Protein 1. Allele HLA-A*02:01. Number of high binders 1 ...")
+"""
+import csv
+import gzip
+import json
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence, Union
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+from config import CONFIG_YAML
+from src.utils.log import logger
+
+OUTPUT_CONFIG = CONFIG_YAML.get("OUTPUT", {})
+DEFAULT_FORMAT = OUTPUT_CONFIG.get("default_format", "xlsx")
+EXCEL_MAX_ROWS = OUTPUT_CONFIG.get("excel_max_rows", 1048576)
+CSV_COMPRESSLEVEL = OUTPUT_CONFIG.get("csv_compresslevel", 6)
+PARQUET_BATCH_ROWS = OUTPUT_CONFIG.get("parquet_batch_rows", 65536)
+
+OUTPUT_FORMATS = ("xlsx", "csv.gz", "parquet")
+RESULTS_SHEET = "Results"
+SUMMARY_SHEET = "Summary"
+
+
+def resolve_format(output_format: Optional[str] = None) -> str:
+    """请求中的 output_format，未指定时使用配置的默认格式"""
+    output_format = (output_format or DEFAULT_FORMAT).lower().lstrip(".")
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"不支持的结果格式: {output_format}（可选 {', '.join(OUTPUT_FORMATS)}）")
+    return output_format
+
+
+def result_filename(stem: str, output_format: Optional[str] = None) -> str:
+    """按结果格式加上扩展名，如 xxx_NetMHCPan_results.csv.gz"""
+    return f"{stem}.{resolve_format(output_format)}"
+
+
+def _clean(value):
+    # NaN 写为空单元格
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+class ResultWriter:
+    """
+    逐行写出结果表，append 写数据行，add_summary 写统计行，close 后文件才完整。
+    :param path: 输出文件路径（扩展名由调用方按 result_filename 生成）
+    :param columns: 表头
+    :param output_format: xlsx / csv.gz / parquet，默认 OUTPUT.default_format
+    """
+
+    def __init__(self, path: Union[str, Path], columns: Sequence[str], output_format: Optional[str] = None):
+        self.path = Path(path)
+        self.columns = list(columns)
+        self.format = resolve_format(output_format)
+        self.rows = 0
+        self.summaries: List[str] = []
+        if self.format == "xlsx":
+            self._workbook = Workbook(write_only=True)
+            self._sheets = 0
+            self._new_sheet()
+        elif self.format == "csv.gz":
+            self._file = gzip.open(self.path, "wt", encoding="utf-8", newline="", compresslevel=CSV_COMPRESSLEVEL)
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(self.columns)
+        else:
+            self._batch = []
+            self._parquet = None
+            self._schema = None
+
+    def __enter__(self) -> "ResultWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _new_sheet(self) -> None:
+        self._sheets += 1
+        title = RESULTS_SHEET if self._sheets == 1 else f"{RESULTS_SHEET}_{self._sheets}"
+        self._sheet = self._workbook.create_sheet(title)
+        self._sheet.append(self.columns)
+        self._sheet_rows = 1
+
+    def append(self, row: Sequence) -> None:
+        row = [_clean(value) for value in row]
+        if self.format == "xlsx":
+            if self._sheet_rows >= EXCEL_MAX_ROWS:
+                self._new_sheet()
+            self._sheet.append(row)
+            self._sheet_rows += 1
+        elif self.format == "csv.gz":
+            self._csv.writerow(row)
+        else:
+            self._batch.append(row)
+            if len(self._batch) >= PARQUET_BATCH_ROWS:
+                self._flush_parquet()
+        self.rows += 1
+
+    def add_summary(self, text) -> None:
+        if text is not None:
+            self.summaries.append(str(text))
+
+    def _flush_parquet(self) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        columns = list(zip(*self._batch)) if self._batch else [()] * len(self.columns)
+        if self._schema is None:
+            # 第一批数据推断各列类型，全为空的列按字符串处理
+            arrays = [pa.array(values) for values in columns]
+            arrays = [pa.array(values, pa.string()) if array.type == pa.null() else array
+                      for values, array in zip(columns, arrays)]
+            self._schema = pa.schema([(name, array.type) for name, array in zip(self.columns, arrays)])
+            self._parquet = pq.ParquetWriter(str(self.path), self._schema)
+        else:
+            arrays = [pa.array(values, field.type) for values, field in zip(columns, self._schema)]
+        if self._batch:
+            self._parquet.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+        self._batch = []
+
+    def close(self) -> Path:
+        if self.format == "xlsx":
+            if self.summaries:
+                sheet = self._workbook.create_sheet(SUMMARY_SHEET)
+                sheet.append([SUMMARY_SHEET])
+                for text in self.summaries:
+                    sheet.append([text])
+            self._workbook.save(self.path)
+            if self._sheets > 1:
+                logger.warning(f"结果 {self.path.name} 共 {self.rows} 行，超过 Excel 单表上限，已拆分为 {self._sheets} 个工作表")
+        elif self.format == "csv.gz":
+            padding = [""] * (len(self.columns) - 1)
+            for text in self.summaries:
+                self._csv.writerow([text] + padding)
+            self._file.close()
+        else:
+            if self._batch or self._parquet is None:
+                self._flush_parquet()
+            self._parquet.add_key_value_metadata({"summary": json.dumps(self.summaries, ensure_ascii=False)})
+            self._parquet.close()
+        return self.path
+
+
+def write_parsed(parsed, path: Union[str, Path], output_format: Optional[str] = None) -> Path:
+    """写出解析后的 ParsedOutput，summary_rows 对应的行写为统计行"""
+    summary_rows = set(parsed.summary_rows)
+    with ResultWriter(path, parsed.columns, output_format) as writer:
+        for position, row in enumerate(parsed.rows):
+            if position in summary_rows:
+                writer.add_summary(row[0])
+            else:
+                writer.append(row)
+    return Path(path)
+
+
+def write_frame(
+    df: pd.DataFrame,
+    path: Union[str, Path],
+    output_format: Optional[str] = None,
+    summaries: Iterable[str] = (),
+) -> Path:
+    """写出 DataFrame（如合并后的结果），summaries 为统计行"""
+    output_format = resolve_format(output_format)
+    summaries = [str(text) for text in summaries]
+    if output_format == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[b"summary"] = json.dumps(summaries, ensure_ascii=False).encode("utf-8")
+        pq.write_table(table.replace_schema_metadata(metadata), str(path))
+    elif output_format == "csv.gz":
+        with gzip.open(path, "wt", encoding="utf-8", newline="", compresslevel=CSV_COMPRESSLEVEL) as f:
+            df.to_csv(f, index=False)
+            writer = csv.writer(f)
+            padding = [""] * (len(df.columns) - 1)
+            for text in summaries:
+                writer.writerow([text] + padding)
+    else:
+        with ResultWriter(path, df.columns, output_format) as writer:
+            for row in df.itertuples(index=False, name=None):
+                writer.append(row)
+            for text in summaries:
+                writer.add_summary(text)
+    return Path(path)
+
+
+class ResultReader:
+    """
+    只读方式逐行读取 ResultWriter 写出的 xlsx：columns 为表头，rows() 依次遍历 Results、Results_2 ... 的数据行，
+    summaries 为 Summary 工作表中的统计行
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self._workbook = load_workbook(path, read_only=True)
+        self._sheets = [sheet for sheet in self._workbook.worksheets if sheet.title.startswith(RESULTS_SHEET)]
+        self.columns = list(next(self._sheets[0].iter_rows(max_row=1, values_only=True)))
+        self.summaries: List[str] = []
+        if SUMMARY_SHEET in self._workbook.sheetnames:
+            rows = self._workbook[SUMMARY_SHEET].iter_rows(min_row=2, values_only=True)
+            self.summaries = [row[0] for row in rows if row and row[0] is not None]
+
+    def __enter__(self) -> "ResultReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def rows(self) -> Iterator[tuple]:
+        # 只读模式不会补齐行尾的空单元格，按表头宽度补齐
+        for sheet in self._sheets:
+            yield from sheet.iter_rows(min_row=2, max_col=len(self.columns), values_only=True)
+
+    def close(self) -> None:
+        self._workbook.close()
+
+
+def read_result(path: Union[str, Path]):
+    """读取 ResultWriter 写出的 xlsx，返回 (全部数据行的 DataFrame, 统计行列表)"""
+    sheets = pd.read_excel(path, sheet_name=None, header=0)
+    frames = [df for name, df in sheets.items() if name.startswith(RESULTS_SHEET)]
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    summaries = []
+    if SUMMARY_SHEET in sheets:
+        summaries = sheets[SUMMARY_SHEET][SUMMARY_SHEET].dropna().astype(str).tolist()
+    return df, summaries
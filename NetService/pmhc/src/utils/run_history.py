@@ -0,0 +1,82 @@
+"""
+工具运行历史
+
+记录每次工具运行的输入规模与资源占用（峰值内存、CPU 时间、耗时），
+供准入控制估算新请求的峰值内存和排队等待时间。
+"""
+import os
+import sqlite3
+import time
+from typing import List, NamedTuple
+
+from src.utils.log import logger
+from config import CONFIG_YAML
+
+HISTORY_CONFIG = CONFIG_YAML.get("RUN_HISTORY", {})
+HISTORY_DB_PATH = HISTORY_CONFIG.get("db_path", "/opt/tmp/cache/run_history.db")
+HISTORY_MAX_ROWS_PER_TOOL = HISTORY_CONFIG.get("max_rows_per_tool", 500)
+
+
+class RunRecord(NamedTuple):
+    tool: str
+    work_units: float
+    max_rss_kb: int
+    cpu_seconds: float
+    wall_seconds: float
+    created_at: float
+
+
+def _connect():
+    os.makedirs(os.path.dirname(HISTORY_DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(HISTORY_DB_PATH, timeout=5)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS runs ("
+        " tool TEXT NOT NULL,"
+        " work_units REAL NOT NULL,"
+        " max_rss_kb INTEGER NOT NULL,"
+        " cpu_seconds REAL NOT NULL,"
+        " wall_seconds REAL NOT NULL,"
+        " created_at REAL NOT NULL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_runs_tool ON runs (tool, created_at)")
+    return conn
+
+
+def record_run(tool: str, work_units: float, max_rss_kb: int, cpu_seconds: float, wall_seconds: float) -> None:
+    """写入一次运行记录，并只保留每个工具最近的 max_rows_per_tool 条"""
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO runs (tool, work_units, max_rss_kb, cpu_seconds, wall_seconds, created_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (tool, work_units, max_rss_kb, cpu_seconds, wall_seconds, time.time())
+                )
+                conn.execute(
+                    "DELETE FROM runs WHERE tool = ? AND rowid NOT IN ("
+                    " SELECT rowid FROM runs WHERE tool = ? ORDER BY created_at DESC LIMIT ?)",
+                    (tool, tool, HISTORY_MAX_ROWS_PER_TOOL)
+                )
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning(f"写入运行历史失败: {e}")
+
+
+def recent_runs(tool: str, limit: int = 50) -> List[RunRecord]:
+    """按时间倒序返回工具最近的运行记录"""
+    try:
+        conn = _connect()
+        try:
+            rows = conn.execute(
+                "SELECT tool, work_units, max_rss_kb, cpu_seconds, wall_seconds, created_at"
+                " FROM runs WHERE tool = ? ORDER BY created_at DESC LIMIT ?",
+                (tool, limit)
+            ).fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning(f"读取运行历史失败: {e}")
+        return []
+    return [RunRecord(*row) for row in rows]
@@ -0,0 +1,173 @@
+"""
+工具请求调度
+
+所有工具请求共享同一批 CPU，大批量任务（如整个蛋白质组的 NetCTLpan）会让交互式小请求
+（RNAFold、Prime 等）长时间排队。这里在工具执行前增加一层加权公平排队（WFQ）：
+1. 按 (租户, 类别) 划分队列：租户取自请求头 X-Tenant-Id，类别分为 interactive / bulk，
+   默认按工具划分，也可通过请求头 X-Priority 指定；
+2. 每个请求按 完成标签 = max(虚拟时间, 该队列上一个完成标签) + 代价 / 权重 排序，
+   权重 = 类别权重 × 租户权重，同时执行的请求数不超过 max_concurrent；
+3. 排队位置和等待时间写入 request.state，由 QueueHeadersMiddleware 返回给客户端
+   （响应头 X-Queue-Position / X-Queue-Wait-Seconds / X-Queue-Class）。
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Tuple
+
+from starlette.datastructures import MutableHeaders
+
+from src.utils.log import logger
+from src.utils.metrics import QUEUE_WAIT
+from config import CONFIG_YAML
+
+SCHEDULER_CONFIG = CONFIG_YAML.get("SCHEDULER", {})
+SCHEDULER_ENABLED = SCHEDULER_CONFIG.get("enabled", True)
+MAX_CONCURRENT = SCHEDULER_CONFIG.get("max_concurrent", 4)
+TENANT_HEADER = SCHEDULER_CONFIG.get("tenant_header", "X-Tenant-Id")
+PRIORITY_HEADER = SCHEDULER_CONFIG.get("priority_header", "X-Priority")
+CLASS_WEIGHTS = SCHEDULER_CONFIG.get("class_weights", {"interactive": 8, "bulk": 1})
+CLASS_COSTS = SCHEDULER_CONFIG.get("class_costs", {"interactive": 1, "bulk": 10})
+TENANT_WEIGHTS = SCHEDULER_CONFIG.get("tenant_weights", {})
+BULK_TOOLS = set(SCHEDULER_CONFIG.get("bulk_tools", ["netctlpan", "netmhcpan", "netchop"]))
+
+DEFAULT_TENANT = "default"
+
+
+def classify(http_request, tool: str) -> Tuple[str, str]:
+    """根据请求头和工具名返回 (租户, 类别)"""
+    tenant = http_request.headers.get(TENANT_HEADER) or DEFAULT_TENANT
+    request_class = (http_request.headers.get(PRIORITY_HEADER) or "").lower()
+    if request_class not in CLASS_WEIGHTS:
+        request_class = "bulk" if tool in BULK_TOOLS else "interactive"
+    return tenant, request_class
+
+
+class FairScheduler:
+    """加权公平排队（按虚拟完成标签从小到大出队），限制同时执行的请求数"""
+
+    def __init__(self, max_concurrent: int):
+        self.max_concurrent = max_concurrent
+        self._running = 0
+        self._queue = []
+        self._virtual_time = 0.0
+        self._last_finish = {}
+        self._sequence = itertools.count()
+
+    def _dispatch(self) -> None:
+        while self._running < self.max_concurrent and self._queue:
+            _, _, start, future = heapq.heappop(self._queue)
+            if future.done():
+                continue
+            # 虚拟时间推进到出队请求的开始标签，新到达的队列从这里开始计算标签
+            self._virtual_time = max(self._virtual_time, start)
+            self._running += 1
+            future.set_result(None)
+
+    def release(self) -> None:
+        self._running -= 1
+        self._dispatch()
+        if self._running == 0 and not self._queue:
+            # 完全空闲时重置虚拟时间，避免历史租户的标签无限增长；
+            # 先出队再判断，已取消请求残留的队列项不会阻止重置
+            self._virtual_time = 0.0
+            self._last_finish.clear()
+
+    async def acquire(self, tenant: str, request_class: str) -> int:
+        """
+        排队直到轮到该请求执行
+
+        Returns:
+            int: 入队时的排队位置，0 表示无需排队
+        """
+        weight = CLASS_WEIGHTS.get(request_class, 1) * TENANT_WEIGHTS.get(tenant, 1)
+        flow = (tenant, request_class)
+        start = max(self._virtual_time, self._last_finish.get(flow, 0.0))
+        finish = start + CLASS_COSTS.get(request_class, 1) / weight
+        self._last_finish[flow] = finish
+
+        if self._running < self.max_concurrent and not self._queue:
+            self._virtual_time = start
+            self._running += 1
+            return 0
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (finish, next(self._sequence), start, future)
+        heapq.heappush(self._queue, entry)
+        position = sum(1 for queued in self._queue if queued[:2] <= entry[:2] and not queued[3].done())
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                future.cancel()
+            raise
+        return position
+
+
+_scheduler = FairScheduler(MAX_CONCURRENT)
+
+
+async def run_scheduled(http_request, tool: str, coro):
+    """
+    经过加权公平排队后运行工具协程
+
+    Args:
+        http_request: FastAPI/Starlette 的 Request 对象，用于读取租户/优先级请求头并记录排队信息
+        tool: 工具名称
+        coro: 工具调用协程
+    """
+    if not SCHEDULER_ENABLED:
+        return await coro
+    tenant, request_class = classify(http_request, tool)
+    enqueued = time.monotonic()
+    try:
+        position = await _scheduler.acquire(tenant, request_class)
+    except BaseException:
+        coro.close()
+        raise
+
+    waited = time.monotonic() - enqueued
+    QUEUE_WAIT.observe(waited, tool=tool, queue="scheduler")
+    http_request.state.queue_position = position
+    http_request.state.queue_wait_seconds = waited
+    http_request.state.queue_class = request_class
+    if position:
+        logger.info(
+            f"{tool} 请求（租户 {tenant}，{request_class}）排队位置 {position}，等待 {waited:.1f}s"
+        )
+    try:
+        return await coro
+    finally:
+        _scheduler.release()
+
+
+class QueueHeadersMiddleware:
+    """
+    将排队位置、等待时间和请求类别写入响应头
+
+    纯 ASGI 中间件：只改写 http.response.start 消息，receive 原样传给接口，
+    接口内的 is_disconnected() 能收到客户端断开（BaseHTTPMiddleware 会吞掉 http.disconnect）
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        # 与接口中 Request.state 共用同一个 dict
+        state = scope.setdefault("state", {})
+
+        async def send_with_queue_headers(message):
+            if message["type"] == "http.response.start" and state.get("queue_position") is not None:
+                headers = MutableHeaders(scope=message)
+                headers["X-Queue-Position"] = str(state["queue_position"])
+                headers["X-Queue-Wait-Seconds"] = f"{state['queue_wait_seconds']:.3f}"
+                headers["X-Queue-Class"] = state["queue_class"]
+            await send(message)
+
+        await self.app(scope, receive, send_with_queue_headers)
@@ -0,0 +1,124 @@
+"""
+相同工具请求的合并执行（single-flight）
+
+请求指纹 = 工具名 + 规范化后的请求参数 + 输入文件内容哈希（MinIO 对象取 ETag，本地文件取 sha256）。
+同一时刻指纹相同的请求只真正执行一次，其余请求挂到同一个执行任务上并共享其结果。
+"""
+import asyncio
+import hashlib
+import json
+import os
+
+from pathlib import Path
+from urllib.parse import urlparse
+
+from src.utils.log import logger, run_in_executor
+from src.utils.metrics import record_cache_lookup
+from src.utils.minio_utils import minio_client
+
+# 正在执行的请求: 指纹 -> {"task": asyncio.Task, "waiters": 等待者数量}
+_inflight = {}
+
+
+def _normalize_value(value):
+    """去掉首尾空白，逗号分隔的列表（如 HLA 等位基因）去掉元素间空白"""
+    if isinstance(value, str):
+        value = value.strip()
+        if "," in value:
+            value = ",".join(item.strip() for item in value.split(","))
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_normalize_value(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _normalize_value(item) for key, item in value.items()}
+    return value
+
+
+def _request_params(request) -> dict:
+    """兼容 pydantic v1/v2 的请求参数导出"""
+    if hasattr(request, "model_dump"):
+        return request.model_dump()
+    return request.dict()
+
+
+def input_content_hash(path: str) -> str:
+    """
+    计算输入文件的内容标识，带上后缀（部分工具按后缀判断输入类型）
+
+    Returns:
+        str: MinIO 对象为 "<后缀>:etag:<ETag>"，本地文件为 "<后缀>:sha256:<摘要>"，无法识别时返回 None
+    """
+    if path.startswith("minio://"):
+        parsed = urlparse(path)
+        object_name = parsed.path.lstrip("/")
+        stat = minio_client.stat_object(parsed.netloc, object_name)
+        return f"{Path(object_name).suffix.lower()}:etag:{stat.etag}"
+    if os.path.isfile(path):
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return f"{Path(path).suffix.lower()}:sha256:{digest.hexdigest()}"
+    return None
+
+
+async def request_fingerprint(tool: str, request, exclude=()) -> str:
+    """
+    计算请求指纹
+
+    Args:
+        tool: 工具名
+        request: pydantic 请求模型
+        exclude: 不影响结果的参数名（如 num_workers），不参与指纹计算
+
+    Returns:
+        str: sha256 指纹
+    """
+    params = {}
+    for key, value in sorted(_request_params(request).items()):
+        if key in exclude:
+            continue
+        value = _normalize_value(value)
+        if isinstance(value, str) and (value.startswith("minio://") or value.startswith("/")):
+            try:
+                content_hash = await run_in_executor(None, input_content_hash, value)
+            except Exception as e:
+                # 对象不存在等情况交给工具本身报错，这里退化为按路径计算指纹
+                logger.warning(f"计算输入文件哈希失败，按路径计算指纹: {value}, 错误: {e}")
+                content_hash = None
+            if content_hash:
+                value = content_hash
+        params[key] = value
+    payload = json.dumps({"tool": tool, "params": params}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def single_flight(fingerprint: str, coro_factory):
+    """
+    指纹相同的并发请求只执行一次 coro_factory()，所有请求共享同一结果（或同一异常）
+
+    所有等待者都取消后，正在执行的任务也会被取消。
+    """
+    entry = _inflight.get(fingerprint)
+    record_cache_lookup("single_flight", entry is not None)
+    if entry is None:
+        task = asyncio.ensure_future(coro_factory())
+        entry = {"task": task, "waiters": 0}
+        _inflight[fingerprint] = entry
+
+        def _release(_, entry=entry):
+            if _inflight.get(fingerprint) is entry:
+                del _inflight[fingerprint]
+
+        task.add_done_callback(_release)
+    else:
+        logger.info(f"相同请求正在执行，合并等待结果: {fingerprint[:16]}")
+
+    entry["waiters"] += 1
+    try:
+        return await asyncio.shield(entry["task"])
+    finally:
+        entry["waiters"] -= 1
+        if entry["waiters"] == 0 and not entry["task"].done():
+            logger.info(f"请求已无等待者，取消执行: {fingerprint[:16]}")
+            entry["task"].cancel()
@@ -0,0 +1,103 @@
+"""
+结果摘要（Markdown）
+
+工具结果在内存中已经是带类型的 DataFrame，摘要直接基于它生成，不再回读 Excel/CSV：
+1. 筛选用布尔掩码，取前 K 行用 nlargest / nsmallest（不对整表排序）；
+2. 只对要显示的行做格式化和 Markdown 转义（按列向量化），百万行结果的摘要也只处理几行数据。
+
+用法:
+    shown = top_k(df, "Aff_score", 7, ascending=True)
+    lines = markdown_table(shown, ["Allele", "Peptide", "Aff_score"])
+    lines += truncation_note(len(df), len(shown))
+"""
+from typing import Callable, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+DEFAULT_LIMIT = 7
+MISSING = "-"
+
+# Markdown 特殊字符加反斜杠转义，换行替换为空格
+_MARKDOWN_ESCAPES = str.maketrans(
+    {char: "\\" + char for char in "\\|*_#+-=><()![]{}\"'`&%$^~"}
+)
+_MARKDOWN_ESCAPES[ord("\n")] = " "
+
+
+def read_table(path, **read_kwargs) -> Optional[pd.DataFrame]:
+    """
+    读取本地 CSV/TSV 结果表，供摘要和 hits 共用同一份 DataFrame；
+    读取失败时返回 None，由调用方按原路径交给摘要函数报告错误
+    """
+    try:
+        return pd.read_csv(path, **read_kwargs)
+    except Exception:
+        return None
+
+
+def escape_markdown(values: pd.Series) -> pd.Series:
+    """按列转义 Markdown 特殊字符"""
+    return values.map(str).str.translate(_MARKDOWN_ESCAPES)
+
+
+def top_k(df: pd.DataFrame, by: str, k: Optional[int], ascending: bool) -> pd.DataFrame:
+    """
+    按 by 列取前 k 行（k 为 None 时返回全部行），并列时保持原顺序。
+    数值列用 nsmallest / nlargest，只做部分选择；非数值列退回稳定排序。
+    """
+    if k is None:
+        return df.sort_values(by, ascending=ascending, kind="mergesort")
+    dtype = df[by].dtype
+    if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+        return df.nsmallest(k, by) if ascending else df.nlargest(k, by)
+    return df.sort_values(by, ascending=ascending, kind="mergesort").head(k)
+
+
+def top_k_per_group(df: pd.DataFrame, by: str, group: str, k: int, ascending: bool) -> pd.DataFrame:
+    """
+    每个 group 取 by 列前 k 行，并列时保留先出现的行；group 或 by 为空的行（如统计行）全部保留，行顺序不变
+    """
+    scores = pd.to_numeric(df[by], errors="coerce")
+    ranked = df[group].notna() & scores.notna()
+    rank = scores[ranked].groupby(df.loc[ranked, group]).rank(method="first", ascending=ascending)
+    keep = ~ranked
+    keep[rank.index] = rank <= k
+    return df[keep]
+
+
+def markdown_table(
+    df: pd.DataFrame,
+    columns: Sequence[str],
+    headers: Optional[Sequence[str]] = None,
+    formats: Optional[Dict[str, Callable]] = None,
+    escape: bool = False,
+) -> List[str]:
+    """
+    把 df 的指定列渲染为 Markdown 表格行（含表头），df 中缺少的列显示为 "-"。
+    formats 为 {列名: 单值格式化函数}，如 {"y_prob": "{:.4f}".format}。
+    """
+    headers = list(headers or columns)
+    formats = formats or {}
+    cells = []
+    for column in columns:
+        if column not in df.columns:
+            cells.append([MISSING] * len(df))
+            continue
+        values = df[column]
+        if column in formats:
+            values = values.map(formats[column])
+        values = escape_markdown(values) if escape else values.map(str)
+        cells.append(values.tolist())
+    lines = [
+        "| " + " | ".join(headers) + " |",
+        "|" + "|".join("-" * (len(header) + 2) for header in headers) + "|",
+    ]
+    lines.extend("| " + " | ".join(row) + " |" for row in zip(*cells))
+    return lines
+
+
+def truncation_note(total: int, shown: int, hint: str = "全部内容请下载表格查看。") -> List[str]:
+    """结果被截断时的提示行"""
+    if total <= shown:
+        return []
+    return [f"\n⚠️ 结果超过 {shown} 行，仅显示前 {shown} 行，{hint}"]
@@ -0,0 +1,88 @@
+"""
+模型子进程线程预算
+
+torch / TensorFlow / BLAS 默认按机器核数开启线程池，多个模型任务并发时线程数成倍超出 CPU 核数，
+上下文切换和缓存争用会显著拖慢整体吞吐。这里按服务维护一个总线程预算：每次启动模型子进程时
+按当前并发数分配线程数，并通过 OMP/MKL/OpenBLAS/TensorFlow 的环境变量传给子进程，结束后归还。
+"""
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+from src.utils.log import logger
+from src.utils.supervisor import available_cpus
+from config import CONFIG_YAML
+
+THREAD_BUDGET_CONFIG = CONFIG_YAML.get("THREAD_BUDGET", {})
+TOTAL_THREADS = THREAD_BUDGET_CONFIG.get("total_threads", 0)
+MIN_THREADS_PER_RUN = THREAD_BUDGET_CONFIG.get("min_threads_per_run", 1)
+MAX_THREADS_PER_RUN = THREAD_BUDGET_CONFIG.get("max_threads_per_run", 0)
+INTEROP_THREADS = THREAD_BUDGET_CONFIG.get("interop_threads", 1)
+EXPECTED_CONCURRENCY = THREAD_BUDGET_CONFIG.get("expected_concurrency", 2)
+
+# 各线程库读取的线程数环境变量
+_INTRA_OP_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "TF_NUM_INTRAOP_THREADS",
+)
+
+
+class ThreadBudget:
+    """按并发任务数切分的线程预算，线程安全"""
+
+    def __init__(self, total_threads: int):
+        self.total_threads = total_threads
+        self._lock = threading.Lock()
+        self._leased = 0
+        self._active = 0
+
+    def acquire(self) -> int:
+        with self._lock:
+            # 新任务与已运行任务平分预算（至少按预期并发数预留），但不超过当前剩余线程数
+            fair_share = self.total_threads // max(self._active + 1, EXPECTED_CONCURRENCY)
+            threads = min(fair_share, self.total_threads - self._leased)
+            if MAX_THREADS_PER_RUN:
+                threads = min(threads, MAX_THREADS_PER_RUN)
+            threads = max(threads, MIN_THREADS_PER_RUN)
+            self._leased += threads
+            self._active += 1
+            return threads
+
+    def release(self, threads: int) -> None:
+        with self._lock:
+            self._leased -= threads
+            self._active -= 1
+
+
+_budget = ThreadBudget(TOTAL_THREADS or available_cpus())
+
+
+def thread_env(threads: int) -> Dict[str, str]:
+    """返回限制子进程线程数的环境变量（在当前环境变量基础上覆盖）"""
+    env = dict(os.environ)
+    for name in _INTRA_OP_ENV_VARS:
+        env[name] = str(threads)
+    env["TF_NUM_INTEROP_THREADS"] = str(INTEROP_THREADS)
+    return env
+
+
+@contextmanager
+def thread_lease(tool: str) -> Iterator[Dict[str, str]]:
+    """
+    为一次模型子进程运行分配线程数，退出时归还
+
+    用法:
+        with thread_lease("bigmhc") as env:
+            proc = await run_supervised("bigmhc", cmd, env=env)
+    """
+    threads = _budget.acquire()
+    logger.info(f"{tool} 分配线程数 {threads}（总预算 {_budget.total_threads}）")
+    try:
+        yield thread_env(threads)
+    finally:
+        _budget.release(threads)
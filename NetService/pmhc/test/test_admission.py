@@ -0,0 +1,172 @@
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from pydantic import BaseModel
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.utils import admission, result_cache, scheduler
+from src.utils.admission import AdmissionController, AdmissionRejected
+from src.utils.scheduler import FairScheduler
+from src.utils.tool_runner import run_tool
+
+ESTIMATE_KB = 800
+
+
+class DemoRequest(BaseModel):
+    name: str
+
+
+class DemoHttpRequest:
+    url = SimpleNamespace(path="/demo")
+
+    def __init__(self):
+        self.headers = {}
+        self.state = SimpleNamespace()
+
+    async def is_disconnected(self) -> bool:
+        return False
+
+
+@pytest.fixture(autouse=True)
+def small_memory(monkeypatch):
+    # 内存上限 1000KB，每个请求预估 800KB：同一时间只能放行一个请求
+    monkeypatch.setattr(admission, "ADMISSION_ENABLED", True)
+    monkeypatch.setattr(admission, "MEMORY_FRACTION", 1.0)
+    monkeypatch.setattr(admission, "MAX_QUEUE", 1)
+    monkeypatch.setattr(admission, "memory_limit_kb", lambda: 1000)
+    monkeypatch.setattr(admission, "memory_usage_kb", lambda: 0)
+    monkeypatch.setattr(admission, "_self_rss_kb", lambda: 0)
+    monkeypatch.setattr(admission, "estimate_peak_rss_kb", lambda tool, work_units: ESTIMATE_KB)
+    monkeypatch.setattr(admission, "estimate_wall_seconds", lambda tool: 30)
+    monkeypatch.setattr(admission, "_controller", AdmissionController())
+
+
+def test_full_queue_is_rejected_with_retry_after():
+    async def main():
+        controller = admission._controller
+        await controller.acquire("bigmhc", ESTIMATE_KB)
+        waiter = asyncio.ensure_future(controller.acquire("bigmhc", ESTIMATE_KB))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire("bigmhc", ESTIMATE_KB)
+        # 运行一个 + 排队一个，新请求约需等待 30s × 2
+        assert rejected.value.status_code == 429
+        assert rejected.value.headers == {"Retry-After": "60"}
+        controller.release(ESTIMATE_KB)
+        await asyncio.wait_for(waiter, 1)
+        controller.release(ESTIMATE_KB)
+        assert controller._running == 0 and controller._reserved_kb == 0
+
+    asyncio.run(main())
+
+
+def test_first_request_is_always_admitted():
+    async def main():
+        await admission._controller.acquire("bigmhc", 10 * ESTIMATE_KB)
+        assert admission._controller._running == 1
+
+    asyncio.run(main())
+
+
+def test_waiters_are_admitted_in_order(monkeypatch):
+    monkeypatch.setattr(admission, "MAX_QUEUE", 4)
+
+    async def main():
+        controller = admission._controller
+        order = []
+
+        async def wait(name, estimate_kb):
+            await controller.acquire("bigmhc", estimate_kb)
+            order.append(name)
+
+        await controller.acquire("bigmhc", ESTIMATE_KB)
+        big = asyncio.ensure_future(wait("big", ESTIMATE_KB))
+        await asyncio.sleep(0.01)
+        # 小请求虽然放得下，也不能越过排在前面的大请求
+        small = asyncio.ensure_future(wait("small", 100))
+        await asyncio.sleep(0.01)
+        assert order == []
+        controller.release(ESTIMATE_KB)
+        await asyncio.wait_for(big, 1)
+        await asyncio.wait_for(small, 1)
+        assert order == ["big", "small"]
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_leaves_queue():
+    async def main():
+        controller = admission._controller
+        await controller.acquire("bigmhc", ESTIMATE_KB)
+        waiter = asyncio.ensure_future(controller.acquire("bigmhc", ESTIMATE_KB))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert not controller._waiters
+        controller.release(ESTIMATE_KB)
+        assert controller._running == 0 and controller._reserved_kb == 0
+
+    asyncio.run(main())
+
+
+def test_admission_wait_does_not_hold_scheduler_slot(monkeypatch):
+    monkeypatch.setattr(result_cache, "CACHE_ENABLED", False)
+    monkeypatch.setattr(scheduler, "SCHEDULER_ENABLED", True)
+    monkeypatch.setattr(scheduler, "_scheduler", FairScheduler(2))
+
+    async def main():
+        release_first = asyncio.Event()
+        started = []
+
+        async def tool(name, wait=None):
+            started.append(name)
+            if wait is not None:
+                await wait.wait()
+            return name
+
+        def call(name, admitted, wait=None):
+            return asyncio.ensure_future(run_tool(
+                DemoHttpRequest(), name, DemoRequest(name=name), lambda: tool(name, wait), admitted=admitted
+            ))
+
+        first = call("bigmhc", True, release_first)
+        await asyncio.sleep(0.05)
+        # 第二个模型类请求在准入处排队，不占用剩余的调度槽位
+        second = call("nettcr", True)
+        await asyncio.sleep(0.05)
+        assert started == ["bigmhc"]
+        assert await asyncio.wait_for(call("rnafold", False), 1) == "rnafold"
+        assert not second.done()
+
+        release_first.set()
+        assert await asyncio.wait_for(first, 1) == "bigmhc"
+        assert await asyncio.wait_for(second, 1) == "nettcr"
+        assert started == ["bigmhc", "rnafold", "nettcr"]
+
+    asyncio.run(main())
+
+
+def test_rejected_request_never_starts_tool(monkeypatch):
+    monkeypatch.setattr(admission, "MAX_QUEUE", 0)
+    monkeypatch.setattr(result_cache, "CACHE_ENABLED", False)
+    monkeypatch.setattr(scheduler, "_scheduler", FairScheduler(2))
+
+    async def main():
+        started = []
+
+        async def tool(name):
+            started.append(name)
+            return name
+
+        await admission._controller.acquire("bigmhc", ESTIMATE_KB)
+        with pytest.raises(AdmissionRejected):
+            await run_tool(DemoHttpRequest(), "bigmhc", DemoRequest(name="a"), lambda: tool("a"), admitted=True)
+        assert started == []
+        assert scheduler._scheduler._running == 0
+
+    asyncio.run(main())
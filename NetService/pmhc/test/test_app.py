@@ -0,0 +1,112 @@
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import app
+from src import api
+from src.utils import result_cache, run_history, supervisor
+from src.utils.supervisor import run_supervised
+
+PYTHON = sys.executable
+
+
+@pytest.fixture(autouse=True)
+def fast_poll(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, "CACHE_ENABLED", False)
+    monkeypatch.setattr(run_history, "HISTORY_DB_PATH", str(tmp_path / "run_history.db"))
+    monkeypatch.setattr(supervisor, "DISCONNECT_POLL_INTERVAL", 0.05)
+    monkeypatch.setattr(supervisor, "KILL_GRACE_SECONDS", 1)
+
+
+def _alive(pid: int) -> bool:
+    """进程存在且不是僵尸进程"""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def test_client_disconnect_kills_tool_process(tmp_path, monkeypatch):
+    pid_file = tmp_path / "pid"
+    input_file = tmp_path / "input.fasta"
+    input_file.write_text(">s\nGGGAAACCC\n")
+
+    async def slow_rnafold(input_file):
+        script = f"import os, time; open({str(pid_file)!r}, 'w').write(str(os.getpid())); time.sleep(60)"
+        await run_supervised("rnafold", [PYTHON, "-c", script])
+        return json.dumps({"type": "text", "content": "finished"})
+
+    monkeypatch.setattr(api, "run_rnafold", slow_rnafold)
+    body = json.dumps({"input_file": str(input_file)}).encode()
+    messages = []
+
+    async def receive():
+        if not messages:
+            messages.append("request")
+            return {"type": "http.request", "body": body, "more_body": False}
+        # 工具进程启动后客户端断开；此前的轮询拿不到消息
+        if pid_file.exists() and pid_file.read_text():
+            return {"type": "http.disconnect"}
+        await asyncio.Event().wait()
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/rnafold", "raw_path": b"/rnafold", "root_path": "", "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 50000), "server": ("testserver", 80),
+    }
+    asyncio.run(asyncio.wait_for(app(scope, receive, send), 10))
+
+    # 进程组由监管线程异步终止
+    pid = int(pid_file.read_text())
+    deadline = time.monotonic() + 5
+    while _alive(pid) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not _alive(pid)
+    assert sent[0]["status"] == 200
+    response = json.loads(json.loads(b"".join(m.get("body", b"") for m in sent[1:])))
+    assert response["content"] == "客户端已断开连接，任务已取消"
+
+
+def test_middlewares_edit_response_through_real_app(tmp_path, monkeypatch):
+    input_file = tmp_path / "input.fasta"
+    input_file.write_text(">s\nGGGAAACCC\n")
+
+    async def fake_rnafold(input_file):
+        await run_supervised("rnafold", [PYTHON, "-c", "pass"])
+        return json.dumps({"type": "link", "url": "minio://b/r.txt", "content": "结果", "hits": {"items": []}},
+                          ensure_ascii=False)
+
+    monkeypatch.setattr(api, "run_rnafold", fake_rnafold)
+    client = TestClient(app)
+    payload = {"input_file": str(input_file)}
+
+    plain = client.post("/rnafold", json=payload)
+    assert json.loads(plain.json())["hits"] == {"items": []}
+    assert "timings" not in json.loads(plain.json())
+
+    response = client.post("/rnafold", json=payload, headers={
+        "X-Request-Id": "job-1", "X-Include-Timings": "1", "X-Include-Hits": "0", "X-Include-Resource-Usage": "1",
+    })
+    result = json.loads(response.json())
+    assert result["content"] == "结果"
+    assert "hits" not in result
+    assert result["timings"]["request_id"] == "job-1"
+    assert result["resource_usage"]["processes"] == 1
+    assert response.headers["X-Request-Id"] == "job-1"
+    assert json.loads(response.headers["X-Resource-Usage"])["processes"] == 1
+    assert response.headers["X-Queue-Class"] == "interactive"
+    assert int(response.headers["content-length"]) == len(response.content)
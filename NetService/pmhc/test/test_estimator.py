@@ -0,0 +1,181 @@
+import asyncio
+import gzip
+import json
+import sys
+from pathlib import Path
+from typing import Optional
+
+import pytest
+from pydantic import BaseModel
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.utils import estimator, run_history
+from src.utils.estimator import (
+    Estimate, estimate_for_units, estimate_summary, fit_linear, resolve_num_workers, run_measured, workers_for_estimate
+)
+from src.utils.run_history import record_run, recent_runs
+from src.utils.supervisor import run_supervised
+
+TOOL_SPECS = {
+    "netmhcpan": {
+        "input": "input_filename",
+        "alleles": "mhc_allele",
+        "lengths": "peptide_length",
+        "cpu_seconds_per_unit": 0.5,
+        "startup_seconds": 2,
+    },
+    "nettcr": {"input": "input_file"},
+}
+
+
+class DemoRequest(BaseModel):
+    input_filename: str
+    mhc_allele: Optional[str] = "HLA-A02:01"
+    peptide_length: Optional[str] = "9"
+    num_workers: Optional[str] = "auto"
+
+
+class TableRequest(BaseModel):
+    input_file: str
+
+
+@pytest.fixture(autouse=True)
+def history(tmp_path, monkeypatch):
+    monkeypatch.setattr(run_history, "HISTORY_DB_PATH", str(tmp_path / "cache" / "run_history.db"))
+    monkeypatch.setattr(estimator, "TOOL_SPECS", TOOL_SPECS)
+    monkeypatch.setattr(estimator, "MIN_HISTORY_RUNS", 3)
+    monkeypatch.setattr(estimator, "TARGET_SHARD_SECONDS", 60)
+    monkeypatch.setattr(estimator, "MAX_STARTUP_OVERHEAD", 0.1)
+    monkeypatch.setattr(estimator, "MAX_WORKERS", 0)
+    monkeypatch.setattr(estimator, "free_cpus", lambda: 16)
+    estimator._stats_cache.clear()
+
+
+def _fasta(tmp_path, sequences, name="input.fasta"):
+    path = tmp_path / name
+    path.write_text("".join(f">p{i}\n{seq}\n" for i, seq in enumerate(sequences)))
+    return str(path)
+
+
+def test_fit_linear_recovers_line_and_clamps_slope():
+    intercept, slope = fit_linear([1, 2, 3, 4], [5, 8, 11, 14])
+    assert intercept == pytest.approx(2)
+    assert slope == pytest.approx(3)
+    # 斜率为负时按常数处理，取均值
+    assert fit_linear([1, 2, 3], [9, 6, 3]) == (6, 0.0)
+    assert fit_linear([5, 5], [1, 3]) == (2, 0.0)
+
+
+def test_work_units_scale_with_residues_alleles_and_lengths(tmp_path):
+    path = _fasta(tmp_path, ["SIINFEKL", "GILGFVFTLAA"])
+    run = lambda **kw: asyncio.run(estimator.estimate_work_units("netmhcpan", DemoRequest(input_filename=path, **kw)))
+    assert run() == 19
+    assert run(mhc_allele="HLA-A02:01, HLA-B07:02", peptide_length="9,10") == 19 * 2 * 2
+    # -1 表示默认的 8/9/10/11 四种肽长
+    assert run(peptide_length="-1") == 19 * 4
+
+
+def test_work_units_read_compressed_input_and_skip_table_header(tmp_path):
+    fasta = tmp_path / "input.fasta.gz"
+    fasta.write_bytes(gzip.compress(b">p\nSIINFEKL\n>q\nGILGFVFTL\n"))
+    table = tmp_path / "pairs.csv"
+    table.write_text("peptide,cdr3\nSIINFEKL,CASS\nGILGFVFTL,CASR\n")
+    assert asyncio.run(estimator.estimate_work_units("netmhcpan", DemoRequest(input_filename=str(fasta)))) == 17
+    assert asyncio.run(estimator.estimate_work_units("nettcr", TableRequest(input_file=str(table)))) == 2
+    # 输入文件不存在时按 0 处理，交给工具本身报错
+    assert asyncio.run(estimator.estimate_work_units("nettcr", TableRequest(input_file=str(tmp_path / "x.csv")))) == 0
+
+
+def test_estimate_without_history_uses_configured_rate():
+    result = estimate_for_units("netmhcpan", 100)
+    assert result == Estimate(100, 0, 50.0, 50.0, None)
+    assert estimate_for_units("nettcr", 100).cpu_seconds is None
+
+
+def test_estimate_fits_history():
+    # CPU 时间 = 10 + 2·工作量，峰值内存与工作量无关
+    for units in (100, 200, 300, 400):
+        record_run("netmhcpan", units, 2048, 10 + 2 * units, 5 + units)
+    result = estimate_for_units("netmhcpan", 1000)
+    assert result.history_runs == 4
+    assert result.cpu_seconds == pytest.approx(2010)
+    assert result.wall_seconds == pytest.approx(1005)
+    assert result.peak_rss_kb == 2048
+    # 小输入的预测值不低于历史中位数
+    assert estimate_for_units("netmhcpan", 0).cpu_seconds == pytest.approx(10 + 2 * 300)
+
+
+def test_workers_for_estimate_limits(monkeypatch):
+    estimate = lambda cpu: Estimate(0, 0, cpu, cpu, None)
+    assert workers_for_estimate("nettcr", estimate(None)) == 1
+    assert workers_for_estimate("nettcr", estimate(30)) == 1
+    assert workers_for_estimate("nettcr", estimate(600)) == 10
+    # 启动开销：600s × 10% / 2s = 30，不构成限制；启动 10s 时最多 6 个分片
+    assert workers_for_estimate("netmhcpan", estimate(600)) == 10
+    monkeypatch.setitem(TOOL_SPECS["netmhcpan"], "startup_seconds", 10)
+    assert workers_for_estimate("netmhcpan", estimate(600)) == 6
+    monkeypatch.setattr(estimator, "free_cpus", lambda: 4)
+    assert workers_for_estimate("nettcr", estimate(6000)) == 4
+    monkeypatch.setattr(estimator, "MAX_WORKERS", 2)
+    assert workers_for_estimate("nettcr", estimate(6000)) == 2
+
+
+def test_resolve_num_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(estimator, "available_cpus", lambda: 4)
+    path = _fasta(tmp_path, ["A" * 1200])
+    # 1200 残基 × 0.5s = 600s CPU，约 10 个分片
+    assert asyncio.run(resolve_num_workers("netmhcpan", DemoRequest(input_filename=path))) == 10
+    assert asyncio.run(resolve_num_workers("netmhcpan", DemoRequest(input_filename=path, num_workers="3"))) == 3
+    assert asyncio.run(resolve_num_workers("netmhcpan", DemoRequest(input_filename=path, num_workers="64"))) == 4
+
+
+def test_estimate_summary_is_json_serializable(tmp_path):
+    path = _fasta(tmp_path, ["SIINFEKL"])
+    summary = asyncio.run(estimate_summary("netmhcpan", DemoRequest(input_filename=path)))
+    assert json.loads(json.dumps(summary))["input"] == {"bytes": 13, "records": 1, "residues": 8}
+    assert summary["work_units"] == 8
+    assert summary["recommended_num_workers"] == 1
+
+
+def test_run_measured_records_supervised_runs(tmp_path):
+    path = _fasta(tmp_path, ["SIINFEKL"])
+    request = DemoRequest(input_filename=path)
+
+    async def tool():
+        await run_supervised("netmhcpan", [sys.executable, "-c", "pass"])
+        return "ok"
+
+    async def no_process():
+        return "ok"
+
+    assert asyncio.run(run_measured("netmhcpan", request, tool())) == "ok"
+    assert asyncio.run(run_measured("netmhcpan", request, no_process())) == "ok"
+    runs = recent_runs("netmhcpan")
+    # 只有启动了工具进程的运行才会写入历史
+    assert len(runs) == 1
+    assert runs[0].work_units == 8
+    assert runs[0].max_rss_kb > 0
+
+
+def test_downloaded_input_is_scanned_locally(tmp_path, monkeypatch):
+    monkeypatch.setattr(estimator, "available_cpus", lambda: 4)
+    local = _fasta(tmp_path, ["A" * 1200])
+    request = DemoRequest(input_filename="minio://inputs/input.fasta")
+    monkeypatch.setattr(estimator, "input_content_hash", lambda path: "etag:1")
+
+    def no_minio(*args, **kwargs):
+        raise AssertionError("输入已下载到本地，不应再从 MinIO 读取")
+
+    monkeypatch.setattr(estimator.minio_client, "open_object", no_minio)
+    assert asyncio.run(resolve_num_workers("netmhcpan", request, local)) == 10
+    # 显式指定并行度时同样按本地文件统计，供 run_measured 使用
+    estimator._stats_cache.clear()
+    assert asyncio.run(resolve_num_workers("netmhcpan", request.model_copy(update={"num_workers": "2"}), local)) == 2
+
+    async def tool():
+        await run_supervised("netmhcpan", [sys.executable, "-c", "pass"])
+        return "ok"
+
+    assert asyncio.run(run_measured("netmhcpan", request, tool())) == "ok"
+    assert recent_runs("netmhcpan")[0].work_units == 1200
@@ -0,0 +1,187 @@
+import asyncio
+import gzip
+import io
+import sys
+from pathlib import Path
+
+import pytest
+import zstandard
+from minio import Minio
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.utils import minio_utils
+from src.utils.minio_utils import (
+    compression_of, decompressing_stream, download_from_minio_uri, minio_client, strip_compression_suffix
+)
+
+CONTENT = b">p1\nSIINFEKL\n>p2\nGILGFVFTL\n" * 2000
+
+
+class FakeResponse(io.RawIOBase):
+    """模拟 urllib3 响应：无 peek 的原始流，带 headers 和 release_conn"""
+
+    def __init__(self, data: bytes):
+        self._data = io.BytesIO(data)
+        self.headers = {"content-length": str(len(data))}
+        self.released = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        chunk = self._data.read(len(buffer))
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+    def release_conn(self):
+        self.released = True
+
+
+@pytest.fixture
+def bucket(monkeypatch):
+    """内存中的对象存储，替换 MinIO 的 get_object / fget_object / fput_object"""
+    objects = {}
+    responses = []
+
+    def get_object(self, bucket_name, object_name, *args, **kwargs):
+        response = FakeResponse(objects[(bucket_name, object_name)])
+        responses.append(response)
+        return response
+
+    def fget_object(bucket_name, object_name, file_path, **kwargs):
+        Path(file_path).write_bytes(objects[(bucket_name, object_name)])
+
+    def fput_object(bucket_name, object_name, file_path, metadata=None, **kwargs):
+        objects[(bucket_name, object_name)] = Path(file_path).read_bytes()
+        objects[("metadata", object_name)] = metadata
+
+    def put_object(bucket_name, object_name, data, length, metadata=None, **kwargs):
+        objects[(bucket_name, object_name)] = data.read(length)
+
+    monkeypatch.setattr(Minio, "get_object", get_object)
+    monkeypatch.setattr(minio_client, "fget_object", fget_object)
+    monkeypatch.setattr(minio_client, "fput_object", fput_object)
+    monkeypatch.setattr(minio_client, "put_object", put_object)
+    monkeypatch.setattr(minio_client, "bucket_exists", lambda bucket_name: True)
+    objects["responses"] = responses
+    return objects
+
+
+def test_compression_suffixes():
+    assert compression_of("a/sample.fasta.gz") == "gzip"
+    assert compression_of("sample.CSV.ZST") == "zstd"
+    assert compression_of("sample.fasta") is None
+    assert strip_compression_suffix("dir/sample.fasta.gz") == "dir/sample.fasta"
+    assert strip_compression_suffix("sample.tar") == "sample.tar"
+
+
+@pytest.mark.parametrize("encoding, compress", [
+    ("gzip", gzip.compress),
+    ("zstd", lambda data: zstandard.ZstdCompressor().compress(data)),
+])
+def test_decompressing_stream(encoding, compress):
+    assert decompressing_stream(io.BytesIO(compress(CONTENT)), encoding).read() == CONTENT
+    # 已被 HTTP 客户端按 Content-Encoding 解压过的数据原样返回
+    assert decompressing_stream(FakeResponse(CONTENT), encoding).read() == CONTENT
+    assert decompressing_stream(io.BytesIO(CONTENT), None).read() == CONTENT
+
+
+def test_decompressing_stream_reads_multiple_zstd_frames():
+    compressor = zstandard.ZstdCompressor()
+    data = compressor.compress(CONTENT[:1000]) + compressor.compress(CONTENT[1000:])
+    assert decompressing_stream(io.BytesIO(data), "zstd").read() == CONTENT
+
+
+@pytest.mark.parametrize("object_name, data", [
+    ("input.fasta.gz", gzip.compress(CONTENT)),
+    ("input.fasta.zst", zstandard.ZstdCompressor().compress(CONTENT)),
+    ("input.fasta", CONTENT),
+])
+def test_open_and_read_object(bucket, object_name, data):
+    bucket[("inputs", object_name)] = data
+    with minio_client.open_object("inputs", object_name) as stream:
+        chunks = list(iter(lambda: stream.read(4096), b""))
+    assert b"".join(chunks) == CONTENT
+    assert minio_client.read_object("inputs", object_name) == CONTENT
+    # 读完后连接归还连接池
+    assert all(response.closed and response.released for response in bucket["responses"])
+
+
+@pytest.mark.parametrize("object_name, data", [
+    ("dir/input.fasta.gz", gzip.compress(CONTENT)),
+    ("dir/input.fasta.zst", zstandard.ZstdCompressor().compress(CONTENT)),
+    ("dir/input.fasta", CONTENT),
+])
+def test_download_decompresses_and_strips_suffix(bucket, tmp_path, object_name, data):
+    bucket[("inputs", object_name)] = data
+    local_path = Path(download_from_minio_uri(f"minio://inputs/{object_name}", str(tmp_path)))
+    assert local_path.parent == tmp_path
+    assert local_path.name.endswith("_input.fasta")
+    assert local_path.read_bytes() == CONTENT
+
+    explicit = Path(download_from_minio_uri(f"minio://inputs/{object_name}", str(tmp_path / "out" / "copy.fasta.gz")))
+    assert explicit == tmp_path / "out" / "copy.fasta"
+    assert explicit.read_bytes() == CONTENT
+
+
+def test_download_rejects_other_schemes():
+    with pytest.raises(ValueError):
+        download_from_minio_uri("s3://inputs/input.fasta")
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_compressed_upload_round_trip(bucket, tmp_path, monkeypatch, encoding):
+    monkeypatch.setattr(minio_utils, "COMPRESS_ENCODING", encoding)
+    monkeypatch.setattr(minio_utils, "COMPRESS_MIN_SIZE", 1024)
+    path = tmp_path / "result.csv"
+    path.write_bytes(CONTENT)
+    minio_utils._fput_object("results", "result.csv", path, compress=True)
+    stored = bucket[("results", "result.csv")]
+    assert len(stored) < len(CONTENT)
+    assert bucket[("metadata", "result.csv")] == {"Content-Encoding": encoding}
+    assert decompressing_stream(io.BytesIO(stored), encoding).read() == CONTENT
+    # 临时压缩文件已删除
+    assert [p.name for p in tmp_path.iterdir()] == ["result.csv"]
+
+
+def test_small_or_binary_files_upload_uncompressed(bucket, tmp_path, monkeypatch):
+    monkeypatch.setattr(minio_utils, "COMPRESS_MIN_SIZE", 1024)
+    small = tmp_path / "small.csv"
+    small.write_bytes(b"a,b\n1,2\n")
+    binary = tmp_path / "result.xlsx"
+    binary.write_bytes(CONTENT)
+    minio_utils._fput_object("results", "small.csv", small, compress=True)
+    minio_utils._fput_object("results", "result.xlsx", binary, compress=True)
+    assert bucket[("results", "small.csv")] == small.read_bytes()
+    assert bucket[("results", "result.xlsx")] == CONTENT
+    assert bucket[("metadata", "result.xlsx")] is None
+
+
+def test_upload_artifacts_reports_failures_with_local_fallback(bucket, tmp_path, monkeypatch):
+    put_artifact = minio_utils._put_artifact
+
+    def flaky_put(bucket_name, object_name, source, content_type):
+        if object_name.endswith("bad.svg") or object_name.endswith("bad.txt"):
+            raise OSError("connection reset")
+        return put_artifact(bucket_name, object_name, source, content_type)
+
+    monkeypatch.setattr(minio_utils, "_put_artifact", flaky_put)
+    good, bad = tmp_path / "good.svg", tmp_path / "bad.svg"
+    good.write_bytes(b"<svg/>")
+    bad.write_bytes(b"<svg/>")
+    artifacts = {"good.svg": good, "bad.svg": bad, "bad.txt": b"{}"}
+
+    urls, failures = asyncio.run(minio_utils.upload_artifacts_to_minio(artifacts, "results", object_prefix="job_"))
+    # 单个文件失败不影响其余文件，失败的文件不返回地址
+    assert urls == {"good.svg": "minio://results/job_good.svg"}
+    assert sorted(failures) == ["bad.svg", "bad.txt"]
+    assert bucket[("results", "job_good.svg")] == b"<svg/>"
+
+    urls, failures = asyncio.run(minio_utils.upload_artifacts_to_minio(
+        artifacts, "results", object_prefix="job_", fallback_url_prefix="https://dl/"
+    ))
+    # 本地文件的兜底地址按文件名拼接，字节内容按对象名拼接
+    assert urls["bad.svg"] == "https://dl/bad.svg"
+    assert urls["bad.txt"] == "https://dl/job_bad.txt"
+    assert sorted(failures) == ["bad.svg", "bad.txt"]
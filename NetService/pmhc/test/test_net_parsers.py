@@ -0,0 +1,223 @@
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.utils.net_parsers import (
+    NETCTLPAN,
+    NETMHCPAN,
+    NETMHCSTABPAN,
+    StreamParser,
+    parse_netchop,
+    parse_netctlpan,
+    parse_netmhcpan,
+    parse_netmhcstabpan,
+    rank_rows,
+)
+from src.utils import result_writer
+from src.utils.result_writer import ResultReader, write_parsed
+
+NETCHOP_OUTPUT = """
+NetChop 3.1 predictions using version C-term. Threshold 0.500000
+
+--------------------------------------
+ pos  AA  C      score      Ident
+--------------------------------------
+   1   M  .   0.094106 sp_P04637
+   2   E  S   0.872087 sp_P04637
+   3   E  .   0.041295 sp_P04637
+--------------------------------------
+
+Number of cleavage sites 1. Number of amino acids 3. Protein name sp_P04637
+
+--------------------------------------
+ pos  AA  C      score      Ident
+--------------------------------------
+   1   K  S   0.913113 seq2
+--------------------------------------
+
+Number of cleavage sites 1. Number of amino acids 1. Protein name seq2
+"""
+
+NETCTLPAN_OUTPUT = """
+# NetCTLpan version 1.1
+# Input is in FSA format
+ N  Sequence Name   Allele      Peptide    MHC     TAP    Cle    Comb   %Rank
+-----------------------------------------------------------------------------
+    0 143B_BOVIN_P HLA-A02:01  MLDLQPETT 0.00868 0.03900 0.70924 0.1823 17.00
+    1 143B_BOVIN_P HLA-A02:01  LDLQPETTV 0.47855 0.53300 0.94011 0.7036  1.50 <-E
+    2 143B_BOVIN_P HLA-A02:01  DLQPETTVA -0.0120 -0.3200 0.10924 0.0123 50.00
+-----------------------------------------------------------------------------
+Number of MHC ligands 1 identified. Number of CTL epitopes 1 in protein 143B_BOVIN_P
+"""
+
+NETMHCPAN_OUTPUT = """
+# NetMHCpan version 4.1b
+---------------------------------------------------------------------------------------------------------------------------
+ Pos         MHC        Peptide      Core Of Gp Gl Ip Il        Icore        Identity  Score_EL %Rank_EL Score_BA %Rank_BA  Aff(nM) BindLevel
+---------------------------------------------------------------------------------------------------------------------------
+   1 HLA-A*02:01      LLFGYPVYV LLFGYPVYV  0  0  0  0  0    LLFGYPVYV         PEPLIST 0.9865960    0.015 0.853580    0.022     7.63 <= SB
+   2 HLA-A*02:01      GILGFVFTL GILGFVFTL  0  0  0  0  0    GILGFVFTL         PEPLIST 0.4135960    1.015 0.553580    1.022    97.63 <= WB
+   3 HLA-A*02:01      AAAAAAAAA AAAAAAAAA  0  0  0  0  0    AAAAAAAAA         PEPLIST 0.0013960   30.015 0.053580   40.022 30197.63
+   4 HLA-A*02:01      KKKKKKKKK KKKKKKKKK  0  0  0  0  0    KKKKKKKKK         PEPLIST 0.0003960   60.015 0.013580   70.022 40197.63<=WB
+---------------------------------------------------------------------------------------------------------------------------
+
+Protein PEPLIST. Allele HLA-A*02:01. Number of high binders 1. Number of weak binders 1. Number of peptides 4
+
+-----------------------------------------------------------------------------------
+"""
+
+NETMHCSTABPAN_OUTPUT = """
+# NetMHCstabpan version 1.0
+ pos          HLA         peptide      Identity  Pred    Thalf(h) %Rank_Stab BindLevel
+-----------------------------------------------------------------------------------
+   0  HLA-A*02:01       AAAWYLWEV      Sequence 0.620     4.38    0.50 <= SB
+   1  HLA-A*02:01       AAWYLWEVK      Sequence 0.020     0.38   20.00
+   2  HLA-A*02:01       AWYLWEVKK      Sequence 0.020     0.38   20.00
+   3  HLA-A*02:01       WYLWEVKKA      Sequence 0.120     1.38    1.50 <= WB
+-----------------------------------------------------------------------------------
+
+Protein Sequence. Allele HLA-A*02:01. Number of high binders 1. Number of weak binders 1. Number of peptides 4
+"""
+
+
+def test_parse_netchop():
+    parsed = parse_netchop(NETCHOP_OUTPUT)
+    assert parsed.columns == ["Pos", "AA", "C", "score", "Ident"]
+    assert parsed.rows[0] == [1, "M", ".", 0.094106, "sp_P04637"]
+    assert parsed.rows[1] == [2, "E", "S", 0.872087, "sp_P04637"]
+    # 每个蛋白的统计行紧跟在该蛋白的数据行之后
+    assert parsed.summary_rows == [3, 5]
+    assert parsed.rows[3][0].startswith("Number of cleavage sites 1. Number of amino acids 3")
+    assert parsed.rows[3][1:] == [""] * 4
+    assert parsed.rows[4] == [1, "K", "S", 0.913113, "seq2"]
+
+
+def test_parse_netctlpan():
+    parsed = parse_netctlpan(NETCTLPAN_OUTPUT)
+    assert parsed.columns[-1] == "Epitope"
+    assert parsed.rows[0] == [0, "143B_BOVIN_P", "HLA-A02:01", "MLDLQPETT", 0.00868, 0.039, 0.70924, 0.1823, 17.0, ""]
+    # %Rank 后的表位标记单独成列，%Rank 保持数值
+    assert parsed.rows[1][8] == 1.5
+    assert parsed.rows[1][9] == "<-E"
+    assert parsed.rows[2][4:6] == [-0.012, -0.32]
+    assert parsed.summary_rows == [3]
+    assert parsed.rows[3][0] == "Number of MHC ligands 1 identified. Number of CTL epitopes 1 in protein 143B_BOVIN_P"
+
+
+def test_parse_netmhcpan():
+    parsed = parse_netmhcpan(NETMHCPAN_OUTPUT)
+    assert len(parsed.columns) == 17
+    assert parsed.rows[0] == [
+        1, "HLA-A*02:01", "LLFGYPVYV", "LLFGYPVYV", 0, 0, 0, 0, 0, "LLFGYPVYV", "PEPLIST",
+        0.986596, 0.015, 0.85358, 0.022, 7.63, "<= SB"
+    ]
+    assert parsed.rows[1][-1] == "<= WB"
+    assert parsed.rows[2][-1] == ""
+    assert parsed.rows[2][15] == 30197.63
+    # 亲和力与 BindLevel 粘连的行走正则兜底
+    assert parsed.rows[3][15] == 40197.63
+    assert parsed.rows[3][-1] == "<= WB"
+    assert parsed.summary_rows == [4]
+    assert parsed.rows[4][0].startswith("Protein PEPLIST. Allele HLA-A*02:01. Number of high binders 1.")
+
+
+def test_parse_netmhcstabpan():
+    parsed = parse_netmhcstabpan(NETMHCSTABPAN_OUTPUT)
+    assert [row[0] for row in parsed.rows[:4]] == [0, 1, 2, 3]
+    assert parsed.rows[1] == [1, "HLA-A*02:01", "AAWYLWEVK", "Sequence", 0.02, 0.38, 20.0, ""]
+    assert parsed.rows[3][-1] == "<= WB"
+    assert parsed.summary_rows == [4]
+    assert parsed.rows[4][0].startswith("Protein Sequence. Allele HLA-A*02:01.")
+
+
+def test_skips_malformed_lines():
+    output = "   1 HLA-A*02:01 broken line\n12345\n" + NETMHCSTABPAN_OUTPUT
+    parsed = parse_netmhcstabpan(output)
+    assert len(parsed.rows) == 5
+
+
+def _stream(parser: StreamParser, output: str, chunk_size: int = 7):
+    # 按很小的块输入，覆盖行被切断的情况
+    data = output.encode()
+    for start in range(0, len(data), chunk_size):
+        parser.feed(data[start:start + chunk_size])
+    return parser.close()
+
+
+def test_stream_parser_matches_parse_output():
+    assert _stream(StreamParser(NETMHCPAN), NETMHCPAN_OUTPUT) == parse_netmhcpan(NETMHCPAN_OUTPUT)
+    assert _stream(StreamParser(NETMHCSTABPAN), NETMHCSTABPAN_OUTPUT) == parse_netmhcstabpan(NETMHCSTABPAN_OUTPUT)
+
+
+def test_stream_parser_binders_only():
+    parser = StreamParser(NETMHCPAN, binders_only=True)
+    parsed = _stream(parser, NETMHCPAN_OUTPUT)
+    assert [row[2] for row in parsed.rows[:3]] == ["LLFGYPVYV", "GILGFVFTL", "KKKKKKKKK"]
+    # 统计行保留，仍位于该蛋白的数据行之后
+    assert parsed.summary_rows == [3]
+    assert (parser.total_rows, parser.matched_rows) == (4, 3)
+
+    parsed = _stream(StreamParser(NETCTLPAN, binders_only=True), NETCTLPAN_OUTPUT)
+    assert len(parsed.rows) == 2
+    assert parsed.rows[0][3] == "LDLQPETTV"
+    assert parsed.summary_rows == [1]
+
+
+def test_stream_parser_top_k_per_allele():
+    lines = NETMHCPAN_OUTPUT.splitlines()
+    other_allele = lines[5].replace("HLA-A*02:01", "HLA-B*07:02")
+    output = "\n".join(lines[:9] + [other_allele] + lines[9:])
+    parsed = _stream(StreamParser(NETMHCPAN, top_k=2), output)
+    # 每个等位基因保留 Score_EL 最高的 2 行，按原输出顺序排列
+    assert [(row[1], row[0]) for row in parsed.rows if row[1]] == [
+        ("HLA-A*02:01", 1), ("HLA-A*02:01", 2), ("HLA-B*07:02", 1)
+    ]
+    assert parsed.summary_rows == [3]
+
+
+def test_rank_rows():
+    parsed = rank_rows(parse_netmhcpan(NETMHCPAN_OUTPUT), "%Rank_EL", ascending=True, limit=3)
+    assert [row[0] for row in parsed.rows[:3]] == [1, 2, 3]
+    # 统计行放在排序后的数据行之后
+    assert parsed.summary_rows == [3]
+    parsed = rank_rows(parse_netctlpan(NETCTLPAN_OUTPUT), "Comb", ascending=False)
+    assert [row[0] for row in parsed.rows[:3]] == [1, 0, 2]
+
+
+def test_write_parsed_roundtrip(tmp_path, monkeypatch):
+    parsed = parse_netmhcpan(NETMHCPAN_OUTPUT)
+    summary_rows = set(parsed.summary_rows)
+    # 空字符串在 Excel 中为空单元格，读回为 None
+    data = [tuple(value if value != "" else None for value in row)
+            for position, row in enumerate(parsed.rows) if position not in summary_rows]
+    # 单表行数上限为 3（含表头）时数据行拆分到多个工作表，读回时顺序不变
+    monkeypatch.setattr(result_writer, "EXCEL_MAX_ROWS", 3)
+    path = write_parsed(parsed, tmp_path / "result.xlsx")
+    with ResultReader(path) as reader:
+        assert reader.columns == parsed.columns
+        assert list(reader.rows()) == data
+        assert reader.summaries == [parsed.rows[position][0] for position in parsed.summary_rows]
+        assert len(reader._sheets) == 2
+
+
+def benchmark(rows: int = 1_000_000):
+    """各工具解析速度（行/秒）"""
+    samples = {
+        "netchop": (parse_netchop, "   2   E  S   0.872087 sp_P04637\n"),
+        "netctlpan": (parse_netctlpan, "    1 143B_BOVIN_P HLA-A02:01  LDLQPETTV 0.47855 0.53300 0.94011 0.7036  1.50 <-E\n"),
+        "netmhcpan": (parse_netmhcpan, NETMHCPAN_OUTPUT.splitlines()[5] + "\n"),
+        "netmhcstabpan": (parse_netmhcstabpan, "   0  HLA-A*02:01       AAAWYLWEV      Sequence 0.620     4.38    0.50 <= SB\n"),
+    }
+    for name, (parse, line) in samples.items():
+        output = line * rows
+        started = time.perf_counter()
+        parsed = parse(output)
+        elapsed = time.perf_counter() - started
+        assert len(parsed.rows) == rows
+        print(f"{name:15s} {rows / elapsed:12,.0f} 行/秒")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,245 @@
+import asyncio
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from pydantic import ValidationError
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.protocols import NetCTLPanRequest, NetMHCPanRequest
+from src.utils import parallel_utils
+from src.utils.parallel_utils import ShardManifest, cleanup_stale_jobs, merge_excels, run_commands_async
+from src.utils.result_writer import ResultReader, ResultWriter
+from src.utils.summarize import top_k_per_group
+
+PARAMS = {"mhc_allele": "HLA-A02:01", "peptide_length": "9", "mode": 0}
+BAD_JOB_IDS = ["../../../../opt/workspace", "..", "abc", "/etc", "A" * 32, uuid.uuid4().hex + "/x", ""]
+
+
+@pytest.fixture(autouse=True)
+def jobs_dir(tmp_path, monkeypatch):
+    path = tmp_path / "jobs"
+    monkeypatch.setattr(parallel_utils, "SHARD_JOBS_DIR", str(path))
+    return path
+
+
+def test_manifest_resumes_completed_shards(jobs_dir):
+    job_id = uuid.uuid4().hex
+    manifest = ShardManifest("netmhcpan", job_id, PARAMS)
+    assert manifest.job_dir == (jobs_dir / "netmhcpan" / job_id).resolve()
+    split = manifest.job_dir / "split_1.fasta"
+    split.write_text(">p\nSIINFEKL\n")
+    output = manifest.job_dir / "split_1.xlsx"
+    output.write_text("done")
+    manifest.set_splits("all", [str(split)])
+    manifest.mark_done("all:1", str(output), attempts=1)
+    manifest.mark_failed("all:2", "boom", attempts=3)
+
+    resumed = ShardManifest("netmhcpan", job_id, dict(PARAMS))
+    assert resumed.completed_keys() == ["all:1"]
+    assert resumed.get_output("all:1") == str(output)
+    assert resumed.get_output("all:2") is None
+    assert resumed.get_splits("all") == [str(split)]
+
+    # 分片输出被删除后需要重跑
+    output.unlink()
+    assert ShardManifest("netmhcpan", job_id, PARAMS).get_output("all:1") is None
+
+
+def test_manifest_rejects_changed_params():
+    job_id = uuid.uuid4().hex
+    ShardManifest("netmhcpan", job_id, PARAMS)
+    with pytest.raises(ValueError):
+        ShardManifest("netmhcpan", job_id, dict(PARAMS, mhc_allele="HLA-B07:02"))
+
+
+def test_manifest_cleanup_removes_job_dir():
+    manifest = ShardManifest("netctlpan", uuid.uuid4().hex, PARAMS)
+    (manifest.job_dir / "split_1.fasta").write_text(">p\nSIINFEKL\n")
+    manifest.cleanup()
+    assert not manifest.job_dir.exists()
+
+
+@pytest.mark.parametrize("job_id", BAD_JOB_IDS)
+def test_manifest_rejects_unsafe_job_id(jobs_dir, tmp_path, job_id):
+    outside = tmp_path / "workspace"
+    outside.mkdir()
+    with pytest.raises(ValueError):
+        ShardManifest("netmhcpan", job_id, PARAMS)
+    assert outside.exists()
+    assert not (jobs_dir / "netmhcpan").exists() or not any((jobs_dir / "netmhcpan").iterdir())
+
+
+def test_manifest_rejects_symlinked_job_dir(jobs_dir, tmp_path):
+    job_id = uuid.uuid4().hex
+    outside = tmp_path / "workspace"
+    outside.mkdir()
+    (jobs_dir / "netmhcpan").mkdir(parents=True)
+    (jobs_dir / "netmhcpan" / job_id).symlink_to(outside)
+    with pytest.raises(ValueError):
+        ShardManifest("netmhcpan", job_id, PARAMS)
+    assert outside.exists()
+
+
+@pytest.mark.parametrize("model", [NetMHCPanRequest, NetCTLPanRequest])
+def test_request_validates_job_id(model):
+    job_id = uuid.uuid4().hex
+    assert model(input_filename="minio://bucket/a.fasta", job_id=job_id).job_id == job_id
+    assert model(input_filename="minio://bucket/a.fasta").job_id is None
+    for bad in BAD_JOB_IDS:
+        with pytest.raises(ValidationError):
+            model(input_filename="minio://bucket/a.fasta", job_id=bad)
+
+
+def test_cleanup_stale_jobs_keeps_recent(jobs_dir):
+    stale = ShardManifest("netmhcpan", uuid.uuid4().hex, PARAMS)
+    recent = ShardManifest("netmhcpan", uuid.uuid4().hex, PARAMS)
+    old = time.time() - 48 * 3600
+    os.utime(stale.job_dir, (old, old))
+    cleanup_stale_jobs("netmhcpan", retention_hours=24)
+    assert not stale.job_dir.exists()
+    assert recent.job_dir.exists()
+
+
+def _shards(tmp_path, count):
+    files = []
+    for i in range(count):
+        path = tmp_path / f"split_{i + 1}.fasta"
+        path.write_text(">p\nSIINFEKL\n")
+        files.append(str(path))
+    return files
+
+
+@pytest.fixture
+def fast_shards(monkeypatch):
+    monkeypatch.setattr(parallel_utils, "SHARD_RETRY_BACKOFF_SECONDS", 0)
+    monkeypatch.setattr(parallel_utils, "SHARD_SPECULATION_CHECK_INTERVAL", 0.05)
+    monkeypatch.setattr(parallel_utils, "SHARD_SPECULATION_MIN_SECONDS", 0.2)
+    monkeypatch.setattr(parallel_utils, "SHARD_SPECULATION_SLOWDOWN", 1.5)
+
+
+def test_straggler_is_speculatively_reexecuted(tmp_path, fast_shards):
+    files = _shards(tmp_path, 4)
+    calls = []
+    cancelled = []
+
+    async def run_shard(fasta_file):
+        name = Path(fasta_file).name
+        calls.append(name)
+        # 第一次执行 split_4 卡住，重复执行正常完成
+        delay = 30 if name == "split_4.fasta" and calls.count(name) == 1 else 0.1
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(name)
+            raise
+        return f"{name}:{calls.count(name)}"
+
+    started = time.monotonic()
+    results = asyncio.run(run_commands_async(run_shard, files, num_workers=4, speculative=True, pin_cpus=False))
+    assert time.monotonic() - started < 5
+    assert results[:3] == ["split_1.fasta:1", "split_2.fasta:1", "split_3.fasta:1"]
+    assert results[3] == "split_4.fasta:2"
+    assert calls.count("split_4.fasta") == 2
+    assert cancelled == ["split_4.fasta"]
+
+
+def test_no_speculation_when_disabled(tmp_path, fast_shards):
+    files = _shards(tmp_path, 3)
+    calls = []
+
+    async def run_shard(fasta_file):
+        calls.append(Path(fasta_file).name)
+        await asyncio.sleep(0.6 if fasta_file == files[-1] else 0.05)
+        return fasta_file
+
+    assert asyncio.run(run_commands_async(run_shard, files, num_workers=3, speculative=False, pin_cpus=False)) == files
+    assert len(calls) == 3
+
+
+def test_failed_shard_is_retried(tmp_path, fast_shards):
+    files = _shards(tmp_path, 2)
+    calls = []
+
+    async def run_shard(fasta_file):
+        calls.append(fasta_file)
+        if fasta_file == files[0] and calls.count(fasta_file) < 3:
+            raise RuntimeError("transient")
+        return fasta_file
+
+    results = asyncio.run(run_commands_async(
+        run_shard, files, num_workers=2, max_retries=2, speculative=False, pin_cpus=False
+    ))
+    assert results == files
+    assert calls.count(files[0]) == 3
+
+
+def test_manifest_skips_done_shards_and_records_failures(tmp_path, fast_shards):
+    files = _shards(tmp_path, 3)
+    manifest = ShardManifest("netmhcpan", uuid.uuid4().hex, PARAMS)
+    done_output = tmp_path / "split_1.xlsx"
+    done_output.write_text("done")
+    manifest.mark_done("9/split_1.fasta", str(done_output), attempts=1)
+    calls = []
+
+    async def run_shard(fasta_file):
+        calls.append(Path(fasta_file).name)
+        if fasta_file == files[2]:
+            raise RuntimeError("broken shard")
+        return fasta_file + ".xlsx"
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run_commands_async(
+            run_shard, files, num_workers=3, manifest=manifest, shard_group="9",
+            max_retries=1, speculative=False, pin_cpus=False
+        ))
+    assert "split_1.fasta" not in calls
+    assert calls.count("split_3.fasta") == 2
+    # 失败分片之外的分片照常完成并记录，续跑时只需重跑失败的分片
+    resumed = ShardManifest("netmhcpan", manifest.job_id, PARAMS)
+    assert sorted(resumed.completed_keys()) == ["9/split_1.fasta", "9/split_2.fasta"]
+    assert resumed.data["shards"]["9/split_3.fasta"]["status"] == "failed"
+
+
+def _shard(path, columns, rows, summaries):
+    with ResultWriter(path, columns, "xlsx") as writer:
+        for row in rows:
+            writer.append(row)
+        for text in summaries:
+            writer.add_summary(text)
+    return str(path)
+
+
+def test_merge_excels_streams_shards_in_order(tmp_path):
+    columns = ["MHC", "Peptide", "Score_EL", "BindLevel"]
+    first = [("A", "p1", 0.5, "<= WB"), ("B", "p2", 0.9, "<= SB"), ("A", "p3", 0.8, None), ("A", "p4", None, None)]
+    second = [(0.8, "p5", "A", None), (0.1, "p6", "B", None), (0.95, "p7", None, "<= SB")]
+    files = [
+        _shard(tmp_path / "1.xlsx", columns, first, ["Protein 1 summary"]),
+        # 第二个分片列顺序不同，按第一个表的表头对齐
+        _shard(tmp_path / "2.xlsx", ["Score_EL", "Peptide", "MHC", "BindLevel"], second, ["Protein 2 summary"]),
+    ]
+    rows = first + [(mhc, peptide, score, level) for score, peptide, mhc, level in second]
+
+    merged = merge_excels(files, str(tmp_path / "all.xlsx"), "Score_EL", ascending=False, head_rows=2,
+                          count_column="BindLevel")
+    with ResultReader(tmp_path / "all.xlsx") as reader:
+        assert reader.columns == columns
+        assert list(reader.rows()) == rows
+        assert reader.summaries == ["Protein 1 summary", "Protein 2 summary"]
+    assert merged.rows == len(rows)
+    assert merged.head["Peptide"].tolist() == ["p7", "p2"]
+    assert merged.counts == {"<= WB": 1, "<= SB": 2, None: 4}
+
+    # 每个等位基因前 K 行与 top_k_per_group 的结果一致（并列时保留先出现的行，评分或等位基因为空的行保留）
+    limited = merge_excels(files, str(tmp_path / "top.xlsx"), "Score_EL", ascending=False, group_limit=("MHC", 1))
+    expected = top_k_per_group(pd.DataFrame(rows, columns=columns), "Score_EL", "MHC", 1, ascending=False)
+    with ResultReader(tmp_path / "top.xlsx") as reader:
+        assert [row[1] for row in reader.rows()] == expected["Peptide"].tolist() == ["p2", "p3", "p4", "p7"]
+    assert limited.rows == 4
+    assert limited.counts is None and limited.head.empty
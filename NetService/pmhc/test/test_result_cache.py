@@ -0,0 +1,140 @@
+import asyncio
+import json
+import sys
+import threading
+from pathlib import Path
+from typing import Optional
+
+import pytest
+from pydantic import BaseModel
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.utils import result_cache
+from src.utils.result_cache import get_cached_result, run_with_cache, save_result
+
+LINK = json.dumps({"type": "link", "url": "minio://bucket/result.xlsx", "content": "ok"})
+
+
+class DemoRequest(BaseModel):
+    input_file: str
+    bypass_cache: Optional[bool] = False
+
+
+@pytest.fixture(autouse=True)
+def cache_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, "CACHE_DB_PATH", str(tmp_path / "cache" / "result_cache.db"))
+    monkeypatch.setattr(result_cache, "CACHE_ENABLED", True)
+    monkeypatch.setattr(result_cache, "TOOL_VERSIONS", {"netmhcpan": "4.1"})
+
+
+def test_save_and_hit():
+    save_result("netmhcpan", "fp", LINK)
+    assert get_cached_result("netmhcpan", "fp") == LINK
+    assert get_cached_result("netmhcpan", "other") is None
+    assert get_cached_result("netctlpan", "fp") is None
+
+
+def test_only_link_results_are_stored():
+    save_result("netmhcpan", "text", json.dumps({"type": "text", "content": "调用失败"}))
+    save_result("netmhcpan", "broken", "not json")
+    assert get_cached_result("netmhcpan", "text") is None
+    assert get_cached_result("netmhcpan", "broken") is None
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, "time", lambda: now[0])
+    monkeypatch.setattr(result_cache, "CACHE_TTL_SECONDS", 60)
+    save_result("netmhcpan", "fp", LINK)
+    now[0] += 59
+    assert get_cached_result("netmhcpan", "fp") == LINK
+    now[0] += 2
+    assert get_cached_result("netmhcpan", "fp") is None
+
+
+def test_least_recently_used_entry_is_evicted(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, "time", lambda: now[0])
+    monkeypatch.setattr(result_cache, "CACHE_MAX_ENTRIES", 2)
+    for fingerprint in ("a", "b"):
+        now[0] += 1
+        save_result("netmhcpan", fingerprint, LINK)
+    # 访问 a 之后 b 成为最久未访问的条目
+    now[0] += 1
+    assert get_cached_result("netmhcpan", "a") == LINK
+    now[0] += 1
+    save_result("netmhcpan", "c", LINK)
+    assert get_cached_result("netmhcpan", "a") == LINK
+    assert get_cached_result("netmhcpan", "b") is None
+    assert get_cached_result("netmhcpan", "c") == LINK
+
+
+def test_tool_version_change_invalidates(monkeypatch):
+    save_result("netmhcpan", "fp", LINK)
+    monkeypatch.setattr(result_cache, "TOOL_VERSIONS", {"netmhcpan": "4.2"})
+    assert get_cached_result("netmhcpan", "fp") is None
+
+
+def test_run_with_cache_hits_and_bypass(tmp_path):
+    input_file = tmp_path / "input.fasta"
+    input_file.write_text(">p\nSIINFEKL\n")
+    calls = []
+
+    async def run_tool():
+        calls.append(1)
+        return json.dumps({"type": "link", "url": f"minio://bucket/{len(calls)}.xlsx", "content": "ok"})
+
+    def run(bypass_cache=False):
+        request = DemoRequest(input_file=str(input_file), bypass_cache=bypass_cache)
+        return asyncio.run(run_with_cache("netmhcpan", request, run_tool))
+
+    first = run()
+    assert run() == first
+    assert len(calls) == 1
+    # bypass_cache 强制重新执行，新结果写回缓存
+    fresh = run(bypass_cache=True)
+    assert fresh != first
+    assert len(calls) == 2
+    assert run() == fresh
+    assert len(calls) == 2
+
+
+def test_run_with_cache_disabled(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, "CACHE_ENABLED", False)
+    calls = []
+
+    async def run_tool():
+        calls.append(1)
+        return LINK
+
+    request = DemoRequest(input_file=str(tmp_path / "input.fasta"))
+    for _ in range(2):
+        assert asyncio.run(run_with_cache("netmhcpan", request, run_tool)) == LINK
+    assert len(calls) == 2
+
+
+def test_run_with_cache_keeps_sqlite_off_event_loop(tmp_path, monkeypatch):
+    threads = []
+    get_cached, save = result_cache.get_cached_result, result_cache.save_result
+
+    def record(func):
+        def wrapper(*args):
+            threads.append(threading.get_ident())
+            return func(*args)
+        return wrapper
+
+    monkeypatch.setattr(result_cache, "get_cached_result", record(get_cached))
+    monkeypatch.setattr(result_cache, "save_result", record(save))
+
+    async def run_tool():
+        return LINK
+
+    async def main():
+        request = DemoRequest(input_file=str(tmp_path / "input.fasta"))
+        assert await run_with_cache("netmhcpan", request, run_tool) == LINK
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(main())
+    assert len(threads) == 2
+    assert loop_thread not in threads
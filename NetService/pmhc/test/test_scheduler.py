@@ -0,0 +1,146 @@
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.utils import scheduler
+from src.utils.scheduler import FairScheduler, QueueHeadersMiddleware, classify, run_scheduled
+
+
+class DemoHttpRequest:
+    def __init__(self, **headers):
+        self.headers = headers
+        self.state = SimpleNamespace()
+
+
+@pytest.fixture(autouse=True)
+def weights(monkeypatch):
+    monkeypatch.setattr(scheduler, "CLASS_WEIGHTS", {"interactive": 8, "bulk": 1})
+    monkeypatch.setattr(scheduler, "CLASS_COSTS", {"interactive": 1, "bulk": 10})
+    monkeypatch.setattr(scheduler, "TENANT_WEIGHTS", {})
+
+
+async def _dispatch_order(fair, requests):
+    """占住唯一的执行槽位后按顺序提交请求，返回实际执行顺序"""
+    order = []
+
+    async def run(name, tenant, request_class):
+        await fair.acquire(tenant, request_class)
+        order.append(name)
+        fair.release()
+
+    assert await fair.acquire("holder", "interactive") == 0
+    tasks = []
+    for request in requests:
+        tasks.append(asyncio.ensure_future(run(*request)))
+        await asyncio.sleep(0)
+    fair.release()
+    await asyncio.wait_for(asyncio.gather(*tasks), 1)
+    return order
+
+
+def test_interactive_request_overtakes_queued_bulk():
+    order = asyncio.run(_dispatch_order(FairScheduler(1), [
+        ("bulk-1", "default", "bulk"),
+        ("bulk-2", "default", "bulk"),
+        ("rnafold", "default", "interactive"),
+    ]))
+    assert order == ["rnafold", "bulk-1", "bulk-2"]
+
+
+def test_tenant_weights_share_slots(monkeypatch):
+    monkeypatch.setattr(scheduler, "CLASS_COSTS", {"interactive": 1, "bulk": 1})
+    monkeypatch.setattr(scheduler, "TENANT_WEIGHTS", {"a": 2})
+    order = asyncio.run(_dispatch_order(FairScheduler(1), [
+        ("a1", "a", "bulk"), ("a2", "a", "bulk"), ("a3", "a", "bulk"), ("a4", "a", "bulk"),
+        ("b1", "b", "bulk"), ("b2", "b", "bulk"),
+    ]))
+    # 租户 a 权重为 2，按完成标签出队时每执行两个 a 的请求才轮到一个 b 的请求
+    assert order == ["a1", "a2", "b1", "a3", "a4", "b2"]
+
+
+def test_same_flow_is_first_in_first_out():
+    order = asyncio.run(_dispatch_order(FairScheduler(1), [
+        (f"bulk-{i}", "default", "bulk") for i in range(5)
+    ]))
+    assert order == [f"bulk-{i}" for i in range(5)]
+
+
+def test_queue_position_and_cancellation():
+    async def main():
+        fair = FairScheduler(1)
+        await fair.acquire("default", "bulk")
+        first = asyncio.ensure_future(fair.acquire("default", "bulk"))
+        cancelled = asyncio.ensure_future(fair.acquire("default", "bulk"))
+        interactive = asyncio.ensure_future(fair.acquire("default", "interactive"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+
+        fair.release()
+        assert await asyncio.wait_for(interactive, 1) == 1
+        fair.release()
+        assert await asyncio.wait_for(first, 1) == 1
+        fair.release()
+        # 被取消的请求不会占用执行槽位，空闲后虚拟时间归零
+        assert fair._running == 0
+        assert fair._virtual_time == 0.0
+
+    asyncio.run(main())
+
+
+def test_classify_uses_headers_and_tool(monkeypatch):
+    monkeypatch.setattr(scheduler, "BULK_TOOLS", {"netmhcpan"})
+    assert classify(DemoHttpRequest(), "netmhcpan") == ("default", "bulk")
+    assert classify(DemoHttpRequest(), "rnafold") == ("default", "interactive")
+    assert classify(DemoHttpRequest(**{"X-Tenant-Id": "lab", "X-Priority": "Interactive"}), "netmhcpan") == (
+        "lab", "interactive"
+    )
+    assert classify(DemoHttpRequest(**{"X-Priority": "urgent"}), "rnafold") == ("default", "interactive")
+
+
+def test_run_scheduled_records_queue_state(monkeypatch):
+    monkeypatch.setattr(scheduler, "SCHEDULER_ENABLED", True)
+    monkeypatch.setattr(scheduler, "_scheduler", FairScheduler(1))
+
+    async def tool():
+        return "ok"
+
+    http_request = DemoHttpRequest()
+    assert asyncio.run(run_scheduled(http_request, "rnafold", tool())) == "ok"
+    assert http_request.state.queue_position == 0
+    assert http_request.state.queue_class == "interactive"
+    assert scheduler._scheduler._running == 0
+
+
+def test_queue_headers_middleware(monkeypatch):
+    monkeypatch.setattr(scheduler, "SCHEDULER_ENABLED", True)
+    monkeypatch.setattr(scheduler, "_scheduler", FairScheduler(1))
+    app = FastAPI()
+
+    async def tool():
+        return {"type": "text", "content": "ok"}
+
+    @app.get("/rnafold")
+    async def rnafold(http_request: Request):
+        return await run_scheduled(http_request, "rnafold", tool())
+
+    @app.get("/")
+    async def root():
+        return {}
+
+    app.add_middleware(QueueHeadersMiddleware)
+    client = TestClient(app)
+    response = client.get("/rnafold", headers={"X-Priority": "bulk"})
+    assert response.json() == {"type": "text", "content": "ok"}
+    assert response.headers["X-Queue-Position"] == "0"
+    assert response.headers["X-Queue-Class"] == "bulk"
+    assert float(response.headers["X-Queue-Wait-Seconds"]) >= 0
+    # 未经过调度的请求不带排队信息
+    assert "X-Queue-Position" not in client.get("/").headers
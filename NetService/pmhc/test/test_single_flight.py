@@ -0,0 +1,121 @@
+import asyncio
+import sys
+from pathlib import Path
+from typing import Optional
+
+from pydantic import BaseModel
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.utils import single_flight as sf
+from src.utils.single_flight import request_fingerprint, single_flight
+
+
+class DemoRequest(BaseModel):
+    input_file: str
+    mhc_allele: Optional[str] = "HLA-A02:01"
+    num_workers: Optional[int] = None
+
+
+def test_concurrent_requests_share_one_run():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*(single_flight("fp", work) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["result"] * 5
+    assert len(calls) == 1
+    assert sf._inflight == {}
+
+
+def test_different_fingerprints_run_separately():
+    calls = []
+
+    async def work(name):
+        calls.append(name)
+        await asyncio.sleep(0.01)
+        return name
+
+    async def main():
+        return await asyncio.gather(single_flight("a", lambda: work("a")), single_flight("b", lambda: work("b")))
+
+    assert asyncio.run(main()) == ["a", "b"]
+    assert sorted(calls) == ["a", "b"]
+
+
+def test_error_is_propagated_to_every_waiter():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("tool failed")
+
+    async def main():
+        return await asyncio.gather(*(single_flight("fp", work) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(isinstance(result, RuntimeError) and str(result) == "tool failed" for result in results)
+    assert sf._inflight == {}
+
+
+def test_run_is_cancelled_when_all_waiters_leave():
+    cancelled = []
+
+    async def work():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def main():
+        waiters = [asyncio.ensure_future(single_flight("fp", work)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        waiters[0].cancel()
+        await asyncio.sleep(0.01)
+        # 还有一个等待者，任务继续执行
+        assert not cancelled
+        waiters[1].cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert cancelled == [1]
+    assert sf._inflight == {}
+
+
+def test_fingerprint_normalizes_params_and_hashes_local_inputs(tmp_path):
+    first = tmp_path / "a.fasta"
+    second = tmp_path / "b.fasta"
+    other = tmp_path / "c.fasta"
+    first.write_text(">p\nSIINFEKL\n")
+    second.write_text(">p\nSIINFEKL\n")
+    other.write_text(">p\nGILGFVFTL\n")
+
+    async def fingerprint(request, exclude=()):
+        return await request_fingerprint("netmhcpan", request, exclude=exclude)
+
+    base = asyncio.run(fingerprint(DemoRequest(input_file=str(first), mhc_allele="HLA-A02:01,HLA-B07:02")))
+    # 等位基因列表中的空白、输入文件路径不影响指纹，文件内容影响指纹
+    assert asyncio.run(fingerprint(DemoRequest(input_file=str(second), mhc_allele=" HLA-A02:01, HLA-B07:02 "))) == base
+    assert asyncio.run(fingerprint(DemoRequest(input_file=str(other), mhc_allele="HLA-A02:01,HLA-B07:02"))) != base
+    # exclude 中的参数不参与指纹
+    with_workers = DemoRequest(input_file=str(first), mhc_allele="HLA-A02:01,HLA-B07:02", num_workers=8)
+    assert asyncio.run(fingerprint(with_workers)) != base
+    assert asyncio.run(fingerprint(with_workers, exclude=("num_workers",))) == asyncio.run(
+        fingerprint(DemoRequest(input_file=str(first), mhc_allele="HLA-A02:01,HLA-B07:02"), exclude=("num_workers",))
+    )
+
+
+def test_input_content_hash_keeps_suffix(tmp_path):
+    path = tmp_path / "peptides.CSV"
+    path.write_text("peptide\nSIINFEKL\n")
+    assert sf.input_content_hash(str(path)).startswith(".csv:sha256:")
+    assert sf.input_content_hash(str(tmp_path / "missing.csv")) is None
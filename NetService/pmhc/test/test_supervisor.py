@@ -0,0 +1,154 @@
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.utils import supervisor
+from src.utils.supervisor import collect_process_results, run_supervised
+
+PYTHON = sys.executable
+
+
+@pytest.fixture(autouse=True)
+def short_grace(monkeypatch):
+    monkeypatch.setattr(supervisor, "KILL_GRACE_SECONDS", 1)
+
+
+def _alive(pid: int) -> bool:
+    """进程存在且不是僵尸进程"""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def _wait_for_file(path: Path, timeout: float = 5.0) -> str:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if path.exists() and path.read_text().strip():
+            return path.read_text().strip()
+        time.sleep(0.02)
+    raise AssertionError(f"{path} not written")
+
+
+def test_successful_run_collects_output_and_usage():
+    async def main():
+        with collect_process_results() as results:
+            result = await run_supervised("demo", [PYTHON, "-c", "import sys; print('out'); print('err', file=sys.stderr)"])
+        return result, results
+
+    result, results = asyncio.run(main())
+    assert result.returncode == 0
+    assert result.exit_reason == "ok"
+    assert result.stdout.strip() == b"out"
+    assert result.stderr.strip() == b"err"
+    assert result.max_rss_kb > 0
+    assert results == [result]
+
+
+def test_nonzero_exit_is_reported_as_error():
+    result = asyncio.run(run_supervised("demo", [PYTHON, "-c", "raise SystemExit(3)"]))
+    assert result.returncode == 3
+    assert result.exit_reason == "error"
+    assert not result.killed
+
+
+def test_zero_limits_do_not_kill():
+    result = asyncio.run(run_supervised(
+        "demo", [PYTHON, "-c", "import time; time.sleep(0.3); print('x' * 100000)"], timeout=0, max_output_bytes=0
+    ))
+    assert result.exit_reason == "ok"
+    assert len(result.stdout) > 100000
+
+
+def test_timeout_kills_process_group(tmp_path):
+    child_pid_file = tmp_path / "child.pid"
+    started = time.monotonic()
+    result = asyncio.run(run_supervised(
+        "demo", ["sh", "-c", f"sleep 30 & echo $! > {child_pid_file}; wait"], timeout=0.5
+    ))
+    assert time.monotonic() - started < 5
+    assert result.exit_reason == "timeout"
+    assert result.killed
+    assert result.returncode < 0
+    assert b"[supervisor] demo" in result.stderr
+    # 后台子进程与包装脚本在同一进程组中，一并被终止
+    assert not _alive(int(_wait_for_file(child_pid_file)))
+
+
+def test_output_limit_kills_process():
+    result = asyncio.run(run_supervised(
+        "demo", [PYTHON, "-c", "import sys, time\nwhile True:\n    sys.stdout.write('x' * 65536)\n    sys.stdout.flush()"],
+        max_output_bytes=256 * 1024
+    ))
+    assert result.exit_reason == "output_limit"
+    assert result.killed
+
+
+def test_stdout_sink_receives_output_outside_limit():
+    chunks = []
+    result = asyncio.run(run_supervised(
+        "demo", [PYTHON, "-c", "print('y' * 200000)"], max_output_bytes=1024, stdout_sink=chunks.append
+    ))
+    assert result.exit_reason == "ok"
+    assert result.stdout == b""
+    assert b"".join(chunks).strip() == b"y" * 200000
+
+
+def test_cancel_kills_process_group(tmp_path):
+    pid_file = tmp_path / "tool.pid"
+    child_pid_file = tmp_path / "child.pid"
+
+    async def main():
+        task = asyncio.ensure_future(run_supervised(
+            "demo", ["sh", "-c", f"echo $$ > {pid_file}; sleep 30 & echo $! > {child_pid_file}; wait"]
+        ))
+        await asyncio.get_running_loop().run_in_executor(None, _wait_for_file, child_pid_file)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert not _alive(int(_wait_for_file(pid_file)))
+    assert not _alive(int(_wait_for_file(child_pid_file)))
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_getaffinity"), reason="需要 sched_getaffinity")
+def test_cpu_affinity_is_applied_to_child():
+    cpu = min(os.sched_getaffinity(0))
+    script = "import os, time; time.sleep(0.3); print(sorted(os.sched_getaffinity(0)))"
+    result = asyncio.run(run_supervised("demo", [PYTHON, "-c", script], cpus={cpu}))
+    assert result.stdout.strip() == f"[{cpu}]".encode()
+
+
+class _DisconnectingRequest:
+    class url:
+        path = "/demo"
+
+    def __init__(self, after: float):
+        self._deadline = time.monotonic() + after
+
+    async def is_disconnected(self) -> bool:
+        return time.monotonic() >= self._deadline
+
+
+def test_cancel_on_disconnect_stops_tool(tmp_path, monkeypatch):
+    monkeypatch.setattr(supervisor, "DISCONNECT_POLL_INTERVAL", 0.1)
+    pid_file = tmp_path / "tool.pid"
+
+    async def main():
+        return await supervisor.cancel_on_disconnect(
+            _DisconnectingRequest(after=0.5),
+            run_supervised("demo", ["sh", "-c", f"echo $$ > {pid_file}; exec sleep 30"]),
+        )
+
+    started = time.monotonic()
+    assert "客户端已断开连接" in asyncio.run(main())
+    assert time.monotonic() - started < 5
+    assert not _alive(int(_wait_for_file(pid_file)))
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import re
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.utils import profiling, tracing
+from src.utils.log import request_id_context, run_in_executor
+from src.utils.profiling import ProfilingMiddleware
+from src.utils.tracing import TracingMiddleware, add_body_field, remove_body_field
+
+UUID_HEX = re.compile(r"^[0-9a-f]{32}$")
+UNSAFE_IDS = ["../../etc/passwd", "a/b", "..\\x", "id with space", "x" * 65, "id;rm -rf"]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", True)
+    monkeypatch.setattr(profiling, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(profiling, "WORKSPACE", str(tmp_path / "profiles"))
+    uploads = []
+
+    def fake_upload(local_path, bucket, object_name):
+        uploads.append((bucket, object_name))
+        return f"minio://{bucket}/{object_name}"
+
+    monkeypatch.setattr(profiling, "upload_file_to_minio", fake_upload)
+
+    app = FastAPI()
+
+    @app.get("/demo")
+    async def demo():
+        return {"type": "text", "content": "ok"}
+
+    # 与 app.py 相同：追踪中间件在外层，剖析中间件读取其生成的请求 ID
+    app.add_middleware(ProfilingMiddleware)
+    app.add_middleware(TracingMiddleware)
+    test_client = TestClient(app)
+    test_client.uploads = uploads
+    return test_client
+
+
+def test_valid_request_id_is_kept(client):
+    response = client.get("/demo", headers={"X-Request-Id": "job-42.retry_1"})
+    assert response.headers["X-Request-Id"] == "job-42.retry_1"
+
+
+def test_missing_request_id_is_generated(client):
+    assert UUID_HEX.match(client.get("/demo").headers["X-Request-Id"])
+
+
+@pytest.mark.parametrize("request_id", UNSAFE_IDS)
+def test_unsafe_request_id_is_replaced(client, request_id):
+    response = client.get("/demo", headers={"X-Request-Id": request_id})
+    assert UUID_HEX.match(response.headers["X-Request-Id"])
+
+
+def test_profile_files_do_not_use_request_id(client, tmp_path):
+    response = client.get("/demo", headers={"X-Request-Id": "job-42", "X-Profile": "1"})
+    assert response.headers["X-Profile-Status"] == "done"
+    files = sorted(path.name for path in (tmp_path / "profiles").iterdir())
+    assert len(files) == 2
+    assert all(UUID_HEX.match(Path(name).stem) for name in files)
+    # 请求 ID 只出现在报告内容中
+    report = next((tmp_path / "profiles").glob("*.txt")).read_text(encoding="utf-8")
+    assert "request_id: job-42" in report
+    assert [bucket for bucket, _ in client.uploads] == [profiling.PROFILE_BUCKET] * 2
+    assert all("job-42" not in object_name for _, object_name in client.uploads)
+    assert response.json()["profile"]["report"].startswith(f"minio://{profiling.PROFILE_BUCKET}/")
+
+
+@pytest.mark.parametrize("payload", [{"type": "text", "content": "中文 }"}, {}])
+def test_add_and_remove_body_field(payload):
+    value = {"stages": {"下载": 1.5}}
+    # 接口返回的 JSON 字符串被 FastAPI 再编码一次，两种形式都要支持
+    for body, decode in [
+        (json.dumps(payload, ensure_ascii=False).encode(), json.loads),
+        (json.dumps(json.dumps(payload, ensure_ascii=False), ensure_ascii=False).encode(),
+         lambda data: json.loads(json.loads(data))),
+    ]:
+        added = add_body_field(body, "timings", value)
+        assert decode(added) == {**payload, "timings": value}
+        assert decode(remove_body_field(added, "timings")) == payload
+        # 不含该字段时原样返回
+        assert remove_body_field(body, "timings") is body
+    assert add_body_field(b"[1, 2]", "timings", value) == b"[1, 2]"
+
+
+def test_executor_work_keeps_request_id():
+    async def main():
+        token = request_id_context.set("job-7")
+        try:
+            return await run_in_executor(None, request_id_context.get)
+        finally:
+            request_id_context.reset(token)
+
+    assert asyncio.run(main()) == "job-7"
@@ -1,70 +1,112 @@
-import json
-import traceback
-
-from src.protocols import (
-    PisteRequest,
-    PMTNetRequest,
-)
-
-from src.tools.PMTNet.pMTnet import run_pMTnet
-from src.tools.Piste.piste import run_PISTE
-
-async def piste(request: PisteRequest) -> str:
-    """
-    Run the PISTE tool on a given input file and return results.
-
-    Args:
-        input_file_dir (str): MinIO路径，例如 minio://bucket/file.csv
-        model_name (str, optional): 使用的模型名，如 random、unipep、reftcr。
-        threshold (float, optional): binder判定阈值（0-1）。
-        antigen_type (str, optional): 抗原类型，MT 或 WT。
-
-    Returns:
-        str: JSON格式的预测结果
-    """
-    input_file_dir_minio = request.input_file_dir_minio
-    model_name = request.model_name
-    threshold = request.threshold
-    antigen_type = request.antigen_type
-    try:
-        return await run_PISTE(
-            input_file_dir_minio,model_name,threshold,antigen_type
-        )
-
-    except Exception as e:
-        # result = {
-        #     "type": "text",
-        #     "content": f"调用Piste工具失败: {e}"
-        # }
-        # return json.dumps(result, ensure_ascii=False)
-        result = {
-        "type": "text",
-        "content": f"调用Piste工具失败: {str(e)}\n详细错误:\n{traceback.format_exc()}"
-    }
-    return json.dumps(result, ensure_ascii=False)
-
-async def pmtnet(request: PMTNetRequest) -> str:
-    """
-     Run the pMTnet tool on a given input file directory and return the results.
-     Args:
-         input_file_dir (str): The path to the input file directory.
-     Returns:
-         str: The JSON-formatted results of the pMTnet analysis.
-    """
-    input_file_dir_minio = request.input_file_dir_minio
-    try:
-        return await run_pMTnet(
-            input_file_dir_minio
-        )
-
-    except Exception as e:
-        # result = {
-        #     "type": "text",
-        #     "content": f"调用PMTNet工具失败: {e}"
-        # }
-        # return json.dumps(result, ensure_ascii=False)        
-        result = {
-        "type": "text",
-        "content": f"调用PMTnet工具失败: {str(e)}\n详细错误:\n{traceback.format_exc()}"
-    }
-    return json.dumps(result, ensure_ascii=False)
\ No newline at end of file
+import json
+
+from fastapi import HTTPException, Request
+import traceback
+
+from src.protocols import (
+    PisteRequest,
+    PMTNetRequest,
+    EstimateRequest,
+)
+
+from src.tools.PMTNet.pMTnet import run_pMTnet
+from src.tools.Piste.piste import run_PISTE
+from src.utils.estimator import estimate_summary
+from src.utils.tool_runner import run_tool
+
+async def piste(request: PisteRequest, http_request: Request) -> str:
+    """
+    Run the PISTE tool on a given input file and return results.
+
+    Args:
+        input_file_dir (str): MinIO路径，例如 minio://bucket/file.csv
+        model_name (str, optional): 使用的模型名，如 random、unipep、reftcr。
+        threshold (float, optional): binder判定阈值（0-1）。
+        antigen_type (str, optional): 抗原类型，MT 或 WT。
+
+    Returns:
+        str: JSON格式的预测结果
+    """
+    input_file_dir_minio = request.input_file_dir_minio
+    model_name = request.model_name
+    threshold = request.threshold
+    antigen_type = request.antigen_type
+    try:
+        return await run_tool(http_request, "piste", request, lambda: run_PISTE(
+            input_file_dir_minio,model_name,threshold,antigen_type
+        ), admitted=True)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        # result = {
+        #     "type": "text",
+        #     "content": f"调用Piste工具失败: {e}"
+        # }
+        # return json.dumps(result, ensure_ascii=False)
+        result = {
+        "type": "text",
+        "content": f"调用Piste工具失败: {str(e)}\n详细错误:\n{traceback.format_exc()}"
+    }
+    return json.dumps(result, ensure_ascii=False)
+
+async def pmtnet(request: PMTNetRequest, http_request: Request) -> str:
+    """
+     Run the pMTnet tool on a given input file directory and return the results.
+     Args:
+         input_file_dir (str): The path to the input file directory.
+     Returns:
+         str: The JSON-formatted results of the pMTnet analysis.
+    """
+    input_file_dir_minio = request.input_file_dir_minio
+    try:
+        return await run_tool(http_request, "pmtnet", request, lambda: run_pMTnet(
+            input_file_dir_minio
+        ), admitted=True)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        # result = {
+        #     "type": "text",
+        #     "content": f"调用PMTNet工具失败: {e}"
+        # }
+        # return json.dumps(result, ensure_ascii=False)        
+        result = {
+        "type": "text",
+        "content": f"调用PMTnet工具失败: {str(e)}\n详细错误:\n{traceback.format_exc()}"
+    }
+    return json.dumps(result, ensure_ascii=False)
+
+
+# /estimate 支持的工具及其请求模型
+ESTIMATE_TOOLS = {
+    "piste": PisteRequest,
+    "pmtnet": PMTNetRequest,
+}
+
+
+async def estimate(request: EstimateRequest) -> str:
+    """
+    估算工具请求的运行开销（不执行工具），供调用方规划任务。
+    Args:
+        tool (str): 工具名称，如 piste、pmtnet
+        params (dict): 该工具的请求参数，与对应接口的请求体一致
+    Returns:
+        str: JSON 字符串，content 为 JSON 格式的估算结果，包含输入统计量、工作量、历史记录数、预估 CPU 时间/耗时/峰值内存以及推荐的 num_workers
+    """
+    try:
+        request_model = ESTIMATE_TOOLS.get(request.tool)
+        if request_model is None:
+            raise ValueError(f"不支持的工具: {request.tool}，可选: {', '.join(ESTIMATE_TOOLS)}")
+        summary = await estimate_summary(request.tool, request_model(**request.params))
+        result = {
+            "type": "text",
+            "content": json.dumps(summary, ensure_ascii=False)
+        }
+    except Exception as e:
+        result = {
+            "type": "text",
+            "content": f"估算工具开销失败: {str(e)}"
+        }
+    return json.dumps(result, ensure_ascii=False)
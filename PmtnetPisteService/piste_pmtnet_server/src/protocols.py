@@ -1,11 +1,18 @@
-from typing import Optional
-from pydantic  import BaseModel
- 
-class PisteRequest(BaseModel):
-    input_file_dir_minio: str    
-    model_name: Optional[str] = "random" 
-    threshold:Optional[float] = 0.5
-    antigen_type: Optional[str] = "MT" 
-
-class PMTNetRequest(BaseModel):
-    input_file_dir_minio: str    
\ No newline at end of file
+from typing import Optional, Any, Dict
+from pydantic  import BaseModel
+ 
+class PisteRequest(BaseModel):
+    input_file_dir_minio: str    
+    model_name: Optional[str] = "random" 
+    threshold:Optional[float] = 0.5
+    antigen_type: Optional[str] = "MT" 
+    bypass_cache: Optional[bool] = False
+
+class PMTNetRequest(BaseModel):
+    input_file_dir_minio: str
+    bypass_cache: Optional[bool] = False
+
+
+class EstimateRequest(BaseModel):
+    tool: str
+    params: Optional[Dict[str, Any]] = {}
@@ -17,7 +17,13 @@ project_root = current_file.parents[3]
 sys.path.append(str(project_root))
 from config import CONFIG_YAML
 from src.tools.PMTNet.parse_pMTnet_result import parse_pmtnet_result
+from src.utils.hits import top_hits, with_hits
 from src.utils.log import logger
+from src.utils.supervisor import run_supervised
+from src.utils.tracing import traced
+from src.utils.minio_utils import InstrumentedMinio
+from src.utils.summarize import read_table
+from src.utils.thread_budget import thread_lease
 
 load_dotenv()
 #动态获取文件路径
@@ -39,7 +45,7 @@ MINIO_BUCKET = MINIO_CONFIG["pmtnet_bucket"]
 MINIO_SECURE = MINIO_CONFIG.get("secure", False)
 
 # 初始化 MinIO 客户端
-minio_client = Minio(
+minio_client = InstrumentedMinio(
     MINIO_ENDPOINT,
     access_key=MINIO_ACCESS_KEY,
     secret_key=MINIO_SECRET_KEY,
@@ -119,6 +125,7 @@ def check_minio_connection():
         print(f"MinIO连接或bucket操作失败: {e}")
         return False
 
+@traced()
 async def run_pMTnet(input_file_dir_minio: str):
     
     if check_minio_connection():
@@ -134,14 +141,11 @@ async def run_pMTnet(input_file_dir_minio: str):
 
     try:
         # 使用 subprocess 运行命令
-        process = await asyncio.create_subprocess_exec(
-            *command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
+        with thread_lease("pmtnet") as env:
+            process = await run_supervised("pmtnet", command, env=env)
 
         # 等待进程完成并获取输出
-        stdout, stderr = await process.communicate()
+        stdout, stderr = process.stdout, process.stderr
         print(f"[STDOUT]\n{stdout.decode()}")
         print(f"[STDERR]\n{stderr.decode()}")
         #exit()
@@ -155,23 +159,41 @@ async def run_pMTnet(input_file_dir_minio: str):
         stdout_decoded = stdout.decode()
         stderr_decoded = stderr.decode()
 
-        # 提取 MinIO 路径
+        # 提取 MinIO 路径和本地结果文件路径
         pmtnet_results_path = None
+        local_results_path = None
         for line in stdout_decoded.split('\n'):
             if line.startswith('MinIO path: '):
                 pmtnet_results_path = line[len('MinIO path: '):].strip()
-                break
+            elif line.startswith('Local path: '):
+                local_results_path = line[len('Local path: '):].strip()
 
         # 返回结果
-        if pmtnet_results_path is None:
-            raise ValueError("MinIO path not found in the output.")
-        markdown_content = parse_pmtnet_result(pmtnet_results_path)
+        result_df = None
+        try:
+            if pmtnet_results_path is None:
+                raise ValueError("MinIO path not found in the output.")
+            if local_results_path and Path(local_results_path).exists():
+                # 直接解析本地结果文件，避免从 MinIO 重新下载
+                result_df = read_table(local_results_path)
+                markdown_content = parse_pmtnet_result(
+                    result_df if result_df is not None else local_results_path
+                )
+            else:
+                markdown_content = parse_pmtnet_result(pmtnet_results_path)
+        finally:
+            # pMTnet_script.py 不再删除本地结果文件，由这里清理（解析失败也清理）
+            if local_results_path and Path(local_results_path).exists():
+                Path(local_results_path).unlink()
+                logger.info(f"Deleted local file: {local_results_path}")
         # print(markdown_content)
         result = {
         "type": "link",
         "url": pmtnet_results_path,
         "content": markdown_content,
         }     
+        # 按 Rank 升序的 top hits（仅本地结果可用时）
+        with_hits(result, top_hits(result_df, "Rank", ascending=True, columns=["CDR3", "Antigen", "HLA", "Rank"]))
         return json.dumps(result, ensure_ascii=False)  
 
     except asyncio.CancelledError:
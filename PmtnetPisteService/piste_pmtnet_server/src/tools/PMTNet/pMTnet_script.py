@@ -326,6 +326,20 @@ TCR_array=TCRMap(TCR_list,aa_dict_atchley)
 antigen_array=antigenMap(antigen_list,15,'BLOSUM50')
 HLA_array=HLAMap(HLA_list,'BLOSUM50')
 
+# 线程数由调用方按服务线程预算分配（见 src/utils/thread_budget.py）
+intra_op_threads = int(os.getenv("TF_NUM_INTRAOP_THREADS", "0"))
+inter_op_threads = int(os.getenv("TF_NUM_INTEROP_THREADS", "0"))
+if intra_op_threads or inter_op_threads:
+    if hasattr(K, "set_session"):
+        tf_v1 = tf.compat.v1 if hasattr(tf, "compat") else tf
+        K.set_session(tf_v1.Session(config=tf_v1.ConfigProto(
+            intra_op_parallelism_threads=intra_op_threads,
+            inter_op_parallelism_threads=inter_op_threads
+        )))
+    else:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
 #Model prediction                                                                                                                         
 TCR_encoder=load_model(model_dir+'/TCR_encoder_30.h5')
 TCR_encoder=Model(TCR_encoder.input,TCR_encoder.layers[-12].output)
@@ -394,20 +408,8 @@ rank_output_matrix.to_csv(output_file_to_local, sep=',', index=False)
 if not minio_client.bucket_exists(MINIO_BUCKET):
     minio_client.make_bucket(MINIO_BUCKET)
 minio_path = upload_to_minio(minio_client, output_file_to_local, MINIO_BUCKET, object_name)
-if minio_path.startswith("minio://") :
-    try:
-        if not isinstance(output_file_to_local, Path):
-                output_file_to_local = Path(output_file_to_local)
-        if output_file_to_local.exists():
-            output_file_to_local.unlink()
-            logger.info(f"Deleted local file: {output_file_to_local}")
-            # print(f"Deleted local file: {output_file_to_local}")
-        else:
-            logger.warning(f"Local file does not exist: {output_file_to_local}")
-            # print(f"Local file does not exist: {output_file_to_local}")
-    except Exception as e:
-        logger.error(f"Error deleting local file: {e}")
-        # print(f"Error deleting local file: {e}")
+# 本地结果文件保留给调用方直接解析，由调用方负责删除
+print(f"Local path: {output_file_to_local}")
 # print('\nPrediction Accomplished.\n')
 logger.info('\nPrediction Accomplished.\n')
     # log_file.close()
@@ -14,6 +14,9 @@ current_file = Path(__file__).resolve()
 project_root = current_file.parents[3]
 sys.path.append(str(project_root))
 from src.utils.log import logger
+from src.utils.metrics import stage_timer
+from src.utils.summarize import DEFAULT_LIMIT, markdown_table, top_k, truncation_note
+from src.utils.minio_utils import InstrumentedMinio
 
 # MinIO 配置
 MINIO_CONFIG = CONFIG_YAML["MINIO"]
@@ -22,7 +25,7 @@ MINIO_ACCESS_KEY = os.getenv("ACCESS_KEY")
 MINIO_SECRET_KEY = os.getenv("SECRET_KEY")
 MINIO_SECURE = MINIO_CONFIG.get("secure", False)
 
-minio_client = Minio(
+minio_client = InstrumentedMinio(
     MINIO_ENDPOINT,
     access_key=MINIO_ACCESS_KEY,
     secret_key=MINIO_SECRET_KEY,
@@ -84,6 +87,7 @@ def check_minio_connection():
         print(f"MinIO连接或bucket操作失败: {e}")
         return False
 
+@stage_timer("parse")
 def parse_piste_result(minio_path: str) -> str:
     """
     解析 MinIO 上的 PISTE 结果文件，返回按 predicted_score 降序排序后的 Markdown 表格。
@@ -98,28 +102,16 @@ def parse_piste_result(minio_path: str) -> str:
         # 读取 CSV 文件
         df = pd.read_csv(result_file_path)
 
-        # 按 predicted_score 降序排序
-        df_sorted = df.sort_values(by='predicted_score', ascending=False)
-
-        truncated = False
-        if len(df_sorted) > 7:
-            df_sorted = df_sorted.head(7)
-            truncated = True
+        # 按 predicted_score 降序取前 7 行
+        df_top = top_k(df, 'predicted_score', DEFAULT_LIMIT, ascending=False)
 
         # 构建 Markdown 表格
-        markdown_lines = [
-            "| CDR3 | MT_pep | HLA_type | HLA_sequence | predicted_label | predicted_score |",
-            "|------|--------|----------|---------------|------------------|------------------|"
-        ]
-
-        for _, row in df_sorted.iterrows():
-            markdown_lines.append(
-                f"| {row.get('CDR3', '-')} | {row.get('MT_pep', '-')} | {row.get('HLA_type', '-')} | "
-                f"{row.get('HLA_sequence', '-')} | {row.get('predicted_label', '-')} | {row.get('predicted_score', 0):.6f} |"
-            )
-
-        if truncated:
-            markdown_lines.append("\n⚠️ 结果超过 7 行，仅显示前 7 行，全部内容请下载表格查看。")
+        markdown_lines = markdown_table(
+            df_top,
+            ["CDR3", "MT_pep", "HLA_type", "HLA_sequence", "predicted_label", "predicted_score"],
+            formats={"predicted_score": "{:.6f}".format},
+        )
+        markdown_lines += truncation_note(len(df), len(df_top))
         # 删除临时文件
         file_path = Path(result_file_path)
         file_path.unlink()
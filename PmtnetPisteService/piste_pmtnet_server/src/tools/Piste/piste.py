@@ -16,6 +16,10 @@ current_script_dir = current_file.parent
 project_root = current_file.parents[3]
 sys.path.append(str(project_root))
 from src.utils.log import logger
+from src.utils.supervisor import run_supervised
+from src.utils.tracing import traced
+from src.utils.minio_utils import InstrumentedMinio
+from src.utils.thread_budget import thread_lease
 from config import CONFIG_YAML
 load_dotenv()
 # PISTE 相关路径配置
@@ -37,7 +41,7 @@ MINIO_ACCESS_KEY = os.getenv("ACCESS_KEY")
 MINIO_SECRET_KEY = os.getenv("SECRET_KEY")
 MINIO_SECURE = MINIO_CONFIG.get("secure", False)
 
-minio_client = Minio(
+minio_client = InstrumentedMinio(
     MINIO_ENDPOINT,
     access_key=MINIO_ACCESS_KEY,
     secret_key=MINIO_SECRET_KEY,
@@ -98,6 +102,7 @@ def check_minio_connection():
         return False
 
 
+@traced()
 async def run_PISTE(input_file_dir_minio: str,
                     model_name=None,
                     threshold=None,
@@ -122,13 +127,10 @@ async def run_PISTE(input_file_dir_minio: str,
         command += ["--antigen_type", antigen_type]
 
     try:
-        process = await asyncio.create_subprocess_exec(
-            *map(str, command),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
+        with thread_lease("piste") as env:
+            process = await run_supervised("piste", command, env=env)
 
-        stdout, stderr = await process.communicate()
+        stdout, stderr = process.stdout, process.stderr
         #print(f"[STDOUT]\n{stdout.decode()}")
         #print(f"[STDERR]\n{stderr.decode()}")
         #exit()
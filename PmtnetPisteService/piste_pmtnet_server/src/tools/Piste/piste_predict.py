@@ -97,6 +97,12 @@ d_layers = 1
 interact_layers = 1
 window_size = '3'
 
+# 线程数由调用方按服务线程预算分配（见 src/utils/thread_budget.py）
+if os.getenv("OMP_NUM_THREADS"):
+    torch.set_num_threads(int(os.getenv("OMP_NUM_THREADS")))
+if os.getenv("TF_NUM_INTEROP_THREADS"):
+    torch.set_num_interop_threads(int(os.getenv("TF_NUM_INTEROP_THREADS")))
+
 use_cuda = torch.cuda.is_available()
 device = torch.device("cuda:0" if use_cuda else "cpu")
 vocab = {'C': 1, 'W': 2, 'V': 3, 'A': 4, 'H': 5, 'T': 6, 'E': 7, 'K': 8, 'N': 9, 'P': 10, 'I': 11, 'L': 12, 'S': 13, 'D': 14, 'G': 15, 'Q': 16, 'R': 17, 'Y': 18, 'F': 19, 'M': 20, '-': 0}
@@ -0,0 +1,228 @@
+"""
+基于内存的准入控制
+
+模型类工具（PISTE、pMTnet、BigMHC、NetTCR、ImmuneApp、UniPMT 等）每个请求都会在子进程中加载
+数百 MB 的模型，突发并发时容易触发容器 OOM。准入控制在工具真正运行前：
+1. 根据运行历史按请求工作量估算本次运行的峰值内存（estimator.py）；
+2. 在 cgroup 内存上限内还有余量时放行，否则按先来先服务排队；
+3. 排队请求数超过上限时直接返回 429，并在 Retry-After 中给出建议的重试时间。
+运行结束后记录实际峰值内存（wait4 的 ru_maxrss），用于修正后续估算。
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import HTTPException
+
+from src.utils.estimator import estimate_for_units, estimate_work_units
+from src.utils.log import logger
+from src.utils.metrics import QUEUE_WAIT
+from src.utils.run_history import recent_runs
+from config import CONFIG_YAML
+
+ADMISSION_CONFIG = CONFIG_YAML.get("ADMISSION", {})
+ADMISSION_ENABLED = ADMISSION_CONFIG.get("enabled", True)
+MEMORY_FRACTION = ADMISSION_CONFIG.get("memory_fraction", 0.85)
+MAX_QUEUE = ADMISSION_CONFIG.get("max_queue", 16)
+SAFETY_FACTOR = ADMISSION_CONFIG.get("safety_factor", 1.2)
+DEFAULT_RSS_MB = ADMISSION_CONFIG.get("default_rss_mb", {})
+FALLBACK_RSS_MB = ADMISSION_CONFIG.get("fallback_rss_mb", 2048)
+DEFAULT_RETRY_AFTER = ADMISSION_CONFIG.get("retry_after_seconds", 60)
+POLL_INTERVAL = ADMISSION_CONFIG.get("poll_interval", 2.0)
+
+
+class AdmissionRejected(HTTPException):
+    """排队已满，返回 429 Too Many Requests"""
+
+    def __init__(self, tool: str, retry_after: int):
+        super().__init__(
+            status_code=429,
+            detail=f"{tool} 当前排队请求过多，请 {retry_after} 秒后重试",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
+def _read_first_line(path: str) -> Optional[str]:
+    try:
+        with open(path, "r") as f:
+            return f.readline().strip()
+    except OSError:
+        return None
+
+
+def _meminfo_kb(field: str) -> Optional[int]:
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def memory_limit_kb() -> int:
+    """容器可用内存上限：优先读取 cgroup v2/v1，未设置限制时取物理内存"""
+    value = _read_first_line("/sys/fs/cgroup/memory.max")
+    if value and value != "max":
+        return int(value) // 1024
+    value = _read_first_line("/sys/fs/cgroup/memory/memory.limit_in_bytes")
+    total_kb = _meminfo_kb("MemTotal") or 0
+    if value and value.isdigit() and (not total_kb or int(value) // 1024 < total_kb):
+        return int(value) // 1024
+    return total_kb
+
+
+def memory_usage_kb() -> int:
+    """容器当前已用内存"""
+    for path in ("/sys/fs/cgroup/memory.current", "/sys/fs/cgroup/memory/memory.usage_in_bytes"):
+        value = _read_first_line(path)
+        if value and value.isdigit():
+            return int(value) // 1024
+    total_kb = _meminfo_kb("MemTotal") or 0
+    available_kb = _meminfo_kb("MemAvailable") or total_kb
+    return total_kb - available_kb
+
+
+def estimate_peak_rss_kb(tool: str, work_units: float) -> int:
+    """
+    估算工具本次运行的峰值内存（KB）
+
+    由 estimator 按工作量和历史运行记录拟合，并乘以安全系数；历史不足时使用配置的默认值。
+    """
+    peak_rss_kb = estimate_for_units(tool, work_units).peak_rss_kb
+    if peak_rss_kb is None:
+        return int(DEFAULT_RSS_MB.get(tool, FALLBACK_RSS_MB) * 1024)
+    return int(peak_rss_kb * SAFETY_FACTOR)
+
+
+def estimate_wall_seconds(tool: str) -> float:
+    """工具单次运行耗时的中位数，历史为空时返回默认重试间隔"""
+    walls = sorted(run.wall_seconds for run in recent_runs(tool))
+    if not walls:
+        return DEFAULT_RETRY_AFTER
+    return walls[len(walls) // 2]
+
+
+def _self_rss_kb() -> int:
+    """服务进程自身的常驻内存"""
+    value = None
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    value = int(line.split()[1])
+                    break
+    except OSError:
+        pass
+    return value or 0
+
+
+class AdmissionController:
+    """按预估峰值内存预留额度，额度不足时先来先服务排队"""
+
+    def __init__(self):
+        self._reserved_kb = 0
+        self._running = 0
+        self._waiters = deque()
+
+    def _fits(self, estimate_kb: int) -> bool:
+        if self._running == 0:
+            # 没有正在运行的任务时总是放行，避免预估偏大导致永远无法执行
+            return True
+        budget_kb = memory_limit_kb() * MEMORY_FRACTION
+        if self._reserved_kb + _self_rss_kb() + estimate_kb > budget_kb:
+            return False
+        # 同时参考实际用量，覆盖其他 worker 进程或未经准入控制的工具
+        return memory_usage_kb() + estimate_kb <= budget_kb
+
+    def _reserve(self, estimate_kb: int) -> None:
+        self._reserved_kb += estimate_kb
+        self._running += 1
+
+    def release(self, estimate_kb: int) -> None:
+        self._reserved_kb -= estimate_kb
+        self._running -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        # 严格按排队顺序放行，队首放不下时后面的请求也继续等待，避免大请求饿死
+        while self._waiters:
+            estimate_kb, future = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            if not self._fits(estimate_kb):
+                break
+            self._waiters.popleft()
+            self._reserve(estimate_kb)
+            future.set_result(None)
+
+    async def acquire(self, tool: str, estimate_kb: int) -> None:
+        if not self._waiters and self._fits(estimate_kb):
+            self._reserve(estimate_kb)
+            return
+        if len(self._waiters) >= MAX_QUEUE:
+            retry_after = math.ceil(
+                estimate_wall_seconds(tool) * (len(self._waiters) + 1) / max(self._running, 1)
+            )
+            logger.warning(f"{tool} 准入排队已满（{len(self._waiters)}），拒绝请求")
+            raise AdmissionRejected(tool, max(retry_after, 1))
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (estimate_kb, future)
+        self._waiters.append(entry)
+        logger.info(
+            f"{tool} 预估峰值内存 {estimate_kb / 1024:.0f}MB，内存余量不足，排队等待（第 {len(self._waiters)} 位）"
+        )
+        try:
+            while not future.done():
+                try:
+                    await asyncio.wait_for(asyncio.shield(future), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    # 其他进程释放内存时不会触发 release，定期重新检查
+                    self._wake()
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(estimate_kb)
+            else:
+                future.cancel()
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+            raise
+
+
+_controller = AdmissionController()
+
+
+@asynccontextmanager
+async def admission_slot(tool: str, request):
+    """
+    在内存准入控制下预留额度，退出时释放
+
+    Args:
+        tool: 工具名称
+        request: pydantic 请求模型，按其输入规模估算峰值内存
+
+    Yields:
+        本次请求的工作量，供 run_measured 复用；未启用准入控制时为 None
+
+    Raises:
+        AdmissionRejected: 排队请求数超过上限
+    """
+    if not ADMISSION_ENABLED:
+        yield None
+        return
+    work_units = await estimate_work_units(tool, request)
+    estimate_kb = estimate_peak_rss_kb(tool, work_units)
+    enqueued = time.monotonic()
+    await _controller.acquire(tool, estimate_kb)
+    QUEUE_WAIT.observe(time.monotonic() - enqueued, tool=tool, queue="admission")
+    try:
+        yield work_units
+    finally:
+        _controller.release(estimate_kb)
+
@@ -0,0 +1,135 @@
+"""
+已完成工具结果的内容寻址缓存
+
+缓存键 = 工具名 + 工具版本 + 请求指纹（规范化参数 + 输入文件 ETag/sha256，见 single_flight.py），
+缓存值为工具返回的 JSON 字符串（包含已上传结果的 MinIO 地址和 markdown 内容）。
+缓存存放在本地 sqlite 文件中，服务重启后仍然有效，按 TTL 过期并按最近访问时间做 LRU 淘汰。
+sqlite 读写（含淘汰）在线程池中执行，不阻塞事件循环。
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import time
+
+from src.utils.log import logger
+from src.utils.metrics import record_cache_lookup
+from src.utils.single_flight import request_fingerprint, single_flight
+from config import CONFIG_YAML
+
+CACHE_CONFIG = CONFIG_YAML.get("CACHE", {})
+CACHE_ENABLED = CACHE_CONFIG.get("enabled", True)
+CACHE_DB_PATH = CACHE_CONFIG.get("db_path", "/opt/tmp/cache/result_cache.db")
+CACHE_TTL_SECONDS = CACHE_CONFIG.get("ttl_seconds", 7 * 24 * 3600)
+CACHE_MAX_ENTRIES = CACHE_CONFIG.get("max_entries", 10000)
+TOOL_VERSIONS = CACHE_CONFIG.get("tool_versions", {})
+
+
+def _connect():
+    os.makedirs(os.path.dirname(CACHE_DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(CACHE_DB_PATH, timeout=5)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS result_cache ("
+        " cache_key TEXT PRIMARY KEY,"
+        " tool TEXT NOT NULL,"
+        " result TEXT NOT NULL,"
+        " created_at REAL NOT NULL,"
+        " last_access REAL NOT NULL)"
+    )
+    return conn
+
+
+def _cache_key(tool: str, fingerprint: str) -> str:
+    return f"{tool}:{TOOL_VERSIONS.get(tool, 'unknown')}:{fingerprint}"
+
+
+def get_cached_result(tool: str, fingerprint: str):
+    """命中且未过期时返回缓存的结果 JSON 字符串，否则返回 None"""
+    cache_key = _cache_key(tool, fingerprint)
+    now = time.time()
+    conn = _connect()
+    try:
+        with conn:
+            row = conn.execute(
+                "SELECT result, created_at FROM result_cache WHERE cache_key = ?",
+                (cache_key,)
+            ).fetchone()
+            if row is None:
+                return None
+            result, created_at = row
+            if now - created_at > CACHE_TTL_SECONDS:
+                conn.execute("DELETE FROM result_cache WHERE cache_key = ?", (cache_key,))
+                return None
+            conn.execute(
+                "UPDATE result_cache SET last_access = ? WHERE cache_key = ?",
+                (now, cache_key)
+            )
+        logger.info(f"命中结果缓存: {cache_key[:64]}")
+        return result
+    finally:
+        conn.close()
+
+
+def save_result(tool: str, fingerprint: str, result) -> None:
+    """只缓存成功上传了结果文件的返回（type 为 link）"""
+    try:
+        if json.loads(result).get("type") != "link":
+            return
+    except (TypeError, ValueError, AttributeError):
+        return
+    cache_key = _cache_key(tool, fingerprint)
+    now = time.time()
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO result_cache (cache_key, tool, result, created_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (cache_key, tool, result, now, now)
+            )
+            # 过期淘汰 + 超出容量时按最近访问时间淘汰
+            conn.execute(
+                "DELETE FROM result_cache WHERE created_at < ?",
+                (now - CACHE_TTL_SECONDS,)
+            )
+            conn.execute(
+                "DELETE FROM result_cache WHERE cache_key IN ("
+                " SELECT cache_key FROM result_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (CACHE_MAX_ENTRIES,)
+            )
+    finally:
+        conn.close()
+
+
+async def run_with_cache(tool: str, request, coro_factory, exclude=()):
+    """
+    先查结果缓存，未命中时通过 single_flight 执行工具并写入缓存
+
+    Args:
+        tool: 工具名
+        request: pydantic 请求模型，bypass_cache 为 True 时跳过缓存读取（结果仍会写回缓存）
+        coro_factory: 返回工具执行协程的函数
+        exclude: 不参与指纹计算的参数名
+    """
+    fingerprint = await request_fingerprint(tool, request, exclude=tuple(exclude) + ("bypass_cache",))
+    use_cache = CACHE_ENABLED and not getattr(request, "bypass_cache", False)
+    if use_cache:
+        try:
+            cached = await asyncio.to_thread(get_cached_result, tool, fingerprint)
+        except sqlite3.Error as e:
+            logger.warning(f"读取结果缓存失败: {e}")
+            cached = None
+        record_cache_lookup("result_cache", cached is not None)
+        if cached is not None:
+            return cached
+
+    async def _run_and_save():
+        result = await coro_factory()
+        if CACHE_ENABLED:
+            try:
+                await asyncio.to_thread(save_result, tool, fingerprint, result)
+            except sqlite3.Error as e:
+                logger.warning(f"写入结果缓存失败: {e}")
+        return result
+
+    return await single_flight(fingerprint, _run_and_save)
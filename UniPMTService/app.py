@@ -1,25 +1,42 @@
-from fastapi import FastAPI 
-from fastapi.middleware.cors import CORSMiddleware
-
-from src.api import lineardesign,unipmt
-
-app = FastAPI()
-
-origins = [
-    "*",  # 允许的来源，可以添加多个
-]
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,  # 允许访问的源列表
-    allow_credentials=True,  # 支持cookie跨域
-    allow_methods=["*"],  # 允许的请求方法
-    allow_headers=["*"],  # 允许的请求头
-)
-
-@app.get("/")
-def read_root():
-    return {"Hello": "我提供UniPMT 工具服务"}
-
-
-app.post("/Unipmt",tags=["Unipmt"],summary="UnipmtTool")(unipmt)  
+from fastapi import FastAPI 
+from fastapi.middleware.cors import CORSMiddleware
+
+from src.api import unipmt
+from src.utils.hits import HitsMiddleware
+from src.utils.metrics import metrics_endpoint, MetricsMiddleware
+from src.utils.profiling import ProfilingMiddleware
+from src.utils.resource_usage import ResourceUsageMiddleware
+from src.utils.tracing import TracingMiddleware
+
+app = FastAPI()
+
+origins = [
+    "*",  # 允许的来源，可以添加多个
+]
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=origins,  # 允许访问的源列表
+    allow_credentials=True,  # 支持cookie跨域
+    allow_methods=["*"],  # 允许的请求方法
+    allow_headers=["*"],  # 允许的请求头
+    expose_headers=["X-Resource-Usage", "X-Request-Id", "X-Profile-Url", "X-Profile-Status"],  # 允许前端读取资源统计、请求 ID 和剖析报告地址
+)
+# 未要求返回 hits 时从响应 JSON 中去掉 hits 字段
+app.add_middleware(HitsMiddleware)
+# 按请求汇总工具进程的 CPU 时间、峰值内存和 I/O
+app.add_middleware(ResourceUsageMiddleware)
+# 请求头 X-Profile 开启时用 cProfile + tracemalloc 剖析本次请求
+app.add_middleware(ProfilingMiddleware)
+# 生成请求 ID 并记录各阶段耗时，按需在响应中返回 timings
+app.add_middleware(TracingMiddleware)
+# 记录接口耗时和错误数，/metrics 以 Prometheus 文本格式输出
+app.add_middleware(MetricsMiddleware)
+
+@app.get("/")
+def read_root():
+    return {"Hello": "我提供UniPMT 工具服务"}
+
+
+app.post("/Unipmt",tags=["Unipmt"],summary="UnipmtTool")(unipmt)
+app.get("/metrics",tags=["Metrics"],summary="Metrics")(metrics_endpoint)
@@ -1,32 +1,34 @@
-import json
-
-from src.protocols import UniPMT
-
-from src.tools.UniPMT.unipmt import run_unipmt
-
-
-
-async def unipmt(request: UniPMT) -> str:
-    """
-    使用 unipmt 工具来完成三元复合体结构建模
-
-    参数：
-        minio_input_fasta: MinIO 中的输入文件路径（例如 minio://bucket/input.fasta）
-        lambda_val: lambda 参数控制表达/结构平衡，默认 0.5
-
-    返回：
-        包含 MinIO 链接的 JSON 字符串
-    """
-    minio_input_fasta = request.minio_input_fasta
-    lambda_val = request.lambda_val
-    try:
-        return await run_unipmt(
-            minio_input_fasta,
-            lambda_val,
-        )
-    except Exception as e:
-        result = {
-            "type": "text",
-            "content": f"调用LinearDesign工具失败: {e}"
-        }
+import json
+
+from fastapi import HTTPException, Request
+
+from src.protocols import UniPMT
+
+from src.tools.UniPMT.unipmt import run_unipmt
+from src.utils.tool_runner import run_tool
+
+
+
+async def unipmt(request: UniPMT, http_request: Request) -> str:
+    """
+    使用 unipmt 工具预测肽段-MHC-TCR 三元复合体的结合概率
+
+    参数：
+        input_file: MinIO 中的输入文件路径（csv，包含 Peptide, MHC, TCR 三列）
+
+    返回：
+        包含 MinIO 链接的 JSON 字符串
+    """
+    input_file = request.input_file
+    try:
+        return await run_tool(http_request, "unipmt", request, lambda: run_unipmt(
+            input_file
+        ), admitted=True)
+    except HTTPException:
+        raise
+    except Exception as e:
+        result = {
+            "type": "text",
+            "content": f"调用UniPMT工具失败: {e}"
+        }
         return json.dumps(result, ensure_ascii=False)
\ No newline at end of file
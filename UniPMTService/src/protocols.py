@@ -1,8 +1,8 @@
-from typing import Optional,List
-from pydantic  import BaseModel
-
-
-
-
-class UniPMT(BaseModel):
-    input_file: str
+from typing import Optional,List
+from pydantic  import BaseModel
+
+
+
+
+class UniPMT(BaseModel):
+    input_file: str
@@ -1,151 +1,330 @@
-import os
-import uuid
-import sys
-import tempfile
-
-from dotenv import load_dotenv
-from pathlib import Path
-from minio import Minio
-from minio.error import S3Error
-from urllib.parse import urlparse
-
-
-load_dotenv()
-current_file = Path(__file__).resolve()
-project_root = current_file.parents[5]
-sys.path.append(str(project_root))
-from config import CONFIG_YAML
-from src.utils.log import logger
-
-
-MINIO_CONFIG = CONFIG_YAML["MINIO"]
-MINIO_ENDPOINT = MINIO_CONFIG["endpoint"]
-MINIO_ACCESS_KEY = os.getenv("ACCESS_KEY")
-MINIO_SECRET_KEY = os.getenv("SECRET_KEY")
-MINIO_BUCKET = MINIO_CONFIG["molly_bucket"]
-MINIO_SECURE = MINIO_CONFIG.get("secure", False)
-
-
-# # 初始化 MinIO 客户端
-minio_client = Minio(
-    MINIO_ENDPOINT,
-    access_key=MINIO_ACCESS_KEY,
-    secret_key=MINIO_SECRET_KEY,
-    secure=MINIO_SECURE
-)
-
-def upload_file_to_minio(
-    local_file_path: str,
-    bucket_name: str,
-    minio_object_name: str = None,
-) -> str:
-    """
-    上传本地文件到MinIO存储
-    
-    Args:
-        minio_client: 已初始化的MinIO客户端实例
-        local_file_path: 本地文件路径
-        bucket_name: MinIO桶名称
-        minio_object_name: 在MinIO中存储的文件名(可选)，如果不指定则使用随机UUID+原文件名
-        
-    Returns:
-        str: MinIO访问地址 (格式: minio://bucket/object_name)
-        
-    Raises:
-        FileNotFoundError: 如果本地文件不存在
-        S3Error: MinIO操作相关的错误
-    """
-
-    # 检查本地文件是否存在
-    local_path = Path(local_file_path)
-    if not local_path.exists():
-        raise FileNotFoundError(f"本地文件不存在: {local_file_path}")
-    
-    # 如果没有指定MinIO中的文件名，则生成一个
-    if minio_object_name is None:
-        file_ext = local_path.suffix  # 获取文件扩展名
-        minio_object_name = f"{uuid.uuid4().hex}{file_ext}"
-    
-    try:
-        # 确保桶存在
-        if not minio_client.bucket_exists(bucket_name):
-            minio_client.make_bucket(bucket_name)
-        
-        # 上传文件
-        minio_client.fput_object(
-            bucket_name,
-            minio_object_name,
-            str(local_path)
-        )
-        logger.info(f"MinIO path: minio://{bucket_name}/{minio_object_name}")
-        # 返回MinIO地址
-        return f"minio://{bucket_name}/{minio_object_name}"
-        
-    except S3Error as e:
-        logger.error(f"MinIO S3 Error: {e}")
-        raise S3Error(f"上传文件到MinIO失败: {e}") from e
-    except Exception as e:
-        logger.error(f"An unexpected error occurred: {e}")
-        raise
-        
-
-
-
-
-
-
-def download_from_minio_uri(uri: str, local_path: str = None) -> str:
-    """
-    通过MinIO路径下载文件
-    
-    Args:
-        uri: MinIO路径 (格式: minio://bucket-name/path/to/object)
-        local_path: (可选)本地保存路径（可以是目录或完整路径）
-                   - 如果是目录：自动使用原文件名（前面加UUID）
-                   - 如果未指定：使用临时目录+UUID_原文件名
-    
-    Returns:
-        str: 下载文件的完整本地路径（包含文件名）
-    
-    Raises:
-        ValueError: 无效的URI格式
-        S3Error: MinIO操作错误
-        IOError: 本地文件错误
-    """
-    # 解析URI
-    parsed = urlparse(uri)
-    if parsed.scheme != 'minio':
-        raise ValueError("无效的MinIO URI，必须以 minio:// 开头")
-    
-    bucket_name = parsed.netloc
-    object_name = parsed.path.lstrip('/')
-    original_filename = os.path.basename(object_name)
-    
-    # 生成带UUID的新文件名
-    filename_with_uuid = f"{uuid.uuid4()}_{original_filename}"
-
-    # 处理本地路径
-    if local_path is None:
-        # 默认使用临时目录+UUID_原文件名
-        local_path = os.path.join(tempfile.gettempdir(), filename_with_uuid)
-    elif os.path.isdir(local_path):
-        # 如果提供的是目录，自动添加UUID_原文件名
-        local_path = os.path.join(local_path, filename_with_uuid)
-    else:
-        # 如果提供的是完整路径，直接使用（但不加UUID，因为用户可能想要自定义文件名）
-        pass  # 保持原样
-    
-    # 确保目录存在
-    os.makedirs(os.path.dirname(local_path), exist_ok=True)
-    
-    # 执行下载
-    minio_client.fget_object(
-        bucket_name=bucket_name,
-        object_name=object_name,
-        file_path=local_path
-    )
-    
-    # 返回绝对路径
-    return os.path.abspath(local_path)
-
-download_from_minio_uri("minio://molly/29959599-2e39-4a66-a22d-ccfb86dedd21_hlas.fasta","/mnt/workspace/dev/ltc/mRNAPredictionAgent/src/utils")
+import gzip
+import io
+import os
+import shutil
+import time
+import uuid
+import sys
+import tempfile
+
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from pathlib import Path
+from typing import Optional, Union
+import pandas as pd
+from minio import Minio
+from minio.error import S3Error
+from urllib.parse import urlparse
+
+
+load_dotenv()
+current_file = Path(__file__).resolve()
+project_root = current_file.parents[5]
+sys.path.append(str(project_root))
+from config import CONFIG_YAML
+from src.utils.log import logger
+from src.utils.metrics import MINIO_BYTES, MINIO_DURATION, stage_timer
+
+
+MINIO_CONFIG = CONFIG_YAML["MINIO"]
+MINIO_ENDPOINT = MINIO_CONFIG["endpoint"]
+MINIO_ACCESS_KEY = os.getenv("ACCESS_KEY")
+MINIO_SECRET_KEY = os.getenv("SECRET_KEY")
+MINIO_BUCKET = MINIO_CONFIG["molly_bucket"]
+MINIO_SECURE = MINIO_CONFIG.get("secure", False)
+
+# 传输压缩：上传文本结果时压缩并设置 Content-Encoding，对象名不变，minio/urllib3 客户端和浏览器下载时透明解压；
+# 下载 .gz / .zst 输入时边下载边解压
+COMPRESS_UPLOADS = MINIO_CONFIG.get("compress_uploads", False)
+COMPRESS_ENCODING = MINIO_CONFIG.get("compress_encoding", "gzip")
+COMPRESS_LEVEL = MINIO_CONFIG.get("compress_level", 6)
+COMPRESS_MIN_SIZE = MINIO_CONFIG.get("compress_min_size", 64 * 1024)
+COMPRESS_SUFFIXES = tuple(MINIO_CONFIG.get(
+    "compress_suffixes", [".csv", ".tsv", ".txt", ".fasta", ".fa", ".fsa", ".vcf", ".json", ".md", ".pdb"]
+))
+
+# 压缩格式的扩展名和文件头
+_COMPRESSED_SUFFIXES = {".gz": "gzip", ".zst": "zstd"}
+_MAGIC = {"gzip": b"\x1f\x8b", "zstd": b"\x28\xb5\x2f\xfd"}
+_COPY_CHUNK = 1024 * 1024
+
+
+def compression_of(name: str) -> Optional[str]:
+    """按扩展名判断压缩格式（gzip / zstd），未压缩返回 None"""
+    return _COMPRESSED_SUFFIXES.get(Path(name).suffix.lower())
+
+
+def strip_compression_suffix(name: str) -> str:
+    """去掉 .gz / .zst 扩展名（如 sample.fasta.gz -> sample.fasta），用于按原扩展名判断文件类型"""
+    if compression_of(name) is None:
+        return name
+    return name[:-len(Path(name).suffix)]
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("读写 zstd 压缩文件需要安装 zstandard") from None
+    return zstandard
+
+
+def decompressing_stream(stream, encoding: Optional[str]):
+    """
+    包装为边读边解压的流。先按文件头确认确实是压缩数据：对象带 Content-Encoding 时
+    HTTP 客户端已经解压过，此时原样返回
+    """
+    if encoding is None:
+        return stream
+    if not hasattr(stream, "peek"):
+        stream = io.BufferedReader(stream, _COPY_CHUNK)
+    if not stream.peek(len(_MAGIC[encoding])).startswith(_MAGIC[encoding]):
+        return stream
+    if encoding == "gzip":
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    return _zstd().ZstdDecompressor().stream_reader(stream, read_across_frames=True)
+
+
+def _compressible(object_name: str, size: int) -> bool:
+    return size >= COMPRESS_MIN_SIZE and Path(object_name).suffix.lower() in COMPRESS_SUFFIXES
+
+
+def _compress_file(path: Path) -> Path:
+    """流式压缩到同目录下的临时文件"""
+    target = path.with_name(f"{path.name}.{uuid.uuid4().hex}.part")
+    with open(path, "rb") as source, open(target, "wb") as output:
+        if COMPRESS_ENCODING == "zstd":
+            compressor = _zstd().ZstdCompressor(level=COMPRESS_LEVEL)
+            with compressor.stream_writer(output, closefd=False) as writer:
+                shutil.copyfileobj(source, writer, _COPY_CHUNK)
+        else:
+            with gzip.GzipFile(fileobj=output, mode="wb", compresslevel=COMPRESS_LEVEL) as writer:
+                shutil.copyfileobj(source, writer, _COPY_CHUNK)
+    return target
+
+
+def _compress_bytes(data: bytes) -> bytes:
+    if COMPRESS_ENCODING == "zstd":
+        return _zstd().ZstdCompressor(level=COMPRESS_LEVEL).compress(data)
+    return gzip.compress(data, COMPRESS_LEVEL)
+
+
+class InstrumentedMinio(Minio):
+    """
+    记录对象读写的耗时和字节数（/metrics）。fget_object / fput_object 内部分别调用
+    get_object / put_object，这里只覆盖这两个方法；get 的耗时为收到响应头的时间，
+    字节数为传输的字节数（压缩对象为压缩后的大小）。
+    open_object / read_object 读取对象时按扩展名边下载边解压 .gz / .zst
+    """
+
+    def get_object(self, bucket_name, object_name, *args, **kwargs):
+        started = time.monotonic()
+        response = super().get_object(bucket_name, object_name, *args, **kwargs)
+        MINIO_DURATION.observe(time.monotonic() - started, operation="get")
+        MINIO_BYTES.inc(int(response.headers.get("content-length") or 0), operation="get")
+        return response
+
+    def put_object(self, bucket_name, object_name, data, length, *args, **kwargs):
+        started = time.monotonic()
+        result = super().put_object(bucket_name, object_name, data, length, *args, **kwargs)
+        MINIO_DURATION.observe(time.monotonic() - started, operation="put")
+        MINIO_BYTES.inc(max(length, 0), operation="put")
+        return result
+
+    @contextmanager
+    def open_object(self, bucket_name, object_name):
+        """
+        以流的方式读取对象，.gz / .zst 对象边下载边解压
+
+        用法:
+            with minio_client.open_object(bucket_name, object_name) as stream:
+                for chunk in iter(lambda: stream.read(1024 * 1024), b""):
+                    ...
+        """
+        response = self.get_object(bucket_name, object_name)
+        try:
+            yield decompressing_stream(response, compression_of(object_name))
+        finally:
+            response.close()
+            response.release_conn()
+
+    def read_object(self, bucket_name, object_name) -> bytes:
+        """读取对象的全部内容，.gz / .zst 对象返回解压后的内容"""
+        with self.open_object(bucket_name, object_name) as stream:
+            return stream.read()
+
+
+# # 初始化 MinIO 客户端
+minio_client = InstrumentedMinio(
+    MINIO_ENDPOINT,
+    access_key=MINIO_ACCESS_KEY,
+    secret_key=MINIO_SECRET_KEY,
+    secure=MINIO_SECURE
+)
+
+
+def _fput_object(bucket_name: str, object_name: str, local_path: Path, compress: Optional[bool] = None, **kwargs) -> None:
+    """
+    上传本地文件。compress（默认配置 compress_uploads）为 True 时，超过 compress_min_size 的文本文件
+    （compress_suffixes）先流式压缩，再带 Content-Encoding 上传，对象名不变
+    """
+    if compress is None:
+        compress = COMPRESS_UPLOADS
+    size = local_path.stat().st_size
+    if not (compress and _compressible(object_name, size)):
+        minio_client.fput_object(bucket_name, object_name, str(local_path), **kwargs)
+        return
+    compressed = _compress_file(local_path)
+    try:
+        minio_client.fput_object(
+            bucket_name,
+            object_name,
+            str(compressed),
+            metadata={"Content-Encoding": COMPRESS_ENCODING},
+            **kwargs
+        )
+        logger.info(f"压缩上传 {object_name}: {size} -> {compressed.stat().st_size} 字节（{COMPRESS_ENCODING}）")
+    finally:
+        compressed.unlink()
+
+
+def upload_file_to_minio(
+    local_file_path: str,
+    bucket_name: str,
+    minio_object_name: str = None,
+    compress: Optional[bool] = None,
+) -> str:
+    """
+    上传本地文件到MinIO存储
+    
+    Args:
+        minio_client: 已初始化的MinIO客户端实例
+        local_file_path: 本地文件路径
+        bucket_name: MinIO桶名称
+        minio_object_name: 在MinIO中存储的文件名(可选)，如果不指定则使用随机UUID+原文件名
+        compress: (可选)是否压缩上传文本文件（带 Content-Encoding，下载时透明解压），默认读取配置 compress_uploads
+        
+    Returns:
+        str: MinIO访问地址 (格式: minio://bucket/object_name)
+        
+    Raises:
+        FileNotFoundError: 如果本地文件不存在
+        S3Error: MinIO操作相关的错误
+    """
+
+    # 检查本地文件是否存在
+    local_path = Path(local_file_path)
+    if not local_path.exists():
+        raise FileNotFoundError(f"本地文件不存在: {local_file_path}")
+    
+    # 如果没有指定MinIO中的文件名，则生成一个
+    if minio_object_name is None:
+        file_ext = local_path.suffix  # 获取文件扩展名
+        minio_object_name = f"{uuid.uuid4().hex}{file_ext}"
+    
+    try:
+        # 确保桶存在
+        if not minio_client.bucket_exists(bucket_name):
+            minio_client.make_bucket(bucket_name)
+        
+        # 上传文件
+        with stage_timer("upload"):
+            _fput_object(bucket_name, minio_object_name, local_path, compress)
+        logger.info(f"MinIO path: minio://{bucket_name}/{minio_object_name}")
+        # 返回MinIO地址
+        return f"minio://{bucket_name}/{minio_object_name}"
+        
+    except S3Error as e:
+        logger.error(f"MinIO S3 Error: {e}")
+        raise S3Error(f"上传文件到MinIO失败: {e}") from e
+    except Exception as e:
+        logger.error(f"An unexpected error occurred: {e}")
+        raise
+        
+
+
+
+
+
+
+def download_from_minio_uri(uri: str, local_path: str = None) -> str:
+    """
+    通过MinIO路径下载文件
+    
+    Args:
+        uri: MinIO路径 (格式: minio://bucket-name/path/to/object)
+        local_path: (可选)本地保存路径（可以是目录或完整路径）
+                   - 如果是目录：自动使用原文件名（前面加UUID）
+                   - 如果未指定：使用临时目录+UUID_原文件名
+                   .gz / .zst 对象边下载边解压，本地文件名去掉压缩扩展名
+    
+    Returns:
+        str: 下载文件的完整本地路径（包含文件名）
+    
+    Raises:
+        ValueError: 无效的URI格式
+        S3Error: MinIO操作错误
+        IOError: 本地文件错误
+    """
+    # 解析URI
+    parsed = urlparse(uri)
+    if parsed.scheme != 'minio':
+        raise ValueError("无效的MinIO URI，必须以 minio:// 开头")
+    
+    bucket_name = parsed.netloc
+    object_name = parsed.path.lstrip('/')
+    original_filename = os.path.basename(object_name)
+    
+    # 生成带UUID的新文件名
+    filename_with_uuid = f"{uuid.uuid4()}_{strip_compression_suffix(original_filename)}"
+
+    # 处理本地路径
+    if local_path is None:
+        # 默认使用临时目录+UUID_原文件名
+        local_path = os.path.join(tempfile.gettempdir(), filename_with_uuid)
+    elif os.path.isdir(local_path):
+        # 如果提供的是目录，自动添加UUID_原文件名
+        local_path = os.path.join(local_path, filename_with_uuid)
+    else:
+        # 如果提供的是完整路径，直接使用（但不加UUID，因为用户可能想要自定义文件名）
+        local_path = strip_compression_suffix(local_path)  # 只去掉压缩扩展名
+    
+    # 确保目录存在
+    os.makedirs(os.path.dirname(local_path), exist_ok=True)
+    
+    # 执行下载
+    with stage_timer("download"):
+        if compression_of(object_name) is None:
+            minio_client.fget_object(
+                bucket_name=bucket_name,
+                object_name=object_name,
+                file_path=local_path
+            )
+        else:
+            # 压缩对象边下载边解压，本地只保存解压后的文件
+            with minio_client.open_object(bucket_name, object_name) as stream, open(local_path, "wb") as f:
+                shutil.copyfileobj(stream, f, _COPY_CHUNK)
+    
+    # 返回绝对路径
+    return os.path.abspath(local_path)
+
+
+def load_result_dataframe(result: Union[str, Path, pd.DataFrame], download_dir: str = None, **read_kwargs) -> pd.DataFrame:
+    """
+    读取工具结果表格，优先使用内存中的 DataFrame 或本地文件，MinIO 路径仅作为兜底。
+    从 MinIO 下载到 download_dir 的临时文件读完即删除（读取失败也删除）；本地结果文件由调用方清理。
+    """
+    if isinstance(result, pd.DataFrame):
+        return result
+    result = str(result)
+    if not result.startswith("minio://"):
+        return pd.read_csv(result, **read_kwargs)
+    temp_file_path = download_from_minio_uri(result, download_dir)
+    try:
+        return pd.read_csv(temp_file_path, **read_kwargs)
+    finally:
+        if os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+            logger.info(f"Temporary file {temp_file_path} deleted.")
+
+# download_from_minio_uri("minio://molly/29959599-2e39-4a66-a22d-ccfb86dedd21_hlas.fasta","/mnt/workspace/dev/ltc/mRNAPredictionAgent/src/utils")
@@ -0,0 +1,200 @@
+"""
+按需性能剖析
+
+请求头 X-Profile 为 1/true 时，用 cProfile + tracemalloc 运行这一次请求：
+1. 在工作目录（配置 PROFILING.workspace）中保存 <剖析ID>.prof（pstats 格式，可用 snakeviz 等工具查看）
+   和 <剖析ID>.txt（按累计耗时/自身耗时排序的函数列表、按代码行汇总的内存分配），
+   剖析 ID 由服务端生成，请求 ID 只写在报告内容中，不用于拼接文件路径；
+2. 上传到结果文件旁边（结果对象名 + .profile.prof / .profile.txt），结果不在 MinIO 时上传到 PROFILING.bucket；
+3. 在响应头 X-Profile-Url 和响应 JSON 的 profile 字段中返回报告地址。
+cProfile 和 tracemalloc 都是进程级的，同一时刻只剖析一个请求，已有剖析在进行时请求照常执行、不做剖析
+（响应头 X-Profile-Status: busy）。剖析期间事件循环线程上执行的其他请求代码也会计入报告；
+工具子进程和线程池中执行的代码不在报告中。
+"""
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+from typing import Optional, Tuple
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+
+from src.utils.log import logger, run_in_executor
+from src.utils.minio_utils import upload_file_to_minio
+from src.utils.tracing import add_body_field, current_request_id, rewriting_send
+from config import CONFIG_YAML
+
+PROFILING_CONFIG = CONFIG_YAML.get("PROFILING", {})
+PROFILING_ENABLED = PROFILING_CONFIG.get("enabled", True)
+REQUEST_HEADER = PROFILING_CONFIG.get("request_header", "X-Profile")
+WORKSPACE = PROFILING_CONFIG.get("workspace", "/opt/tmp/profiles")
+PROFILE_BUCKET = PROFILING_CONFIG.get("bucket", "profiles")
+TOP_FUNCTIONS = PROFILING_CONFIG.get("top_functions", 50)
+TOP_ALLOCATIONS = PROFILING_CONFIG.get("top_allocations", 30)
+TRACEMALLOC_FRAMES = PROFILING_CONFIG.get("tracemalloc_frames", 1)
+
+URL_HEADER = "X-Profile-Url"
+STATUS_HEADER = "X-Profile-Status"
+
+_profile_lock = threading.Lock()
+
+
+def _wants_profile(request) -> bool:
+    value = (request.headers.get(REQUEST_HEADER) or "").strip().lower()
+    return value in ("1", "true", "yes")
+
+
+def _find_minio_url(value) -> Optional[str]:
+    """在结果 JSON 中查找第一个 minio:// 地址"""
+    if isinstance(value, str):
+        if value.startswith("minio://"):
+            return value.split("#", 1)[0]
+        if value.startswith("{"):
+            try:
+                return _find_minio_url(json.loads(value))
+            except ValueError:
+                return None
+        return None
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (list, tuple)):
+        for item in value:
+            url = _find_minio_url(item)
+            if url:
+                return url
+    return None
+
+
+def _object_prefix(body: bytes, profile_id: str) -> Tuple[str, str]:
+    """剖析文件的上传位置：结果对象旁边，找不到结果对象时放到 PROFILING.bucket 下"""
+    try:
+        url = _find_minio_url(json.loads(body))
+    except ValueError:
+        url = None
+    if url:
+        bucket, _, object_name = url[len("minio://"):].partition("/")
+        if bucket and object_name:
+            return bucket, f"{object_name}.profile"
+    return PROFILE_BUCKET, f"{profile_id}.profile"
+
+
+def _write_report(path: Path, request, request_id: str, wall_seconds: float,
+                  profiler: cProfile.Profile, snapshot, peak_bytes: int) -> None:
+    out = io.StringIO()
+    out.write(f"request_id: {request_id}\n")
+    out.write(f"path: {request.method} {request.url.path}\n")
+    out.write(f"wall_seconds: {wall_seconds:.3f}\n")
+    out.write(f"tracemalloc_peak_mb: {peak_bytes / 1024 / 1024:.1f}\n")
+
+    for sort_key in ("cumulative", "tottime"):
+        out.write(f"\n===== 函数耗时（按 {sort_key} 排序，前 {TOP_FUNCTIONS} 个）=====\n")
+        stats = pstats.Stats(profiler, stream=out)
+        stats.strip_dirs().sort_stats(sort_key).print_stats(TOP_FUNCTIONS)
+
+    out.write(f"\n===== 内存分配（按代码行汇总，前 {TOP_ALLOCATIONS} 个）=====\n")
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+        frame = stat.traceback[0]
+        out.write(
+            f"{stat.size / 1024:10.1f} KiB {stat.count:8d} 次  {frame.filename}:{frame.lineno}\n"
+        )
+    path.write_text(out.getvalue(), encoding="utf-8")
+
+
+def _upload_profile(files, bucket: str, prefix: str) -> dict:
+    """上传剖析文件，返回 {文件类型: MinIO 地址}，上传失败时返回本地路径"""
+    urls = {}
+    for kind, local_path in files.items():
+        try:
+            urls[kind] = upload_file_to_minio(str(local_path), bucket, f"{prefix}{local_path.suffix}")
+        except Exception as e:
+            logger.warning(f"剖析文件上传失败，保留在本地 {local_path}: {e}")
+            urls[kind] = str(local_path)
+    return urls
+
+
+def _mark_busy(message):
+    MutableHeaders(scope=message)[STATUS_HEADER] = "busy"
+    return None
+
+
+class ProfilingMiddleware:
+    """请求头 X-Profile 开启时，在 cProfile + tracemalloc 下运行本次请求并上传剖析报告"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not PROFILING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        if not _wants_profile(request):
+            await self.app(scope, receive, send)
+            return
+        if not _profile_lock.acquire(blocking=False):
+            logger.warning(f"已有请求正在剖析，{request.url.path} 不做剖析")
+            await self.app(scope, receive, rewriting_send(send, _mark_busy))
+            return
+
+        # 剖析结果要写入响应，先收下整个响应，剖析结束后再发送
+        start = None
+        chunks = []
+
+        async def capture(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        request_id = current_request_id() or "-"
+        profile_id = uuid.uuid4().hex
+        profiler = cProfile.Profile()
+        # 进程以 PYTHONTRACEMALLOC 启动时 tracemalloc 已在运行，这种情况下不在这里关闭
+        was_tracing = tracemalloc.is_tracing()
+        try:
+            if not was_tracing:
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+            started = time.monotonic()
+            profiler.enable()
+            try:
+                await self.app(scope, receive, capture)
+            finally:
+                profiler.disable()
+                wall_seconds = time.monotonic() - started
+                snapshot = tracemalloc.take_snapshot()
+                _, peak_bytes = tracemalloc.get_traced_memory()
+                if not was_tracing:
+                    tracemalloc.stop()
+
+            workspace = Path(WORKSPACE)
+            workspace.mkdir(parents=True, exist_ok=True)
+            files = {"pstats": workspace / f"{profile_id}.prof", "report": workspace / f"{profile_id}.txt"}
+            profiler.dump_stats(str(files["pstats"]))
+            _write_report(files["report"], request, request_id, wall_seconds, profiler, snapshot, peak_bytes)
+            logger.info(f"请求 {request_id} 剖析完成，耗时 {wall_seconds:.3f}s，报告: {files['report']}")
+        finally:
+            _profile_lock.release()
+
+        body = b"".join(chunks)
+        bucket, prefix = _object_prefix(body, profile_id)
+        urls = await run_in_executor(None, _upload_profile, files, bucket, prefix)
+
+        headers = MutableHeaders(scope=start)
+        if "json" in headers.get("content-type", ""):
+            body = add_body_field(body, "profile", urls)
+        headers["content-length"] = str(len(body))
+        headers[URL_HEADER] = urls["report"]
+        headers[STATUS_HEADER] = "done"
+        await send(start)
+        await send({"type": "http.response.body", "body": body})
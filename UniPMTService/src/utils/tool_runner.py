@@ -0,0 +1,38 @@
+"""
+工具调用的统一执行流程
+
+各接口按相同顺序组合以下几层：
+1. 相同请求合并（single_flight）；
+2. 内存准入控制（admission.admission_slot，仅模型类工具）；
+3. 资源占用记录（estimator.run_measured）；
+整个过程中客户端断开时取消任务（supervisor.cancel_on_disconnect）。
+"""
+from src.utils.admission import admission_slot
+from src.utils.estimator import run_measured
+from src.utils.single_flight import request_fingerprint, single_flight
+from src.utils.supervisor import cancel_on_disconnect
+
+
+async def run_tool(http_request, tool: str, request, coro_factory, admitted: bool = False, exclude=()):
+    """
+    按统一流程运行工具
+
+    Args:
+        http_request: FastAPI/Starlette 的 Request 对象
+        tool: 工具名称
+        request: pydantic 请求模型
+        coro_factory: 返回工具调用协程的函数，准入被拒绝时不会调用
+        admitted: 是否经过内存准入控制
+        exclude: 不参与请求指纹计算的参数名
+
+    Raises:
+        AdmissionRejected: 准入排队请求数超过上限
+    """
+    async def _run():
+        if not admitted:
+            return await run_measured(tool, request, coro_factory())
+        async with admission_slot(tool, request) as work_units:
+            return await run_measured(tool, request, coro_factory(), work_units=work_units)
+
+    fingerprint = await request_fingerprint(tool, request, exclude=exclude)
+    return await cancel_on_disconnect(http_request, single_flight(fingerprint, _run))
@@ -1,13 +1,17 @@
 import json
 
+from fastapi import Request
+
 from src.protocols import (
     VcfSwitchRequest,
     VcfSwitchResponse
 )
 from src.tools.VCFSwitch.vcfswitch import run_vcfswitch
+from src.utils.single_flight import request_fingerprint, single_flight
+from src.utils.supervisor import cancel_on_disconnect
 
 
-async def vcfswitch(request: VcfSwitchRequest) -> VcfSwitchResponse:
+async def vcfswitch(request: VcfSwitchRequest, http_request: Request) -> VcfSwitchResponse:
     """                                    
     VcfSwitch是一种用于从正常和异常VCF文件中的提取突变肽段的工具。
     Args:                                  
@@ -18,10 +22,12 @@ async def vcfswitch(request: VcfSwitchRequest) -> VcfSwitchResponse:
     """
 
     try:
-        return await run_vcfswitch(
+        fingerprint = await request_fingerprint("vcfswitch", request)
+        return await cancel_on_disconnect(http_request, single_flight(fingerprint, lambda: run_vcfswitch(
             request.normal_file,
             request.tumor_file
-        )
+        )),
+        disconnected_result=VcfSwitchResponse(type="text", content="客户端已断开连接，任务已取消"))
     except Exception as e:
         import traceback
         error_trace = traceback.format_exc()
@@ -1,7 +1,14 @@
+import asyncio
+import atexit
+import contextvars
+import copy
+import json
 import os
 import platform
+import queue
 import logging
 import logging.config as log_config
+import logging.handlers
 from config import CONFIG_YAML
 
 # 判断操作系统类型
@@ -22,12 +29,107 @@ if container_message and "docker" in container_message:
 elif container_message and "kubepods" in container_message and "/" in container_message:
     appendstr = container_message.strip().split("/")[-1][:12]
 
+LOGGER_CONFIG = CONFIG_YAML["LOGGER"]
+LOG_FORMAT = LOGGER_CONFIG.get("format", "json")
+QUEUE_SIZE = LOGGER_CONFIG.get("queue_size", 10000)
+MAX_MESSAGE_CHARS = LOGGER_CONFIG.get("max_message_chars", 4000)
+PAYLOAD_LEVEL = logging.getLevelName(LOGGER_CONFIG.get("payload_level", "DEBUG"))
+MAX_PAYLOAD_CHARS = LOGGER_CONFIG.get("max_payload_chars", 2000)
+
+# 当前请求 ID（由 TracingMiddleware 写入），写入每条日志记录
+request_id_context = contextvars.ContextVar("request_id", default=None)
+
+
+class RequestContextFilter(logging.Filter):
+    """在调用方线程中写入请求 ID，并截断过长的日志消息"""
+
+    def filter(self, record):
+        record.request_id = request_id_context.get() or "-"
+        message = record.getMessage()
+        if len(message) > MAX_MESSAGE_CHARS:
+            record.msg = f"{message[:MAX_MESSAGE_CHARS]}...(已截断，共 {len(message)} 字符)"
+            record.args = None
+        return True
+
+
+def run_in_executor(executor, func, *args) -> asyncio.Future:
+    """
+    在线程池中执行 func。loop.run_in_executor 不会把调用方的上下文变量带到工作线程，
+    这里通过 contextvars.copy_context().run 执行，线程中的日志仍带有当前请求 ID
+    """
+    loop = asyncio.get_running_loop()
+    return loop.run_in_executor(executor, contextvars.copy_context().run, func, *args)
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行 JSON"""
+
+    def format(self, record):
+        entry = {
+            "time": f"{self.formatTime(record, self.datefmt)}.{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "file": record.filename,
+            "line": record.lineno,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+_exception_formatter = logging.Formatter()
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """日志放入队列后立即返回；队列满时丢弃并计数，恢复后补记一条丢弃数量"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # 在调用方线程中格式化消息；异常堆栈保存在 exc_text 中，由输出端的 formatter 单独输出
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.dropped:
+            notice = logging.LogRecord(
+                record.name, logging.WARNING, __file__, 0,
+                f"日志队列已满，丢弃了 {self.dropped} 条日志", None, None
+            )
+            notice.request_id = "-"
+            try:
+                self.queue.put_nowait(notice)
+                self.dropped = 0
+            except queue.Full:
+                pass
+
+
 logger_config = {
     "version": 1,
     "disable_existing_loggers": False,
     "formatters": {
         "simpleFormater": {
-            "format": "%(asctime)s.%(msecs)03d - %(filename)s[line:%(lineno)d] - %(levelname)7s: %(name)10s: %(message)s",
+            "format": "%(asctime)s.%(msecs)03d - %(request_id)s - %(filename)s[line:%(lineno)d] - %(levelname)7s: %(name)10s: %(message)s",
+            "datefmt": "%Y-%m-%d %H:%M:%S"
+        },
+        "jsonFormater": {
+            "()": JsonFormatter,
             "datefmt": "%Y-%m-%d %H:%M:%S"
         }
     },
@@ -57,21 +159,49 @@ logger_config = {
     }
 }
 
+_listener = None
+
+
+def _start_queue_listener():
+    """
+    把 root 上的控制台/文件 handler 移到后台线程（QueueListener）中执行，
+    root 只保留一个非阻塞的 QueueHandler，写日志不会因磁盘或终端 I/O 阻塞事件循环
+    """
+    global _listener
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+    for handler in handlers:
+        root.removeHandler(handler)
+    log_queue = queue.Queue(QUEUE_SIZE)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+    root.addHandler(queue_handler)
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
 def config_logger(log_dir, log_level, name):
     # config logger
     if not log_level:
         log_level = "INFO"
 
     filename = os.path.join(log_dir, f'{appendstr}_{name}.log')
+    formatter = "jsonFormater" if LOG_FORMAT == "json" else "simpleFormater"
     logger_config['handlers']['log_file_handler']['filename'] = filename
     logger_config['handlers']['log_file_handler']['level'] = log_level
+    logger_config['handlers']['log_file_handler']['formatter'] = formatter
     logger_config['handlers']['console']['level'] = log_level
+    logger_config['handlers']['console']['formatter'] = formatter
+    # root 与 handler 使用同一级别，低于该级别的日志（如 log_payload）在调用处直接跳过
+    logger_config['root']['level'] = log_level
     os.makedirs(os.path.dirname(filename), exist_ok=True)
     log_config.dictConfig(logger_config)
+    _start_queue_listener()
 
 # 创建日志存储路径
 LOG_PATH = os.path.join(
-    os.path.dirname(os.path.dirname(__file__)), 
+    os.path.dirname(os.path.dirname(__file__)),
     CONFIG_YAML["LOGGER"]['log_path']
 )
 if not os.path.exists(LOG_PATH):
@@ -79,4 +209,21 @@ if not os.path.exists(LOG_PATH):
 
 config_logger(CONFIG_YAML["LOGGER"]['log_path'], CONFIG_YAML["LOGGER"]['log_level'], f"server")
 
-logger = logging.getLogger()
\ No newline at end of file
+logger = logging.getLogger()
+
+
+def log_payload(label: str, payload, level: int = PAYLOAD_LEVEL) -> None:
+    """
+    记录解析结果、分片列表等大对象：日志级别低于 payload_level 时不做序列化，
+    超过 max_payload_chars 时截断
+
+    用法:
+        log_payload("RNAfold 解析结果", results)
+    """
+    if not logger.isEnabledFor(level):
+        return
+    text = payload if isinstance(payload, str) else repr(payload)
+    count = f"（{len(payload)} 条）" if isinstance(payload, (list, tuple, dict)) else ""
+    if len(text) > MAX_PAYLOAD_CHARS:
+        text = f"{text[:MAX_PAYLOAD_CHARS]}...(已截断，共 {len(text)} 字符)"
+    logger.log(level, f"{label}{count}: {text}")
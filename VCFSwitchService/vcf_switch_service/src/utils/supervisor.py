@@ -0,0 +1,420 @@
+"""
+外部工具子进程监管
+
+所有工具统一通过 run_supervised 启动：
+1. 子进程运行在独立的进程组中（start_new_session），终止时整组杀掉，避免 tcsh/python 包装脚本留下孤儿进程；
+2. 可按工具配置墙钟超时和输出大小上限（默认均不限制），超限后先 SIGTERM，宽限期后 SIGKILL；
+3. 调用方协程被取消（如客户端断开连接）时同样终止整个进程组；
+4. 记录每次运行的退出原因（ok / error / signal / timeout / output_limit / sink_error / cancelled），
+   以及通过 wait4 获得的 CPU 时间（用户态/内核态）、峰值内存（ru_maxrss）和块设备 I/O；
+5. 可选地在子进程启动后立即绑定 CPU 亲和性（cpus 参数或 pinned_cpus 上下文）；
+6. 可选地把 stdout 按块交给 stdout_sink 增量处理（如流式解析），不在内存中保存完整输出。
+"""
+import asyncio
+import contextvars
+import json
+import math
+import os
+import selectors
+import signal
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from src.utils.log import logger, run_in_executor
+from src.utils.metrics import PROCESS_EXITS, PROCESSES_RUNNING, STAGE_DURATION
+from src.utils.tracing import record_span
+from config import CONFIG_YAML
+
+SUPERVISOR_CONFIG = CONFIG_YAML.get("SUPERVISOR", {})
+# 默认不限制运行时间和输出大小（蛋白质组规模的输入可能运行数小时、输出数 GB），只对配置了上限的工具生效
+DEFAULT_TIMEOUT = SUPERVISOR_CONFIG.get("default_timeout", 0)
+DEFAULT_MAX_OUTPUT_BYTES = SUPERVISOR_CONFIG.get("max_output_bytes", 0)
+KILL_GRACE_SECONDS = SUPERVISOR_CONFIG.get("kill_grace_seconds", 5)
+DISCONNECT_POLL_INTERVAL = SUPERVISOR_CONFIG.get("disconnect_poll_interval", 1.0)
+TOOL_TIMEOUTS = SUPERVISOR_CONFIG.get("tool_timeouts", {})
+
+# 每个运行中的子进程占用一个监管线程（读取管道 + 等待退出）
+_supervisor_executor = ThreadPoolExecutor(
+    max_workers=SUPERVISOR_CONFIG.get("max_processes", 64),
+    thread_name_prefix="tool-supervisor"
+)
+
+_POLL_INTERVAL = 0.2
+_READ_CHUNK_SIZE = 64 * 1024
+
+# 当前上下文中用于收集子进程运行结果的列表，嵌套收集时每一层各有一个列表（见 collect_process_results）
+_result_collectors = contextvars.ContextVar("tool_process_results", default=())
+
+# 当前上下文中启动的子进程绑定的 CPU 集合（见 pinned_cpus）
+_cpu_affinity = contextvars.ContextVar("tool_cpu_affinity", default=None)
+
+# 当前正在运行的工具进程数
+_active_processes = 0
+
+
+class ProcessResult:
+    """子进程运行结果，returncode/stdout/stderr 与 asyncio Process.communicate() 的用法一致"""
+
+    def __init__(self, tool: str, pid: int, returncode: int, stdout: bytes, stderr: bytes,
+                 exit_reason: str, wall_seconds: float, max_rss_kb: int = 0, user_seconds: float = 0.0,
+                 sys_seconds: float = 0.0, read_bytes: int = 0, write_bytes: int = 0):
+        self.tool = tool
+        self.pid = pid
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.exit_reason = exit_reason
+        self.wall_seconds = wall_seconds
+        self.max_rss_kb = max_rss_kb
+        self.user_seconds = user_seconds
+        self.sys_seconds = sys_seconds
+        self.read_bytes = read_bytes
+        self.write_bytes = write_bytes
+
+    @property
+    def cpu_seconds(self) -> float:
+        return self.user_seconds + self.sys_seconds
+
+    @property
+    def killed(self) -> bool:
+        """是否被监管器主动终止（超时、输出超限、stdout_sink 出错或请求取消）"""
+        return self.exit_reason in ("timeout", "output_limit", "sink_error", "cancelled")
+
+    def usage(self) -> dict:
+        """资源占用，用于结构化日志和响应"""
+        return {
+            "tool": self.tool,
+            "pid": self.pid,
+            "exit_reason": self.exit_reason,
+            "wall_seconds": round(self.wall_seconds, 3),
+            "user_seconds": round(self.user_seconds, 3),
+            "sys_seconds": round(self.sys_seconds, 3),
+            "max_rss_kb": self.max_rss_kb,
+            "read_bytes": self.read_bytes,
+            "write_bytes": self.write_bytes,
+        }
+
+
+def available_cpus() -> int:
+    """当前进程可用的 CPU 数：取 CPU 亲和性与 cgroup CPU 配额中较小者"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = None
+    try:
+        # cgroup v2: "<quota> <period>" 或 "max <period>"
+        with open("/sys/fs/cgroup/cpu.max", "r") as f:
+            value, period = f.read().split()
+        if value != "max":
+            quota = int(value) / int(period)
+    except (OSError, ValueError):
+        try:
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "r") as f:
+                value = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us", "r") as f:
+                period = int(f.read())
+            if value > 0:
+                quota = value / period
+        except (OSError, ValueError):
+            pass
+    if quota:
+        cpus = min(cpus, max(int(math.ceil(quota)), 1))
+    return cpus
+
+
+def active_processes() -> int:
+    """当前由 run_supervised 启动且尚未结束的工具进程数"""
+    return _active_processes
+
+
+def _decode_status(status: int) -> int:
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _signal_group(pgid: int, sig: int) -> None:
+    try:
+        os.killpg(pgid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _poll_exit(pid: int, deadline: Optional[float]):
+    """等待进程退出，返回 (退出状态, rusage)；超过 deadline 返回 None"""
+    while True:
+        waited_pid, status, rusage = os.wait4(pid, os.WNOHANG)
+        if waited_pid == pid:
+            return status, rusage
+        if deadline is not None and time.monotonic() >= deadline:
+            return None
+        time.sleep(_POLL_INTERVAL)
+
+
+def _kill_group(proc: subprocess.Popen):
+    """SIGTERM 整个进程组，宽限期后 SIGKILL，返回 (退出状态, rusage)"""
+    _signal_group(proc.pid, signal.SIGTERM)
+    exited = _poll_exit(proc.pid, time.monotonic() + KILL_GRACE_SECONDS)
+    if exited is None:
+        _signal_group(proc.pid, signal.SIGKILL)
+        _, status, rusage = os.wait4(proc.pid, 0)
+        exited = status, rusage
+    # 组长退出后清理仍残留的子进程
+    _signal_group(proc.pid, signal.SIGKILL)
+    return exited
+
+
+def _supervise(proc: subprocess.Popen, timeout: Optional[float], max_output_bytes: Optional[int],
+               cancel_event: threading.Event, stdout_sink: Optional[Callable[[bytes], None]] = None):
+    """在监管线程中读取输出、执行超时/输出上限/取消检查，并回收子进程"""
+    deadline = time.monotonic() + timeout if timeout else None
+    stdout_fd, stderr_fd = proc.stdout.fileno(), proc.stderr.fileno()
+    chunks = {stdout_fd: [], stderr_fd: []}
+    total_bytes = 0
+    reason = None
+
+    selector = selectors.DefaultSelector()
+    selector.register(proc.stdout, selectors.EVENT_READ)
+    selector.register(proc.stderr, selectors.EVENT_READ)
+    try:
+        while reason is None and selector.get_map():
+            if cancel_event.is_set():
+                reason = "cancelled"
+                break
+            wait = _POLL_INTERVAL
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    reason = "timeout"
+                    break
+                wait = min(wait, remaining)
+            for key, _ in selector.select(wait):
+                data = os.read(key.fd, _READ_CHUNK_SIZE)
+                if not data:
+                    selector.unregister(key.fileobj)
+                    continue
+                if stdout_sink is not None and key.fd == stdout_fd:
+                    # 交给调用方增量处理的 stdout 不在内存中累积，不计入输出上限
+                    try:
+                        stdout_sink(data)
+                    except Exception:
+                        logger.exception(f"stdout_sink 处理输出失败，终止进程 pid={proc.pid}")
+                        reason = "sink_error"
+                        break
+                    continue
+                total_bytes += len(data)
+                if max_output_bytes and total_bytes > max_output_bytes:
+                    reason = "output_limit"
+                    break
+                chunks[key.fd].append(data)
+    finally:
+        selector.close()
+
+    # 管道关闭后进程可能仍在运行，继续等待直到退出、超时或取消
+    exited = None
+    while reason is None:
+        exited = _poll_exit(proc.pid, time.monotonic() + _POLL_INTERVAL)
+        if exited is not None:
+            break
+        if cancel_event.is_set():
+            reason = "cancelled"
+        elif deadline is not None and time.monotonic() >= deadline:
+            reason = "timeout"
+
+    if reason is not None:
+        exited = _kill_group(proc)
+    status, rusage = exited
+    returncode = _decode_status(status)
+    # 子进程已由监管线程回收，同步到 Popen 对象避免其再次 wait
+    proc.returncode = returncode
+    proc.stdout.close()
+    proc.stderr.close()
+
+    if reason is None:
+        if returncode == 0:
+            reason = "ok"
+        elif returncode < 0:
+            reason = "signal"
+        else:
+            reason = "error"
+    return returncode, b"".join(chunks[stdout_fd]), b"".join(chunks[stderr_fd]), reason, rusage
+
+
+@contextmanager
+def collect_process_results():
+    """
+    收集当前上下文（包括其中创建的子任务）内所有 run_supervised 的运行结果，
+    用于按请求汇总峰值内存、CPU 时间等资源占用；可以嵌套，内外层都会收到结果
+
+    用法:
+        with collect_process_results() as results:
+            await run_tool(...)
+        peak_rss_kb = max((r.max_rss_kb for r in results), default=0)
+    """
+    results: List[ProcessResult] = []
+    token = _result_collectors.set(_result_collectors.get() + (results,))
+    try:
+        yield results
+    finally:
+        _result_collectors.reset(token)
+
+
+@contextmanager
+def pinned_cpus(cpus: Optional[Iterable[int]]):
+    """
+    当前上下文（包括其中创建的子任务）内 run_supervised 启动的子进程绑定到 cpus，
+    cpus 为 None 时不绑定（继承服务进程的亲和性）
+
+    用法:
+        with pinned_cpus({2, 3}):
+            await run_tool(...)
+    """
+    token = _cpu_affinity.set(set(cpus) if cpus else None)
+    try:
+        yield
+    finally:
+        _cpu_affinity.reset(token)
+
+
+async def run_supervised(
+    tool: str,
+    cmd: Sequence,
+    cwd: Optional[str] = None,
+    env: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+    max_output_bytes: Optional[int] = None,
+    cpus: Optional[Iterable[int]] = None,
+    stdout_sink: Optional[Callable[[bytes], None]] = None,
+) -> ProcessResult:
+    """
+    在独立进程组中运行外部工具并等待其结束
+
+    Args:
+        tool: 工具名称，用于读取 SUPERVISOR.tool_timeouts 中的超时配置和日志
+        cmd: 命令及参数
+        cwd: 工作目录
+        env: 环境变量（不指定则继承当前进程）
+        timeout: 墙钟超时（秒），默认读取配置；0 表示不限制
+        max_output_bytes: stdout + stderr 累计字节上限，默认读取配置；0 表示不限制
+        cpus: 子进程绑定的 CPU 集合，默认取 pinned_cpus 设置的值；None 表示不绑定
+        stdout_sink: 按读取顺序接收 stdout 数据块的回调（在监管线程中调用）；指定时结果中的 stdout 为空，
+            且 stdout 不计入 max_output_bytes
+
+    Returns:
+        ProcessResult: 被终止时 returncode 为负的信号值，stderr 末尾附带终止原因
+
+    Raises:
+        asyncio.CancelledError: 调用方被取消时，终止整个进程组后重新抛出
+    """
+    if timeout is None:
+        timeout = TOOL_TIMEOUTS.get(tool, DEFAULT_TIMEOUT)
+    if max_output_bytes is None:
+        max_output_bytes = DEFAULT_MAX_OUTPUT_BYTES
+    cmd = [str(arg) for arg in cmd]
+    cpus = set(cpus) if cpus else _cpu_affinity.get()
+
+    started = time.monotonic()
+    proc = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=cwd,
+        env=env,
+        start_new_session=True
+    )
+    if cpus:
+        # 服务进程中有多个线程，fork 后在子进程里执行 Python 代码（preexec_fn）不安全，
+        # 改为进程启动后立即设置亲和性，工具之后派生的子进程都会继承
+        try:
+            os.sched_setaffinity(proc.pid, cpus)
+        except OSError:
+            # CPU 集合不可用（如容器 cpuset 变更）或进程已退出时不绑定，不影响工具运行
+            pass
+    pinned = f" cpus={','.join(str(cpu) for cpu in sorted(cpus))}" if cpus else ""
+    logger.info(f"{tool} 进程启动 pid={proc.pid} timeout={timeout}s{pinned}: {' '.join(cmd)}")
+
+    global _active_processes
+    cancel_event = threading.Event()
+    future = run_in_executor(
+        _supervisor_executor, _supervise, proc, timeout, max_output_bytes, cancel_event, stdout_sink
+    )
+    _active_processes += 1
+    PROCESSES_RUNNING.inc(tool=tool)
+    try:
+        returncode, stdout, stderr, reason, rusage = await asyncio.shield(future)
+    except asyncio.CancelledError:
+        cancel_event.set()
+        PROCESS_EXITS.inc(tool=tool, exit_reason="cancelled")
+        logger.warning(f"{tool} 请求已取消，终止进程组 pid={proc.pid}")
+        # 等待监管线程完成进程组清理，避免留下僵尸进程
+        await asyncio.wait([future])
+        raise
+    finally:
+        _active_processes -= 1
+        PROCESSES_RUNNING.dec(tool=tool)
+
+    wall_seconds = time.monotonic() - started
+    PROCESS_EXITS.inc(tool=tool, exit_reason=reason)
+    STAGE_DURATION.observe(wall_seconds, tool=tool, stage="subprocess")
+    record_span("subprocess", started, tool=tool, pid=proc.pid, exit_reason=reason)
+    # Linux 下 ru_maxrss 单位为 KB，ru_inblock/ru_oublock 单位为 512 字节（只统计实际落盘/读盘，不含页缓存命中）
+    max_rss_kb = rusage.ru_maxrss
+    cpu_seconds = rusage.ru_utime + rusage.ru_stime
+    read_bytes = rusage.ru_inblock * 512
+    write_bytes = rusage.ru_oublock * 512
+    if reason in ("timeout", "output_limit", "sink_error"):
+        stderr += f"\n[supervisor] {tool} 已被终止: {reason}".encode()
+        logger.warning(
+            f"{tool} 进程 pid={proc.pid} 被终止: exit_reason={reason}, 耗时 {wall_seconds:.1f}s"
+        )
+    else:
+        logger.info(
+            f"{tool} 进程 pid={proc.pid} 结束: exit_reason={reason}, returncode={returncode}, "
+            f"耗时 {wall_seconds:.1f}s, CPU {cpu_seconds:.1f}s（用户态 {rusage.ru_utime:.1f}s, 内核态 {rusage.ru_stime:.1f}s）, "
+            f"峰值内存 {max_rss_kb / 1024:.0f}MB, 读 {read_bytes / 1048576:.1f}MB, 写 {write_bytes / 1048576:.1f}MB"
+        )
+    result = ProcessResult(
+        tool, proc.pid, returncode, stdout, stderr, reason, wall_seconds, max_rss_kb,
+        rusage.ru_utime, rusage.ru_stime, read_bytes, write_bytes
+    )
+    for collector in _result_collectors.get():
+        collector.append(result)
+    return result
+
+
+async def cancel_on_disconnect(http_request, coro, disconnected_result=None):
+    """
+    运行 coro，期间轮询 HTTP 客户端是否断开；断开后取消 coro，
+    由 run_supervised 终止其启动的工具进程
+
+    Args:
+        http_request: FastAPI/Starlette 的 Request 对象
+        coro: 工具调用协程
+        disconnected_result: (可选)客户端断开后返回的结果，默认返回 text 类型的 JSON 字符串
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait([task], timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                break
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+
+    logger.warning(f"客户端已断开连接，取消请求: {http_request.url.path}")
+    task.cancel()
+    await asyncio.wait([task])
+    if disconnected_result is not None:
+        return disconnected_result
+    return json.dumps({
+        "type": "text",
+        "content": "客户端已断开连接，任务已取消"
+    }, ensure_ascii=False)
@@ -0,0 +1,286 @@
+"""
+请求级阶段追踪
+
+TracingMiddleware 为每个请求生成请求 ID（请求头 X-Request-Id 符合 [A-Za-z0-9._-]{1,64} 时沿用），并在上下文中创建追踪记录；
+请求内通过 span() / traced() 记录各阶段（下载、切分、工具进程、解析、写 Excel、上传等）的开始时间和耗时，
+上下文会自动传递到请求内创建的子任务，因此多肽长/多分片并发时各分片的阶段也会记录在同一请求下。
+请求结束后：
+1. 输出一行结构化日志（trace {...}，JSON）；
+2. 在响应头 X-Request-Id 中返回请求 ID；
+3. 配置 include_in_response 为 true 或请求头 X-Include-Timings 为 1/true 时，
+   在响应 JSON 中加入 timings 字段（各阶段明细和按阶段汇总的耗时）。
+没有追踪记录时（如不经过 HTTP 的调用）span() 不做任何事情。
+
+各服务的 HTTP 中间件都写成纯 ASGI 中间件（包装 send，receive 原样传给接口）：
+BaseHTTPMiddleware 会吞掉 http.disconnect，接口内的 cancel_on_disconnect 就检测不到客户端断开。
+需要修改响应 JSON 的中间件通过 rewriting_send 只在确实要改时缓冲响应体。
+"""
+import asyncio
+import contextvars
+import functools
+import json
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+
+from src.utils.log import logger, request_id_context
+from config import CONFIG_YAML
+
+TRACING_CONFIG = CONFIG_YAML.get("TRACING", {})
+TRACING_ENABLED = TRACING_CONFIG.get("enabled", True)
+INCLUDE_IN_RESPONSE = TRACING_CONFIG.get("include_in_response", False)
+REQUEST_HEADER = TRACING_CONFIG.get("request_header", "X-Include-Timings")
+MAX_SPANS = TRACING_CONFIG.get("max_spans", 500)
+
+REQUEST_ID_HEADER = "X-Request-Id"
+# 请求 ID 会写入日志和响应头，只接受安全字符，不符合时重新生成
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+_current_trace = contextvars.ContextVar("request_trace", default=None)
+_current_span = contextvars.ContextVar("request_span", default=None)
+
+
+class Trace:
+    """一次请求的追踪记录"""
+
+    def __init__(self, request_id: str, path: str):
+        self.request_id = request_id
+        self.path = path
+        self.started = time.monotonic()
+        self.spans = []
+        self.dropped = 0
+        self._next_id = 0
+
+    def new_span_id(self) -> int:
+        self._next_id += 1
+        return self._next_id
+
+    def add(self, record: dict) -> None:
+        if len(self.spans) >= MAX_SPANS:
+            self.dropped += 1
+            return
+        self.spans.append(record)
+
+    def summary(self) -> dict:
+        """各阶段明细（按开始时间排序）和按阶段名汇总的耗时"""
+        stages = {}
+        for record in self.spans:
+            stages[record["name"]] = round(stages.get(record["name"], 0.0) + record["duration"], 3)
+        result = {
+            "request_id": self.request_id,
+            "total_seconds": round(time.monotonic() - self.started, 3),
+            "stages": stages,
+            "spans": sorted(self.spans, key=lambda record: record["start"]),
+        }
+        if self.dropped:
+            result["dropped_spans"] = self.dropped
+        return result
+
+
+def _add_span(trace: Trace, span_id: int, parent: Optional[int], name: str, started: float,
+              attrs: dict, error: Optional[str] = None) -> None:
+    record = {
+        "id": span_id,
+        "parent": parent,
+        "name": name,
+        "start": round(started - trace.started, 3),
+        "duration": round(time.monotonic() - started, 3),
+    }
+    if attrs:
+        record["attrs"] = attrs
+    if error:
+        record["error"] = error
+    trace.add(record)
+
+
+def request_id_from(request) -> str:
+    """请求头中的请求 ID 合法时沿用，否则生成新的 ID"""
+    request_id = request.headers.get(REQUEST_ID_HEADER)
+    if request_id and REQUEST_ID_PATTERN.fullmatch(request_id):
+        return request_id
+    return uuid.uuid4().hex
+
+
+def current_request_id() -> Optional[str]:
+    """当前请求的请求 ID，不在请求上下文中时返回 None"""
+    return request_id_context.get()
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    记录一个阶段的耗时，可以嵌套；也可作为同步函数的装饰器（异步函数使用 traced）
+
+    用法:
+        with span("merge_excels", files=len(excel_files)):
+            merge_excels(excel_files, output)
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    span_id = trace.new_span_id()
+    parent = _current_span.get()
+    token = _current_span.set(span_id)
+    started = time.monotonic()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        _add_span(trace, span_id, parent, name, started, attrs, error)
+
+
+def record_span(name: str, started: float, **attrs) -> None:
+    """记录一个已经结束的阶段，started 为 time.monotonic() 记录的开始时间"""
+    trace = _current_trace.get()
+    if trace is not None:
+        _add_span(trace, trace.new_span_id(), _current_span.get(), name, started, attrs)
+
+
+def traced(name: Optional[str] = None):
+    """把整个函数调用记录为一个阶段，支持同步和异步函数"""
+    def decorator(func):
+        span_name = name or func.__name__
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def header_enabled(request, header: str, default: bool) -> bool:
+    """请求头为 1/true/yes 时开启，为其他非空值时关闭，未设置时使用 default"""
+    value = (request.headers.get(header) or "").strip().lower()
+    if value:
+        return value in ("1", "true", "yes")
+    return default
+
+
+def add_body_field(body: bytes, field: str, value) -> bytes:
+    """
+    在响应 JSON 中加入一个字段：直接拼接在末尾的 } 之前，不解析、不重新序列化整个响应体。
+    接口返回的是 JSON 字符串（json.dumps 后的 {"type": ...}），FastAPI 会再编码一次，
+    这种形式下拼接的片段同样按字符串内容转义；不是 JSON 对象时原样返回
+    """
+    fragment = json.dumps(field, ensure_ascii=False) + ": " + json.dumps(value, ensure_ascii=False)
+    body = body.rstrip()
+    if body.startswith(b"{") and body.endswith(b"}"):
+        head = body[:-1].rstrip()
+        separator = "" if head == b"{" else ", "
+        return head + (separator + fragment).encode("utf-8") + b"}"
+    if body.startswith(b'"{') and body.endswith(b'}"'):
+        head = body[:-2]
+        separator = "" if head == b'"{' else ", "
+        return head + json.dumps(separator + fragment, ensure_ascii=False)[1:-1].encode("utf-8") + b'}"'
+    return body
+
+
+def remove_body_field(body: bytes, field: str) -> bytes:
+    """从响应 JSON 中去掉一个字段（两种编码形式都支持），不含该字段时不解析响应体"""
+    if json.dumps(field).encode("utf-8") not in body and json.dumps(json.dumps(field))[1:-1].encode("utf-8") not in body:
+        return body
+    try:
+        payload = json.loads(body)
+        if isinstance(payload, str):
+            inner = json.loads(payload)
+            if not isinstance(inner, dict) or field not in inner:
+                return body
+            inner.pop(field)
+            payload = json.dumps(inner, ensure_ascii=False)
+        elif isinstance(payload, dict) and field in payload:
+            payload.pop(field)
+        else:
+            return body
+    except ValueError:
+        return body
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+def rewriting_send(send, on_start):
+    """
+    包装 ASGI send，在响应发出时修改响应头和 JSON 响应体
+
+    on_start(message) 在 http.response.start 时调用，可以修改其中的响应头（MutableHeaders(scope=message)）；
+    返回 rewrite(body) 函数时收齐 JSON 响应体、修改一次后再发送并更新 Content-Length，
+    返回 None 或响应不是 JSON 时直接透传，不缓冲响应体
+    """
+    start = None
+    rewrite = None
+    chunks = []
+
+    async def wrapped(message):
+        nonlocal start, rewrite
+        if message["type"] == "http.response.start":
+            rewrite = on_start(message)
+            if rewrite is not None and "json" in MutableHeaders(scope=message).get("content-type", ""):
+                start = message
+                return
+            await send(message)
+            return
+        if start is None or message["type"] != "http.response.body":
+            await send(message)
+            return
+        chunks.append(message.get("body", b""))
+        if message.get("more_body", False):
+            return
+        body = rewrite(b"".join(chunks))
+        MutableHeaders(scope=start)["content-length"] = str(len(body))
+        await send(start)
+        await send({"type": "http.response.body", "body": body})
+
+    return wrapped
+
+
+class TracingMiddleware:
+    """为请求生成请求 ID 和追踪记录，响应发出时输出追踪日志并按需返回 timings"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not TRACING_ENABLED or scope["path"] in ("/", "/metrics"):
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        request_id = request_id_from(request)
+        trace = Trace(request_id, scope["path"])
+        include_timings = header_enabled(request, REQUEST_HEADER, INCLUDE_IN_RESPONSE)
+
+        def on_start(message):
+            timings = trace.summary()
+            record = {"method": scope["method"], "path": trace.path, "status": message["status"]}
+            record.update(timings)
+            logger.info("trace " + json.dumps(record, ensure_ascii=False))
+            MutableHeaders(scope=message)[REQUEST_ID_HEADER] = request_id
+            if include_timings:
+                return lambda body: add_body_field(body, "timings", timings)
+            return None
+
+        tokens = (
+            _current_trace.set(trace),
+            _current_span.set(None),
+            request_id_context.set(request_id),
+        )
+        try:
+            await self.app(scope, receive, rewriting_send(send, on_start))
+        finally:
+            request_id_context.reset(tokens[2])
+            _current_span.reset(tokens[1])
+            _current_trace.reset(tokens[0])